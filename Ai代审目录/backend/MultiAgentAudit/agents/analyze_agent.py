@@ -1,17 +1,48 @@
 
 import os
+import re
 import json
 import logging
 from agents.base_agent import BaseAgent
 from core.prompts import Prompts
+from utils.file_scanner import ProjectScan
+from utils.source_loader import SourceFile
+from utils.taint_engine import find_taint_paths, SUPPORTED_LANGUAGES
+from utils.symbol_index import SymbolIndex
+from utils.finding_vectors import FindingVectorIndex, format_examples
+from core.token_budget import get_counter
+
+# 单次确认调用最多携带的候选路径数
+MAX_CANDIDATES_PER_CALL = 20
+# 每条候选路径附带的跨文件上下文（调用方/被调函数片段）Token 上限
+CONTEXT_TOKENS_PER_CANDIDATE = 600
+# 每次调用注入的相似历史案例数量及 Token 上限
+FEW_SHOT_K = 3
+FEW_SHOT_TOKENS = 400
 
 class AnalyzeAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, taint_first=None, few_shot=None):
         super().__init__("AnalyzeAgent")
+        # 支持的语言先走本地污点引擎，LLM 只确认候选路径（没有候选路径的文件仍做完整分析）；
+        # 关闭后每个文件都做完整 LLM 分析
+        if taint_first is None:
+            taint_first = os.getenv("ANALYZE_TAINT_FIRST", "1") != "0"
+        self.taint_first = taint_first
+        self.symbols = None
+        # 已验证漏洞的本地向量索引：检索相似案例作为 few-shot；
+        # 只有 HackerAgent 用 PoC 验证确认的漏洞才写入（见 remember_verified），LLM 自评的置信度不算确认
+        if few_shot is None:
+            few_shot = os.getenv("ANALYZE_FEW_SHOT", "1") != "0"
+        self.few_shot = few_shot
+        self.examples = None
+        # (文件, 位置, 类型) -> (写入案例库时使用的代码片段, 语言)
+        self._example_sources = {}
 
-    def run(self, target_dir, env_data):
+    def run(self, target_dir, env_data, scan=None, checkpoint=None):
         """
         根据环境信息，审计目标目录下的代码。
+        scan 为同一任务共享的 ProjectScan，未提供时新建。
+        checkpoint 为 core.memory.Checkpoint 时按文件记录结果，续跑时跳过已完成的文件。
         """
         print(f"[{self.name}] Starting code audit...")
         
@@ -34,54 +65,227 @@ class AnalyzeAgent(BaseAgent):
             ".cs": "csharp"
         }
         
-        # 处理单文件
-        if os.path.isfile(target_dir):
-            ext = os.path.splitext(target_dir)[1].lower()
-            if ext in extension_map:
-                language = extension_map[ext]
-                self._audit_file(target_dir, language, results)
-        else:
-            # 处理目录
-            for root, dirs, files in os.walk(target_dir):
-                for file in files:
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in extension_map:
-                        path = os.path.join(root, file)
-                        language = extension_map[ext]
-                        self._audit_file(path, language, results)
+        # 单文件和目录统一由扫描器处理（已跳过依赖目录、压缩/生成/二进制/超大文件）
+        scan = scan or ProjectScan(target_dir)
+
+        # 符号索引每个任务构建一次（持久化，增量更新），用于跨文件确认参数来源和检索上下文
+        if self.taint_first:
+            try:
+                self.symbols = SymbolIndex.load_or_build(scan)
+                print(f"[{self.name}] Symbol index ready ({len(self.symbols.files)} files, {self.symbols.reparsed} re-parsed).")
+            except Exception as e:
+                logging.warning(f"Symbol index build failed: {e}")
+                self.symbols = None
+
+        if self.few_shot and self.examples is None:
+            try:
+                self.examples = FindingVectorIndex()
+                print(f"[{self.name}] Finding index ready ({len(self.examples)} past findings).")
+            except OSError as e:
+                logging.warning(f"Finding index unavailable: {e}")
+
+        try:
+            for entry in scan.iter_files(extension_map):
+                if checkpoint is None:
+                    self._audit_file(entry.path, extension_map[entry.ext], results)
+                    continue
+                done = checkpoint.get("analyze", entry.rel_path)
+                if done is not None:
+                    results["vulnerabilities"].extend(done)
+                    print(f"[{self.name}] Resumed {entry.rel_path} from checkpoint.")
+                    continue
+                file_results = {"vulnerabilities": []}
+                # 失败的文件不记录，续跑时重新审计
+                if self._audit_file(entry.path, extension_map[entry.ext], file_results):
+                    checkpoint.put("analyze", file_results["vulnerabilities"], entry.rel_path)
+                results["vulnerabilities"].extend(file_results["vulnerabilities"])
+        finally:
+            # 案例库只在本次运行内打开，下次运行重新加载（包含本次写入的结论）
+            if self.examples is not None:
+                self.examples.close()
+                self.examples = None
 
         return results
 
     def _audit_file(self, file_path, language, results):
+        """审计单个文件，结果追加到 results；出错返回 False"""
         print(f"[{self.name}] Auditing file: {os.path.basename(file_path)}")
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # 按文件内存映射读取并识别编码，不拼接整个项目
+            with SourceFile(file_path) as source:
+                content = source.text()
+                
+                # 本地污点引擎先找候选路径，LLM 只做确认；
+                # 没有候选路径时不能断定文件安全（规则覆盖不到的漏洞），退回完整 LLM 分析
+                paths = None
+                if self.taint_first and language in SUPPORTED_LANGUAGES:
+                    paths = find_taint_paths(content, language, file_path, track_params=self.symbols is not None)
+                if paths is not None:
+                    paths = [path for path in paths if self._reachable(path)]
+                    if paths:
+                        self._confirm_paths(file_path, language, source, paths, results)
+                        return True
+                    print(f"[{self.name}] No candidate taint paths in {os.path.basename(file_path)}, "
+                          f"falling back to full analysis.")
+            
+            # 超出模型上下文窗口时按行截断，避免请求失败
+            counter = get_counter(self.llm.model)
+            examples = self._similar_examples(content, language, counter)
+            budget = counter.prompt_budget(
+                Prompts.ANALYZE_SYSTEM,
+                Prompts.ANALYZE_TASK_TEMPLATE.format(
+                    language=language, file_path=file_path, examples=examples, code_content="")
+            )
+            content = counter.truncate(content, budget)
             
             user_prompt = Prompts.ANALYZE_TASK_TEMPLATE.format(
                 language=language,
                 file_path=file_path,
+                examples=examples,
                 code_content=content
             )
             
             response = self.llm.chat(Prompts.ANALYZE_SYSTEM, user_prompt)
             logging.info(f"Raw LLM response for {os.path.basename(file_path)}: {response}")
             
-            # 清理 Markdown 标记
-            cleaned_response = response.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.startswith("```"):
-                cleaned_response = cleaned_response[3:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
-            
-            data = json.loads(cleaned_response)
-            if data.get("vulnerabilities"):
-                for vuln in data["vulnerabilities"]:
-                    vuln["file"] = file_path # 添加文件路径信息
-                    results["vulnerabilities"].append(vuln)
-                    print(f"  [!] Found {vuln['type']} in {os.path.basename(file_path)}")
+            for vuln in self._parse_vulnerabilities(response):
+                vuln["file"] = file_path # 添加文件路径信息
+                results["vulnerabilities"].append(vuln)
+                self._example_sources[self._example_key(vuln)] = (vuln.get("code_snippet"), language)
+                print(f"  [!] Found {vuln['type']} in {os.path.basename(file_path)}")
+            return True
             
         except Exception as e:
             print(f"Error auditing {file_path}: {e}")
+            return False
+
+    def _confirm_paths(self, file_path, language, source, paths, results):
+        """把候选污点路径（含相关代码片段）交给 LLM 复核，超过单次上限时分多次确认"""
+        calls = (len(paths) + MAX_CANDIDATES_PER_CALL - 1) // MAX_CANDIDATES_PER_CALL
+        print(f"[{self.name}] {len(paths)} candidate taint path(s), asking LLM to confirm in {calls} call(s)...")
+        for start in range(0, len(paths), MAX_CANDIDATES_PER_CALL):
+            self._confirm_batch(file_path, language, source, paths[start:start + MAX_CANDIDATES_PER_CALL], results)
+
+    def _confirm_batch(self, file_path, language, source, paths, results):
+        """一次确认调用，候选编号在本批内从 1 开始"""
+        counter = get_counter(self.llm.model)
+        blocks, snippets = [], []
+        for index, path in enumerate(paths, 1):
+            flow = " -> ".join(f"{var}@{line}" for line, var in path.steps) or "直接传入"
+            lines = self._snippet_lines(path, source.line_count)
+            snippet = "\n".join(f"{number:>5}| {source.line(number)}" for number in lines)
+            block = (
+                f"[#{index}] {path.vuln_type}\n"
+                f"Source 第 {path.source[0]} 行: {path.source[1]}\n"
+                f"传播: {flow}\n"
+                f"Sink 第 {path.sink[0]} 行: {path.sink_name}\n"
+                f"{snippet}"
+            )
+            if self.symbols is not None:
+                context = self.symbols.context_for(file_path, path.function, counter, CONTEXT_TOKENS_PER_CANDIDATE)
+                if context:
+                    block += f"\n跨文件上下文:\n{context}"
+            blocks.append(block)
+            # 检索和入库使用不带行号的原始代码
+            snippets.append("\n".join(source.line(number) for number in lines))
+        
+        user_prompt = Prompts.CONFIRM_TEMPLATE.format(
+            language=language,
+            file_path=file_path,
+            examples=self._similar_examples("\n".join(snippets), language, counter),
+            candidates="\n\n".join(blocks)
+        )
+        response = self.llm.chat(Prompts.CONFIRM_SYSTEM, user_prompt)
+        logging.info(f"Taint confirmation for {os.path.basename(file_path)}: {response}")
+        
+        for vuln in self._parse_vulnerabilities(response):
+            candidate = self._candidate(vuln.get("candidate_id"), paths)
+            if candidate is not None:
+                vuln.setdefault("type", candidate.vuln_type)
+                vuln.setdefault("severity", candidate.severity)
+                vuln.setdefault("location", str(candidate.sink[0]))
+                vuln.setdefault("code_snippet", candidate.sink[1])
+                vuln["taint_path"] = candidate.to_dict()
+            vuln["file"] = file_path
+            results["vulnerabilities"].append(vuln)
+            self._example_sources[self._example_key(vuln)] = (
+                snippets[paths.index(candidate)] if candidate is not None else vuln.get("code_snippet"), language)
+            print(f"  [!] Confirmed {vuln.get('type')} in {os.path.basename(file_path)}")
+
+    def _similar_examples(self, code, language, counter):
+        """检索与本次代码最相似的已确认漏洞，格式化为提示词中的参考案例"""
+        if self.examples is None or not len(self.examples):
+            return ""
+        hits = self.examples.search(code, k=FEW_SHOT_K, language=language)
+        return format_examples(hits, counter, FEW_SHOT_TOKENS)
+
+    @staticmethod
+    def _example_key(vuln):
+        return (vuln.get("file"), str(vuln.get("location")), vuln.get("type"))
+
+    def remember_verified(self, vulns):
+        """
+        把 HackerAgent 用 PoC 验证确认（verified 为 True）的漏洞写入案例库，供后续审计检索。
+        未验证的结论（包括 LLM 自评为 Certain 的）不写入，避免把误报当作参考案例。
+        返回新增条数。
+        """
+        verified = [vuln for vuln in vulns if vuln.get("verified") is True]
+        if not self.few_shot or not verified:
+            return 0
+        added = 0
+        index = None
+        try:
+            index = FindingVectorIndex()
+            for vuln in verified:
+                # 续跑时本次运行没有记录片段，退回漏洞自带的代码片段
+                snippet, language = self._example_sources.get(
+                    self._example_key(vuln), (vuln.get("code_snippet"), None))
+                added += index.add(snippet or "", {
+                    "type": vuln.get("type"),
+                    "severity": vuln.get("severity"),
+                    "language": language,
+                    "reason": vuln.get("reason", ""),
+                })
+        except OSError as e:
+            logging.warning(f"Finding index update failed: {e}")
+        finally:
+            if index is not None:
+                index.close()
+        if added:
+            print(f"[{self.name}] Added {added} verified finding(s) to the finding index.")
+        return added
+
+    def _reachable(self, path):
+        """来自普通函数参数的路径，只有在项目中存在调用方时才保留"""
+        if not path.via_param:
+            return True
+        return bool(self.symbols and self.symbols.callers_of(path.function, self.symbols.rel(path.file)))
+
+    @staticmethod
+    def _snippet_lines(path, line_count, context=1):
+        """路径涉及的行及其上下文，行号去重排序"""
+        lines = set()
+        for line in path.lines:
+            lines.update(range(max(1, line - context), min(line_count, line + context) + 1))
+        return sorted(lines)
+
+    @staticmethod
+    def _candidate(candidate_id, paths):
+        match = re.search(r"\d+", str(candidate_id or ""))
+        if match and 1 <= int(match.group(0)) <= len(paths):
+            return paths[int(match.group(0)) - 1]
+        return None
+
+    @staticmethod
+    def _parse_vulnerabilities(response):
+        # 清理 Markdown 标记
+        cleaned_response = response.strip()
+        if cleaned_response.startswith("```json"):
+            cleaned_response = cleaned_response[7:]
+        if cleaned_response.startswith("```"):
+            cleaned_response = cleaned_response[3:]
+        if cleaned_response.endswith("```"):
+            cleaned_response = cleaned_response[:-3]
+        
+        data = json.loads(cleaned_response)
+        return data.get("vulnerabilities") or []
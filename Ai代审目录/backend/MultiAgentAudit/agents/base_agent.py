@@ -5,13 +5,14 @@ import os
 # 将项目根目录添加到 sys.path，以便导入 core 模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.llm_client import LLMClient
+from core.llm_router import LLMRouter
 
 class BaseAgent:
     def __init__(self, name):
         self.name = name
-        # 默认使用 DeepSeek，因为它性价比最高且能力强
-        self.llm = LLMClient(provider="deepseek")
+        # 按 LLM_PROVIDERS 配置多个 provider，自动选择最快的健康后端并故障切换；
+        # 未配置时只使用 LLM_PROVIDER（默认 DeepSeek，性价比最高且能力强）
+        self.llm = LLMRouter.from_env()
         print(f"[{self.name}] Initialized.")
 
     def run(self, *args, **kwargs):
@@ -1,17 +1,27 @@
 
 import json
 import os
+import hashlib
 import logging
 from agents.base_agent import BaseAgent
 from core.prompts import Prompts
+from utils.poc_verifier import PocVerifier, Probe, TargetLauncher, MAX_CONCURRENCY, REQUEST_TIMEOUT
 
 class HackerAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, verify=None, concurrency=None, timeout=None):
         super().__init__("HackerAgent")
+        # 是否启动目标应用实际发送 Payload 验证：会运行被审计项目的代码，需显式开启（HACKER_VERIFY=1）
+        if verify is None:
+            verify = os.getenv("HACKER_VERIFY", "0") == "1"
+        self.verify = verify
+        self.concurrency = concurrency or int(os.getenv("HACKER_CONCURRENCY", MAX_CONCURRENCY))
+        self.timeout = timeout or float(os.getenv("HACKER_TIMEOUT", REQUEST_TIMEOUT))
 
-    def run(self, analyze_results, env_data):
+    def run(self, analyze_results, env_data, target_dir=None, checkpoint=None):
         """
-        基于审计结果生成 Payload 并（模拟）验证。
+        基于审计结果生成 Payload，并在目标应用上并发验证。
+        target_dir 为被审计的源码目录，用于启动目标；未提供时只生成 Payload。
+        checkpoint 为 core.memory.Checkpoint 时按漏洞记录生成的 Payload，续跑时不再重复调用 LLM。
         """
         print(f"[{self.name}] Generating payloads for identified vulnerabilities...")
         
@@ -39,6 +49,14 @@ class HackerAgent(BaseAgent):
             ext = os.path.splitext(file_path)[1].lower() if file_path else ""
             language = extension_map.get(ext, env_data.get("language", "unknown"))
 
+            unit = hashlib.sha1(json.dumps(vuln, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+            payloads = checkpoint.get("payloads", unit) if checkpoint is not None else None
+            if payloads is not None:
+                verified_vuln = dict(vuln, payloads=payloads, verification="skipped", verified=False)
+                verification_results["verified_vulnerabilities"].append(verified_vuln)
+                print(f"  [+] Resumed {len(payloads)} payloads from checkpoint.")
+                continue
+
             user_prompt = Prompts.HACKER_GEN_PAYLOAD_TEMPLATE.format(
                 vuln_type=vuln['type'],
                 code_snippet=vuln['code_snippet'],
@@ -63,13 +81,47 @@ class HackerAgent(BaseAgent):
                 verified_vuln = vuln.copy()
                 verified_vuln["payloads"] = payload_data.get("payloads", [])
                 
-                # 这里可以添加实际的 HTTP 请求验证逻辑
-                # if self._verify(vuln, payload_data): ...
+                verified_vuln["verification"] = "skipped"
+                verified_vuln["verified"] = False
                 
                 verification_results["verified_vulnerabilities"].append(verified_vuln)
+                if checkpoint is not None:
+                    checkpoint.put("payloads", verified_vuln["payloads"], unit)
                 print(f"  [+] Generated {len(payload_data.get('payloads', []))} payloads.")
                 
             except json.JSONDecodeError:
                 print(f"[{self.name}] Failed to parse payload data.")
 
+        vulns = verification_results["verified_vulnerabilities"]
+        if self.verify and target_dir and vulns:
+            self._verify(vulns, env_data, target_dir)
+
         return verification_results
+
+    def _verify(self, vulns, env_data, target_dir):
+        """启动目标，一次性并发发送所有漏洞的 Payload，并把判定结果写回每个 Payload"""
+        probes = [
+            Probe(vuln_id, payload)
+            for vuln_id, vuln in enumerate(vulns)
+            for payload in vuln["payloads"] if isinstance(payload, dict)
+        ]
+        if not probes:
+            return
+        try:
+            with TargetLauncher(target_dir, env_data) as base_url:
+                print(f"[{self.name}] Verifying {len(probes)} payloads against {base_url}...")
+                results = PocVerifier(base_url, self.concurrency, self.timeout).verify(probes)
+        except Exception as e:
+            print(f"[{self.name}] Verification skipped: {e}")
+            logging.warning(f"HackerAgent verification skipped: {e}")
+            return
+
+        for probe, result in zip(probes, results):
+            probe.payload["verification"] = {k: v for k, v in result.items() if k != "vuln_id"}
+        for vuln in vulns:
+            verdicts = [p.get("verification", {}).get("verdict") for p in vuln["payloads"] if isinstance(p, dict)]
+            vuln["verified"] = "confirmed" in verdicts
+            vuln["verification"] = "confirmed" if vuln["verified"] else (
+                "not_reproduced" if "not_reproduced" in verdicts else "unverifiable")
+            mark = "+" if vuln["verified"] else "-"
+            print(f"  [{mark}] {vuln['type']}: {vuln['verification']}")
@@ -4,56 +4,82 @@ import json
 import logging
 from agents.base_agent import BaseAgent
 from core.prompts import Prompts
+from utils.project_detector import detect_project, MANIFEST_LANGUAGE
+from utils.file_scanner import ProjectScan
+from utils.source_loader import read_source
+from core.token_budget import get_counter
+
+# 需要识别的源码和配置文件
+RELEVANT_SUFFIXES = ('.py', '.php', '.java', '.js', '.ts', '.go', '.c', '.cpp', '.rb', '.rs', '.cs', 'Dockerfile')
+
+# LLM 兜底识别时关键文件内容的 Token 预算（总计 / 单文件）
+KEY_FILES_TOKEN_BUDGET = 1500
+KEY_FILE_TOKENS = 500
 
 class OpsAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, local_confidence_threshold=None):
         super().__init__("OpsAgent")
+        # 本地识别置信度低于该值时才调用 LLM
+        if local_confidence_threshold is None:
+            local_confidence_threshold = float(os.getenv("OPS_LOCAL_CONFIDENCE", "0.6"))
+        self.local_confidence_threshold = local_confidence_threshold
+
+    @staticmethod
+    def _is_relevant(file):
+        return file.endswith(RELEVANT_SUFFIXES) or file.lower() in MANIFEST_LANGUAGE
+
+    def _collect_files(self, scan):
+        return [entry.path for entry in scan.iter_files() if self._is_relevant(entry.name)]
+
+    def _read_key_files(self, file_list):
+        # 读取关键文件开头，按 Token 预算截断（而不是按字符数），仅在 LLM 兜底时使用
+        counter = get_counter(self.llm.model)
+        file_contents = ""
+        used = 0
+        for path in file_list:
+            file = os.path.basename(path)
+            try:
+                content = counter.truncate(read_source(path, 4 * KEY_FILE_TOKENS), KEY_FILE_TOKENS)
+            except Exception as e:
+                print(f"Error reading {file}: {e}")
+                continue
+            section = f"\n--- File: {file} ---\n{content}\n"
+            cost = counter.count(section)
+            if used + cost > KEY_FILES_TOKEN_BUDGET:
+                break
+            file_contents += section
+            used += cost
+        return file_contents
 
-    def run(self, target_dir):
+    def run(self, target_dir, scan=None):
         """
         分析目标目录，识别环境。
+        scan 为同一任务共享的 ProjectScan，未提供时新建。
         """
         print(f"[{self.name}] Scanning directory: {target_dir}")
         
         # 1. 收集文件列表
-        file_list = []
-        file_contents = ""
-        
-        # 处理单文件情况
-        if os.path.isfile(target_dir):
-            file = os.path.basename(target_dir)
-            if file.endswith(('.py', '.php', '.java', '.js', '.ts', '.go', '.c', '.cpp', '.rb', '.rs', '.cs', 'package.json', 'requirements.txt', 'Dockerfile')):
-                file_list.append(target_dir)
-                try:
-                    with open(target_dir, 'r', encoding='utf-8') as f:
-                        content = f.read(2000)
-                        file_contents += f"\n--- File: {file} ---\n{content}\n"
-                except Exception as e:
-                    print(f"Error reading {file}: {e}")
-        else:
-            # 处理目录情况
-            for root, dirs, files in os.walk(target_dir):
-                for file in files:
-                    if file.endswith(('.py', '.php', '.java', '.js', '.ts', '.go', '.c', '.cpp', '.rb', '.rs', '.cs', 'package.json', 'requirements.txt', 'Dockerfile')):
-                        path = os.path.join(root, file)
-                        file_list.append(path)
-                        
-                        # 读取关键文件内容 (前50行)
-                        try:
-                            with open(path, 'r', encoding='utf-8') as f:
-                                content = f.read(2000)
-                                file_contents += f"\n--- File: {file} ---\n{content}\n"
-                        except Exception as e:
-                            print(f"Error reading {file}: {e}")
+        scan = scan or ProjectScan(target_dir)
+        file_list = self._collect_files(scan)
 
         if not file_list:
             print(f"[{self.name}] No relevant files found.")
             return {}
 
-        # 2. 调用 LLM 分析
+        # 2. 本地识别（依赖清单 + 扩展名分布 + 导入特征），置信度足够时不再调用 LLM
+        env_data, confidence = detect_project(file_list)
+        if env_data and confidence >= self.local_confidence_threshold:
+            print(f"[{self.name}] Environment identified locally: {env_data.get('language')} / {env_data.get('framework')} (confidence {confidence:.2f})")
+            logging.info(f"OpsAgent local detection (confidence {confidence:.2f}): {env_data}")
+            return env_data
+
+        print(f"[{self.name}] Local detection confidence {confidence:.2f} too low, falling back to LLM...")
+        file_contents = self._read_key_files(file_list)
+
+        # 3. 调用 LLM 分析
         user_prompt = Prompts.OPS_ANALYZE_TEMPLATE.format(
             file_list=file_list,
-            file_contents=file_contents[:5000] # 截断以避免 Token 过长
+            file_contents=file_contents
         )
         
         response = self.llm.chat(Prompts.OPS_SYSTEM, user_prompt)
@@ -67,7 +93,7 @@ class OpsAgent(BaseAgent):
         if cleaned_response.endswith("```"):
             cleaned_response = cleaned_response[:-3]
 
-        # 3. 解析结果
+        # 4. 解析结果
         try:
             env_data = json.loads(cleaned_response)
             print(f"[{self.name}] Environment identified: {env_data.get('language')} / {env_data.get('framework')}")
@@ -10,6 +10,9 @@ class LLMClient:
         self.base_url = base_url or os.getenv("LLM_BASE_URL")
         self.model = model or os.getenv("LLM_MODEL")
         
+        # 累计 Token 用量，cached_tokens 为服务端前缀缓存命中的输入 Token
+        self.usage = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
         # 初始化客户端
         self.client = None
         if self.api_key:
@@ -61,6 +64,7 @@ class LLMClient:
                     temperature=temperature,
                     response_format={"type": "json_object"} if "JSON" in system_prompt else None
                 )
+                self._record_usage(getattr(response, "usage", None))
                 return response.choices[0].message.content
 
             elif self.provider == "gemini":
@@ -79,6 +83,13 @@ class LLMClient:
                     user_prompt,
                     generation_config=generation_config
                 )
+                metadata = getattr(response, "usage_metadata", None)
+                if metadata is not None:
+                    self._add_usage(
+                        getattr(metadata, "prompt_token_count", 0),
+                        getattr(metadata, "cached_content_token_count", 0),
+                        getattr(metadata, "candidates_token_count", 0)
+                    )
                 return response.text
 
         except Exception as e:
@@ -89,6 +100,30 @@ class LLMClient:
             # print("Falling back to Mock response...")
             # return self._mock_response(system_prompt, user_prompt)
 
+    def _record_usage(self, usage):
+        """
+        记录 OpenAI 兼容接口返回的用量。
+        DeepSeek 返回 prompt_cache_hit_tokens，OpenAI 返回 prompt_tokens_details.cached_tokens。
+        """
+        if usage is None:
+            return
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+        self._add_usage(getattr(usage, "prompt_tokens", 0), cached, getattr(usage, "completion_tokens", 0))
+
+    def _add_usage(self, prompt_tokens, cached_tokens, completion_tokens):
+        self.usage["calls"] += 1
+        self.usage["prompt_tokens"] += prompt_tokens or 0
+        self.usage["cached_tokens"] += cached_tokens or 0
+        self.usage["completion_tokens"] += completion_tokens or 0
+
+    def cache_hit_rate(self):
+        """输入 Token 中命中前缀缓存的比例"""
+        prompt_tokens = self.usage["prompt_tokens"]
+        return self.usage["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+
     def _mock_response(self, system_prompt, user_prompt):
         """
         根据 prompt 内容返回模拟的 JSON 响应，用于演示系统流程。
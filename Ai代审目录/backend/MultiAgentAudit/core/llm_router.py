@@ -0,0 +1,203 @@
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from core.llm_client import LLMClient
+
+SUPPORTED_PROVIDERS = ("deepseek", "openai", "gemini")
+
+
+class ProviderBackend:
+    """
+    单个 provider/model 及其滚动健康统计。
+    latencies 只记录成功调用；连续失败达到阈值后进入冷却期。
+    """
+
+    def __init__(self, client, window=50, failure_threshold=3, cooldown=30.0):
+        self.client = client
+        self.name = f"{client.provider}:{client.model}"
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True 成功 / False 失败
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.unhealthy_until = 0.0
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self.unhealthy_until = time.monotonic() + self.cooldown
+
+    def healthy(self, now=None):
+        return (now or time.monotonic()) >= self.unhealthy_until
+
+    def error_rate(self):
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def score(self):
+        """排序依据：中位延迟按错误率放大；没有样本的后端优先探测一次"""
+        median = self.percentile(0.5)
+        if median is None:
+            return 0.0
+        return median * (1 + 4 * self.error_rate())
+
+    def stats(self):
+        return {
+            "latency_p50": self.percentile(0.5),
+            "latency_p95": self.percentile(0.95),
+            "error_rate": round(self.error_rate(), 3),
+            "healthy": self.healthy(),
+        }
+
+
+class LLMRouter:
+    """
+    多 provider 路由，接口与 LLMClient 一致（chat / usage / model），可直接替换。
+
+    - 每次请求发往当前最快的健康后端
+    - 请求超过该后端的 p95 延迟仍未返回时，向次优后端发起对冲请求，取先成功的结果
+    - 调用失败自动切换到下一个后端，全部失败才抛出异常
+    """
+
+    def __init__(self, clients, hedge_quantile=0.95, min_samples=5, hedge=True):
+        if not clients:
+            raise ValueError("LLMRouter requires at least one client")
+        self.backends = [ProviderBackend(client) for client in clients]
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.hedge = hedge and len(self.backends) > 1
+        self.hedged_requests = 0
+        self.failovers = 0
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.backends), thread_name_prefix="llm-router")
+
+    @classmethod
+    def from_env(cls):
+        """
+        LLM_PROVIDERS=deepseek,openai 时按顺序为每个 provider 读取
+        LLM_API_KEY_<PROVIDER> / LLM_MODEL_<PROVIDER> / LLM_BASE_URL_<PROVIDER>；
+        未配置时退回单个 LLM_PROVIDER（默认 deepseek）+ LLM_API_KEY。
+        """
+        names = [n.strip().lower() for n in os.getenv("LLM_PROVIDERS", "").split(",") if n.strip()]
+        clients = []
+        for name in names:
+            if name not in SUPPORTED_PROVIDERS:
+                print(f"[LLM Router] Unsupported provider '{name}', skipped.")
+                continue
+            suffix = name.upper()
+            api_key = os.getenv(f"LLM_API_KEY_{suffix}")
+            if not api_key:
+                print(f"[LLM Router] LLM_API_KEY_{suffix} not set, provider '{name}' skipped.")
+                continue
+            clients.append(LLMClient(
+                api_key=api_key,
+                provider=name,
+                base_url=os.getenv(f"LLM_BASE_URL_{suffix}"),
+                model=os.getenv(f"LLM_MODEL_{suffix}")
+            ))
+        if not clients:
+            clients.append(LLMClient(provider=os.getenv("LLM_PROVIDER", "deepseek").lower()))
+        return cls(clients)
+
+    @property
+    def model(self):
+        return self.ranked()[0].client.model
+
+    @property
+    def usage(self):
+        total = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        for backend in self.backends:
+            for key in total:
+                total[key] += backend.client.usage[key]
+        return total
+
+    def cache_hit_rate(self):
+        usage = self.usage
+        return usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0.0
+
+    def stats(self):
+        return {backend.name: backend.stats() for backend in self.backends}
+
+    def ranked(self):
+        """健康后端按得分排序在前，冷却中的后端按恢复时间排在后面作为最后手段"""
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.healthy(now)]
+        cooling = [b for b in self.backends if not b.healthy(now)]
+        return sorted(healthy, key=lambda b: b.score()) + sorted(cooling, key=lambda b: b.unhealthy_until)
+
+    def _call(self, backend, system_prompt, user_prompt, temperature):
+        start = time.monotonic()
+        try:
+            result = backend.client.chat(system_prompt, user_prompt, temperature)
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success(time.monotonic() - start)
+        return result
+
+    def _hedge_delay(self, backend):
+        if not self.hedge or len(backend.latencies) < self.min_samples:
+            return None
+        return backend.percentile(self.hedge_quantile)
+
+    def chat(self, system_prompt, user_prompt, temperature=0.7):
+        queue = self.ranked()
+        pending = {}
+        last_error = None
+
+        def launch():
+            backend = queue.pop(0)
+            future = self._executor.submit(self._call, backend, system_prompt, user_prompt, temperature)
+            pending[future] = backend
+            return backend
+
+        primary = launch()
+        hedge_delay = self._hedge_delay(primary)
+
+        while pending:
+            timeout = hedge_delay if (hedge_delay is not None and queue and len(pending) == 1) else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 超过 p95 仍未返回，向下一个后端对冲
+                hedge_delay = None
+                self.hedged_requests += 1
+                backend = launch()
+                print(f"[LLM Router] {primary.name} slower than p95, hedging with {backend.name}")
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"[LLM Router] {backend.name} failed: {e}")
+            if not pending and queue:
+                self.failovers += 1
+                primary = launch()
+                hedge_delay = self._hedge_delay(primary)
+
+        raise last_error
@@ -0,0 +1,148 @@
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import tempfile
+import threading
+
+# 多 Agent 流水线的检查点存储：每个阶段（以及阶段内的每个文件/漏洞）完成后立即落盘，
+# 中断后重新运行同一目标时从最后完成的单元继续，已付费的 LLM 调用不再重复。
+
+DEFAULT_CACHE_DIR = os.getenv("AUDIT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "multiagent_audit"))
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+# 同一目标内容变化后开始了新的运行，旧运行不再恢复
+STATUS_SUPERSEDED = "superseded"
+
+
+def run_fingerprint(scan):
+    """目标目录内容指纹（相对路径 + 大小 + mtime），内容变化后不再复用旧检查点"""
+    digest = hashlib.sha1(scan.root.encode("utf-8"))
+    for entry in scan.iter_files():
+        digest.update(f"\0{entry.rel_path}\0{entry.size}\0{entry.mtime}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class CheckpointStore:
+    """SQLite 检查点库（线程安全），记录运行状态和各阶段单元结果"""
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(DEFAULT_CACHE_DIR, "checkpoints.db")
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                target TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (run_id, stage, unit)
+            );
+        """)
+        self._conn.commit()
+
+    def start_run(self, run_id, target, fresh=False):
+        """
+        登记一次运行；同一 run_id 仍处于 running（上次被中断）时沿用其检查点续跑。
+        已完成或已被取代的运行以及 fresh=True 时清空后重来，不会无限期复用旧结果（模型、提示词可能已变化）。
+        返回 Checkpoint
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if fresh or (row is not None and row[0] != STATUS_RUNNING):
+                self._conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+            self._conn.execute(
+                "INSERT INTO runs (run_id, target, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+                (run_id, target, STATUS_RUNNING, now, now)
+            )
+            self._conn.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE target = ? AND run_id != ? AND status = ?",
+                (STATUS_SUPERSEDED, now, target, run_id, STATUS_RUNNING)
+            )
+        return Checkpoint(self, run_id)
+
+    def finish_run(self, run_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                               (STATUS_COMPLETED, time.time(), run_id))
+
+    def interrupted_runs(self):
+        """未完成的运行 [(run_id, target)]，供服务重启后恢复"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, target FROM runs WHERE status = ? ORDER BY updated_at", (STATUS_RUNNING,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def get(self, run_id, stage, unit):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM checkpoints WHERE run_id = ? AND stage = ? AND unit = ?", (run_id, stage, unit)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, run_id, stage, unit, data):
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, stage, unit, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, stage, unit, payload, time.time())
+            )
+            self._conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def count(self, run_id, stage=None):
+        query, args = "SELECT COUNT(*) FROM checkpoints WHERE run_id = ?", [run_id]
+        if stage is not None:
+            query += " AND stage = ?"
+            args.append(stage)
+        with self._lock:
+            return self._conn.execute(query, args).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class Checkpoint:
+    """
+    绑定到单次运行的检查点视图，传给各 Agent。
+    unit 为阶段内的工作单元（文件相对路径、漏洞内容摘要等），整阶段结果用空字符串。
+    """
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        self.hits = 0
+
+    def get(self, stage, unit=""):
+        data = self.store.get(self.run_id, stage, unit)
+        if data is not None:
+            self.hits += 1
+        return data
+
+    def put(self, stage, data, unit=""):
+        try:
+            self.store.put(self.run_id, stage, unit, data)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            # 检查点写入失败不影响本次审计，只是无法续跑
+            logging.warning(f"Checkpoint {stage}/{unit} not saved: {e}")
+
+    def finish(self):
+        self.store.finish_run(self.run_id)
@@ -0,0 +1,114 @@
+
+import os
+import json
+import math
+import hashlib
+import logging
+from collections import OrderedDict
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖，未安装时按字符估算
+    tiktoken = None
+
+# 常见模型的上下文窗口表（按前缀匹配，长前缀优先），与 backend 共用仓库根目录下的 shared/model_context.json
+MODEL_CONTEXT_FILE = os.getenv("MODEL_CONTEXT_FILE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), *[os.pardir] * 4, "shared", "model_context.json")
+# 数据文件缺失时所有模型按该值计算（取常见模型中最小的窗口，宁小勿大）
+FALLBACK_CONTEXT_TOKENS = 8192
+
+
+def load_context_table(path):
+    """读取模型上下文窗口表，返回 (前缀 -> 窗口大小, 默认窗口大小)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        models = {prefix.lower(): int(tokens) for prefix, tokens in data["models"].items()}
+        return models, int(data.get("default", FALLBACK_CONTEXT_TOKENS))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.warning(f"Model context table unavailable, using {FALLBACK_CONTEXT_TOKENS} tokens: {e}")
+        return {}, FALLBACK_CONTEXT_TOKENS
+
+
+MODEL_CONTEXT_TOKENS, DEFAULT_CONTEXT_TOKENS = load_context_table(MODEL_CONTEXT_FILE)
+# 为模型输出预留的 Token
+RESERVED_OUTPUT_TOKENS = 2048
+
+
+def context_window(model):
+    model = (model or "").lower()
+    for prefix in sorted(MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_CONTEXT_TOKENS[prefix]
+    return DEFAULT_CONTEXT_TOKENS
+
+
+class TokenCounter:
+    """
+    Token 计数器：优先用 tiktoken，否则 ASCII 按 4 字符/Token、其余按 1 字符/Token 估算。
+    计数结果按内容哈希缓存，同一文件在多个 Agent 间重复出现时不会重复分词。
+    """
+
+    def __init__(self, model=None, cache_size=4096):
+        self.model = model or ""
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                self._encoding = None
+
+    @staticmethod
+    def estimate(text):
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+    def count(self, text):
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = self.estimate(text)
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+    def truncate(self, text, max_tokens, marker="\n# ... truncated ..."):
+        """按整行截断到 max_tokens 以内，被截断时追加 marker"""
+        if self.count(text) <= max_tokens:
+            return text
+        budget = max_tokens - self.count(marker)
+        kept, used = [], 0
+        for line in text.splitlines(keepends=True):
+            cost = self.count(line)
+            if used + cost > budget:
+                break
+            kept.append(line)
+            used += cost
+        return "".join(kept) + marker
+
+    def prompt_budget(self, *fixed_parts):
+        """上下文窗口扣除输出预留和固定部分后，留给可变内容的 Token 数"""
+        fixed = sum(self.count(part) for part in fixed_parts)
+        return max(0, context_window(self.model) - RESERVED_OUTPUT_TOKENS - fixed)
+
+
+_counters = {}
+
+
+def get_counter(model):
+    """同一模型共享计数器及其缓存"""
+    counter = _counters.get(model)
+    if counter is None:
+        counter = _counters[model] = TokenCounter(model)
+    return counter
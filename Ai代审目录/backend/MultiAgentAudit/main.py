@@ -25,71 +25,138 @@ from agents.ops_agent import OpsAgent
 from agents.analyze_agent import AnalyzeAgent
 from agents.hacker_agent import HackerAgent
 from agents.reporter_agent import ReporterAgent
+from utils.file_scanner import ProjectScan
+from core.memory import CheckpointStore, run_fingerprint
 
-def main():
-    # 解析命令行参数
-    parser = argparse.ArgumentParser(description="Multi-Agent Security Audit System")
-    parser.add_argument("path", nargs="?", default="uploads", help="Path to the file or directory to audit (default: uploads)")
-    args = parser.parse_args()
+def run_pipeline(target_dir, store=None, fresh=False):
+    """
+    运行完整的审计流水线。store 为 CheckpointStore 时每个阶段/文件/漏洞完成后落盘，
+    同一目标（内容未变）上次运行被中断时从最后完成的单元继续，上次已完成则重新审计。返回报告路径。
+    """
+    # 扫描一次目标目录，所有 Agent 共享结果
+    scan = ProjectScan(target_dir)
 
-    target_dir = os.path.abspath(args.path)
-    
-    # 确保目标存在
-    if not os.path.exists(target_dir):
-        # 如果是默认的 uploads 且不存在，则创建并提示
-        if args.path == "uploads":
-            os.makedirs(target_dir, exist_ok=True)
-            print(f"Created default upload directory: {target_dir}")
-            print("Please upload files to this directory and run again.")
-            return
-        else:
-            print(f"Error: Target path '{target_dir}' not found.")
-            return
+    checkpoint = None
+    if store is not None:
+        run_id = run_fingerprint(scan)
+        checkpoint = store.start_run(run_id, target_dir, fresh=fresh)
+        done = store.count(run_id)
+        if done:
+            print(f"Resuming run {run_id}: {done} checkpoint(s) found.\n")
+        logging.info(f"Run {run_id} started (checkpoints: {done})")
 
-    print("=== Multi-Agent Code Audit System Started ===\n")
-    logging.info(f"System started. Target: {target_dir}")
+    def stage(name, compute):
+        """整阶段检查点：已完成的阶段直接读取结果"""
+        if checkpoint is not None:
+            data = checkpoint.get(name)
+            if data is not None:
+                print(f"[Checkpoint] Stage '{name}' resumed.")
+                return data
+        data = compute()
+        if checkpoint is not None and data:
+            checkpoint.put(name, data)
+        return data
 
     # 1. OpsAgent: 环境识别
     ops_agent = OpsAgent()
-    env_data = ops_agent.run(target_dir)
+    env_data = stage("ops", lambda: ops_agent.run(target_dir, scan))
     logging.info(f"OpsAgent result: {env_data}")
     if not env_data:
         print("OpsAgent failed to identify environment. Exiting.")
-        return
+        return None
     print("-" * 50)
 
-    # 2. AnalyzeAgent: 代码审计
+    # 2. AnalyzeAgent: 代码审计（按文件记录检查点）
     analyze_agent = AnalyzeAgent()
-    analyze_results = analyze_agent.run(target_dir, env_data)
+    analyze_results = analyze_agent.run(target_dir, env_data, scan, checkpoint)
     
     vuln_count = len(analyze_results.get("vulnerabilities", []))
     print(f"[Main Debug] AnalyzeAgent found {vuln_count} vulnerabilities.")
     logging.info(f"AnalyzeAgent found {vuln_count} vulnerabilities: {analyze_results}")
 
+    agents = [ops_agent, analyze_agent]
+    report_path = None
     if not analyze_results.get("vulnerabilities"):
         print("AnalyzeAgent found no vulnerabilities. Exiting.")
-        return
-    print("-" * 50)
+    else:
+        print("-" * 50)
 
-    # 3. HackerAgent: 漏洞验证
-    hacker_agent = HackerAgent()
-    hacker_results = hacker_agent.run(analyze_results, env_data)
-    logging.info(f"HackerAgent finished.")
-    print("-" * 50)
+        # 3. HackerAgent: 漏洞验证（按漏洞记录生成的 Payload）
+        hacker_agent = HackerAgent()
+        hacker_results = stage("hacker", lambda: hacker_agent.run(analyze_results, env_data, target_dir, checkpoint))
+        logging.info(f"HackerAgent finished.")
+        # 只有经 PoC 验证确认的漏洞进入案例库
+        analyze_agent.remember_verified(hacker_results.get("verified_vulnerabilities", []))
+        print("-" * 50)
 
-    # 4. ReporterAgent: 生成报告
-    reporter_agent = ReporterAgent()
-    try:
-        report_path = reporter_agent.run(env_data, analyze_results, hacker_results)
-        logging.info(f"ReporterAgent finished. Report path: {report_path}")
-    except Exception as e:
-        logging.error(f"ReporterAgent failed: {e}", exc_info=True)
-        print(f"ReporterAgent failed: {e}")
-        report_path = None
+        # 4. ReporterAgent: 生成报告
+        reporter_agent = ReporterAgent()
+        agents += [hacker_agent, reporter_agent]
+        try:
+            report_path = stage("report", lambda: reporter_agent.run(env_data, analyze_results, hacker_results))
+            logging.info(f"ReporterAgent finished. Report path: {report_path}")
+        except Exception as e:
+            logging.error(f"ReporterAgent failed: {e}", exc_info=True)
+            print(f"ReporterAgent failed: {e}")
+            print("Completed stages are checkpointed; rerun to resume from the report stage.")
+            return None
     
+    if checkpoint is not None:
+        checkpoint.finish()
+
     print("\n=== Audit Completed ===")
     if report_path:
         print(f"Report available at: {report_path}")
 
+    # 各 Agent 的 Token 用量及前缀缓存命中情况
+    for agent in agents:
+        usage = agent.llm.usage
+        if usage["calls"]:
+            print(f"[{agent.name}] LLM calls: {usage['calls']}, prompt tokens: {usage['prompt_tokens']} "
+                  f"(cached {agent.llm.cache_hit_rate():.0%}), completion tokens: {usage['completion_tokens']}")
+            logging.info(f"{agent.name} LLM usage: {usage}")
+    return report_path
+
+def main():
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="Multi-Agent Security Audit System")
+    parser.add_argument("path", nargs="?", default="uploads", help="Path to the file or directory to audit (default: uploads)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore existing checkpoints for this target")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Do not persist or resume checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Resume all interrupted runs recorded in the checkpoint store")
+    args = parser.parse_args()
+
+    store = None if args.no_checkpoint else CheckpointStore()
+
+    if args.resume:
+        runs = store.interrupted_runs() if store else []
+        if not runs:
+            print("No interrupted runs to resume.")
+        for run_id, target in runs:
+            if not os.path.exists(target):
+                print(f"Skipping run {run_id}: target '{target}' no longer exists.")
+                continue
+            print(f"=== Resuming run {run_id}: {target} ===\n")
+            run_pipeline(target, store)
+        return
+
+    target_dir = os.path.abspath(args.path)
+    
+    # 确保目标存在
+    if not os.path.exists(target_dir):
+        # 如果是默认的 uploads 且不存在，则创建并提示
+        if args.path == "uploads":
+            os.makedirs(target_dir, exist_ok=True)
+            print(f"Created default upload directory: {target_dir}")
+            print("Please upload files to this directory and run again.")
+            return
+        else:
+            print(f"Error: Target path '{target_dir}' not found.")
+            return
+
+    print("=== Multi-Agent Code Audit System Started ===\n")
+    logging.info(f"System started. Target: {target_dir}")
+    run_pipeline(target_dir, store, fresh=args.fresh)
+
 if __name__ == "__main__":
     main()
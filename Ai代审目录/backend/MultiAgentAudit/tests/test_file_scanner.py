@@ -0,0 +1,90 @@
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_scanner import ProjectScan, GitIgnore
+
+class TestFileScanner(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, rel_path, content="x = 1\n"):
+        path = os.path.join(self.test_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = "wb" if isinstance(content, bytes) else "w"
+        with open(path, mode) as f:
+            f.write(content)
+        return path
+
+    def _rel_paths(self, scan, extensions=None):
+        return [entry.rel_path for entry in scan.iter_files(extensions)]
+
+    def test_skips_vendor_generated_binary_and_oversized(self):
+        self._write("app.py")
+        self._write("src/util.js", "module.exports = 1\n")
+        self._write("node_modules/lib/index.js")
+        self._write("vendor/autoload.php")
+        self._write("static/app.min.js")
+        self._write("static/big.js", "var a=1;" * 5000)
+        self._write("proto/user_pb2.py")
+        self._write("logo.png", b"\x89PNG")
+        self._write("data.dat", b"\x00\x01\x02")
+        self._write("huge.py", "#" * (70 * 1024))
+
+        scan = ProjectScan(self.test_dir, max_file_size=64 * 1024)
+        self.assertEqual(self._rel_paths(scan), ["app.py", "src/util.js"])
+        self.assertEqual(scan.skipped["vendor_dir"], 2)
+        self.assertEqual(scan.skipped["generated"], 3)
+        self.assertEqual(scan.skipped["binary"], 2)
+        self.assertEqual(scan.skipped["oversized"], 1)
+
+    def test_gitignore_rules(self):
+        self._write(".gitignore", "# comment\n*.log\n/secret.py\ntmp/\n!keep.log\ndocs/**/*.md\n")
+        self._write("app.py")
+        self._write("secret.py")
+        self._write("sub/secret.py")
+        self._write("debug.log")
+        self._write("keep.log")
+        self._write("tmp/a.py")
+        self._write("docs/guide/a.md")
+        self._write("pkg/.gitignore", "local_*.py\n")
+        self._write("pkg/local_settings.py")
+        self._write("pkg/mod.py")
+
+        scan = ProjectScan(self.test_dir)
+        self.assertEqual(self._rel_paths(scan), ["app.py", "keep.log", "pkg/mod.py", "sub/secret.py"])
+
+    def test_extension_filter_and_cache(self):
+        self._write("a.py")
+        self._write("b.php", "<?php ?>")
+        scan = ProjectScan(self.test_dir)
+        self.assertEqual(self._rel_paths(scan, {".php"}), ["b.php"])
+
+        # 第一次完整遍历后使用缓存，新文件不会再被扫描到
+        self._write("c.py")
+        self.assertEqual(self._rel_paths(scan), ["a.py", "b.php"])
+
+    def test_single_file_target(self):
+        path = self._write("only.py")
+        scan = ProjectScan(path)
+        entries = scan.files()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].path, path)
+        self.assertEqual(entries[0].ext, ".py")
+
+    def test_gitignore_dir_only_pattern(self):
+        rules = GitIgnore(["build/", "*.tmp"])
+        self.assertTrue(rules.match("build", is_dir=True))
+        self.assertIsNone(rules.match("build", is_dir=False))
+        self.assertTrue(rules.match("a/b.tmp", is_dir=False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.finding_vectors import FindingVectorIndex, embed, format_examples
+from agents.analyze_agent import AnalyzeAgent
+
+SQLI = 'cursor.execute("SELECT * FROM users WHERE id = " + user_id)'
+CMDI = 'os.system("ping -c 1 " + host)'
+XSS = 'document.getElementById("out").innerHTML = location.hash.substring(1);'
+
+class TestFindingVectors(unittest.TestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir)
+
+    def _index(self):
+        index = FindingVectorIndex(self.index_dir)
+        self.addCleanup(index.close)
+        return index
+
+    def test_embedding_is_normalized(self):
+        vector = embed(SQLI)
+        self.assertAlmostEqual(sum(v * v for v in vector.values()), 1.0, places=5)
+        self.assertEqual(embed("   "), {})
+
+    def test_search_returns_most_similar(self):
+        index = self._index()
+        self.assertTrue(index.add(SQLI, {"type": "SQL Injection", "language": "python", "reason": "拼接 SQL"}))
+        self.assertTrue(index.add(CMDI, {"type": "Command Injection", "language": "python"}))
+        self.assertTrue(index.add(XSS, {"type": "XSS", "language": "javascript"}))
+        # 相同类型 + 相同片段不重复写入
+        self.assertFalse(index.add(SQLI, {"type": "SQL Injection", "language": "python"}))
+
+        hits = index.search('cur.execute("SELECT name FROM users WHERE id = " + uid)', k=2)
+        self.assertEqual(hits[0][1]["type"], "SQL Injection")
+        self.assertGreater(hits[0][0], 0.5)
+        self.assertEqual(index.search(SQLI, language="javascript", min_score=0.9), [])
+
+    def test_persisted_and_incremental(self):
+        index = self._index()
+        index.add(SQLI, {"type": "SQL Injection"})
+        self.assertEqual(len(index.search(SQLI)), 1)
+        index.add(CMDI, {"type": "Command Injection"})
+        # 文件增长后重新映射，新增条目可以被检索到
+        self.assertEqual(index.search(CMDI)[0][1]["type"], "Command Injection")
+
+        reopened = self._index()
+        self.assertEqual(len(reopened), 2)
+        # 写入中断导致元数据多于向量时，以向量为准
+        with open(reopened.meta_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "orphan"}) + "\n")
+        self.assertEqual(len(self._index()), 2)
+
+    def test_recovers_from_interrupted_write(self):
+        index = self._index()
+        index.add(SQLI, {"type": "SQL Injection"})
+        # 模拟写入向量后、写入元数据前崩溃：多出一行向量
+        with open(index.vectors_path, "ab") as f:
+            f.write(bytes(4 * index.dim))
+        reopened = self._index()
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(os.path.getsize(reopened.vectors_path), 4 * reopened.dim)
+        # 之后追加的条目与元数据仍一一对应
+        reopened.add(CMDI, {"type": "Command Injection"})
+        self.assertEqual(reopened.search(CMDI)[0][1]["type"], "Command Injection")
+        self.assertEqual(self._index().search(SQLI)[0][1]["type"], "SQL Injection")
+
+        # 元数据末尾的半行同样被截掉，新写入的行不会接在半行后面
+        with open(reopened.meta_path, "a", encoding="utf-8") as f:
+            f.write('{"type": "half')
+        index = self._index()
+        index.add(XSS, {"type": "XSS"})
+        self.assertEqual([record["type"] for record in self._index().meta],
+                         ["SQL Injection", "Command Injection", "XSS"])
+
+    def test_format_examples_respects_budget(self):
+        hits = [(0.9, {"type": "SQL Injection", "severity": "High", "snippet": SQLI, "reason": "拼接 SQL"})]
+        text = format_examples(hits)
+        self.assertIn("[参考案例 1] SQL Injection (High) 相似度 0.90", text)
+        self.assertEqual(format_examples(hits, max_tokens=5), "")
+        self.assertEqual(format_examples([]), "")
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_verified_findings_become_examples(self, mock_chat):
+        project = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, project)
+        with open(os.path.join(project, "app.py"), "w", encoding="utf-8") as f:
+            f.write("from flask import request\nimport os\n\ndef ping():\n"
+                    "    host = request.args.get('host')\n    os.system('ping -c 1 ' + host)\n")
+        mock_chat.return_value = json.dumps({"vulnerabilities": [
+            {"candidate_id": 1, "reason": "host 未过滤", "confidence": "Certain"}]})
+
+        with patch("utils.finding_vectors.DEFAULT_INDEX_DIR", self.index_dir), \
+                patch("utils.symbol_index.DEFAULT_CACHE_DIR", self.index_dir):
+            # 同一个 Agent 连续运行：每次运行结束关闭案例库，下次运行重新打开
+            agent = AnalyzeAgent(taint_first=True, few_shot=True)
+            vulns = agent.run(project, {"language": "python"})["vulnerabilities"]
+            self.assertNotIn("参考案例", mock_chat.call_args[0][1])
+            self.assertIsNone(agent.examples)
+            # LLM 自评 Certain 但未经 PoC 验证的结论不写入
+            self.assertEqual(agent.remember_verified(vulns), 0)
+            self.assertEqual(agent.remember_verified([dict(vulns[0], verified=False)]), 0)
+            self.assertEqual(len(self._index()), 0)
+            self.assertEqual(agent.remember_verified([dict(vulns[0], verified=True)]), 1)
+            agent.run(project, {"language": "python"})
+
+        self.assertIn("[参考案例 1] Command Injection", mock_chat.call_args[0][1])
+        self.assertEqual(len(self._index()), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+
+import unittest
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.llm_router import LLMRouter
+
+class FakeClient:
+    def __init__(self, provider, delay=0.0, fail=False):
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.usage = {"calls": 0, "prompt_tokens": 10, "cached_tokens": 5, "completion_tokens": 1}
+
+    def chat(self, system_prompt, user_prompt, temperature=0.7):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.provider} down")
+        return self.provider
+
+class TestLLMRouter(unittest.TestCase):
+    def test_prefers_fastest_backend(self):
+        slow, fast = FakeClient("slow", delay=0.02), FakeClient("fast")
+        router = LLMRouter([slow, fast], hedge=False)
+        # 两个后端各探测一次后，后续请求都发往更快的后端
+        results = [router.chat("s", "u") for _ in range(6)]
+        self.assertEqual(results[-4:], ["fast"] * 4)
+        self.assertEqual(slow.calls, 1)
+        self.assertEqual(router.model, "fast-model")
+
+    def test_failover_and_cooldown(self):
+        broken, backup = FakeClient("broken", fail=True), FakeClient("backup")
+        router = LLMRouter([broken, backup], hedge=False)
+        router.backends[1].record_success(1.0)  # 让 broken 排在前面
+        for _ in range(3):
+            self.assertEqual(router.chat("s", "u"), "backup")
+        self.assertEqual(router.failovers, 3)
+        self.assertFalse(router.backends[0].healthy())
+        # 冷却期内不再优先尝试 broken
+        self.assertEqual(router.chat("s", "u"), "backup")
+        self.assertEqual(broken.calls, 3)
+
+    def test_all_backends_fail(self):
+        router = LLMRouter([FakeClient("a", fail=True), FakeClient("b", fail=True)])
+        with self.assertRaises(RuntimeError):
+            router.chat("s", "u")
+
+    def test_hedges_after_p95(self):
+        primary, secondary = FakeClient("primary"), FakeClient("secondary")
+        router = LLMRouter([primary, secondary], min_samples=3)
+        for _ in range(5):
+            router.backends[0].record_success(0.01)
+        router.backends[1].record_success(0.5)
+        primary.delay = 0.5
+        self.assertEqual(router.chat("s", "u"), "secondary")
+        self.assertEqual(router.hedged_requests, 1)
+
+    def test_usage_is_aggregated(self):
+        router = LLMRouter([FakeClient("a"), FakeClient("b")])
+        self.assertEqual(router.usage["prompt_tokens"], 20)
+        self.assertAlmostEqual(router.cache_hit_rate(), 0.5)
+
+    @patch.dict(os.environ, {"LLM_PROVIDERS": "deepseek,unknown,openai", "LLM_API_KEY_OPENAI": "",
+                             "LLM_API_KEY_DEEPSEEK": "", "LLM_PROVIDER": "openai"})
+    def test_from_env_falls_back_to_single_provider(self):
+        router = LLMRouter.from_env()
+        self.assertEqual([b.client.provider for b in router.backends], ["openai"])
+
+if __name__ == '__main__':
+    unittest.main()
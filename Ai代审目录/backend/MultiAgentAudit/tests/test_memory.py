@@ -0,0 +1,85 @@
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memory import CheckpointStore, run_fingerprint
+from utils.file_scanner import ProjectScan
+from agents.analyze_agent import AnalyzeAgent
+from agents.hacker_agent import HackerAgent
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.db_dir = tempfile.mkdtemp()
+        self.store = CheckpointStore(os.path.join(self.db_dir, "checkpoints.db"))
+        for name in ("a.php", "b.php"):
+            with open(os.path.join(self.test_dir, name), "w") as f:
+                f.write("<?php\n$id = $_GET['id'];\nmysql_query(\"SELECT * FROM t WHERE id=\" . $id);\n")
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.db_dir)
+
+    def test_run_lifecycle(self):
+        scan = ProjectScan(self.test_dir)
+        run_id = run_fingerprint(scan)
+        self.assertEqual(run_id, run_fingerprint(ProjectScan(self.test_dir)))
+
+        checkpoint = self.store.start_run(run_id, self.test_dir)
+        checkpoint.put("ops", {"language": "php"})
+        self.assertEqual(self.store.interrupted_runs(), [(run_id, self.test_dir)])
+
+        # 重新打开（模拟进程重启）后仍可读取
+        self.store.close()
+        self.store = CheckpointStore(os.path.join(self.db_dir, "checkpoints.db"))
+        checkpoint = self.store.start_run(run_id, self.test_dir)
+        self.assertEqual(checkpoint.get("ops"), {"language": "php"})
+        self.assertIsNone(checkpoint.get("report"))
+        checkpoint.finish()
+        self.assertEqual(self.store.interrupted_runs(), [])
+
+        # 已完成的运行再次开始时不复用旧结果
+        checkpoint = self.store.start_run(run_id, self.test_dir)
+        self.assertIsNone(checkpoint.get("ops"))
+        checkpoint.put("ops", {"language": "python"})
+
+        # fresh 清空旧检查点；同一目标的新运行会取代旧运行
+        self.assertIsNone(self.store.start_run(run_id, self.test_dir, fresh=True).get("ops"))
+        self.store.start_run("other", self.test_dir)
+        self.assertEqual(self.store.interrupted_runs(), [("other", self.test_dir)])
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_analyze_resumes_per_file(self, mock_chat):
+        checkpoint = self.store.start_run("run", self.test_dir)
+        confirmed = json.dumps({"vulnerabilities": [{"candidate_id": 1, "confidence": "Tentative"}]})
+        # 第二个文件的 LLM 调用失败，只有第一个文件写入检查点
+        mock_chat.side_effect = [confirmed, RuntimeError("provider down")]
+        first = AnalyzeAgent(taint_first=True, few_shot=False).run(self.test_dir, {}, checkpoint=checkpoint)
+        self.assertEqual(len(first["vulnerabilities"]), 1)
+        self.assertEqual(self.store.count("run", "analyze"), 1)
+
+        mock_chat.side_effect = [confirmed]
+        second = AnalyzeAgent(taint_first=True, few_shot=False).run(self.test_dir, {}, checkpoint=checkpoint)
+        self.assertEqual(mock_chat.call_count, 3)
+        self.assertEqual(sorted(os.path.basename(v["file"]) for v in second["vulnerabilities"]), ["a.php", "b.php"])
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_hacker_resumes_per_vulnerability(self, mock_chat):
+        checkpoint = self.store.start_run("run", self.test_dir)
+        mock_chat.return_value = json.dumps({"payloads": [{"payload": "1'", "expected_response": "状态码 500"}]})
+        vulns = {"vulnerabilities": [{"type": "SQL Injection", "file": "a.php", "code_snippet": "q"}]}
+        HackerAgent(verify=False).run(vulns, {}, checkpoint=checkpoint)
+        resumed = HackerAgent(verify=False).run(vulns, {}, checkpoint=checkpoint)
+        self.assertEqual(mock_chat.call_count, 1)
+        self.assertEqual(resumed["verified_vulnerabilities"][0]["payloads"][0]["payload"], "1'")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+
+import unittest
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from unittest.mock import patch
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.poc_verifier import PocVerifier, Probe, TargetLauncher, parse_expectation
+from agents.hacker_agent import HackerAgent
+
+
+class VulnerableHandler(BaseHTTPRequestHandler):
+    """反射参数、单引号触发 500、包含 sleep 时延时 1 秒的测试目标"""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            time.sleep(1.0 if "sleep" in query else 0.05)
+            status = 500 if "'" in query else 200
+            body = "SQL syntax error" if status == 500 else f"<p>results for {query}</p>"
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestPocVerifier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), VulnerableHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_parse_expectation(self):
+        self.assertEqual(
+            parse_expectation({"expected_response": "返回状态码 500，页面出现 'SQL syntax'，或延时 5 秒"}),
+            {"contains": ["SQL syntax"], "status": 500, "delay": 5.0}
+        )
+        self.assertEqual(
+            parse_expectation({"match": {"contains": "uid=", "status": None, "delay": None}}),
+            {"contains": ["uid="], "status": None, "delay": 0.0}
+        )
+
+    def test_verdicts_by_signature(self):
+        payloads = [
+            {"payload": "<script>alert(7)</script>", "param": "q", "match": {"contains": ["<script>alert(7)"]}},
+            {"payload": "1'", "param": "q", "expected_response": "状态码 500"},
+            {"payload": "1 and sleep(1)", "param": "q", "match": {"delay": 1}},
+            {"payload": "1", "param": "q", "expected_response": "包含 'results for'"},
+            {"payload": "1", "param": "q", "match": {"status": 500}},
+            {"payload": "1'", "expected_response": "状态码 500"},
+            {"payload": "1", "param": "q", "expected_response": "页面异常"},
+        ]
+        results = PocVerifier(self.base_url).verify([Probe(0, p) for p in payloads])
+        self.assertEqual([r["verdict"] for r in results], [
+            "confirmed", "confirmed", "confirmed",
+            "not_reproduced",  # 正常页面本来就包含该字符串
+            "not_reproduced", "unverifiable", "unverifiable",
+        ])
+        self.assertGreaterEqual(results[2]["elapsed"], 0.8)
+
+    def test_concurrency_limit_and_timeout(self):
+        VulnerableHandler.peak = 0
+        probes = [Probe(i, {"payload": f"x{i}", "param": "q", "match": {"contains": [f"x{i}"]}}) for i in range(12)]
+        start = time.monotonic()
+        results = PocVerifier(self.base_url, concurrency=3).verify(probes)
+        self.assertTrue(all(r["verdict"] == "confirmed" for r in results))
+        self.assertLessEqual(VulnerableHandler.peak, 3)
+        self.assertLess(time.monotonic() - start, 5)
+
+        slow = Probe(0, {"payload": "sleep", "param": "q", "match": {"contains": ["never"]}})
+        result, = PocVerifier(self.base_url, timeout=0.3).verify([slow])
+        self.assertEqual(result["verdict"], "error")
+
+    def test_local_target_launcher(self):
+        target_dir = tempfile.mkdtemp()
+        with open(os.path.join(target_dir, "index.html"), "w") as f:
+            f.write("hello")
+        port = _free_port()
+        env_data = {"docker_config": {"ports": [str(port)], "start_command": f"{sys.executable} -m http.server {port}"}}
+        with patch.dict(os.environ, {"HACKER_TARGET_URL": ""}):
+            launcher = TargetLauncher(target_dir, env_data, boot_timeout=10, mode="local")
+            with launcher as base_url:
+                self.assertEqual(httpx.get(base_url + "/index.html").text, "hello")
+                process = launcher._process
+            self.assertIsNotNone(process.poll())
+
+        with self.assertRaises(RuntimeError):
+            with TargetLauncher(target_dir, {}, mode="local"):
+                pass
+
+    def test_launcher_refuses_unsafe_targets(self):
+        target_dir = tempfile.mkdtemp()
+        env_data = {"docker_config": {"ports": ["9"], "start_command": "true"}}
+        # 没有镜像且未显式选择本机运行时不执行 start_command
+        with patch.dict(os.environ, {"HACKER_TARGET_URL": "", "HACKER_SANDBOX": ""}):
+            with self.assertRaises(RuntimeError):
+                with TargetLauncher(target_dir, env_data):
+                    pass
+            # 端口已被其他服务占用
+            busy = {"docker_config": {"ports": [str(self.server.server_address[1])], "start_command": "true"}}
+            launcher = TargetLauncher(target_dir, busy, mode="local")
+            with self.assertRaises(RuntimeError):
+                with launcher:
+                    pass
+            self.assertIsNone(launcher._process)
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_hacker_agent_records_verdicts(self, mock_chat):
+        mock_chat.return_value = json.dumps({"payloads": [
+            {"payload": "<b>pwn</b>", "method": "GET", "path": "/search", "param": "q",
+             "match": {"contains": ["<b>pwn</b>"]}},
+            {"payload": "test", "method": "GET", "path": "/search", "param": "q",
+             "match": {"contains": ["alert"]}},
+        ]})
+        analyze_results = {"vulnerabilities": [{"type": "XSS", "file": "app.py", "code_snippet": "return q"}]}
+        with patch.dict(os.environ, {"HACKER_TARGET_URL": self.base_url}):
+            results = HackerAgent(verify=True).run(analyze_results, {"language": "python"}, tempfile.gettempdir())
+
+        vuln, = results["verified_vulnerabilities"]
+        self.assertTrue(vuln["verified"])
+        self.assertEqual(vuln["verification"], "confirmed")
+        self.assertEqual([p["verification"]["verdict"] for p in vuln["payloads"]], ["confirmed", "not_reproduced"])
+
+        # 未提供源码目录时只生成 Payload
+        skipped = HackerAgent(verify=True).run(analyze_results, {"language": "python"})
+        self.assertEqual(skipped["verified_vulnerabilities"][0]["verification"], "skipped")
+
+        # 默认不验证
+        with patch.dict(os.environ, {"HACKER_VERIFY": ""}):
+            self.assertFalse(HackerAgent().verify)
+
+if __name__ == '__main__':
+    unittest.main()
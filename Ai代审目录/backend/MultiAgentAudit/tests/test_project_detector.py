@@ -0,0 +1,103 @@
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.project_detector import detect_project
+from agents.ops_agent import OpsAgent
+
+class TestProjectDetector(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, rel_path, content):
+        path = os.path.join(self.test_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_requirements_flask(self):
+        files = [
+            self._write("requirements.txt", "Flask==2.3.0\nrequests>=2.0  # http\n-e .\n"),
+            self._write("app.py", "from flask import Flask\n"),
+        ]
+        env_data, confidence = detect_project(files)
+        self.assertEqual(env_data["language"], "python")
+        self.assertEqual(env_data["framework"], "flask")
+        self.assertEqual(env_data["dependencies"], ["flask", "requests"])
+        self.assertEqual(env_data["docker_config"]["start_command"], "python app.py")
+        self.assertEqual(env_data["docker_config"]["ports"], ["5000"])
+        self.assertGreaterEqual(confidence, 0.9)
+
+    def test_package_json_express(self):
+        files = [
+            self._write("package.json", json.dumps({
+                "dependencies": {"express": "^4.18.0"},
+                "engines": {"node": ">=20"}
+            })),
+            self._write("src/index.js", "const express = require('express')\n"),
+        ]
+        env_data, _ = detect_project(files)
+        self.assertEqual(env_data["language"], "node")
+        self.assertEqual(env_data["framework"], "express")
+        self.assertEqual(env_data["docker_config"]["image"], "node:20-alpine")
+
+    def test_pom_spring(self):
+        files = [self._write("pom.xml", """
+<project>
+  <properties><java.version>1.8</java.version></properties>
+  <dependencies>
+    <dependency><artifactId>spring-boot-starter-web</artifactId></dependency>
+  </dependencies>
+</project>""")]
+        env_data, _ = detect_project(files)
+        self.assertEqual(env_data["language"], "java")
+        self.assertEqual(env_data["framework"], "spring")
+        self.assertEqual(env_data["docker_config"]["image"], "maven:3-eclipse-temurin-8")
+
+    def test_composer_and_go_mod(self):
+        composer = self._write("php/composer.json", json.dumps({
+            "require": {"php": "^8.1", "laravel/framework": "^10.0"}
+        }))
+        env_data, _ = detect_project([composer])
+        self.assertEqual((env_data["language"], env_data["framework"], env_data["version"]),
+                         ("php", "laravel", "8.1"))
+
+        go_mod = self._write("go/go.mod", "module example.com/app\n\ngo 1.22\n\nrequire (\n\tgithub.com/gin-gonic/gin v1.9.1\n)\n")
+        env_data, _ = detect_project([go_mod])
+        self.assertEqual((env_data["language"], env_data["framework"], env_data["version"]),
+                         ("go", "gin", "1.22"))
+
+    def test_import_signature_without_manifest(self):
+        files = [self._write("views.py", "import os\nfrom django.http import HttpResponse\n")]
+        env_data, confidence = detect_project(files)
+        self.assertEqual(env_data["framework"], "django")
+        self.assertLess(confidence, 0.9)
+        self.assertGreaterEqual(confidence, 0.6)
+
+    def test_extension_only_is_low_confidence(self):
+        env_data, confidence = detect_project([self._write("a.php", "<?php echo 1; ?>")])
+        self.assertEqual(env_data["language"], "php")
+        self.assertLess(confidence, 0.6)
+        self.assertEqual(detect_project([]), ({}, 0.0))
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_ops_agent_skips_llm_when_confident(self, mock_chat):
+        self._write("requirements.txt", "django>=4.2\n")
+        self._write("manage.py", "import django\n")
+        env_data = OpsAgent().run(self.test_dir)
+        self.assertEqual(env_data["framework"], "django")
+        mock_chat.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+
+import unittest
+import os
+import sys
+import re
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.llm_client import LLMClient
+from core.prompts import Prompts
+
+class TestPromptCache(unittest.TestCase):
+    def test_system_prompts_have_no_variables(self):
+        # System Prompt 作为缓存前缀，必须与调用参数无关
+        for name in ("OPS_SYSTEM", "ANALYZE_SYSTEM", "HACKER_SYSTEM", "REPORTER_SYSTEM"):
+            self.assertIsNone(re.search(r"\{[a-z_]+\}|\{\{", getattr(Prompts, name)), name)
+
+    def test_templates_only_hold_variable_content(self):
+        prompt = Prompts.ANALYZE_TASK_TEMPLATE.format(language="python", file_path="a.py",
+                                                     examples="", code_content="x = 1")
+        self.assertNotIn("vulnerabilities", prompt)
+        self.assertIn("JSON", Prompts.HACKER_SYSTEM)
+        self.assertNotIn("JSON", Prompts.REPORTER_SYSTEM)
+
+    def test_usage_tracks_cached_tokens(self):
+        client = LLMClient(api_key=None)
+        client._record_usage(SimpleNamespace(prompt_tokens=1000, prompt_cache_hit_tokens=768, completion_tokens=50))
+        client._record_usage(SimpleNamespace(prompt_tokens=1000, completion_tokens=20,
+                                             prompt_tokens_details=SimpleNamespace(cached_tokens=0)))
+        client._record_usage(None)
+        self.assertEqual(client.usage, {"calls": 2, "prompt_tokens": 2000, "cached_tokens": 768, "completion_tokens": 70})
+        self.assertAlmostEqual(client.cache_hit_rate(), 0.384)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.source_loader import SourceFile, detect_encoding, read_source, SAMPLE_SIZE
+
+class TestSourceLoader(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, name, data):
+        path = os.path.join(self.test_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_detect_encoding(self):
+        self.assertEqual(detect_encoding("# 注释\n".encode("utf-8")), "utf-8")
+        self.assertEqual(detect_encoding("# 注释\n".encode("gbk")), "gb18030")
+        self.assertEqual(detect_encoding("﻿x = 1".encode("utf-8")), "utf-8-sig")
+        self.assertEqual(detect_encoding("x = 1".encode("utf-16")), "utf-16")
+        self.assertEqual(detect_encoding(b"caf\xe9 \xff\xfe\xfd"), "latin-1")
+        # 采样截断在多字节字符中间时仍识别为 utf-8
+        self.assertEqual(detect_encoding("中".encode("utf-8")[:2], final=False), "utf-8")
+
+    def test_gbk_file_is_readable(self):
+        path = self._write("legacy.php", "<?php\n// 用户登录\necho $_GET['name'];\n".encode("gbk"))
+        with SourceFile(path) as source:
+            self.assertEqual(source.encoding, "gb18030")
+            self.assertIn("用户登录", source.text())
+            self.assertEqual(source.line(2), "// 用户登录")
+
+    def test_line_index_snippets(self):
+        lines = [f"line {i} 行" for i in range(1, 101)]
+        path = self._write("a.py", ("\n".join(lines) + "\n").encode("utf-8"))
+        with SourceFile(path) as source:
+            self.assertEqual(source.line_count, 100)
+            self.assertEqual(source.line(1), "line 1 行")
+            self.assertEqual(source.line(100), "line 100 行")
+            self.assertEqual(source.snippet(50, context=1), "line 49 行\nline 50 行\nline 51 行\n")
+            # 超出范围截断到文件边界
+            self.assertEqual(source.snippet(99, 200), "line 99 行\nline 100 行\n")
+            self.assertEqual(source.snippet(500), "")
+
+    def test_crlf_and_no_trailing_newline(self):
+        path = self._write("b.py", b"a = 1\r\nb = 2\r\nc = 3")
+        with SourceFile(path) as source:
+            self.assertEqual(source.line_count, 3)
+            self.assertEqual(source.line(2), "b = 2")
+            self.assertEqual(source.line(3), "c = 3")
+
+    def test_utf16_and_empty_file(self):
+        path = self._write("w.py", "x = 1\ny = '中'\n".encode("utf-16"))
+        with SourceFile(path) as source:
+            self.assertEqual(source.line_count, 2)
+            self.assertEqual(source.line(2), "y = '中'")
+
+        empty = self._write("empty.py", b"")
+        with SourceFile(empty) as source:
+            self.assertEqual((source.text(), source.line_count, source.snippet(1)), ("", 0, ""))
+
+    def test_head_does_not_split_characters(self):
+        path = self._write("c.py", ("中" * (SAMPLE_SIZE)).encode("utf-8"))
+        self.assertEqual(read_source(path, 10), "中" * 10)
+        self.assertEqual(len(read_source(path)), SAMPLE_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
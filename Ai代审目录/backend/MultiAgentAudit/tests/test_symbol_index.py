@@ -0,0 +1,118 @@
+
+import unittest
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_scanner import ProjectScan
+from utils.symbol_index import SymbolIndex
+from agents.analyze_agent import AnalyzeAgent
+
+VIEWS = '''from flask import request
+from lib.shell import run_cmd
+
+def index():
+    cmd = request.args.get("cmd")
+    return run_cmd(cmd)
+'''
+
+SHELL = '''import os
+
+def run_cmd(command):
+    full = "sh -c " + command
+    return os.system(full)
+
+def unused(path):
+    return open(path).read()
+'''
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self._write("app/views.py", VIEWS)
+        self._write("lib/shell.py", SHELL)
+        self._write("web/util.js", "function runIt(cmd) {\n  return exec(cmd);\n}\nconst other = (a) => runIt(a);\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def _write(self, rel_path, content):
+        path = os.path.join(self.test_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def _build(self):
+        return SymbolIndex.load_or_build(ProjectScan(self.test_dir), cache_dir=self.cache_dir)
+
+    def test_definitions_and_call_edges(self):
+        index = self._build()
+        self.assertEqual([(s.file, s.line, s.end_line) for s in index.defs["run_cmd"]], [("lib/shell.py", 3, 5)])
+        self.assertEqual(index.callers_of("run_cmd", "lib/shell.py"), [("index", "app/views.py", 6)])
+        self.assertEqual([s.qualname for s, _ in index.callees_of("index", "app/views.py")], ["run_cmd"])
+        self.assertEqual(index.callers_of("runIt", "web/util.js"), [("other", "web/util.js", 4)])
+        self.assertEqual(index.callers_of("unused", "lib/shell.py"), [])
+
+    def test_callers_resolved_per_call_site(self):
+        # 两个模块各有一个 save：只有导入了对应模块的调用点才算调用方
+        self._write("models/a.py", "import os\n\ndef save(data):\n    os.system(data)\n")
+        self._write("models/b.py", "def save(data):\n    return data\n")
+        self._write("app/api.py", "from models import a\n\ndef store(x):\n    return a.save(x)\n")
+        self._write("app/jobs.py", "from models.b import save\n\ndef flush(x):\n    save(x)\n")
+        self._write("app/misc.py", "def touch(obj):\n    obj.save(1)\n")
+        index = self._build()
+        self.assertEqual(index.callers_of("save", "models/a.py"), [("store", "app/api.py", 4)])
+        self.assertEqual(index.callers_of("save", "models/b.py"), [("flush", "app/jobs.py", 4)])
+
+        context = index.context_for(os.path.join(self.test_dir, "models/a.py"), "save")
+        self.assertIn("app/api.py:4", context)
+        self.assertNotIn("app/jobs.py", context)
+        self.assertNotIn("app/misc.py", context)
+
+    def test_persisted_and_incremental(self):
+        self.assertEqual(self._build().reparsed, 3)
+        self.assertEqual(self._build().reparsed, 0)
+
+        path = self._write("lib/shell.py", SHELL + "\ndef extra():\n    pass\n")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        os.remove(os.path.join(self.test_dir, "web/util.js"))
+        index = self._build()
+        self.assertEqual(index.reparsed, 1)
+        self.assertIn("extra", index.defs)
+        self.assertNotIn("runIt", index.defs)
+
+    def test_context_for_sink_function(self):
+        index = self._build()
+        context = index.context_for(os.path.join(self.test_dir, "lib/shell.py"), "run_cmd")
+        self.assertIn("调用方 app/views.py:6 (index)", context)
+        self.assertIn('    5|     cmd = request.args.get("cmd")', context)
+        self.assertEqual(index.context_for(os.path.join(self.test_dir, "lib/shell.py"), None), "")
+        # 预算不足时不附带
+        self.assertEqual(index.context_for(os.path.join(self.test_dir, "lib/shell.py"), "run_cmd", max_tokens=5), "")
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_cross_file_candidate_with_context(self, mock_chat):
+        mock_chat.return_value = json.dumps({"vulnerabilities": [{"candidate_id": 1, "reason": "index 传入 cmd"}]})
+        with patch("utils.symbol_index.DEFAULT_CACHE_DIR", self.cache_dir):
+            results = AnalyzeAgent(taint_first=True).run(self.test_dir, {"language": "python"})
+
+        prompts = [call[0][1] for call in mock_chat.call_args_list]
+        shell_prompt = [p for p in prompts if "lib/shell.py" in p.split("\n")[2]][0]
+        self.assertIn("Source 第 3 行: 参数 command", shell_prompt)
+        self.assertIn("调用方 app/views.py:6 (index)", shell_prompt)
+        # unused(path) 没有调用方，不作为候选
+        self.assertNotIn("Path Traversal", shell_prompt)
+        shell_vulns = [v for v in results["vulnerabilities"] if v["file"].endswith("shell.py")]
+        self.assertEqual(shell_vulns[0]["taint_path"]["via_param"], "command")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.taint_engine import find_taint_paths
+from agents.analyze_agent import AnalyzeAgent
+
+FLASK_APP = '''
+import os, subprocess, sqlite3, yaml
+from flask import request, Flask
+app = Flask(__name__)
+
+@app.route("/files/<name>")
+def handler(name):
+    cmd = request.args.get("cmd")
+    full = "ls " + cmd
+    os.system(full)
+    n = int(request.args["n"])
+    os.system("echo %d" % n)
+    subprocess.run(["ls", cmd])
+    cur = sqlite3.connect("db").cursor()
+    cur.execute("select * from t where id=?", (cmd,))
+    cur.execute(f"select * from t where name='{name}'")
+    yaml.load(cmd, Loader=yaml.SafeLoader)
+    return open(name).read()
+
+def helper():
+    value = "constant"
+    os.system(value)
+'''
+
+class TestTaintEngine(unittest.TestCase):
+    def _summary(self, paths):
+        return sorted((p.vuln_type, p.source[0], p.sink[0]) for p in paths)
+
+    def test_python_intraprocedural(self):
+        paths = find_taint_paths(FLASK_APP, "python", "app.py")
+        self.assertEqual(self._summary(paths), [
+            ("Command Injection", 8, 10),
+            ("Path Traversal", 7, 18),
+            ("SQL Injection", 7, 16),
+        ])
+        command = [p for p in paths if p.vuln_type == "Command Injection"][0]
+        self.assertEqual(command.steps, [(8, "cmd"), (9, "full")])
+        self.assertEqual(command.to_dict()["sink"]["name"], "os.system")
+
+    def test_python_syntax_error_falls_back(self):
+        self.assertIsNone(find_taint_paths("def broken(:\n", "python"))
+        self.assertIsNone(find_taint_paths("package main", "go"))
+
+    def test_php_patterns(self):
+        code = ("<?php\n$id = $_GET['id'];\n$q = \"SELECT * FROM u WHERE id=\" . $id;\nmysqli_query($conn, $q);\n"
+                "$n = intval($_GET['n']);\nmysqli_query($conn, \"SELECT \" . $n);\n"
+                "echo htmlspecialchars($_GET['a']);\n<?php echo $_GET['b']; ?>\n")
+        self.assertEqual(self._summary(find_taint_paths(code, "php")), [
+            ("SQL Injection", 2, 4),
+            ("XSS", 8, 8),
+        ])
+
+    def test_js_and_java_patterns(self):
+        js = ("app.get('/', (req, res) => {\n  const name = req.query.name;\n  res.send(`Hello ${name}`);\n"
+              "  const id = parseInt(req.query.id);\n  db.query('SELECT ' + id);\n});\n")
+        self.assertEqual(self._summary(find_taint_paths(js, "javascript")), [("XSS", 2, 3)])
+
+        java = ("String user = request.getParameter(\"user\");\n"
+                "String sql = \"select * from users where name='\" + user + \"'\";\n"
+                "stmt.executeQuery(sql);\n// stmt.executeQuery(user);\n")
+        paths = find_taint_paths(java, "java")
+        self.assertEqual(self._summary(paths), [("SQL Injection", 1, 3)])
+        self.assertEqual(paths[0].steps, [(1, "user"), (2, "sql")])
+
+    def test_python_branches_are_joined(self):
+        code = (
+            "import os\nfrom flask import request\n"
+            "def a():\n    q = request.args.get('q')\n"
+            "    if q:\n        cmd = 'echo ' + q\n    else:\n        cmd = 'echo'\n    os.system(cmd)\n"
+            "def b():\n    cmd = request.args['c']\n"
+            "    try:\n        cmd = int(cmd)\n    except ValueError:\n        pass\n    os.system(cmd)\n"
+            "def c():\n    cmd = 'ls'\n"
+            "    for part in request.args.getlist('p'):\n        os.popen(cmd)\n        cmd = part\n"
+            "def d():\n    cmd = request.args['c']\n    cmd = 'ls'\n    os.system(cmd)\n"
+        )
+        self.assertEqual(self._summary(find_taint_paths(code, "python")), [
+            ("Command Injection", 4, 9),
+            ("Command Injection", 11, 16),
+            ("Command Injection", 19, 20),
+        ])
+
+    def test_pattern_branches_are_joined(self):
+        php = ("<?php\n$cmd = $_GET['c'];\nif ($safe) {\n    $cmd = 'ls';\n}\nsystem($cmd);\n"
+               "$id = $_GET['id'];\n$id = 1;\nmysqli_query($conn, $id);\n")
+        self.assertEqual(self._summary(find_taint_paths(php, "php")), [("Command Injection", 2, 6)])
+        js = ("function f(req) {\n  let p = req.query.p;\n  if (x) {\n    p = 'a';\n  } else {\n    p = 'b';\n"
+              "  }\n  fs.readFileSync(p);\n  p = 'c';\n  fs.readFileSync(p);\n}\n")
+        self.assertEqual(self._summary(find_taint_paths(js, "javascript")), [("Path Traversal", 2, 8)])
+
+class TestAnalyzeAgentTaint(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.test_dir, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_confirmation_call_only_for_candidates(self, mock_chat):
+        self._write("app.py", FLASK_APP)
+        mock_chat.return_value = json.dumps({"vulnerabilities": [
+            {"candidate_id": "#1", "reason": "cmd 直接拼接进 os.system", "confidence": "Certain"}
+        ]})
+
+        results = AnalyzeAgent(taint_first=True).run(self.test_dir, {"language": "python"})
+
+        self.assertEqual(mock_chat.call_count, 1)
+        system_prompt, user_prompt = mock_chat.call_args[0][:2]
+        self.assertIn("候选", system_prompt)
+        self.assertIn("[#1] Command Injection", user_prompt)
+        self.assertIn("   10|     os.system(full)", user_prompt)
+
+        vuln = results["vulnerabilities"][0]
+        self.assertEqual((vuln["type"], vuln["severity"], vuln["location"]), ("Command Injection", "High", "10"))
+        self.assertEqual(vuln["taint_path"]["source"]["line"], 8)
+
+    @patch('agents.analyze_agent.MAX_CANDIDATES_PER_CALL', 2)
+    @patch('core.llm_client.LLMClient.chat')
+    def test_candidates_split_across_calls(self, mock_chat):
+        self._write("app.py", FLASK_APP)
+        mock_chat.return_value = json.dumps({"vulnerabilities": [{"candidate_id": "#1", "confidence": "Firm"}]})
+
+        results = AnalyzeAgent(taint_first=True, few_shot=False).run(self.test_dir, {"language": "python"})
+
+        # 3 条候选路径分两次确认，第二批的编号重新从 1 开始
+        self.assertEqual(mock_chat.call_count, 2)
+        self.assertNotIn("[#3]", mock_chat.call_args_list[0][0][1])
+        self.assertIn("[#1]", mock_chat.call_args_list[1][0][1])
+        self.assertEqual(len({v["taint_path"]["sink"]["line"] for v in results["vulnerabilities"]}), 2)
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_no_candidates_falls_back_to_full_analysis(self, mock_chat):
+        # 污点规则覆盖不到的漏洞（硬编码凭据）不能因为没有候选路径而跳过
+        self._write("settings.py", "import requests\n\nTOKEN = 'sk-live-123'\n\n"
+                                   "def fetch():\n    return requests.get('https://api', headers={'X': TOKEN})\n")
+        mock_chat.return_value = json.dumps({"vulnerabilities": [
+            {"type": "Hardcoded Credentials", "severity": "Medium", "location": "3", "confidence": "Firm"}]})
+        results = AnalyzeAgent(taint_first=True, few_shot=False).run(self.test_dir, {"language": "python"})
+        self.assertEqual(mock_chat.call_count, 1)
+        self.assertIn("请审计以下代码文件", mock_chat.call_args[0][1])
+        self.assertEqual([v["type"] for v in results["vulnerabilities"]], ["Hardcoded Credentials"])
+
+    @patch('core.llm_client.LLMClient.chat')
+    def test_unsupported_language_uses_full_analysis(self, mock_chat):
+        self._write("main.go", "package main\n")
+        mock_chat.return_value = json.dumps({"vulnerabilities": []})
+        AnalyzeAgent(taint_first=True).run(self.test_dir, {"language": "go"})
+        self.assertIn("请审计以下代码文件", mock_chat.call_args[0][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.token_budget import TokenCounter, context_window, load_context_table, MODEL_CONTEXT_FILE, RESERVED_OUTPUT_TOKENS
+
+class TestTokenBudget(unittest.TestCase):
+    def setUp(self):
+        self.counter = TokenCounter("deepseek-chat")
+
+    def test_truncate_by_lines(self):
+        text = "".join(f"line_{i} = {i}\n" for i in range(1000))
+        truncated = self.counter.truncate(text, 100)
+        self.assertLessEqual(self.counter.count(truncated), 100)
+        self.assertTrue(truncated.startswith("line_0 = 0\n"))
+        self.assertTrue(truncated.endswith("# ... truncated ..."))
+        # 未超出预算时原样返回
+        self.assertEqual(self.counter.truncate("x = 1\n", 100), "x = 1\n")
+
+    def test_prompt_budget(self):
+        fixed = "system prompt"
+        expected = context_window("deepseek-chat") - RESERVED_OUTPUT_TOKENS - self.counter.count(fixed)
+        self.assertEqual(self.counter.prompt_budget(fixed), expected)
+        self.assertEqual(context_window(None), 8192)
+
+    def test_shared_context_table(self):
+        # 与 backend 共用同一份数据文件
+        models, default = load_context_table(MODEL_CONTEXT_FILE)
+        self.assertEqual(default, 8192)
+        self.assertEqual(models["deepseek"], 65536)
+        self.assertEqual(context_window("gpt-4-32k-0613"), 32768)
+        self.assertEqual(load_context_table(os.path.join(os.path.dirname(MODEL_CONTEXT_FILE), "missing.json")), ({}, 8192))
+
+    def test_count_is_cached(self):
+        self.counter.count("cached text")
+        self.assertEqual(len(self.counter._cache), 1)
+        self.counter.count("cached text")
+        self.assertEqual(len(self.counter._cache), 1)
+
+if __name__ == '__main__':
+    unittest.main()
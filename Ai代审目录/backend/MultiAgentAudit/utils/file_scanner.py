@@ -0,0 +1,287 @@
+
+import os
+import re
+import logging
+from collections import Counter
+
+# 第三方依赖、构建产物、IDE/缓存目录，整个目录跳过
+DEFAULT_SKIP_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "vendor", "third_party",
+    "__pycache__", ".venv", "venv", "site-packages", ".tox", ".mypy_cache", ".pytest_cache",
+    ".idea", ".vscode", "dist", "build", "target", "out", "coverage", ".next", ".nuxt",
+})
+
+# 明确的二进制扩展名，无需读取内容
+BINARY_EXTENSIONS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".svgz", ".mp3", ".mp4", ".avi",
+    ".mov", ".wav", ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".jar", ".war",
+    ".class", ".so", ".dll", ".dylib", ".exe", ".bin", ".o", ".a", ".pyc", ".pyo", ".whl",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".ttf", ".otf", ".woff", ".woff2",
+    ".eot", ".db", ".sqlite", ".pkl", ".npy", ".npz",
+})
+
+# 已知文本扩展名，跳过二进制内容探测
+TEXT_EXTENSIONS = frozenset({
+    ".py", ".php", ".java", ".js", ".ts", ".jsx", ".tsx", ".go", ".c", ".h", ".cpp", ".hpp",
+    ".cc", ".rb", ".rs", ".cs", ".kt", ".scala", ".vue", ".html", ".htm", ".css", ".json",
+    ".xml", ".yml", ".yaml", ".toml", ".ini", ".cfg", ".txt", ".md", ".sql", ".sh", ".gradle",
+    ".mod", ".lock", ".env", ".properties",
+})
+
+# 压缩/打包/自动生成的文件
+GENERATED_PATTERNS = re.compile(
+    r"(\.min\.(js|css)$|[.-]bundle\.js$|\.map$|_pb2(_grpc)?\.py$|\.pb\.go$|\.generated\.\w+$"
+    r"|^(package-lock\.json|yarn\.lock|pnpm-lock\.yaml|composer\.lock|poetry\.lock|Cargo\.lock|go\.sum)$)"
+)
+
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+# 超过该大小的 js/css 检查是否为单行压缩代码
+MINIFIED_CHECK_SIZE = 20 * 1024
+MINIFIED_LINE_LENGTH = 1000
+
+
+class FileEntry:
+    """扫描得到的单个文件元数据"""
+
+    __slots__ = ("path", "rel_path", "name", "ext", "size", "mtime")
+
+    def __init__(self, path, rel_path, name, size, mtime):
+        self.path = path
+        self.rel_path = rel_path
+        self.name = name
+        self.ext = os.path.splitext(name)[1].lower()
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self):
+        return f"FileEntry({self.rel_path!r}, size={self.size})"
+
+
+def _translate_gitignore(pattern):
+    """将 gitignore 通配符转换为正则"""
+    i, n, out = 0, len(pattern), []
+    while i < n:
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+class GitIgnore:
+    """单个 .gitignore 文件的规则，路径相对于其所在目录"""
+
+    def __init__(self, lines):
+        self.rules = []
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            regex = re.compile(_translate_gitignore(line.lstrip("/")) + r"\Z")
+            self.rules.append((regex, negate, dir_only, anchored))
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return cls([])
+
+    def match(self, rel_path, is_dir):
+        """返回 True(忽略) / False(显式保留) / None(无规则命中)"""
+        result = None
+        name = rel_path.rsplit("/", 1)[-1]
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                result = not negate
+        return result
+
+
+class ProjectScan:
+    """
+    基于 os.scandir 的项目文件扫描器，每个任务创建一次，供所有 Agent 复用。
+
+    - 遵循各级 .gitignore
+    - 跳过依赖/构建目录、压缩和自动生成文件、二进制文件和超大文件
+    - 惰性产出 FileEntry，首次完整遍历后缓存结果
+    """
+
+    def __init__(self, root, max_file_size=DEFAULT_MAX_FILE_SIZE, skip_dirs=DEFAULT_SKIP_DIRS,
+                 respect_gitignore=True):
+        self.root = os.path.abspath(root)
+        self.max_file_size = max_file_size
+        self.skip_dirs = frozenset(skip_dirs)
+        self.respect_gitignore = respect_gitignore
+        self.skipped = Counter()
+        self._entries = None
+
+    def __iter__(self):
+        return self.iter_files()
+
+    def iter_files(self, extensions=None):
+        """
+        惰性遍历文件；extensions 为扩展名集合（小写，含点）时只返回匹配的文件
+        """
+        source = self._entries if self._entries is not None else self._walk()
+        for entry in source:
+            if extensions is None or entry.ext in extensions:
+                yield entry
+
+    def files(self, extensions=None):
+        return list(self.iter_files(extensions))
+
+    def _walk(self):
+        entries = []
+        self.skipped = Counter()
+
+        if os.path.isfile(self.root):
+            try:
+                st = os.stat(self.root)
+            except OSError:
+                return
+            name = os.path.basename(self.root)
+            entry = FileEntry(self.root, name, name, st.st_size, st.st_mtime)
+            if self._accept(entry):
+                entries.append(entry)
+                yield entry
+            self._entries = entries
+            return
+
+        # 栈中保存 (目录绝对路径, 相对路径, 生效的 gitignore 列表[(基准相对路径, 规则)])
+        stack = [(self.root, "", [])]
+        while stack:
+            current, rel_dir, ignores = stack.pop()
+            if self.respect_gitignore:
+                gitignore_path = os.path.join(current, ".gitignore")
+                if os.path.isfile(gitignore_path):
+                    ignores = ignores + [(rel_dir, GitIgnore.from_file(gitignore_path))]
+            try:
+                with os.scandir(current) as it:
+                    children = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                logging.warning(f"Scanner cannot read {current}: {e}")
+                continue
+
+            subdirs = []
+            for child in children:
+                rel_path = f"{rel_dir}/{child.name}" if rel_dir else child.name
+                try:
+                    is_dir = child.is_dir(follow_symlinks=False)
+                    if not is_dir and not child.is_file(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+
+                if is_dir and child.name in self.skip_dirs:
+                    self.skipped["vendor_dir"] += 1
+                    continue
+                if ignores and self._ignored(ignores, rel_path, is_dir):
+                    self.skipped["gitignore"] += 1
+                    continue
+                if is_dir:
+                    subdirs.append((child.path, rel_path, ignores))
+                    continue
+
+                try:
+                    st = child.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                entry = FileEntry(child.path, rel_path, child.name, st.st_size, st.st_mtime)
+                if self._accept(entry):
+                    entries.append(entry)
+                    yield entry
+            # 逆序入栈以保持目录的字母序遍历
+            stack.extend(reversed(subdirs))
+
+        self._entries = entries
+        logging.info(f"ProjectScan {self.root}: {len(entries)} files, skipped {dict(self.skipped)}")
+
+    @staticmethod
+    def _ignored(ignores, rel_path, is_dir):
+        ignored = False
+        for base, gitignore in ignores:
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            result = gitignore.match(path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def _accept(self, entry):
+        if entry.name == ".gitignore":
+            return False
+        if GENERATED_PATTERNS.search(entry.name):
+            self.skipped["generated"] += 1
+            return False
+        if entry.ext in BINARY_EXTENSIONS:
+            self.skipped["binary"] += 1
+            return False
+        if entry.size > self.max_file_size:
+            self.skipped["oversized"] += 1
+            return False
+        if entry.ext not in TEXT_EXTENSIONS and entry.size and self._looks_binary(entry.path):
+            self.skipped["binary"] += 1
+            return False
+        if entry.ext in (".js", ".css") and entry.size > MINIFIED_CHECK_SIZE and self._looks_minified(entry.path):
+            self.skipped["generated"] += 1
+            return False
+        return True
+
+    @staticmethod
+    def _looks_binary(path):
+        try:
+            with open(path, "rb") as f:
+                return b"\0" in f.read(1024)
+        except OSError:
+            return True
+
+    @staticmethod
+    def _looks_minified(path):
+        try:
+            with open(path, "rb") as f:
+                head = f.read(4096)
+        except OSError:
+            return False
+        return max((len(line) for line in head.split(b"\n")), default=0) >= MINIFIED_LINE_LENGTH
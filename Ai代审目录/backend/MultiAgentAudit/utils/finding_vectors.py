@@ -0,0 +1,209 @@
+
+import os
+import re
+import math
+import mmap
+import json
+import hashlib
+import tempfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖，未安装时用纯 Python 稀疏点积
+    np = None
+
+# 经 PoC 验证确认的漏洞的本地向量索引，用于给 LLM 提供相似的已验证案例（few-shot）。
+# 向量为代码 token 的特征哈希（unigram + bigram，带符号），L2 归一化后以 float32
+# 追加写入 vectors.f32，元数据逐行写入 meta.jsonl；查询时内存映射向量文件。
+
+DEFAULT_DIM = 256
+DEFAULT_INDEX_DIR = os.path.join(
+    os.getenv("AUDIT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "multiagent_audit"), "findings")
+
+_TOKEN = re.compile(r"[A-Za-z_$][\w$]*|\d+|[^\s\w]")
+
+
+def _bucket(feature, dim):
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if (value >> 63) & 1 else -1.0
+
+
+def embed(text, dim=DEFAULT_DIM):
+    """代码片段 -> 归一化的稀疏向量 {维度: 权重}"""
+    tokens = [t.lower() for t in _TOKEN.findall(text)]
+    counts = {}
+    for i, token in enumerate(tokens):
+        counts[token] = counts.get(token, 0) + 1
+        if i:
+            bigram = tokens[i - 1] + " " + token
+            counts[bigram] = counts.get(bigram, 0) + 1
+    vector = {}
+    for feature, count in counts.items():
+        index, sign = _bucket(feature, dim)
+        vector[index] = vector.get(index, 0.0) + sign * (1.0 + math.log(count))
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vector.items() if v}
+
+
+class FindingVectorIndex:
+    """
+    扁平向量索引（余弦相似度，暴力检索）。
+    只追加写入，多次审计之间持久化；安装了 numpy 时用矩阵乘法加速检索。
+    """
+
+    def __init__(self, index_dir=None, dim=DEFAULT_DIM):
+        self.index_dir = index_dir or DEFAULT_INDEX_DIR
+        self.dim = dim
+        self.vectors_path = os.path.join(self.index_dir, "vectors.f32")
+        self.meta_path = os.path.join(self.index_dir, "meta.jsonl")
+        self.meta = []
+        self._keys = set()
+        self._mm = None
+        self._file = None
+        self._mapped_count = 0
+        self._load()
+
+    def __len__(self):
+        return len(self.meta)
+
+    def _load(self):
+        ends = []  # 每条元数据结束处的字节偏移
+        try:
+            with open(self.meta_path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 写入中断留下的半行
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    offset += len(line)
+                    self.meta.append(record)
+                    ends.append(offset)
+        except OSError:
+            pass
+        # 向量与元数据数量以较少者为准，并把两个文件都截断到该条数：
+        # 否则之后追加的向量行号与元数据行号错位，检索会一直返回错误的记录
+        row_bytes = 4 * self.dim
+        rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        del self.meta[rows:]
+        self._truncate(self.meta_path, ends[len(self.meta) - 1] if self.meta else 0)
+        self._truncate(self.vectors_path, len(self.meta) * row_bytes)
+        self._keys = {record.get("key") for record in self.meta}
+
+    @staticmethod
+    def _truncate(path, size):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    @staticmethod
+    def _key(vuln_type, snippet):
+        return hashlib.sha1(f"{vuln_type}\0{snippet.strip()}".encode("utf-8")).hexdigest()
+
+    def add(self, snippet, record):
+        """
+        追加一条已验证的漏洞；record 至少包含 type，建议包含 severity/reason/language。
+        相同类型 + 相同代码片段只保存一次，返回是否新增。
+        """
+        if not snippet or not snippet.strip():
+            return False
+        key = self._key(record.get("type", ""), snippet)
+        if key in self._keys:
+            return False
+        vector = embed(snippet, self.dim)
+        if not vector:
+            return False
+
+        row = array("f", bytes(4 * self.dim))
+        for index, value in vector.items():
+            row[index] = value
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(self.vectors_path, "ab") as f:
+            f.write(row.tobytes())
+        entry = dict(record, snippet=snippet, key=key)
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.meta.append(entry)
+        self._keys.add(key)
+        return True
+
+    def _rows(self):
+        """内存映射向量文件；文件增长后重新映射"""
+        count = len(self.meta)
+        if count == 0:
+            return None
+        if self._mm is None or self._mapped_count != count:
+            self.close()
+            self._file = open(self.vectors_path, "rb")
+            self._mm = mmap.mmap(self._file.fileno(), count * 4 * self.dim, access=mmap.ACCESS_READ)
+            self._mapped_count = count
+        return self._mm
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def search(self, snippet, k=3, min_score=0.3, vuln_type=None, language=None):
+        """返回 [(相似度, 元数据)]，按相似度降序"""
+        query = embed(snippet, self.dim)
+        rows = self._rows() if query else None
+        if rows is None:
+            return []
+        count = self._mapped_count
+
+        if np is not None:
+            matrix = np.frombuffer(rows, dtype=np.float32, count=count * self.dim).reshape(count, self.dim)
+            q = np.zeros(self.dim, dtype=np.float32)
+            q[list(query)] = list(query.values())
+            scores = (matrix @ q).tolist()
+        else:
+            flat = memoryview(rows).cast("f")
+            items = list(query.items())
+            dim = self.dim
+            scores = []
+            for row in range(count):
+                base = row * dim
+                scores.append(sum(flat[base + j] * w for j, w in items))
+            flat.release()
+
+        hits = []
+        for row, score in enumerate(scores):
+            if score < min_score:
+                continue
+            record = self.meta[row]
+            if vuln_type and record.get("type") != vuln_type:
+                continue
+            if language and record.get("language") not in (None, language):
+                continue
+            hits.append((score, record))
+        hits.sort(key=lambda hit: -hit[0])
+        return hits[:k]
+
+
+def format_examples(hits, counter=None, max_tokens=400):
+    """将检索结果格式化为提示词中的参考案例，按 Token 预算截断"""
+    parts, used = [], 0
+    for index, (score, record) in enumerate(hits, 1):
+        text = (
+            f"[参考案例 {index}] {record.get('type')} ({record.get('severity', '')}) 相似度 {score:.2f}\n"
+            f"代码: {record.get('snippet', '').strip()}\n"
+            f"结论: {record.get('reason', '')}"
+        )
+        cost = counter.count(text) if counter else len(text) // 4
+        if used + cost > max_tokens:
+            break
+        parts.append(text)
+        used += cost
+    if not parts:
+        return ""
+    return "以下是历史上经 PoC 验证的相似漏洞，供参考（不代表本次结论）：\n" + "\n".join(parts) + "\n"
+
@@ -0,0 +1,295 @@
+
+import os
+import re
+import time
+import shlex
+import shutil
+import socket
+import asyncio
+import logging
+import subprocess
+
+import httpx
+
+# PoC 验证引擎：启动目标应用（Docker 容器或本地进程），并发发送 Payload，
+# 按 expected_response 中的特征（字符串、状态码、延时）判定漏洞是否可复现。
+
+DEFAULT_PORT = 8000
+BOOT_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 10.0
+MAX_CONCURRENCY = 4
+# 时间盲注判定：响应时间至少达到基线 + 期望延时 * 该比例
+DELAY_TOLERANCE = 0.8
+# 路径中的载荷占位符
+PAYLOAD_PLACEHOLDER = "<PAYLOAD>"
+
+_STATUS_TEXT = re.compile(r"(?:状态码|status(?:\s*code)?|HTTP)\s*[:：]?\s*([1-5]\d\d)\b", re.I)
+_DELAY_TEXT = re.compile(r"(?:sleep|延时|延迟|delay|等待)\D{0,10}(\d+(?:\.\d+)?)\s*(?:秒|s\b|sec)?", re.I)
+_QUOTED_TEXT = re.compile(r"[\"'“‘`「]([^\"'”’`」]{3,80})[\"'”’`」]")
+
+
+def parse_expectation(payload):
+    """
+    从 Payload 中提取判定特征，优先使用结构化的 match 字段，否则解析 expected_response 文本。
+    返回 {"contains": [...], "status": int|None, "delay": float}
+    """
+    match = payload.get("match") if isinstance(payload.get("match"), dict) else {}
+    text = str(payload.get("expected_response") or "")
+
+    contains = match.get("contains")
+    if isinstance(contains, str):
+        contains = [contains]
+    if not contains:
+        contains = _QUOTED_TEXT.findall(text)
+
+    status = match.get("status")
+    if status is None:
+        found = _STATUS_TEXT.search(text)
+        status = int(found.group(1)) if found else None
+
+    delay = match.get("delay")
+    if delay is None:
+        found = _DELAY_TEXT.search(text)
+        delay = float(found.group(1)) if found else 0.0
+
+    try:
+        status = int(status) if status is not None else None
+        delay = float(delay or 0)
+    except (TypeError, ValueError):
+        status, delay = None, 0.0
+    return {"contains": [str(c) for c in contains if str(c).strip()], "status": status, "delay": delay}
+
+
+def judge(expected, response, elapsed, baseline=None):
+    """
+    按特征判定单次响应，所有给出的特征都满足才算复现。
+    baseline 为同一请求点用正常值请求的 (状态码, 响应体, 耗时)，用于排除页面本来就包含的字符串。
+    返回 (verdict, evidence)，verdict 为 confirmed / not_reproduced / unverifiable
+    """
+    contains, status, delay = expected["contains"], expected["status"], expected["delay"]
+    if not contains and status is None and not delay:
+        return "unverifiable", "Payload 未给出可判定的响应特征"
+
+    evidence = []
+    body = response.text if response is not None else ""
+    base_status, base_body, base_elapsed = baseline or (None, "", 0.0)
+
+    if contains:
+        hits = [c for c in contains if c in body and c not in base_body]
+        if not hits:
+            return "not_reproduced", f"响应中未出现 {contains}"
+        evidence.append(f"响应包含 {hits[0]!r}")
+    if status is not None:
+        if response is None or response.status_code != status or base_status == status:
+            actual = response.status_code if response is not None else None
+            return "not_reproduced", f"状态码 {actual}，期望 {status}"
+        evidence.append(f"状态码 {status}")
+    if delay:
+        if elapsed < base_elapsed + delay * DELAY_TOLERANCE:
+            return "not_reproduced", f"耗时 {elapsed:.2f}s，期望至少延时 {delay:g}s"
+        evidence.append(f"耗时 {elapsed:.2f}s（基线 {base_elapsed:.2f}s）")
+    return "confirmed", "，".join(evidence)
+
+
+class Probe:
+    """一次 Payload 请求：请求点（method/path/param）+ 载荷 + 判定特征"""
+    __slots__ = ("vuln_id", "payload", "method", "path", "param", "expected")
+
+    def __init__(self, vuln_id, payload):
+        self.vuln_id = vuln_id
+        self.payload = payload
+        self.method = str(payload.get("method") or "GET").upper()
+        self.path = str(payload.get("path") or "/")
+        if not self.path.startswith("/"):
+            self.path = "/" + self.path
+        self.param = payload.get("param")
+        self.expected = parse_expectation(payload)
+
+    @property
+    def endpoint(self):
+        return (self.method, self.path, self.param)
+
+    def request_args(self, value):
+        """把值注入到参数或路径中的占位符"""
+        path = self.path.replace(PAYLOAD_PLACEHOLDER, value)
+        if not self.param:
+            return path, {}
+        key = "params" if self.method in ("GET", "DELETE", "HEAD") else "data"
+        return path, {key: {self.param: value}}
+
+    @property
+    def injectable(self):
+        return bool(self.param) or PAYLOAD_PLACEHOLDER in self.path
+
+
+class PocVerifier:
+    """
+    针对单个目标的并发验证器。
+    所有请求复用同一个连接池；每个目标最多 concurrency 个并发请求，单个请求有超时，
+    时间盲注类 Payload 的超时按期望延时放宽。
+    """
+
+    def __init__(self, base_url, concurrency=MAX_CONCURRENCY, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def verify(self, probes):
+        """同步入口，返回与 probes 一一对应的结果"""
+        return asyncio.run(self.verify_async(probes))
+
+    async def verify_async(self, probes):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout,
+                                     follow_redirects=True, trust_env=False) as client:
+            # 每个请求点先用正常值取一次基线，再并发发送所有 Payload
+            endpoints = {p.endpoint: p for p in probes if p.injectable}
+            baselines = dict(zip(endpoints, await asyncio.gather(
+                *(self._baseline(client, semaphore, probe) for probe in endpoints.values())
+            )))
+            return await asyncio.gather(
+                *(self._probe(client, semaphore, probe, baselines.get(probe.endpoint)) for probe in probes)
+            )
+
+    async def _send(self, client, semaphore, probe, value, timeout):
+        path, kwargs = probe.request_args(value)
+        async with semaphore:
+            start = time.monotonic()
+            response = await client.request(probe.method, path, timeout=timeout, **kwargs)
+            return response, time.monotonic() - start
+
+    async def _baseline(self, client, semaphore, probe):
+        try:
+            response, elapsed = await self._send(client, semaphore, probe, "1", self.timeout)
+            return response.status_code, response.text, elapsed
+        except httpx.HTTPError as e:
+            logging.info(f"Baseline request failed for {probe.endpoint}: {e}")
+            return None
+
+    async def _probe(self, client, semaphore, probe, baseline):
+        result = {"vuln_id": probe.vuln_id, "method": probe.method, "path": probe.path, "param": probe.param}
+        if not probe.injectable:
+            result.update(verdict="unverifiable", evidence=f"Payload 未指定参数或 {PAYLOAD_PLACEHOLDER} 占位符")
+            return result
+
+        timeout = self.timeout + probe.expected["delay"]
+        try:
+            response, elapsed = await self._send(client, semaphore, probe, str(probe.payload.get("payload", "")), timeout)
+        except httpx.TimeoutException:
+            # 超时本身可能就是延时注入成功的表现
+            elapsed = timeout
+            if probe.expected["delay"] and not probe.expected["contains"] and probe.expected["status"] is None:
+                verdict, evidence = judge(probe.expected, None, elapsed, baseline)
+            else:
+                verdict, evidence = "error", f"请求超时（{timeout:g}s）"
+            result.update(verdict=verdict, evidence=evidence, elapsed=round(elapsed, 3))
+            return result
+        except httpx.HTTPError as e:
+            result.update(verdict="error", evidence=str(e))
+            return result
+
+        verdict, evidence = judge(probe.expected, response, elapsed, baseline)
+        result.update(verdict=verdict, evidence=evidence, status=response.status_code, elapsed=round(elapsed, 3))
+        return result
+
+
+def _port_of(env_data):
+    ports = (env_data.get("docker_config") or {}).get("ports") or []
+    for port in ports if isinstance(ports, list) else [ports]:
+        found = re.search(r"(\d+)\s*$", str(port))
+        if found:
+            return int(found.group(1))
+    return DEFAULT_PORT
+
+
+def _port_in_use(port):
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _wait_for_port(port, timeout, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class TargetLauncher:
+    """
+    按 OpsAgent 给出的 docker_config 启动被测应用，退出时停止。
+    - 设置了 HACKER_TARGET_URL 时直接使用已运行的目标
+    - 有 docker 且给出镜像时在容器中运行（源码目录挂载到 /app）
+    - 只有显式设置 HACKER_SANDBOX=local 时才在源码目录下以本地进程执行 start_command
+      （start_command 来自被审计项目和 LLM，不可信，不会自动回退到本机执行）
+    """
+
+    def __init__(self, target_dir, env_data, boot_timeout=BOOT_TIMEOUT, mode=None):
+        self.target_dir = target_dir if os.path.isdir(target_dir) else os.path.dirname(target_dir)
+        self.env_data = env_data or {}
+        self.boot_timeout = boot_timeout
+        docker_config = self.env_data.get("docker_config") or {}
+        self.image = docker_config.get("image")
+        self.start_command = docker_config.get("start_command")
+        self.port = _port_of(self.env_data)
+        if mode is None:
+            mode = os.getenv("HACKER_SANDBOX") or ("docker" if shutil.which("docker") and self.image else None)
+        self.mode = mode
+        self.base_url = os.getenv("HACKER_TARGET_URL")
+        self._process = None
+        self._container = None
+
+    def __enter__(self):
+        if self.base_url:
+            return self.base_url
+        if not self.start_command:
+            raise RuntimeError("docker_config 中没有 start_command，无法启动目标")
+        if self.mode not in ("docker", "local"):
+            raise RuntimeError("没有可用的 docker 镜像，本机运行目标需显式设置 HACKER_SANDBOX=local")
+        if self.mode == "docker" and not self.image:
+            raise RuntimeError("docker_config 中没有镜像，无法在容器中启动目标")
+        # 端口已被占用时 Payload 会打到无关的本地服务上
+        if _port_in_use(self.port):
+            raise RuntimeError(f"端口 {self.port} 已被占用，无法确认响应来自被测目标")
+
+        if self.mode == "docker":
+            name = f"audit-target-{os.getpid()}-{int(time.time())}"
+            subprocess.run(
+                ["docker", "run", "-d", "--rm", "--name", name, "-p", f"{self.port}:{self.port}",
+                 "-v", f"{os.path.abspath(self.target_dir)}:/app", "-w", "/app", "-e", f"PORT={self.port}",
+                 self.image, "sh", "-c", self.start_command],
+                check=True, capture_output=True, timeout=120
+            )
+            self._container = name
+        else:
+            self._process = subprocess.Popen(
+                shlex.split(self.start_command), cwd=self.target_dir,
+                env=dict(os.environ, PORT=str(self.port)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        if not _wait_for_port(self.port, self.boot_timeout, self._process):
+            self.__exit__(None, None, None)
+            raise RuntimeError(f"目标未能在 {self.boot_timeout:g}s 内监听端口 {self.port}")
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._container:
+            subprocess.run(["docker", "rm", "-f", self._container], capture_output=True, timeout=60)
+            self._container = None
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
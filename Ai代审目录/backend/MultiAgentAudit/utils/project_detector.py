@@ -0,0 +1,350 @@
+
+import os
+import re
+import json
+from collections import Counter
+
+from utils.source_loader import read_source
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# 与前端 utils/projectDetector.js 保持一致的识别思路：
+# 先看依赖清单，再看扩展名分布，最后用导入特征补充框架信息。
+
+EXTENSION_LANGUAGE = {
+    ".py": "python",
+    ".php": "php",
+    ".java": "java",
+    ".js": "node",
+    ".ts": "node",
+    ".go": "go",
+    ".rs": "rust",
+    ".rb": "ruby",
+    ".cs": "csharp",
+    ".c": "c",
+    ".cpp": "cpp",
+}
+
+MANIFEST_LANGUAGE = {
+    "requirements.txt": "python",
+    "pipfile": "python",
+    "pyproject.toml": "python",
+    "setup.py": "python",
+    "package.json": "node",
+    "pom.xml": "java",
+    "build.gradle": "java",
+    "build.gradle.kts": "java",
+    "composer.json": "php",
+    "go.mod": "go",
+    "cargo.toml": "rust",
+}
+
+# 依赖名 -> 框架（按优先级排列）
+FRAMEWORK_DEPENDENCIES = {
+    "python": [("django", "django"), ("flask", "flask"), ("fastapi", "fastapi"), ("tornado", "tornado")],
+    "node": [("@nestjs/core", "nestjs"), ("next", "next"), ("express", "express"), ("koa", "koa"),
+             ("vue", "vue"), ("react", "react")],
+    "java": [("spring-boot", "spring"), ("spring-webmvc", "spring"), ("struts2", "struts2")],
+    "php": [("laravel/framework", "laravel"), ("symfony/", "symfony"), ("topthink/framework", "thinkphp"),
+            ("codeigniter", "codeigniter")],
+    "go": [("github.com/gin-gonic/gin", "gin"), ("github.com/labstack/echo", "echo"),
+           ("github.com/beego/beego", "beego"), ("github.com/gofiber/fiber", "fiber")],
+    "rust": [("actix-web", "actix"), ("axum", "axum"), ("rocket", "rocket")],
+}
+
+# 源码导入特征 -> 框架（没有依赖清单时使用）
+IMPORT_SIGNATURES = {
+    "python": [(re.compile(r"^\s*(from|import)\s+django\b", re.M), "django"),
+               (re.compile(r"^\s*(from|import)\s+flask\b", re.M), "flask"),
+               (re.compile(r"^\s*(from|import)\s+fastapi\b", re.M), "fastapi")],
+    "node": [(re.compile(r"require\(['\"]express['\"]\)|from ['\"]express['\"]"), "express"),
+             (re.compile(r"require\(['\"]koa['\"]\)|from ['\"]koa['\"]"), "koa")],
+    "java": [(re.compile(r"@SpringBootApplication|import org\.springframework"), "spring")],
+    "php": [(re.compile(r"use Illuminate\\"), "laravel"),
+            (re.compile(r"use Symfony\\"), "symfony"),
+            (re.compile(r"namespace app\\|use think\\"), "thinkphp")],
+    "go": [(re.compile(r"\"github\.com/gin-gonic/gin\""), "gin"),
+           (re.compile(r"\"github\.com/labstack/echo"), "echo")],
+}
+
+DEFAULT_VERSION = {"python": "3.11", "node": "18", "java": "17", "php": "8.2", "go": "1.21"}
+
+# 依赖清单 + 框架 / 仅依赖清单 / 仅导入特征 / 仅扩展名
+CONFIDENCE_MANIFEST_FRAMEWORK = 0.9
+CONFIDENCE_MANIFEST = 0.75
+CONFIDENCE_SIGNATURE = 0.65
+CONFIDENCE_EXTENSION = 0.4
+
+SIGNATURE_READ_BYTES = 4096
+SIGNATURE_MAX_FILES = 50
+
+
+def _read_text(path, limit=None):
+    try:
+        return read_source(path, limit)
+    except OSError:
+        return ""
+
+
+def _parse_requirements(path):
+    deps = []
+    for line in _read_text(path).splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith("-"):
+            continue
+        name = re.split(r"[<>=!~\[; ]", line, 1)[0].strip()
+        if name:
+            deps.append(name.lower())
+    return deps, None
+
+
+def _load_toml(path):
+    if tomllib is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _toml_keys(text, section_pattern):
+    """没有 tomllib 时，粗略提取匹配小节下的键名"""
+    keys = []
+    active = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("["):
+            active = re.search(section_pattern, stripped) is not None
+        elif active:
+            m = re.match(r"([A-Za-z0-9_.\-]+)\s*=", stripped)
+            if m:
+                keys.append(m.group(1).lower())
+    return keys
+
+
+def _requirement_name(spec):
+    return re.split(r"[<>=!~\[; ]", spec.strip(), 1)[0].lower()
+
+
+def _parse_pyproject(path):
+    data = _load_toml(path)
+    if data is None:
+        text = _read_text(path)
+        deps = _toml_keys(text, r"dependencies")
+        version = re.search(r"(?:requires-python|python)\s*=\s*\"[^0-9]*([0-9]+\.[0-9]+)", text)
+        return [d for d in deps if d != "python"], version.group(1) if version else None
+    project = data.get("project", {})
+    poetry = data.get("tool", {}).get("poetry", {})
+    deps = [_requirement_name(d) for d in project.get("dependencies", [])]
+    deps += [d.lower() for d in poetry.get("dependencies", {}) if d.lower() != "python"]
+    version_spec = project.get("requires-python") or poetry.get("dependencies", {}).get("python", "")
+    version = re.search(r"([0-9]+\.[0-9]+)", str(version_spec))
+    return deps, version.group(1) if version else None
+
+
+def _parse_pipfile(path):
+    data = _load_toml(path)
+    if data is None:
+        text = _read_text(path)
+        version = re.search(r"python_version\s*=\s*\"([0-9.]+)\"", text)
+        return _toml_keys(text, r"packages"), version.group(1) if version else None
+    deps = [d.lower() for d in data.get("packages", {})] + [d.lower() for d in data.get("dev-packages", {})]
+    return deps, data.get("requires", {}).get("python_version")
+
+
+def _parse_package_json(path):
+    try:
+        data = json.loads(_read_text(path) or "{}")
+    except ValueError:
+        return [], None
+    deps = list(data.get("dependencies", {}) or {}) + list(data.get("devDependencies", {}) or {})
+    engines = data.get("engines") or {}
+    version = re.search(r"([0-9]+)", str(engines.get("node", "")))
+    return [d.lower() for d in deps], version.group(1) if version else None
+
+
+def _parse_pom(path):
+    text = _read_text(path)
+    deps = [m.lower() for m in re.findall(r"<artifactId>\s*([^<\s]+)\s*</artifactId>", text)]
+    version = re.search(r"<(?:java\.version|maven\.compiler\.source)>\s*([0-9.]+)", text)
+    return deps, version.group(1) if version else None
+
+
+def _parse_gradle(path):
+    text = _read_text(path)
+    deps = [m.lower() for m in re.findall(r"['\"]([\w.\-]+:[\w.\-]+)(?::[^'\"]*)?['\"]", text)]
+    deps = [d.split(":", 1)[1] for d in deps]
+    version = re.search(r"(?:sourceCompatibility|languageVersion\.set\(JavaLanguageVersion\.of\()\s*=?\s*['\"]?(?:JavaVersion\.VERSION_)?([0-9_.]+)", text)
+    return deps, version.group(1).replace("_", ".") if version else None
+
+
+def _parse_composer(path):
+    try:
+        data = json.loads(_read_text(path) or "{}")
+    except ValueError:
+        return [], None
+    require = dict(data.get("require", {}) or {})
+    require.update(data.get("require-dev", {}) or {})
+    version = re.search(r"([0-9]+\.[0-9]+)", str(require.pop("php", "")))
+    return [d.lower() for d in require], version.group(1) if version else None
+
+
+def _parse_go_mod(path):
+    text = _read_text(path)
+    deps = re.findall(r"^\s*(?:require\s+)?([\w.\-]+\.[a-z]+/[\w.\-/]+)\s+v", text, re.M)
+    version = re.search(r"^go\s+([0-9.]+)", text, re.M)
+    return [d.lower() for d in deps], version.group(1) if version else None
+
+
+def _parse_cargo(path):
+    data = _load_toml(path)
+    if data is None:
+        return _toml_keys(_read_text(path), r"dependencies"), None
+    return [d.lower() for d in data.get("dependencies", {})], None
+
+
+MANIFEST_PARSERS = {
+    "requirements.txt": _parse_requirements,
+    "pipfile": _parse_pipfile,
+    "pyproject.toml": _parse_pyproject,
+    "package.json": _parse_package_json,
+    "pom.xml": _parse_pom,
+    "build.gradle": _parse_gradle,
+    "build.gradle.kts": _parse_gradle,
+    "composer.json": _parse_composer,
+    "go.mod": _parse_go_mod,
+    "cargo.toml": _parse_cargo,
+}
+
+
+def _framework_from_deps(language, deps):
+    # 前缀匹配：spring-boot-starter-web -> spring-boot，symfony/console -> symfony/
+    for marker, framework in FRAMEWORK_DEPENDENCIES.get(language, []):
+        if any(dep.startswith(marker) for dep in deps):
+            return framework
+    return None
+
+
+def _framework_from_imports(language, paths):
+    signatures = IMPORT_SIGNATURES.get(language)
+    if not signatures:
+        return None
+    hits = Counter()
+    for path in paths[:SIGNATURE_MAX_FILES]:
+        head = _read_text(path, SIGNATURE_READ_BYTES)
+        for pattern, framework in signatures:
+            if pattern.search(head):
+                hits[framework] += 1
+    return hits.most_common(1)[0][0] if hits else None
+
+
+def _find_entry(paths, candidates):
+    names = {os.path.basename(p).lower(): os.path.basename(p) for p in paths}
+    for candidate in candidates:
+        if candidate in names:
+            return names[candidate]
+    return None
+
+
+def _docker_config(language, framework, version, paths):
+    """根据语言/框架给出默认的部署配置"""
+    version = version or DEFAULT_VERSION.get(language, "latest")
+    if language == "python":
+        if framework == "django":
+            return {"image": f"python:{version}-slim", "ports": ["8000"],
+                    "start_command": "python manage.py runserver 0.0.0.0:8000"}
+        if framework == "fastapi":
+            module = os.path.splitext(_find_entry(paths, ["main.py", "app.py"]) or "main.py")[0]
+            return {"image": f"python:{version}-slim", "ports": ["8000"],
+                    "start_command": f"uvicorn {module}:app --host 0.0.0.0 --port 8000"}
+        entry = _find_entry(paths, ["app.py", "main.py", "run.py", "server.py", "wsgi.py"]) or "app.py"
+        return {"image": f"python:{version}-slim", "ports": ["5000" if framework == "flask" else "8000"],
+                "start_command": f"python {entry}"}
+    if language == "node":
+        return {"image": f"node:{version}-alpine", "ports": ["3000"], "start_command": "npm start"}
+    if language == "java":
+        major = version[2:] if version.startswith("1.") else version.split(".")[0]
+        start_command = "mvn spring-boot:run" if framework == "spring" else "mvn -q package && java -jar target/*.jar"
+        return {"image": f"maven:3-eclipse-temurin-{major}", "ports": ["8080"], "start_command": start_command}
+    if language == "php":
+        if framework == "laravel":
+            return {"image": f"php:{version}-cli", "ports": ["8000"],
+                    "start_command": "php artisan serve --host=0.0.0.0 --port=8000"}
+        return {"image": f"php:{version}-apache", "ports": ["80"], "start_command": "apache2-foreground"}
+    if language == "go":
+        return {"image": f"golang:{version}", "ports": ["8080"], "start_command": "go run ."}
+    if language == "rust":
+        return {"image": "rust:latest", "ports": ["8080"], "start_command": "cargo run --release"}
+    return {"image": "ubuntu:22.04", "ports": [], "start_command": ""}
+
+
+def detect_project(file_paths):
+    """
+    在本地识别项目语言、框架、版本、依赖和部署配置，不调用 LLM。
+
+    返回 (env_data, confidence)。env_data 与 OpsAgent 的 LLM 输出格式一致，
+    confidence 在 0~1 之间，无法识别时返回 ({}, 0.0)。
+    """
+    if not file_paths:
+        return {}, 0.0
+
+    # 1. 依赖清单（离根目录越近越优先）
+    manifests = {}
+    for path in sorted(file_paths, key=lambda p: (p.count(os.sep), p)):
+        name = os.path.basename(path).lower()
+        if name in MANIFEST_LANGUAGE and name not in manifests:
+            manifests[name] = path
+
+    # 2. 扩展名分布
+    histogram = Counter()
+    sources = {}
+    for path in file_paths:
+        language = EXTENSION_LANGUAGE.get(os.path.splitext(path)[1].lower())
+        if language:
+            histogram[language] += 1
+            sources.setdefault(language, []).append(path)
+
+    manifest_languages = Counter(MANIFEST_LANGUAGE[name] for name in manifests)
+    if manifest_languages:
+        # 多个清单时以源码数量最多的语言为准（如前后端混合项目）
+        language = max(manifest_languages, key=lambda lang: (histogram.get(lang, 0), manifest_languages[lang]))
+    elif histogram:
+        language = histogram.most_common(1)[0][0]
+    else:
+        return {}, 0.0
+
+    deps, version = [], None
+    for name, path in manifests.items():
+        if MANIFEST_LANGUAGE[name] != language or name not in MANIFEST_PARSERS:
+            continue
+        parsed_deps, parsed_version = MANIFEST_PARSERS[name](path)
+        deps.extend(d for d in parsed_deps if d not in deps)
+        version = version or parsed_version
+
+    # 3. 框架：先看依赖，再看导入特征
+    framework = _framework_from_deps(language, deps)
+    has_manifest = language in manifest_languages
+    if framework and has_manifest:
+        confidence = CONFIDENCE_MANIFEST_FRAMEWORK
+    else:
+        signature_framework = _framework_from_imports(language, sources.get(language, []))
+        framework = framework or signature_framework
+        if has_manifest:
+            confidence = CONFIDENCE_MANIFEST
+        elif signature_framework:
+            confidence = CONFIDENCE_SIGNATURE
+        else:
+            confidence = CONFIDENCE_EXTENSION
+
+    env_data = {
+        "language": language,
+        "framework": framework or "none",
+        "version": version or DEFAULT_VERSION.get(language, "unknown"),
+        "dependencies": deps,
+        "docker_config": _docker_config(language, framework, version, file_paths),
+    }
+    return env_data, confidence
@@ -0,0 +1,158 @@
+
+import os
+import mmap
+import codecs
+from array import array
+
+# 编码探测只看文件开头这一段
+SAMPLE_SIZE = 64 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _decodes(sample, encoding, final):
+    # 采样可能截断在多字节字符中间，非 final 时允许末尾不完整
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_encoding(sample, final=True):
+    """
+    根据 BOM 和试解码判断编码：utf-8 -> gb18030(兼容 GBK) -> latin-1。
+    final 表示 sample 是否为完整文件内容。
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if _decodes(sample, "utf-8", final):
+        return "utf-8"
+    if _decodes(sample, "gb18030", final):
+        return "gb18030"
+    return "latin-1"
+
+
+class SourceFile:
+    """
+    内存映射的源码文件。
+
+    - 只读取开头一段探测编码
+    - 按需建立行偏移索引，按行号取片段时只解码对应字节区间
+    - 解码失败的字节以替换字符表示，不会中断审计
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        sample = self._data[:SAMPLE_SIZE]
+        self.encoding = detect_encoding(sample, final=self.size <= SAMPLE_SIZE)
+        self._line_offsets = None
+        self._text = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        self._file.close()
+
+    @property
+    def _wide(self):
+        # UTF-16/32 的换行不是单字节，行索引基于解码后的文本
+        return self.encoding in ("utf-16", "utf-32")
+
+    def text(self):
+        """完整文本"""
+        if self._wide:
+            if self._text is None:
+                self._text = self._data[:].decode(self.encoding, errors="replace")
+            return self._text
+        return self._data[:].decode(self.encoding, errors="replace")
+
+    def head(self, max_chars):
+        """开头最多 max_chars 个字符"""
+        if self._wide:
+            return self.text()[:max_chars]
+        # utf-8 单字符最多 4 字节
+        chunk = self._data[:max_chars * 4]
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        return decoder.decode(chunk, final=len(chunk) >= self.size)[:max_chars]
+
+    def _build_index(self):
+        offsets = array("Q", [0])
+        if self._wide:
+            text = self.text()
+            pos = text.find("\n")
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = text.find("\n", pos + 1)
+        else:
+            data = self._data
+            find = data.find
+            pos = find(b"\n")
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = find(b"\n", pos + 1)
+        if offsets[-1] == (len(self._text) if self._wide else self.size) and len(offsets) > 1:
+            offsets.pop()  # 文件以换行结尾时不产生空的最后一行
+        self._line_offsets = offsets
+
+    @property
+    def line_count(self):
+        if not self.size:
+            return 0
+        if self._line_offsets is None:
+            self._build_index()
+        return len(self._line_offsets)
+
+    def _span(self, start, end):
+        offsets = self._line_offsets
+        begin = offsets[start - 1]
+        stop = offsets[end] if end < len(offsets) else (len(self._text) if self._wide else self.size)
+        return begin, stop
+
+    def snippet(self, start, end=None, context=0):
+        """
+        按行号（从 1 开始，含首尾）取片段，context 为上下额外行数。
+        超出范围的行号会被截断到文件边界。
+        """
+        total = self.line_count
+        if not total:
+            return ""
+        end = start if end is None else end
+        start = max(1, start - context)
+        end = min(total, end + context)
+        if start > end:
+            return ""
+        begin, stop = self._span(start, end)
+        if self._wide:
+            return self._text[begin:stop]
+        return self._data[begin:stop].decode(self.encoding, errors="replace")
+
+    def line(self, number):
+        return self.snippet(number).rstrip("\r\n")
+
+
+def load_source(path):
+    return SourceFile(path)
+
+
+def read_source(path, max_chars=None):
+    """读取文件文本（自动识别编码），max_chars 只取开头"""
+    with SourceFile(path) as source:
+        return source.head(max_chars) if max_chars else source.text()
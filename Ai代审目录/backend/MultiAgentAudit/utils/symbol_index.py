@@ -0,0 +1,337 @@
+
+import os
+import re
+import ast
+import json
+import hashlib
+import logging
+import tempfile
+from collections import defaultdict
+
+from utils.source_loader import SourceFile
+
+# 项目符号索引：定义、导入和调用边。每个任务构建一次并持久化，
+# 再次审计同一目录时只重新解析有变化的文件。
+
+INDEX_VERSION = 1
+DEFAULT_CACHE_DIR = os.getenv("AUDIT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "multiagent_audit"))
+
+LANGUAGE_BY_EXT = {
+    ".py": "python",
+    ".php": "php",
+    ".js": "javascript",
+    ".ts": "javascript",
+    ".java": "java",
+    ".go": "go",
+}
+
+# 非 Python 语言的函数定义（正则，取第一个非空分组作为函数名）
+DEF_PATTERNS = {
+    "php": re.compile(r"^\s*(?:(?:public|private|protected|static|final|abstract)\s+)*function\s+&?(\w+)\s*\("),
+    "javascript": re.compile(
+        r"^\s*(?:export\s+)?(?:async\s+)?function\s*\*?\s*(\w+)\s*\("
+        r"|^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|\w+\s*=>)"
+        r"|^\s*(?:async\s+|static\s+)*(?!if\b|for\b|while\b|switch\b|catch\b|return\b)(\w+)\s*\([^)]*\)\s*\{"
+    ),
+    "java": re.compile(
+        r"^\s*(?:(?:public|private|protected|static|final|synchronized|abstract)\s+)+"
+        r"[\w<>\[\],\s]+?\s+(\w+)\s*\([^;]*$"
+    ),
+    "go": re.compile(r"^\s*func\s+(?:\([^)]*\)\s*)?(\w+)\s*\("),
+}
+CALL_PATTERN = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+CALL_KEYWORDS = frozenset({
+    "if", "for", "while", "switch", "catch", "return", "function", "new", "sizeof", "typeof", "elseif",
+    "array", "isset", "empty", "unset", "list", "echo", "print", "func", "super", "this",
+})
+
+
+class Symbol:
+    __slots__ = ("name", "qualname", "file", "line", "end_line")
+
+    def __init__(self, name, qualname, file, line, end_line):
+        self.name = name
+        self.qualname = qualname
+        self.file = file
+        self.line = line
+        self.end_line = end_line
+
+    def __repr__(self):
+        return f"Symbol({self.qualname} @ {self.file}:{self.line}-{self.end_line})"
+
+
+class _PythonIndexer(ast.NodeVisitor):
+    def __init__(self):
+        self.defs, self.calls, self.imports = [], [], {}
+        self._scope = []
+        self._caller = None
+
+    def visit_FunctionDef(self, node):
+        qualname = ".".join(self._scope + [node.name])
+        self.defs.append((node.name, qualname, node.lineno, getattr(node, "end_lineno", node.lineno)))
+        outer = self._caller
+        self._caller = qualname
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+        self._caller = outer
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports[alias.asname or alias.name.split(".")[0]] = alias.name
+
+    def visit_ImportFrom(self, node):
+        if node.module:
+            for alias in node.names:
+                self.imports[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if name:
+            self.calls.append((self._caller, name, node.lineno))
+        self.generic_visit(node)
+
+
+def _python_entries(code):
+    """返回 (defs, calls, imports)；defs: [(name, qualname, line, end_line)]，calls: [(caller, callee, line)]"""
+    indexer = _PythonIndexer()
+    indexer.visit(ast.parse(code))
+    return indexer.defs, indexer.calls, indexer.imports
+
+
+def _pattern_entries(code, language):
+    pattern = DEF_PATTERNS[language]
+    lines = code.splitlines()
+    starts = []
+    for number, line in enumerate(lines, 1):
+        match = pattern.match(line)
+        if match:
+            name = next(group for group in match.groups() if group)
+            if name not in CALL_KEYWORDS:
+                starts.append((number, name))
+
+    defs = []
+    for i, (line, name) in enumerate(starts):
+        end = starts[i + 1][0] - 1 if i + 1 < len(starts) else len(lines)
+        defs.append((name, name, line, end))
+
+    calls = []
+    owner = 0
+    for number, line in enumerate(lines, 1):
+        while owner < len(starts) and starts[owner][0] <= number:
+            owner += 1
+        caller = starts[owner - 1][1] if owner else None
+        for match in CALL_PATTERN.finditer(line):
+            name = match.group(1)
+            # 跳过定义行本身
+            if name in CALL_KEYWORDS or (owner and starts[owner - 1][0] == number and name == caller):
+                continue
+            calls.append((caller, name, number))
+    return defs, calls, {}
+
+
+def extract_entries(code, language):
+    if language == "python":
+        return _python_entries(code)
+    if language in DEF_PATTERNS:
+        return _pattern_entries(code, language)
+    return [], [], {}
+
+
+class SymbolIndex:
+    """
+    符号索引
+    - defs: 函数名 -> [Symbol]
+    - callers: 函数名 -> [(调用方 qualname, 文件, 行号)]
+    - calls: (文件, 调用方 qualname) -> [(被调函数名, 行号)]
+    """
+
+    def __init__(self, root, cache_dir=None):
+        self.root = os.path.abspath(root)
+        self.cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+        self.files = {}  # 相对路径 -> 单文件条目（可持久化）
+        self.reparsed = 0
+        self._reset_maps()
+
+    def _reset_maps(self):
+        self.defs = defaultdict(list)
+        self.callers = defaultdict(list)
+        self.calls = defaultdict(list)
+        self.imports = {}
+
+    @property
+    def cache_path(self):
+        digest = hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"symbols-{digest}.json")
+
+    @classmethod
+    def load_or_build(cls, scan, cache_dir=None):
+        """读取持久化索引，重新解析 mtime/size 变化的文件，删除已不存在的文件，然后保存"""
+        index = cls(scan.root if os.path.isdir(scan.root) else os.path.dirname(scan.root), cache_dir)
+        index._load()
+        index.update(scan)
+        index.save()
+        return index
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.root:
+            self.files = data.get("files", {})
+
+    def save(self):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "root": self.root, "files": self.files}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logging.warning(f"SymbolIndex save failed: {e}")
+
+    def update(self, scan):
+        seen = set()
+        for entry in scan.iter_files(LANGUAGE_BY_EXT):
+            rel_path = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+            seen.add(rel_path)
+            cached = self.files.get(rel_path)
+            if cached and cached["mtime"] == entry.mtime and cached["size"] == entry.size:
+                continue
+            self.files[rel_path] = self._parse(entry, LANGUAGE_BY_EXT[entry.ext])
+            self.reparsed += 1
+        for rel_path in set(self.files) - seen:
+            del self.files[rel_path]
+        self._rebuild_maps()
+
+    @staticmethod
+    def _parse(entry, language):
+        try:
+            with SourceFile(entry.path) as source:
+                defs, calls, imports = extract_entries(source.text(), language)
+        except (OSError, SyntaxError, ValueError) as e:
+            logging.info(f"SymbolIndex skip {entry.path}: {e}")
+            defs, calls, imports = [], [], {}
+        return {"mtime": entry.mtime, "size": entry.size, "language": language,
+                "defs": defs, "calls": calls, "imports": imports}
+
+    def _rebuild_maps(self):
+        self._reset_maps()
+        for rel_path, data in self.files.items():
+            for name, qualname, line, end_line in data["defs"]:
+                self.defs[name].append(Symbol(name, qualname, rel_path, line, end_line))
+            for caller, callee, line in data["calls"]:
+                self.callers[callee].append((caller, rel_path, line))
+                self.calls[(rel_path, caller)].append((callee, line))
+            self.imports[rel_path] = data.get("imports", {})
+
+    def rel(self, path):
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    def callers_of(self, qualname, file):
+        """
+        调用 file 中 qualname 的位置：每个调用点按调用方文件用 resolve 解析，
+        只保留解析到该定义的调用点（同名的其他函数、无法确定目标的调用不算），并排除自引用
+        """
+        name = qualname.split(".")[-1]
+        result = []
+        for caller, path, line in self.callers.get(name, ()):
+            if path == file and caller == qualname:
+                continue
+            if any(s.file == file and s.qualname == qualname for s in self.resolve(name, path, strict=True)):
+                result.append((caller, path, line))
+        return result
+
+    def callees_of(self, qualname, file):
+        """qualname 调用的、在项目内有定义的函数"""
+        result = []
+        seen = set()
+        for callee, line in self.calls.get((file, qualname), ()):
+            for symbol in self.resolve(callee, file):
+                key = (symbol.file, symbol.qualname)
+                if key not in seen:
+                    seen.add(key)
+                    result.append((symbol, line))
+        return result
+
+    def resolve(self, name, from_file, strict=False):
+        """
+        同文件定义优先，其次按导入路径匹配，最后返回所有同名定义。
+        strict 时不做最后一步：Python 还接受经导入的模块调用（from lib import shell; shell.run()），
+        没有导入信息的语言只接受项目内唯一的定义，其余无法确定目标的调用返回空列表
+        """
+        candidates = self.defs.get(name, [])
+        local = [s for s in candidates if s.file == from_file]
+        if local:
+            return local
+        imports = self.imports.get(from_file, {})
+        target = imports.get(name)
+        if target:
+            module_path = target.rsplit(".", 1)[0].replace(".", "/")
+            imported = [s for s in candidates if s.file.rsplit(".", 1)[0].endswith(module_path)]
+            if imported:
+                return imported
+        if not strict:
+            return candidates
+        if self.files.get(from_file, {}).get("language") != "python":
+            return candidates if len(candidates) == 1 else []
+        modules = set()
+        for path in imports.values():
+            modules.add(path.replace(".", "/"))
+            modules.add(path.rsplit(".", 1)[0].replace(".", "/"))
+        return [s for s in candidates if self._module_of(s.file) in modules
+                or any(self._module_of(s.file).endswith("/" + module) for module in modules)]
+
+    @staticmethod
+    def _module_of(rel_path):
+        module = rel_path.rsplit(".", 1)[0]
+        return module[:-len("/__init__")] if module.endswith("/__init__") else module
+
+    def context_for(self, file_path, function, counter=None, max_tokens=800, max_items=3):
+        """
+        为候选 sink 所在函数检索上下文：调用方片段（数据从哪来）和被调函数定义（数据到哪去）。
+        按 Token 预算截断，返回可直接拼进提示词的文本；没有相关上下文时返回空字符串。
+        """
+        if not function:
+            return ""
+        file = self.rel(file_path)
+        blocks = []
+        for caller, path, line in self.callers_of(function, file)[:max_items]:
+            title = f"调用方 {path}:{line}" + (f" ({caller})" if caller else "")
+            blocks.append((title, path, max(1, line - 3), line + 3))
+        for symbol, line in self.callees_of(function, file)[:max_items]:
+            blocks.append((f"被调函数 {symbol.file}:{symbol.line} ({symbol.qualname})",
+                           symbol.file, symbol.line, min(symbol.end_line, symbol.line + 15)))
+
+        parts, used = [], 0
+        for title, path, start, end in blocks:
+            snippet = self._snippet(path, start, end)
+            if not snippet:
+                continue
+            text = f"--- {title} ---\n{snippet}"
+            cost = counter.count(text) if counter else len(text) // 4
+            if used + cost > max_tokens:
+                break
+            parts.append(text)
+            used += cost
+        return "\n".join(parts)
+
+    def _snippet(self, rel_path, start, end):
+        try:
+            with SourceFile(os.path.join(self.root, rel_path)) as source:
+                end = min(end, source.line_count)
+                return "\n".join(f"{n:>5}| {source.line(n)}" for n in range(start, end + 1))
+        except OSError:
+            return ""
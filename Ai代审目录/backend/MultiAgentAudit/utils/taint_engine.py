@@ -0,0 +1,591 @@
+
+import ast
+import re
+import itertools
+
+# 本地 Source -> Sink -> Sanitizer 污点分析。
+# Python 基于 AST 做过程内分析；PHP/JS/Java 基于逐行模式匹配和简单的赋值传播。
+# 结果只是候选路径，交给 LLM 做确认，不直接作为漏洞结论。
+
+SUPPORTED_LANGUAGES = frozenset({"python", "php", "javascript", "typescript", "java"})
+
+SEVERITY = {
+    "Command Injection": "High",
+    "Code Injection": "High",
+    "SQL Injection": "High",
+    "Insecure Deserialization": "High",
+    "Server-Side Template Injection": "High",
+    "Path Traversal": "Medium",
+    "SSRF": "Medium",
+    "XSS": "Medium",
+    "Open Redirect": "Low",
+}
+
+
+class TaintPath:
+    """一条候选污点路径：source 所在行 -> 传播步骤 -> sink 所在行"""
+
+    __slots__ = ("file", "language", "vuln_type", "source", "sink", "sink_name", "steps", "function", "via_param")
+
+    def __init__(self, file, language, vuln_type, source, sink, sink_name, steps=(), function=None,
+                 via_param=None):
+        self.file = file
+        self.language = language
+        self.vuln_type = vuln_type
+        self.source = source  # (行号, 描述)
+        self.sink = sink  # (行号, 描述)
+        self.sink_name = sink_name
+        self.steps = list(steps)  # [(行号, 变量名)]
+        self.function = function  # sink 所在函数（模块顶层为 None）
+        self.via_param = via_param  # 污点来自普通函数参数时为参数名，需要跨文件确认调用方
+
+    @property
+    def severity(self):
+        return SEVERITY.get(self.vuln_type, "Medium")
+
+    @property
+    def lines(self):
+        return sorted({self.source[0], self.sink[0], *(line for line, _ in self.steps)})
+
+    def to_dict(self):
+        return {
+            "file": self.file,
+            "language": self.language,
+            "type": self.vuln_type,
+            "severity": self.severity,
+            "source": {"line": self.source[0], "expr": self.source[1]},
+            "sink": {"line": self.sink[0], "expr": self.sink[1], "name": self.sink_name},
+            "steps": [{"line": line, "var": var} for line, var in self.steps],
+            "function": self.function,
+            "via_param": self.via_param,
+        }
+
+    def __repr__(self):
+        return f"TaintPath({self.vuln_type}, {self.source[0]} -> {self.sink[0]} {self.sink_name})"
+
+
+# ---------------------------------------------------------------- Python (AST)
+
+PY_SOURCE_ATTRS = {
+    # Flask / Werkzeug
+    "args", "form", "values", "json", "data", "cookies", "headers", "files", "get_json",
+    # Django
+    "GET", "POST", "COOKIES", "FILES", "META", "body",
+    # FastAPI / Starlette
+    "query_params", "path_params",
+}
+PY_SOURCE_CALLS = {"input", "raw_input"}
+
+# 调用名（完整或末段） -> 漏洞类型
+PY_SINKS = {
+    "os.system": "Command Injection",
+    "os.popen": "Command Injection",
+    "subprocess.call": "Command Injection",
+    "subprocess.run": "Command Injection",
+    "subprocess.Popen": "Command Injection",
+    "subprocess.check_output": "Command Injection",
+    "subprocess.check_call": "Command Injection",
+    "subprocess.getoutput": "Command Injection",
+    "commands.getoutput": "Command Injection",
+    "eval": "Code Injection",
+    "exec": "Code Injection",
+    "compile": "Code Injection",
+    "execute": "SQL Injection",
+    "executemany": "SQL Injection",
+    "executescript": "SQL Injection",
+    "raw": "SQL Injection",
+    "text": "SQL Injection",
+    "pickle.loads": "Insecure Deserialization",
+    "pickle.load": "Insecure Deserialization",
+    "cPickle.loads": "Insecure Deserialization",
+    "marshal.loads": "Insecure Deserialization",
+    "yaml.load": "Insecure Deserialization",
+    "yaml.unsafe_load": "Insecure Deserialization",
+    "render_template_string": "Server-Side Template Injection",
+    "Template": "Server-Side Template Injection",
+    "open": "Path Traversal",
+    "send_file": "Path Traversal",
+    "os.remove": "Path Traversal",
+    "os.unlink": "Path Traversal",
+    "shutil.rmtree": "Path Traversal",
+    "requests.get": "SSRF",
+    "requests.post": "SSRF",
+    "requests.request": "SSRF",
+    "urlopen": "SSRF",
+    "urllib.request.urlopen": "SSRF",
+    "redirect": "Open Redirect",
+    "Markup": "XSS",
+    "make_response": "XSS",
+    "HttpResponse": "XSS",
+    "mark_safe": "XSS",
+}
+# 只按末段匹配时过于宽泛的名字，要求有接收者（如 cursor.execute）
+PY_METHOD_ONLY_SINKS = {"execute", "executemany", "executescript", "raw", "text"}
+
+PY_SANITIZERS = {
+    "int", "float", "bool", "len", "abs",
+    "escape", "html.escape", "markupsafe.escape", "bleach.clean", "quote", "shlex.quote",
+    "pipes.quote", "secure_filename", "os.path.basename", "urllib.parse.quote", "quote_plus",
+    "sanitize", "clean", "validate", "safe_join", "uuid.UUID",
+}
+
+
+def _call_name(node):
+    """ast.Call.func -> 点分名称（无法解析时为 None）"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+    elif isinstance(node, ast.Call):
+        inner = _call_name(node.func)
+        if inner is None:
+            return None
+        parts.append(inner + "()")
+    else:
+        return None
+    return ".".join(reversed(parts))
+
+
+def _expr_text(node):
+    try:
+        return ast.unparse(node)
+    except Exception:
+        return type(node).__name__
+
+
+class _PythonFunctionTaint(ast.NodeVisitor):
+    """单个函数（或模块顶层）内的污点传播"""
+
+    def __init__(self, analyzer, params=(), function=None, param_sources=None):
+        self.analyzer = analyzer
+        self.function = function
+        # 变量名 -> (source 行号, source 表达式, 传播步骤)
+        self.tainted = {name: (line, expr, []) for name, line, expr in params}
+        # 普通函数参数作为 source 时 (行号, 表达式) -> 参数名
+        self.param_sources = param_sources or {}
+
+    def run(self, body):
+        for stmt in body:
+            self.visit(stmt)
+
+    # --- 表达式污点判定：返回 (source 行号, source 表达式, 步骤) 或 None
+    def taint_of(self, node):
+        if node is None:
+            return None
+        if isinstance(node, ast.Name):
+            return self.tainted.get(node.id)
+        if isinstance(node, ast.Attribute):
+            base = _call_name(node.value)
+            if node.attr in PY_SOURCE_ATTRS and base and base.split(".")[-1] in {"request", "req"}:
+                return (node.lineno, _expr_text(node), [])
+            if _call_name(node) == "sys.argv":
+                return (node.lineno, "sys.argv", [])
+            return self.taint_of(node.value)
+        if isinstance(node, ast.Call):
+            name = _call_name(node.func) or ""
+            short = name.split(".")[-1]
+            if name in PY_SANITIZERS or short in PY_SANITIZERS:
+                return None
+            if name in PY_SOURCE_CALLS:
+                return (node.lineno, _expr_text(node), [])
+            if isinstance(node.func, ast.Attribute):
+                receiver = self.taint_of(node.func.value)
+                if receiver:
+                    return receiver
+            for arg in list(node.args) + [kw.value for kw in node.keywords]:
+                found = self.taint_of(arg)
+                if found:
+                    return found
+            return None
+        if isinstance(node, ast.Subscript):
+            if _call_name(node.value) == "sys.argv":
+                return (node.lineno, _expr_text(node), [])
+            return self.taint_of(node.value)
+        for child in ast.iter_child_nodes(node):
+            found = self.taint_of(child)
+            if found:
+                return found
+        return None
+
+    # --- 赋值传播
+    def _assign(self, targets, value, lineno):
+        taint = self.taint_of(value)
+        for target in targets:
+            for node in ast.walk(target):
+                if isinstance(node, ast.Name):
+                    if taint:
+                        line, expr, steps = taint
+                        self.tainted[node.id] = (line, expr, steps + [(lineno, node.id)])
+                    else:
+                        self.tainted.pop(node.id, None)
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        self._assign(node.targets, node.value, node.lineno)
+
+    def visit_AnnAssign(self, node):
+        self.generic_visit(node)
+        if node.value is not None:
+            self._assign([node.target], node.value, node.lineno)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        taint = self.taint_of(node.value)
+        if taint and isinstance(node.target, ast.Name):
+            line, expr, steps = taint
+            self.tainted[node.target.id] = (line, expr, steps + [(node.lineno, node.target.id)])
+
+    # --- 分支合并：各分支从同一入口状态出发，出口取并集（任一路径被污染即视为污染）
+    def _branch(self, body, state):
+        self.tainted = dict(state)
+        self.run(body)
+        return self.tainted
+
+    @staticmethod
+    def _join(*states):
+        merged = {}
+        for state in states:
+            for name, taint in state.items():
+                merged.setdefault(name, taint)
+        return merged
+
+    def visit_If(self, node):
+        self.visit(node.test)
+        entry = self.tainted
+        self.tainted = self._join(self._branch(node.body, entry), self._branch(node.orelse, entry))
+
+    def _loop(self, node, entry):
+        """循环体可能执行零次或多次：再执行一遍以传播跨迭代的赋值，出口与入口合并后执行 else"""
+        first = self._branch(node.body, entry)
+        second = self._branch(node.body, self._join(entry, first))
+        self.tainted = self._branch(node.orelse, self._join(entry, first, second))
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        entry = self.tainted
+        self._assign([node.target], node.iter, node.lineno)
+        self._loop(node, self._join(self.tainted, entry))
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self.visit(node.test)
+        self._loop(node, self.tainted)
+
+    def visit_Try(self, node):
+        entry = self.tainted
+        body = self._branch(node.orelse, self._branch(node.body, entry))
+        # 异常可能在 try 体中任意位置抛出，except 分支从入口与 try 出口的并集开始
+        handler_entry = self._join(entry, body)
+        outs = [body] + [self._branch(handler.body, handler_entry) for handler in node.handlers]
+        self.tainted = self._join(*outs)
+        self.run(node.finalbody)
+
+    visit_TryStar = visit_Try
+
+    def visit_Match(self, node):
+        self.visit(node.subject)
+        entry = self.tainted
+        # 没有 case 匹配时保持入口状态
+        self.tainted = self._join(dict(entry), *(self._branch(case.body, entry) for case in node.cases))
+
+    def visit_withitem(self, node):
+        self.generic_visit(node)
+        if node.optional_vars is not None:
+            self._assign([node.optional_vars], node.context_expr, node.context_expr.lineno)
+
+    # 嵌套函数单独分析，避免把外层状态带入
+    def visit_FunctionDef(self, node):
+        self.analyzer.analyze_function(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self.analyzer.analyze_class(node)
+
+    def visit_Lambda(self, node):
+        return
+
+    # --- sink 检查
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        name = _call_name(node.func)
+        if not name:
+            return
+        short = name.split(".")[-1]
+        vuln_type = PY_SINKS.get(name)
+        if vuln_type is None and "." in name and short in PY_SINKS:
+            vuln_type = PY_SINKS[short]
+        if vuln_type is None and short in PY_SINKS and short not in PY_METHOD_ONLY_SINKS and "." not in name:
+            vuln_type = PY_SINKS[short]
+        if vuln_type is None:
+            return
+
+        args = list(node.args)
+        if vuln_type == "SQL Injection":
+            # 参数化查询的第二个参数不算注入
+            args = args[:1]
+        elif vuln_type == "Insecure Deserialization" and short == "load" and name.startswith("yaml"):
+            loader = next((kw.value for kw in node.keywords if kw.arg == "Loader"), None)
+            if loader is None and len(node.args) > 1:
+                loader = node.args[1]
+            if loader is not None and "Safe" in _expr_text(loader):
+                return
+        elif vuln_type == "Command Injection" and name.startswith("subprocess"):
+            shell = next((kw.value for kw in node.keywords if kw.arg == "shell"), None)
+            first = node.args[0] if node.args else None
+            if not (isinstance(shell, ast.Constant) and shell.value) and isinstance(first, (ast.List, ast.Tuple)):
+                # 列表形式且未开启 shell，只有第一个元素（程序名）被控制才危险
+                args = list(first.elts[:1])
+        else:
+            args += [kw.value for kw in node.keywords if kw.arg in (None, "url", "path", "filename", "source")]
+
+        for arg in args:
+            taint = self.taint_of(arg)
+            if taint:
+                line, expr, steps = taint
+                self.analyzer.report(vuln_type, (line, expr), (node.lineno, _expr_text(node)), name, steps,
+                                     self.function, self.param_sources.get((line, expr)))
+                return
+
+
+class PythonTaintAnalyzer:
+    """
+    track_params=True 时普通函数的参数也视为 source，得到的路径带 via_param，
+    需要结合调用方（符号索引）判断是否真的可被外部输入控制
+    """
+
+    def __init__(self, file_path, track_params=False):
+        self.file_path = file_path
+        self.track_params = track_params
+        self.paths = []
+        self._seen = set()
+        self._classes = []
+
+    def analyze(self, code):
+        tree = ast.parse(code)
+        _PythonFunctionTaint(self).run(tree.body)
+        return self.paths
+
+    def analyze_class(self, node):
+        self._classes.append(node.name)
+        try:
+            _PythonFunctionTaint(self).run(node.body)
+        finally:
+            self._classes.pop()
+
+    def analyze_function(self, node):
+        params, param_sources = [], {}
+        names = [arg.arg for arg in node.args.args + node.args.kwonlyargs if arg.arg not in ("self", "cls")]
+        if self._is_handler(node):
+            # 路由处理函数的参数来自 URL，视为 source
+            params = [(name, node.lineno, f"{node.name}({name})") for name in names if name not in ("request", "req")]
+        elif self.track_params:
+            for name in names:
+                expr = f"参数 {name}"
+                params.append((name, node.lineno, expr))
+                param_sources[(node.lineno, expr)] = name
+        function = ".".join(self._classes + [node.name])
+        _PythonFunctionTaint(self, params, function, param_sources).run(node.body)
+
+    @staticmethod
+    def _is_handler(node):
+        for decorator in node.decorator_list:
+            target = decorator.func if isinstance(decorator, ast.Call) else decorator
+            name = _call_name(target) or ""
+            if name.split(".")[-1] in ("route", "get", "post", "put", "delete", "patch", "api_view"):
+                return True
+        return False
+
+    def report(self, vuln_type, source, sink, sink_name, steps, function=None, via_param=None):
+        key = (vuln_type, source[0], sink[0])
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        self.paths.append(TaintPath(self.file_path, "python", vuln_type, source, sink, sink_name, steps,
+                                    function, via_param))
+
+
+# ------------------------------------------------- PHP / JS / Java（逐行模式）
+
+class PatternRules:
+    """一种语言的逐行规则：source、变量赋值、sink、sanitizer"""
+
+    def __init__(self, sources, assign, sinks, sanitizers, comment):
+        self.sources = re.compile(sources)
+        self.assign = re.compile(assign)
+        self.sinks = [(re.compile(pattern), vuln_type) for pattern, vuln_type in sinks]
+        self.sanitizers = re.compile(sanitizers)
+        self.comment = re.compile(comment)
+
+
+PHP_RULES = PatternRules(
+    sources=r"\$_(GET|POST|REQUEST|COOKIE|FILES|SERVER)\b|php://input|getenv\(",
+    assign=r"^\s*(\$\w+)\s*(?:\.?=)(?!=)\s*(.+)",
+    sinks=[
+        (r"\b(mysqli?_query|pg_query|sqlite_query)\s*\(|->\s*(query|exec|prepare)\s*\(", "SQL Injection"),
+        (r"\b(system|exec|shell_exec|passthru|popen|proc_open|pcntl_exec)\s*\(|`", "Command Injection"),
+        (r"\b(eval|assert|create_function|preg_replace)\s*\(", "Code Injection"),
+        (r"\b(include|require)(_once)?\b|\b(file_get_contents|fopen|readfile|unlink|file)\s*\(", "Path Traversal"),
+        (r"\bunserialize\s*\(", "Insecure Deserialization"),
+        (r"\b(curl_setopt|fsockopen)\s*\(", "SSRF"),
+        (r"(^|[;{}]|<\?php)\s*(echo|print)\b|<\?=", "XSS"),
+        (r"header\s*\(\s*['\"]Location", "Open Redirect"),
+    ],
+    sanitizers=r"\b(htmlspecialchars|htmlentities|intval|floatval|(int)|mysqli_real_escape_string|"
+               r"addslashes|escapeshellarg|escapeshellcmd|basename|filter_var|strip_tags|is_numeric)\b",
+    comment=r"^\s*(//|#|\*|/\*)",
+)
+
+JS_RULES = PatternRules(
+    sources=r"\breq(uest)?\.(query|body|params|cookies|headers)\b|\blocation\.(search|hash|href)\b|"
+            r"\bdocument\.(URL|cookie|referrer)\b|\bprocess\.argv\b",
+    assign=r"^\s*(?:const|let|var)?\s*\{?\s*([A-Za-z_$][\w$]*)[^=]*?\}?\s*(?<![=!<>])=(?!=)\s*(.+)",
+    sinks=[
+        (r"\.(query|raw)\s*\(|\bsequelize\.query\s*\(", "SQL Injection"),
+        (r"\b(exec|execSync|spawn|spawnSync|execFile)\s*\(", "Command Injection"),
+        (r"\beval\s*\(|\bnew\s+Function\s*\(|\bsetTimeout\s*\(\s*[^,()]*\+|\bvm\.run", "Code Injection"),
+        (r"\.innerHTML\s*=|\.outerHTML\s*=|document\.write\s*\(|\bres\.send\s*\(|dangerouslySetInnerHTML", "XSS"),
+        (r"\bfs\.(readFile|readFileSync|createReadStream|unlink|writeFile)\w*\s*\(|\bres\.sendFile\s*\(", "Path Traversal"),
+        (r"\b(axios\.\w+|fetch|http\.get|request)\s*\(", "SSRF"),
+        (r"\bres\.redirect\s*\(", "Open Redirect"),
+        (r"\bunserialize\s*\(|\bdeserialize\s*\(", "Insecure Deserialization"),
+    ],
+    sanitizers=r"\b(escape|escapeHtml|encodeURIComponent|parseInt|parseFloat|Number|sanitize\w*|DOMPurify|"
+               r"validator\.\w+|path\.basename|xss\()\b",
+    comment=r"^\s*(//|\*|/\*)",
+)
+
+JAVA_RULES = PatternRules(
+    sources=r"\.(getParameter|getParameterValues|getHeader|getQueryString|getCookies|getInputStream|getReader)\s*\(|"
+            r"@(RequestParam|PathVariable|RequestBody|RequestHeader)\b",
+    assign=r"^\s*(?:final\s+)?(?:[\w<>\[\],\s]+\s+)?([A-Za-z_]\w*)\s*(?<![=!<>])=(?!=)\s*(.+)",
+    sinks=[
+        (r"\.(executeQuery|executeUpdate|execute|addBatch)\s*\(|createQuery\s*\(|createNativeQuery\s*\(", "SQL Injection"),
+        (r"Runtime\.getRuntime\(\)\.exec\s*\(|new\s+ProcessBuilder\s*\(", "Command Injection"),
+        (r"new\s+ObjectInputStream\s*\(|\.readObject\s*\(|XMLDecoder|JSON\.parseObject\s*\(", "Insecure Deserialization"),
+        (r"new\s+File(InputStream|OutputStream|Reader)?\s*\(|Paths\.get\s*\(", "Path Traversal"),
+        (r"getWriter\(\)\.(print|println|write)\s*\(", "XSS"),
+        (r"new\s+URL\s*\(|RestTemplate|HttpClient", "SSRF"),
+        (r"sendRedirect\s*\(", "Open Redirect"),
+        (r"ScriptEngine|\.eval\s*\(|SpelExpressionParser|parseExpression\s*\(", "Code Injection"),
+    ],
+    sanitizers=r"\b(Integer\.parseInt|Long\.parseLong|ESAPI\.\w+|StringEscapeUtils\.\w+|HtmlUtils\.htmlEscape|"
+               r"Encode\.\w+|FilenameUtils\.getName|setString|setInt)\b",
+    comment=r"^\s*(//|\*|/\*)",
+)
+
+PATTERN_RULES = {"php": PHP_RULES, "javascript": JS_RULES, "typescript": JS_RULES, "java": JAVA_RULES}
+
+_IDENT = {
+    "php": re.compile(r"\$\w+"),
+    "javascript": re.compile(r"[A-Za-z_$][\w$]*"),
+    "typescript": re.compile(r"[A-Za-z_$][\w$]*"),
+    "java": re.compile(r"[A-Za-z_]\w*"),
+}
+
+
+_STRING_LITERAL = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`')
+
+
+def _strip_literal(match):
+    text = match.group(0)
+    if text[0] == "'":
+        return "''"
+    # 双引号（PHP 内插变量）和反引号模板（JS ${...}）中的变量保留
+    inner = re.findall(r"\$\w+", text) if text[0] == '"' else re.findall(r"\$\{([^}]*)\}", text)
+    return text[0] + " ".join(inner) + text[0]
+
+
+def _strip_strings(line):
+    """去掉字符串字面量内容，避免把引号里的文字当作变量名"""
+    return _STRING_LITERAL.sub(_strip_literal, line)
+
+
+def _pattern_analyze(code, language, file_path):
+    rules = PATTERN_RULES[language]
+    ident = _IDENT[language]
+    tainted = {}  # 变量名 -> (source 行号, source 表达式, 步骤)
+    # 逐行分析没有控制流：按花括号记录代码块，变量被污染时所在的块栈；
+    # 只有在同一块或外层块中重新赋值为干净值才清除污点，if/else、try/catch 等分支中的赋值取并集
+    blocks, scopes = [], {}
+    block_ids = itertools.count()
+    paths = []
+    seen = set()
+
+    for number, raw in enumerate(code.splitlines(), 1):
+        if rules.comment.match(raw):
+            continue
+        line = _strip_strings(raw)
+        stripped = line.lstrip()
+        closing = len(stripped) - len(stripped.lstrip("}"))
+        del blocks[max(0, len(blocks) - closing):]
+        names = set(ident.findall(line))
+
+        direct = rules.sources.search(raw)
+        taint = (number, direct.group(0), []) if direct else None
+        if taint is None:
+            for name in names:
+                if name in tainted:
+                    taint = tainted[name]
+                    break
+        sanitized = bool(rules.sanitizers.search(raw))
+
+        assign = rules.assign.match(line)
+        if assign:
+            target, value = assign.group(1), assign.group(2)
+            value_names = set(ident.findall(value))
+            value_taint = (number, direct.group(0), []) if direct else next(
+                (tainted[n] for n in value_names if n in tainted and n != target), None)
+            if value_taint and not sanitized:
+                src_line, expr, steps = value_taint
+                tainted[target] = (src_line, expr, steps + [(number, target)])
+                scopes[target] = tuple(blocks)
+            elif not (value_taint is None and target in value_names):
+                # 重新赋值为干净值（x = x . "a" 这类自引用保持原状态）；在内层分支中赋值时保留污点
+                if scopes.get(target, ())[:len(blocks)] == tuple(blocks):
+                    tainted.pop(target, None)
+
+        for char in stripped[closing:]:
+            if char == "{":
+                blocks.append(next(block_ids))
+            elif char == "}" and blocks:
+                blocks.pop()
+
+        if taint is None or sanitized:
+            continue
+        for pattern, vuln_type in rules.sinks:
+            match = pattern.search(raw)
+            if not match:
+                continue
+            # 污点必须出现在 sink 之后（参数位置），赋值语句的左侧不算
+            tail = _strip_strings(raw[match.start():])
+            if not (direct and direct.start() >= match.start()) and not any(
+                    name in tainted for name in ident.findall(tail)):
+                continue
+            key = (vuln_type, number)
+            if key in seen:
+                break
+            seen.add(key)
+            src_line, expr, steps = taint
+            paths.append(TaintPath(file_path, language, vuln_type, (src_line, expr),
+                                   (number, raw.strip()), match.group(0).strip(), steps))
+            break
+    return paths
+
+
+def find_taint_paths(code, language, file_path="", track_params=False):
+    """
+    返回候选 TaintPath 列表；语言不支持或代码无法解析时返回 None，调用方应回退到完整 LLM 分析。
+    track_params 只对 Python 生效，见 PythonTaintAnalyzer。
+    """
+    if language == "python":
+        try:
+            return PythonTaintAnalyzer(file_path, track_params).analyze(code)
+        except SyntaxError:
+            return None
+    if language in PATTERN_RULES:
+        return _pattern_analyze(code, language, file_path)
+    return None
@@ -0,0 +1,237 @@
+"""
+单文件审计流程
+静态分析（Bandit）+ LLM 深度分析 + 结果合并，不依赖 API 进程的任务状态：
+API 进程内的后台任务和分布式 Worker 都调用 audit_file，再各自回写结果
+"""
+
+import json
+import logging
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import Config
+from sandbox import SecureSandbox
+from llm_engine import LLMAuditEngine
+from verdict_index import VerdictIndex
+from source_loader import read_source
+from cancellation import CancelToken
+from issue_model import Issue, Source, severity_counts, sort_issues
+
+logger = logging.getLogger(__name__)
+
+
+def run_bandit(sandbox_path: Path, token: CancelToken) -> Tuple[Any, List[Dict]]:
+    """
+    运行 Bandit 进行 Python 代码分析
+
+    Returns:
+        (原始输出, 问题列表)；原始输出为解析后的 Bandit JSON 对象（不再保存美化后的文本），出错时为错误信息
+    """
+    static_output = ""
+    static_issues = []
+    try:
+        logger.info(f"运行 Bandit 分析...")
+        
+        # 构建 bandit 命令
+        bandit_cmd = [
+            "bandit",
+            "-r", str(sandbox_path),
+            "-f", "json",
+            "-ll",  # 输出级别：低
+            "-ii",  # 忽略 info 级别的问题
+        ]
+        
+        # 执行命令（任务取消时立即终止）
+        bandit_result = token.run(
+            bandit_cmd,
+            timeout=120  # 2分钟超时
+        )
+        
+        logger.info(f"Bandit 返回码: {bandit_result.returncode}")
+        
+        # 处理结果
+        if bandit_result.returncode in [0, 1]:  # 0=成功，1=发现问题
+            if bandit_result.stdout.strip():
+                try:
+                    bandit_output = json.loads(bandit_result.stdout)
+                    static_output = bandit_output
+                    
+                    # 解析 Bandit 结果
+                    if "results" in bandit_output:
+                        for issue in bandit_output["results"]:
+                            static_issues.append({
+                                "tool": "bandit",
+                                "severity": issue.get("issue_severity", "medium").lower(),
+                                "confidence": issue.get("issue_confidence", "medium"),
+                                "category": issue.get("test_name", "Unknown"),
+                                "line": issue.get("line_number", 0),
+                                "description": issue.get("issue_text", ""),
+                                "suggestion": issue.get("more_info", ""),
+                                "file": issue.get("filename", "").replace(str(sandbox_path), "").lstrip("/")
+                            })
+                        logger.info(f"Bandit 发现 {len(static_issues)} 个问题")
+                    else:
+                        logger.info("Bandit 未发现安全问题")
+                        
+                except json.JSONDecodeError as e:
+                    logger.error(f"解析 Bandit JSON 失败: {e}")
+                    static_output = f"解析 Bandit 输出失败: {e}\n原始输出:\n{bandit_result.stdout}"
+            else:
+                logger.warning("Bandit 无输出")
+        else:
+            error_msg = f"Bandit 执行失败: {bandit_result.stderr}"
+            logger.error(error_msg)
+            static_output = error_msg
+            
+    except subprocess.TimeoutExpired:
+        error_msg = "Bandit 分析超时（120秒）"
+        logger.error(error_msg)
+        static_output = error_msg
+    except Exception as e:
+        error_msg = f"Bandit 分析异常: {e}"
+        logger.error(error_msg)
+        static_output = error_msg
+    return static_output, static_issues
+
+
+def merge_issues(static_issues: List[Dict], llm_issues: List[Dict]) -> Tuple[List[Issue], int]:
+    """
+    合并静态分析与 LLM 分析的问题，按行号+描述去重并按严重性排序
+
+    Returns:
+        (合并后的问题列表, 新增的 LLM 问题数)
+    """
+    # 添加静态分析问题
+    all_issues = [Issue.from_dict(issue, Source.STATIC) for issue in static_issues]
+    seen = {issue.dedup_key for issue in all_issues}
+    
+    # 添加 LLM 分析问题，避免重复问题（基于行号和描述）
+    llm_issues_count = 0
+    for data in llm_issues:
+        issue = Issue.from_dict(data, Source.LLM)
+        if issue.dedup_key in seen:
+            continue
+        seen.add(issue.dedup_key)
+        all_issues.append(issue)
+        llm_issues_count += 1
+    
+    # 按严重性排序（high > medium > low）
+    sort_issues(all_issues)
+    return all_issues, llm_issues_count
+
+
+def audit_file(
+    task_id: str,
+    file_path: str,
+    language: str,
+    sandbox: SecureSandbox,
+    token: CancelToken,
+    verdicts: Optional[VerdictIndex] = None
+) -> Dict:
+    """
+    审计单个文件
+    1. 静态分析（Bandit/Semgrep）
+    2. LLM 深度分析
+    3. 合并结果
+
+    各阶段之间检查取消令牌，取消时抛出 TaskCancelled
+
+    Returns:
+        需要写回任务的字段：static_analysis_output / llm_result / issues / summary / statistics / completion_time
+    """
+    # 1. 复制文件到沙箱
+    sandbox.copy_to_sandbox(task_id, file_path)
+    sandbox_path = sandbox.get_sandbox_path(task_id)
+    
+    try:
+        # 2. 运行静态分析工具
+        static_output = ""
+        static_issues = []
+        if language.lower() == "python":
+            static_output, static_issues = run_bandit(sandbox_path, token)
+        
+        # 3. 读取代码内容用于 LLM 分析
+        try:
+            # 自动识别 BOM/UTF-8/GBK/Latin-1，避免非 UTF-8 源码读取失败
+            code_content, encoding = read_source(file_path)
+            logger.info(f"源码编码: {encoding}")
+            logger.info(f"读取代码内容成功，长度: {len(code_content)} 字符")
+        except Exception as e:
+            logger.error(f"读取代码文件失败: {e}")
+            code_content = f"# 读取文件失败: {e}"
+        
+        # 4. LLM 深度分析
+        token.check()
+        logger.info("开始 LLM 深度分析...")
+        
+        # 准备静态分析结果供 LLM 参考
+        static_results_summary = None
+        if static_issues:
+            static_results_summary = {
+                "tool": "bandit",
+                "issue_count": len(static_issues),
+                "issues": static_issues,  # 由提示词预算按相关性筛选
+                "summary": f"静态分析发现 {len(static_issues)} 个问题"
+            }
+        
+        # 创建 LLM 引擎实例
+        llm_engine = LLMAuditEngine(
+            model=Config.OPENAI_MODEL,
+            triage_model=Config.OPENAI_TRIAGE_MODEL,
+            chunk_tokens=Config.TRIAGE_CHUNK_TOKENS,
+            verdicts=verdicts,
+            cancel_token=token
+        )
+        
+        # 运行 LLM 分析
+        llm_result = llm_engine.analyze_code(
+            code=code_content,
+            language=language,
+            static_analysis_results=static_results_summary
+        )
+        
+        # 5. 合并结果
+        all_issues, llm_issues_count = merge_issues(static_issues, llm_result.get("issues", []))
+        
+        # 6. 生成统计信息
+        severity_stats = severity_counts(all_issues)
+        
+        total_issues = len(all_issues)
+        token.check()
+        
+        logger.info(f"""
+        审计任务 {task_id} 完成!
+        总计发现 {total_issues} 个安全问题:
+          - 高危: {severity_stats['high']}
+          - 中危: {severity_stats['medium']}
+          - 低危: {severity_stats['low']}
+          - 静态分析: {len(static_issues)} 个
+          - LLM分析: {llm_issues_count} 个
+        """)
+        
+        return {
+            "static_analysis_output": static_output,
+            "llm_result": llm_result,
+            "issues": all_issues,
+            "summary": llm_result.get("summary", f"审计完成，发现 {total_issues} 个安全问题"),
+            "statistics": {
+                "total_issues": total_issues,
+                "severity_distribution": severity_stats,
+                "static_issues": len(static_issues),
+                "llm_issues": llm_issues_count,
+                "unique_issues": total_issues,  # 去重后的问题数
+                "llm_tiers": llm_result.get("tiers", {}),  # 分层分析各层调用次数与 Token 用量
+                "llm_usage": llm_result.get("usage") or None,  # 本次分析的 Token 合计，未知（调用失败等）时为 None
+                "verdict_reuse": llm_result.get("dedup", {})  # 复用历史结论的函数数
+            },
+            "completion_time": datetime.now().isoformat()
+        }
+    finally:
+        # 7. 清理沙箱
+        try:
+            sandbox.cleanup(task_id)
+            logger.info(f"已清理沙箱 {task_id}")
+        except Exception as e:
+            logger.warning(f"清理沙箱时出错: {e}")
@@ -0,0 +1,152 @@
+"""
+批量上传与批量结果
+CI 流水线每次提交大量变更文件，逐个上传、逐个轮询开销很大：
+- 一次请求上传多个文件（multipart 多个 files 字段，或 JSON 清单内联源码），创建一个批次和每个文件的子任务，
+  子任务一次性进入同一租户的调度队列，共享函数级结论复用索引
+- 批量结果以 NDJSON 流式返回：子任务结束时立即输出一行结果，全部结束后输出批次汇总
+"""
+
+import json
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from issue_model import dumps
+from task_watch import TaskWatch
+
+# 扩展名 -> 语言（未指定语言时按扩展名推断）
+EXTENSION_LANGUAGES = {
+    ".py": "python",
+    ".java": "java",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".go": "go",
+    ".php": "php",
+    ".rb": "ruby",
+    ".cs": "csharp",
+}
+ALLOWED_EXTENSIONS = list(EXTENSION_LANGUAGES)
+SUPPORTED_LANGUAGES = list(EXTENSION_LANGUAGES.values())
+
+# 子任务不再变化的状态
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+# 流式结果在没有子任务结束时的最长等待（秒），之后重新检查一遍（子任务被删除、客户端断开等）
+STREAM_POLL_INTERVAL = 30.0
+
+
+class BatchItem:
+    """批次中的一个文件"""
+    __slots__ = ("filename", "language", "content")
+
+    def __init__(self, filename: str, language: Optional[str], content: bytes):
+        self.filename = filename
+        self.language = language
+        self.content = content
+
+
+def infer_language(filename: str) -> Optional[str]:
+    """按扩展名推断语言，不支持的扩展名返回 None"""
+    return EXTENSION_LANGUAGES.get(PurePosixPath(filename).suffix.lower())
+
+
+def safe_name(filename: str) -> str:
+    """清单中的文件名可带目录（CI 中的相对路径），落盘时只取文件名部分"""
+    return PurePosixPath(filename.replace("\\", "/")).name
+
+
+def parse_manifest(text: str) -> List[BatchItem]:
+    """
+    解析 JSON 清单：[{"filename": "src/app.py", "language": "python", "content": "..."}]，
+    也接受 {"files": [...]}；filename 可写作 path，language 可省略
+
+    Raises:
+        ValueError: 清单格式错误
+    """
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ValueError(f"清单不是有效的 JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("files")
+    if not isinstance(data, list):
+        raise ValueError("清单应为文件数组或 {\"files\": [...]}")
+
+    items = []
+    for i, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            raise ValueError(f"清单第 {i + 1} 项不是对象")
+        filename = entry.get("filename") or entry.get("path")
+        content = entry.get("content")
+        if not isinstance(filename, str) or not safe_name(filename):
+            raise ValueError(f"清单第 {i + 1} 项缺少 filename")
+        if not isinstance(content, str):
+            raise ValueError(f"清单第 {i + 1} 项（{filename}）缺少 content")
+        language = entry.get("language")
+        items.append(BatchItem(filename, language.lower() if isinstance(language, str) else None,
+                               content.encode("utf-8")))
+    return items
+
+
+def check_item(item: BatchItem, default_language: Optional[str] = None) -> Optional[str]:
+    """
+    校验并补全语言，返回不能审计的原因（可审计时返回 None）
+    """
+    if PurePosixPath(item.filename).suffix.lower() not in EXTENSION_LANGUAGES:
+        return "不支持的文件类型"
+    item.language = item.language or infer_language(item.filename) or default_language
+    if item.language not in SUPPORTED_LANGUAGES:
+        return f"不支持的语言: {item.language}"
+    return None
+
+
+def batch_key(batch_id: str) -> str:
+    """批次在 TaskWatch 中的版本键：任一子任务结束或被删除时递增"""
+    return f"batch:{batch_id}"
+
+
+def batch_counts(task_ids: List[str], lookup: Callable[[str], Optional[Dict]]) -> Dict[str, int]:
+    """按状态统计子任务数（已删除的子任务计为 deleted）"""
+    counts: Dict[str, int] = {}
+    for task_id in task_ids:
+        task = lookup(task_id)
+        status = task["status"] if task else "deleted"
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+async def stream_results(
+    batch_id: str,
+    task_ids: List[str],
+    lookup: Callable[[str], Optional[Dict]],
+    render: Callable[[Dict], Dict],
+    watch: TaskWatch,
+    poll_interval: float = STREAM_POLL_INTERVAL
+) -> AsyncIterator[bytes]:
+    """
+    按子任务结束的先后输出 NDJSON：每个子任务一行 {"type": "result", ...render(task)}，
+    已删除的子任务输出 {"type": "result", "task_id": ..., "status": "deleted"}，
+    最后一行为 {"type": "summary", "batch_id": ..., "counts": {...}}
+
+    Args:
+        lookup: 按任务 ID 取任务（不存在返回 None）
+        render: 任务 -> 结果内容（与单任务结果接口一致）
+    """
+    key = batch_key(batch_id)
+    pending = list(task_ids)
+    while pending:
+        # 先取版本再检查：检查期间结束的子任务会让下面的等待立即返回
+        version = watch.version(key)
+        remaining = []
+        for task_id in pending:
+            task = lookup(task_id)
+            if task is None:
+                yield dumps({"type": "result", "task_id": task_id, "status": "deleted"}) + b"\n"
+            elif task["status"] in TERMINAL_STATUSES:
+                yield dumps({"type": "result", **render(task)}) + b"\n"
+            else:
+                remaining.append(task_id)
+        pending = remaining
+        if pending:
+            await watch.wait(key, version, poll_interval)
+    yield dumps({"type": "summary", "batch_id": batch_id, "counts": batch_counts(task_ids, lookup)}) + b"\n"
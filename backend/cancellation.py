@@ -0,0 +1,139 @@
+"""
+任务取消与超时
+每个审计任务持有一个 CancelToken，在静态扫描、LLM 调用等阶段之间传递：
+用户取消或超过时间预算时，立即终止正在运行的子进程、关闭进行中的 HTTP 连接，
+并在下一个检查点抛出 TaskCancelled 让任务退出
+"""
+
+import time
+import logging
+import threading
+import subprocess
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(BaseException):
+    """
+    任务已取消或超时
+
+    与 asyncio.CancelledError 一样继承 BaseException，
+    不会被各阶段兜底的 except Exception 吞掉
+    """
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """线程安全的取消令牌，可附带墙钟时间预算"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._timer: Optional[threading.Timer] = None
+        self.reason: Optional[str] = None
+        self.deadline: Optional[float] = None
+
+    def start_budget(self, seconds: Optional[float]):
+        """开始计时，超过 seconds 秒后以 timeout 原因取消（None 或 <= 0 表示不限时）"""
+        if not seconds or seconds <= 0:
+            return
+        self.deadline = time.monotonic() + seconds
+        self._timer = threading.Timer(seconds, self.cancel, args=("timeout",))
+        self._timer.daemon = True
+        self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        取消任务并执行已注册的回调（终止子进程、关闭连接等）
+
+        Returns:
+            是否为首次取消
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if self._timer is not None:
+            self._timer.cancel()
+        logger.info(f"任务取消: {reason}，终止 {len(callbacks)} 个进行中的操作")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"取消回调执行失败: {e}")
+        return True
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        注册取消回调；已取消时立即执行
+
+        Returns:
+            注销函数，操作正常结束后调用
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        """检查点：已取消时抛出 TaskCancelled"""
+        if self._event.is_set():
+            raise TaskCancelled(self.reason)
+
+    def remaining(self) -> Optional[float]:
+        """剩余时间预算（秒），不限时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def timeout(self, default: float) -> float:
+        """单个操作的超时：不超过剩余时间预算"""
+        remaining = self.remaining()
+        return default if remaining is None else max(0.1, min(default, remaining))
+
+    def run(self, cmd: List[str], timeout: float, **kwargs) -> subprocess.CompletedProcess:
+        """
+        可取消的 subprocess.run（固定 capture_output=True, text=True）
+
+        取消时立即 kill 子进程并抛出 TaskCancelled；超时行为与 subprocess.run 一致
+        """
+        self.check()
+        timeout = self.timeout(timeout)
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs)
+        unregister = self.on_cancel(process.kill)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            self.check()
+            raise
+        finally:
+            unregister()
+        self.check()
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def close(self):
+        """任务结束后停止计时器并丢弃回调"""
+        if self._timer is not None:
+            self._timer.cancel()
+        with self._lock:
+            self._callbacks = []
@@ -15,11 +15,57 @@ class Config:
     # OpenAI配置
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4")
+    # 分层分析的初筛小模型（如 gpt-4o-mini），默认关闭：所有代码直接交给 OPENAI_MODEL 整体分析。
+    # 开启后代码按块初筛、只升级可疑块，成本更低，但块之间的上下文不再一起分析
+    OPENAI_TRIAGE_MODEL = os.getenv("OPENAI_TRIAGE_MODEL", "")
+    TRIAGE_CHUNK_TOKENS = int(os.getenv("TRIAGE_CHUNK_TOKENS", 1500))
+
+    # 单个审计任务的墙钟时间预算（秒），超时自动取消；0 表示不限时
+    TASK_TIMEOUT = float(os.getenv("TASK_TIMEOUT", 600))
     
     # 文件上传配置
     MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # 10MB
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
-    
+    # 批量上传（POST /api/audit/batch）单个批次的文件数上限
+    MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 500))
+
+    # 存储清理配置（上传目录 + 沙箱目录合计）
+    STORAGE_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", 2048))
+    STORAGE_MAX_AGE_HOURS = float(os.getenv("STORAGE_MAX_AGE_HOURS", 24))
+    JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", 300))  # 秒
+    JANITOR_BATCH_SIZE = int(os.getenv("JANITOR_BATCH_SIZE", 50))
+
+    # 历史漏洞检索索引（SQLite FTS5）
+    FINDINGS_DB_PATH = os.getenv("FINDINGS_DB_PATH", "findings.db")
+
+    # 函数级结论复用（MinHash 近重复索引），相似度阈值设为 1.0 时只复用归一化后完全相同的函数
+    VERDICT_DB_PATH = os.getenv("VERDICT_DB_PATH", "verdicts.db")
+    VERDICT_SIMILARITY = float(os.getenv("VERDICT_SIMILARITY", 0.9))
+
+    # 分布式执行：设置任务队列地址后，上传的文件投递到队列由 Worker（worker.py）执行
+    # redis://host:6379/0 为 Redis；memory:// 在 API 进程内启动 WORKER_CONCURRENCY 个 Worker；留空则直接在 API 进程内审计
+    AUDIT_BROKER_URL = os.getenv("AUDIT_BROKER_URL", "")
+    JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", 120))  # 租约时长（秒），Worker 失联后任务重新投递
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))
+
+    # 多租户公平调度：同时执行的审计任务总数（分布式时为已投递给 Worker 未完成的任务数，应与 Worker 总并发一致）
+    MAX_CONCURRENT_AUDITS = int(os.getenv("MAX_CONCURRENT_AUDITS", 4))
+    # 租户 API Key（JSON）：{"key": {"tenant": "team-a", "weight": 2, "max_concurrent": 2, "tokens_per_minute": 200000}}
+    # 未配置时按 X-Tenant-ID 请求头区分租户，均使用下面的默认配额（0 表示不限）
+    AUDIT_TENANTS = os.getenv("AUDIT_TENANTS", "")
+    TENANT_MAX_CONCURRENT = int(os.getenv("TENANT_MAX_CONCURRENT", 0))
+    TENANT_TOKENS_PER_MINUTE = int(os.getenv("TENANT_TOKENS_PER_MINUTE", 0))
+
+    # 结果接口长轮询（?wait=N）的最长挂起时间（秒）
+    LONG_POLL_MAX = float(os.getenv("LONG_POLL_MAX", 60))
+
+    # 已完成任务的原始工具输出（Bandit JSON、LLM 原始结果）冷存储目录，随任务删除，不参与存储清理的过期/配额回收
+    COLD_STORAGE_DIR = os.getenv("COLD_STORAGE_DIR", "cold_results")
+
+    # 未结束任务日志（SQLite）：关闭时保留这些任务的上传文件，重启后重新排队
+    TASK_JOURNAL_PATH = os.getenv("TASK_JOURNAL_PATH", "tasks.db")
+
     # 数据库配置
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./audit_results.db")
     
@@ -31,9 +77,10 @@ class Config:
         print("=" * 50)
         print(f"端口: {cls.PORT}")
         print(f"OpenAI API Key: {'已设置' if cls.OPENAI_API_KEY else '未设置'}")
-        print(f"模型: {cls.OPENAI_MODEL}")
+        print(f"模型: {cls.OPENAI_MODEL} (初筛: {cls.OPENAI_TRIAGE_MODEL or '关闭'})")
         print(f"上传目录: {cls.UPLOAD_DIR}")
         print(f"最大文件大小: {cls.MAX_FILE_SIZE / 1024 / 1024} MB")
+        print(f"存储配额: {cls.STORAGE_QUOTA_MB} MB (过期时间 {cls.STORAGE_MAX_AGE_HOURS} 小时)")
         print("=" * 50)
 
 if __name__ == "__main__":
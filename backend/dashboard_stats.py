@@ -0,0 +1,181 @@
+"""
+仪表盘统计模块
+任务完成时增量更新按天聚合的统计表，仪表盘接口只读取聚合结果，
+查询开销只与时间窗口内的天数有关，与历史任务数量无关
+"""
+
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+# 按天聚合的维度
+DIMENSIONS = ("severity", "category", "language", "source")
+
+
+class DayBucket:
+    """单日聚合"""
+
+    __slots__ = ("tasks", "failed", "vulns", "counters", "category_severity")
+
+    def __init__(self):
+        self.tasks = 0
+        self.failed = 0
+        self.vulns = 0
+        self.counters: Dict[str, Counter] = {dim: Counter() for dim in DIMENSIONS}
+        # 每个漏洞类型下各严重级别的数量，用于给类型着色
+        self.category_severity: Dict[str, Counter] = {}
+
+
+class DashboardAggregates:
+    """仪表盘增量聚合（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: Dict[str, DayBucket] = {}
+        # task_id -> 记录时的增量，删除任务时据此回退
+        self._recorded: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _day_of(task: Dict) -> str:
+        timestamp = task.get("completion_time") or task.get("upload_time") or datetime.now().isoformat()
+        return timestamp[:10]
+
+    @staticmethod
+    def _contribution(task: Dict) -> Dict:
+        """计算一个任务对聚合表的贡献"""
+        counters = {dim: Counter() for dim in DIMENSIONS}
+        category_severity: Dict[str, Counter] = {}
+        language = str(task.get("language") or "unknown").lower()
+        issues = task.get("issues") or []
+        for issue in issues:
+            severity = str(issue.get("severity") or "unknown").lower()
+            category = str(issue.get("category") or "Unknown")
+            counters["severity"][severity] += 1
+            counters["category"][category] += 1
+            counters["language"][language] += 1
+            counters["source"][str(issue.get("source") or "unknown")] += 1
+            category_severity.setdefault(category, Counter())[severity] += 1
+        return {
+            "failed": 1 if task.get("status") == "failed" else 0,
+            "vulns": len(issues),
+            "counters": counters,
+            "category_severity": category_severity,
+        }
+
+    def _apply(self, day: str, contrib: Dict, sign: int):
+        bucket = self._days.get(day)
+        if bucket is None:
+            bucket = self._days[day] = DayBucket()
+        bucket.tasks += sign
+        bucket.failed += sign * contrib["failed"]
+        bucket.vulns += sign * contrib["vulns"]
+        for dim, counter in contrib["counters"].items():
+            target = bucket.counters[dim]
+            for key, value in counter.items():
+                target[key] += sign * value
+                if target[key] <= 0:
+                    del target[key]
+        for category, counter in contrib["category_severity"].items():
+            target = bucket.category_severity.setdefault(category, Counter())
+            for key, value in counter.items():
+                target[key] += sign * value
+                if target[key] <= 0:
+                    del target[key]
+            if not target:
+                del bucket.category_severity[category]
+        if bucket.tasks <= 0:
+            del self._days[day]
+
+    def record_task(self, task: Dict):
+        """
+        任务结束（完成或失败）时记录；重复调用会先回退旧的贡献
+
+        Args:
+            task: 任务字典
+        """
+        day = self._day_of(task)
+        contrib = self._contribution(task)
+        with self._lock:
+            old = self._recorded.pop(task["task_id"], None)
+            if old:
+                self._apply(old["day"], old["contrib"], -1)
+            self._apply(day, contrib, 1)
+            self._recorded[task["task_id"]] = {"day": day, "contrib": contrib}
+
+    def discard_task(self, task_id: str):
+        """删除任务时回退其贡献"""
+        with self._lock:
+            old = self._recorded.pop(task_id, None)
+            if old:
+                self._apply(old["day"], old["contrib"], -1)
+
+    def _window(self, days: int, end: Optional[date] = None) -> List[str]:
+        end = end or date.today()
+        return [(end - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+
+    def trend(self, days: int = 7, end: Optional[date] = None) -> Dict:
+        """
+        近 N 天的任务数与漏洞数（TrendChart 使用）
+
+        Returns:
+            {"dates": [...], "tasks": [...], "vulns": [...], "failed": [...]}
+        """
+        dates = self._window(days, end)
+        with self._lock:
+            buckets = [self._days.get(d) for d in dates]
+            return {
+                "dates": dates,
+                "tasks": [b.tasks if b else 0 for b in buckets],
+                "vulns": [b.vulns if b else 0 for b in buckets],
+                "failed": [b.failed if b else 0 for b in buckets],
+            }
+
+    def distribution(self, days: int = 30, end: Optional[date] = None) -> Dict:
+        """
+        时间窗口内按严重级别/漏洞类型/语言/来源的合计
+
+        Returns:
+            {"tasks": n, "vulns": n, "severity": {...}, "category": {...}, ...}
+        """
+        totals = {dim: Counter() for dim in DIMENSIONS}
+        tasks = 0
+        vulns = 0
+        with self._lock:
+            for d in self._window(days, end):
+                bucket = self._days.get(d)
+                if not bucket:
+                    continue
+                tasks += bucket.tasks
+                vulns += bucket.vulns
+                for dim in DIMENSIONS:
+                    totals[dim].update(bucket.counters[dim])
+        result = {"tasks": tasks, "vulns": vulns}
+        result.update({dim: dict(counter.most_common()) for dim, counter in totals.items()})
+        return result
+
+    def vulnerability_types(self, days: int = 30, top: int = 10, end: Optional[date] = None) -> List[Dict]:
+        """
+        漏洞类型分布（VulnerabilityChart 使用），severity 取该类型中数量最多的级别
+
+        Returns:
+            [{"name": 类型, "value": 数量, "severity": 级别}, ...]
+        """
+        per_category: Dict[str, Counter] = {}
+        with self._lock:
+            for d in self._window(days, end):
+                bucket = self._days.get(d)
+                if not bucket:
+                    continue
+                for category, counter in bucket.category_severity.items():
+                    per_category.setdefault(category, Counter()).update(counter)
+        items = [
+            {
+                "name": category,
+                "value": sum(counter.values()),
+                "severity": counter.most_common(1)[0][0],
+            }
+            for category, counter in per_category.items()
+        ]
+        items.sort(key=lambda item: item["value"], reverse=True)
+        return items[:top]
@@ -0,0 +1,130 @@
+"""
+快速 JSON 响应
+- ORJSONResponse: 使用 orjson 渲染（可直接包含 Issue / 压缩后的问题列表），作为应用默认响应类
+- EncodedBody: 已完成（不再变化）的任务结果只序列化一次，只保存一份压缩后的字节（有 brotli 时为 br，否则 gzip），
+  按 Accept-Encoding 直接返回；其他编码和原文由这份数据按需转换，不额外缓存
+"""
+
+import gzip
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+from issue_model import dumps
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只协商 gzip
+    brotli = None
+
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# 同等 q 值时的优先顺序
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """解析 Accept-Encoding，返回 {编码: q 值}"""
+    weights = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def choose_encoding(header: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """选择客户端接受且 q 值最高的压缩编码，都不接受时返回 None（原文）"""
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class ORJSONResponse(JSONResponse):
+    """orjson 渲染的 JSON 响应（跳过标准库 json）"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedBody:
+    """
+    预先序列化的响应体
+
+    只保存一份数据：很小的响应保存原文（encoding 为 None），否则按首选编码（br，未安装 brotli 时 gzip）压缩保存
+    """
+
+    __slots__ = ("size", "encoding", "data")
+
+    def __init__(self, data: bytes):
+        self.size = len(data)
+        self.encoding: Optional[str] = None
+        if self.size < MIN_COMPRESS_SIZE:
+            self.data = data
+        elif brotli is not None:
+            self.encoding, self.data = "br", brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            self.encoding, self.data = "gzip", gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+    @classmethod
+    def of(cls, content: Any) -> "EncodedBody":
+        return cls(dumps(content))
+
+    @property
+    def encodings(self) -> tuple:
+        if self.encoding is None:
+            return ()
+        return ENCODING_PREFERENCE if brotli is not None else ("gzip",)
+
+    def _decode(self) -> bytes:
+        if self.encoding == "br":
+            return brotli.decompress(self.data)
+        return gzip.decompress(self.data)
+
+    def body(self, encoding: Optional[str] = None) -> bytes:
+        """指定编码的响应体，None 为原文"""
+        if self.encoding is None or encoding == self.encoding:
+            return self.data
+        data = self._decode()
+        if encoding == "gzip":
+            return gzip.compress(data, GZIP_LEVEL, mtime=0)
+        if encoding == "br":
+            return brotli.compress(data, quality=BROTLI_QUALITY)
+        return data
+
+    def content(self) -> Any:
+        """反序列化后的内容（供需要嵌入其他输出的场景，如批量结果流）"""
+        return json.loads(self.body())
+
+    @property
+    def nbytes(self) -> int:
+        """缓存占用的字节数"""
+        return len(self.data)
+
+    def response(self, accept_encoding: Optional[str], status_code: int = 200) -> Response:
+        """按 Accept-Encoding 协商后的响应"""
+        encoding = choose_encoding(accept_encoding, self.encodings)
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.body(encoding), status_code=status_code,
+                        headers=headers, media_type="application/json")
@@ -0,0 +1,261 @@
+"""
+历史漏洞检索模块
+基于 SQLite FTS5 对所有已完成任务的问题建立倒排索引，
+支持全文检索（类型/描述/文件/代码片段/修复建议）与严重级别、语言等结构化过滤组合查询
+"""
+
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 参与全文检索的列及其 bm25 权重（类型和描述最重要）
+FTS_COLUMNS = ("category", "description", "file", "code_snippet", "suggestion")
+FTS_WEIGHTS = (5.0, 3.0, 1.5, 1.0, 0.5)
+
+# trigram 分词器支持中文子串匹配，但检索词至少需要 3 个字符
+MIN_TRIGRAM_TERM = 3
+
+
+class FindingSearchIndex:
+    """历史漏洞全文索引（线程安全）"""
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:"):
+        """
+        初始化索引
+
+        Args:
+            db_path: SQLite 数据库路径，默认内存库
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self.tokenizer = self._create_schema()
+        logger.info(f"漏洞检索索引: {self.db_path} (分词器: {self.tokenizer})")
+
+    def _create_schema(self) -> str:
+        conn = self._conn
+        if self.db_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS findings (
+                id INTEGER PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                filename TEXT,
+                language TEXT,
+                severity TEXT,
+                source TEXT,
+                line INTEGER,
+                upload_time TEXT,
+                category TEXT,
+                description TEXT,
+                file TEXT,
+                code_snippet TEXT,
+                suggestion TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_findings_task ON findings(task_id);
+            CREATE INDEX IF NOT EXISTS idx_findings_severity ON findings(severity, upload_time);
+            CREATE INDEX IF NOT EXISTS idx_findings_language ON findings(language, upload_time);
+        """)
+
+        existing = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'findings_fts'"
+        ).fetchone()
+        if existing:
+            return "trigram" if "trigram" in existing["sql"] else "unicode61"
+
+        columns = ", ".join(FTS_COLUMNS)
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE findings_fts USING fts5("
+                    f"{columns}, content='findings', content_rowid='id', tokenize='{tokenizer}')"
+                )
+                break
+            except sqlite3.OperationalError:
+                continue
+        conn.commit()
+        return tokenizer
+
+    @staticmethod
+    def _rows_for(task: Dict) -> List[tuple]:
+        rows = []
+        for issue in task.get("issues") or []:
+            try:
+                line = int(issue.get("line") or 0)
+            except (TypeError, ValueError):
+                line = 0
+            rows.append((
+                task["task_id"],
+                task.get("filename", ""),
+                str(task.get("language") or "").lower(),
+                str(issue.get("severity") or "").lower(),
+                issue.get("source", ""),
+                line,
+                task.get("upload_time", ""),
+                str(issue.get("category") or ""),
+                str(issue.get("description") or ""),
+                str(issue.get("file") or task.get("filename", "")),
+                str(issue.get("code_snippet") or ""),
+                str(issue.get("suggestion") or ""),
+            ))
+        return rows
+
+    def _delete_task(self, task_id: str):
+        conn = self._conn
+        old = conn.execute(
+            f"SELECT id, {', '.join(FTS_COLUMNS)} FROM findings WHERE task_id = ?", (task_id,)
+        ).fetchall()
+        if not old:
+            return
+        # 外部内容表需要显式删除 FTS 中的旧条目
+        conn.executemany(
+            f"INSERT INTO findings_fts(findings_fts, rowid, {', '.join(FTS_COLUMNS)}) "
+            f"VALUES ('delete', ?, {', '.join('?' for _ in FTS_COLUMNS)})",
+            [tuple(row) for row in old]
+        )
+        conn.execute("DELETE FROM findings WHERE task_id = ?", (task_id,))
+
+    def index_task(self, task: Dict) -> int:
+        """
+        索引任务的全部问题（重复调用会替换旧数据）
+
+        Args:
+            task: 已完成的任务字典
+
+        Returns:
+            写入的问题数
+        """
+        rows = self._rows_for(task)
+        with self._lock:
+            conn = self._conn
+            with conn:
+                self._delete_task(task["task_id"])
+                for row in rows:
+                    cur = conn.execute(
+                        "INSERT INTO findings (task_id, filename, language, severity, source, line, "
+                        "upload_time, category, description, file, code_snippet, suggestion) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        row
+                    )
+                    conn.execute(
+                        f"INSERT INTO findings_fts(rowid, {', '.join(FTS_COLUMNS)}) "
+                        f"VALUES (?, {', '.join('?' for _ in FTS_COLUMNS)})",
+                        (cur.lastrowid,) + row[7:]
+                    )
+        return len(rows)
+
+    def remove_task(self, task_id: str):
+        """删除任务的全部问题"""
+        with self._lock:
+            with self._conn:
+                self._delete_task(task_id)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM findings").fetchone()[0]
+
+    def _match_expression(self, query: str) -> Tuple[Optional[str], List[str]]:
+        """
+        将用户输入拆分为 FTS 检索表达式（所有词需同时命中）和过短需要 LIKE 兜底的词
+
+        Returns:
+            (MATCH 表达式或 None, 短词列表)
+        """
+        terms = [t for t in query.split() if t]
+        if self.tokenizer == "trigram":
+            long_terms = [t for t in terms if len(t) >= MIN_TRIGRAM_TERM]
+            short_terms = [t for t in terms if len(t) < MIN_TRIGRAM_TERM]
+        else:
+            long_terms, short_terms = terms, []
+        expression = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+        return expression or None, short_terms
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        severity: Optional[str] = None,
+        language: Optional[str] = None,
+        task_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict]:
+        """
+        检索历史问题
+
+        有检索词时按 bm25 相关度排序，否则按上传时间倒序
+
+        Args:
+            query: 检索词，空格分隔的词需全部命中
+            severity: 严重级别过滤
+            language: 语言过滤
+            task_id: 限定任务
+            limit: 返回数量
+            offset: 偏移
+
+        Returns:
+            问题列表，包含 score 和高亮片段 highlight
+        """
+        match, short_terms = self._match_expression(query or "")
+        where, params = [], []
+        if severity:
+            where.append("f.severity = ?")
+            params.append(severity.lower())
+        if language:
+            where.append("f.language = ?")
+            params.append(language.lower())
+        if task_id:
+            where.append("f.task_id = ?")
+            params.append(task_id)
+        for term in short_terms:
+            where.append(
+                "instr(lower(f.category || ' ' || f.description || ' ' || f.file || ' ' "
+                "|| f.code_snippet || ' ' || f.suggestion), ?) > 0"
+            )
+            params.append(term.lower())
+
+        columns = (
+            "f.id, f.task_id, f.filename, f.language, f.severity, f.source, f.line, "
+            "f.upload_time, f.category, f.description, f.file, f.code_snippet, f.suggestion"
+        )
+        if match:
+            weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+            sql = (
+                f"SELECT {columns}, bm25(findings_fts, {weights}) AS score, "
+                f"snippet(findings_fts, 1, '[', ']', '…', 16) AS highlight "
+                f"FROM findings_fts JOIN findings f ON f.id = findings_fts.rowid "
+                f"WHERE findings_fts MATCH ?"
+                + "".join(f" AND {w}" for w in where)
+                + " ORDER BY score LIMIT ? OFFSET ?"
+            )
+            params = [match] + params
+        else:
+            sql = (
+                f"SELECT {columns}, 0.0 AS score, '' AS highlight FROM findings f"
+                + (" WHERE " + " AND ".join(where) if where else "")
+                + " ORDER BY f.upload_time DESC, f.id LIMIT ? OFFSET ?"
+            )
+        params += [max(1, limit), max(0, offset)]
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        results = []
+        for row in rows:
+            item = dict(row)
+            item.pop("id")
+            # bm25 越小越相关，对外返回越大越相关
+            item["score"] = round(-item["score"], 4) if match else None
+            if not item["highlight"]:
+                item["highlight"] = item["description"][:120]
+            results.append(item)
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,195 @@
+"""
+审计问题模型
+静态分析和 LLM 分析的问题在合并时统一转换为 Issue：
+- 固定字段使用 __slots__，严重级别/来源为枚举，类型/工具/文件等重复出现的字符串做驻留，
+  数千条问题时内存远小于逐条字典
+- 提供与字典相同的 get() 读取接口，索引、统计等只读代码无需区分
+- dumps() 优先使用 orjson 序列化 API 输出
+"""
+
+import sys
+import json
+from collections import Counter
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库 json
+    orjson = None
+
+
+class Severity(str, Enum):
+    HIGH = "high"
+    MEDIUM = "medium"
+    LOW = "low"
+
+    @property
+    def rank(self) -> int:
+        """排序权重：high > medium > low"""
+        return _SEVERITY_RANK[self]
+
+    @classmethod
+    def parse(cls, value: Any) -> "Severity":
+        """兼容 Bandit 的大写级别和 LLM 的 critical/严重 等写法，无法识别时按 low"""
+        text = str(value or "").strip().lower()
+        return _SEVERITY_ALIASES.get(text, cls.LOW)
+
+
+_SEVERITY_RANK = {Severity.HIGH: 0, Severity.MEDIUM: 1, Severity.LOW: 2}
+_SEVERITY_ALIASES = {
+    "high": Severity.HIGH, "critical": Severity.HIGH, "严重": Severity.HIGH, "高": Severity.HIGH, "高危": Severity.HIGH,
+    "medium": Severity.MEDIUM, "moderate": Severity.MEDIUM, "中": Severity.MEDIUM, "中危": Severity.MEDIUM,
+    "low": Severity.LOW, "info": Severity.LOW, "低": Severity.LOW, "低危": Severity.LOW,
+}
+
+
+class Source(str, Enum):
+    STATIC = "static_analysis"
+    LLM = "llm_analysis"
+
+
+# 合并时按来源补充的分析工具
+ANALYSIS_TOOLS = {Source.STATIC: "bandit", Source.LLM: "openai"}
+
+
+def _intern(value: Any) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Issue:
+    """单个审计问题；模型返回的其他字段（tier、code_snippet 等）保存在 extra 中"""
+
+    # 字段顺序即 to_dict() 的输出顺序
+    FIELDS = ("tool", "severity", "confidence", "category", "line", "description",
+              "suggestion", "file", "source", "analysis_tool")
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(
+        self,
+        severity: Severity,
+        source: Source,
+        category: str = "Unknown",
+        line: Optional[int] = None,
+        description: str = "",
+        suggestion: str = "",
+        file: Optional[str] = None,
+        tool: Optional[str] = None,
+        confidence: Optional[str] = None,
+        analysis_tool: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None
+    ):
+        self.severity = severity
+        self.source = source
+        self.category = _intern(category)
+        self.line = line
+        self.description = description
+        self.suggestion = suggestion
+        self.file = _intern(file)
+        self.tool = _intern(tool)
+        self.confidence = _intern(confidence)
+        self.analysis_tool = _intern(analysis_tool or ANALYSIS_TOOLS.get(source))
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Optional[Source] = None) -> "Issue":
+        """
+        从字典构造（静态分析结果、LLM 返回、Worker 回传的序列化结果）
+
+        Args:
+            data: 问题字典
+            source: 指定来源，默认读取字典中的 source 字段
+        """
+        data = dict(data)
+        line = data.pop("line", None)
+        if line is not None and not isinstance(line, int):
+            try:
+                line = int(line)
+            except (TypeError, ValueError):
+                pass
+        if source is None:
+            source = Source(data.pop("source", Source.LLM.value))
+        else:
+            data.pop("source", None)
+        return cls(
+            severity=Severity.parse(data.pop("severity", None)),
+            source=source,
+            category=data.pop("category", None) or "Unknown",
+            line=line,
+            description=data.pop("description", None) or "",
+            suggestion=data.pop("suggestion", None) or "",
+            file=data.pop("file", None),
+            tool=data.pop("tool", None),
+            confidence=data.pop("confidence", None),
+            analysis_tool=data.pop("analysis_tool", None),
+            extra=data
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """与字典相同的读取接口（枚举返回其字符串值）"""
+        if key in Issue.FIELDS:
+            value = getattr(self, key)
+            if isinstance(value, Enum):
+                return value.value
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转为字典（省略空字段），用于 API 输出和跨进程传输"""
+        data = {}
+        for key in Issue.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value.value if isinstance(value, Enum) else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def dedup_key(self) -> tuple:
+        """合并去重依据：行号 + 描述前 50 个字符"""
+        return (self.line, self.description[:50])
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Issue) and self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"Issue({self.severity.value}, {self.category!r}, line={self.line}, source={self.source.value})"
+
+
+_MISSING = object()
+
+
+def sort_issues(issues: List[Issue]):
+    """按严重性排序（high > medium > low），同级保持原顺序"""
+    issues.sort(key=lambda issue: _SEVERITY_RANK[issue.severity])
+
+
+def severity_counts(issues: Iterable[Issue]) -> Dict[str, int]:
+    """各严重级别的问题数（单次 C 层计数）"""
+    counts = Counter(map(attrgetter("severity"), issues))
+    return {severity.value: counts.get(severity, 0) for severity in Severity}
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Issue):
+        return obj.to_dict()
+    if hasattr(obj, "__iter__"):  # 集合、生成器等可迭代容器
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """序列化 API 输出（Issue 和可迭代容器可直接出现在数据中）"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
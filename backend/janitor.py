@@ -0,0 +1,284 @@
+"""
+存储清理模块
+后台定期统计上传目录与沙箱目录的磁盘占用，按配额和过期时间回收空间
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StorageEntry:
+    """目录下的一个顶层条目（上传文件或任务沙箱目录）"""
+
+    __slots__ = ("root", "path", "task_id", "size", "last_used", "is_dir")
+
+    def __init__(self, root: str, path: Path, task_id: str, size: int, last_used: float, is_dir: bool):
+        self.root = root
+        self.path = path
+        self.task_id = task_id
+        self.size = size
+        self.last_used = last_used
+        self.is_dir = is_dir
+
+
+class StorageJanitor:
+    """后台存储清理器"""
+
+    def __init__(
+        self,
+        roots: Dict[str, Path],
+        quota_bytes: int,
+        max_age_seconds: float,
+        interval: float = 300,
+        batch_size: int = 50,
+        low_watermark: float = 0.9,
+        orphan_roots: Iterable[str] = (),
+        orphan_grace_seconds: float = 600,
+        active_tasks: Optional[Callable[[], Set[str]]] = None,
+    ):
+        """
+        初始化清理器
+
+        Args:
+            roots: 需要管理的目录，键为名称（如 uploads / sandbox）
+            quota_bytes: 所有目录合计的磁盘配额
+            max_age_seconds: 超过该时间未使用的条目直接回收
+            interval: 后台巡检间隔（秒）
+            batch_size: 每批删除的条目数，批次之间让出事件循环
+            low_watermark: 超出配额时回收到配额的该比例以下
+            orphan_roots: 不属于活动任务即可回收的目录名称（如失败任务残留的沙箱）
+            orphan_grace_seconds: 孤儿条目的宽限时间
+            active_tasks: 返回当前活动任务ID集合的回调，这些任务的文件不会被回收
+        """
+        self.roots = {name: Path(path) for name, path in roots.items()}
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.low_watermark = low_watermark
+        self.orphan_roots = set(orphan_roots)
+        self.orphan_grace_seconds = orphan_grace_seconds
+        self.active_tasks = active_tasks or (lambda: set())
+
+        self._task: Optional[asyncio.Task] = None
+        self._usage: Dict[str, Dict[str, int]] = {
+            name: {"bytes": 0, "entries": 0} for name in self.roots
+        }
+        self._last_sweep: Optional[float] = None
+        self._last_sweep_duration = 0.0
+        self._evicted_entries = 0
+        self._evicted_bytes = 0
+
+    @staticmethod
+    def _task_id_of(name: str) -> str:
+        """上传文件名为 {task_id}_{filename}，沙箱目录名即 task_id"""
+        return name.split("_", 1)[0]
+
+    @staticmethod
+    def _dir_usage(path: Path) -> Tuple[int, float]:
+        """
+        统计目录的总大小和最近使用时间
+
+        Returns:
+            (字节数, 最近一次访问/修改时间)
+        """
+        total = 0
+        last_used = 0.0
+        stack = [str(path)]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        last_used = max(last_used, st.st_atime, st.st_mtime)
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += st.st_size
+            except OSError:
+                continue
+        return total, last_used
+
+    def scan(self) -> List[StorageEntry]:
+        """
+        扫描所有目录的顶层条目并更新占用统计
+
+        Returns:
+            条目列表
+        """
+        entries: List[StorageEntry] = []
+        for name, root in self.roots.items():
+            usage = {"bytes": 0, "entries": 0}
+            if root.exists():
+                with os.scandir(root) as it:
+                    for entry in it:
+                        if entry.name == "__pycache__":
+                            continue
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if is_dir:
+                            size, last_used = self._dir_usage(Path(entry.path))
+                            last_used = max(last_used, st.st_mtime)
+                        else:
+                            size, last_used = st.st_size, max(st.st_atime, st.st_mtime)
+                        entries.append(StorageEntry(
+                            name, Path(entry.path), self._task_id_of(entry.name),
+                            size, last_used, is_dir
+                        ))
+                        usage["bytes"] += size
+                        usage["entries"] += 1
+            self._usage[name] = usage
+        return entries
+
+    def select_victims(self, entries: List[StorageEntry], now: Optional[float] = None) -> List[StorageEntry]:
+        """
+        按过期、孤儿、LRU 的顺序选出需要回收的条目
+
+        Args:
+            entries: scan() 返回的条目
+            now: 当前时间戳
+
+        Returns:
+            待删除的条目列表
+        """
+        now = now if now is not None else time.time()
+        active = self.active_tasks()
+        candidates = [e for e in entries if e.task_id not in active]
+
+        victims = []
+        chosen = set()
+        for entry in candidates:
+            age = now - entry.last_used
+            expired = age > self.max_age_seconds
+            orphan = entry.root in self.orphan_roots and age > self.orphan_grace_seconds
+            if expired or orphan:
+                victims.append(entry)
+                chosen.add(entry.path)
+
+        total = sum(e.size for e in entries) - sum(e.size for e in victims)
+        if total > self.quota_bytes:
+            target = self.quota_bytes * self.low_watermark
+            remaining = sorted(
+                (e for e in candidates if e.path not in chosen),
+                key=lambda e: e.last_used
+            )
+            for entry in remaining:
+                if total <= target:
+                    break
+                victims.append(entry)
+                total -= entry.size
+
+        return victims
+
+    def _delete_batch(self, batch: List[StorageEntry]) -> Tuple[int, int]:
+        """删除一批条目（在线程池中执行）"""
+        count = 0
+        freed = 0
+        for entry in batch:
+            try:
+                if entry.is_dir:
+                    shutil.rmtree(entry.path)
+                else:
+                    entry.path.unlink()
+                count += 1
+                freed += entry.size
+                logger.debug(f"已回收: {entry.path} ({entry.size} 字节)")
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.warning(f"回收 {entry.path} 失败: {e}")
+        return count, freed
+
+    async def sweep(self) -> Dict:
+        """
+        执行一次巡检：扫描、选择并分批删除，文件系统操作均在线程池中完成
+
+        Returns:
+            本次回收统计
+        """
+        started = time.time()
+        entries = await asyncio.to_thread(self.scan)
+        victims = self.select_victims(entries, now=started)
+
+        evicted = 0
+        freed = 0
+        for i in range(0, len(victims), self.batch_size):
+            count, size = await asyncio.to_thread(self._delete_batch, victims[i:i + self.batch_size])
+            evicted += count
+            freed += size
+
+        if victims:
+            for entry in victims:
+                usage = self._usage.get(entry.root)
+                if usage and not entry.path.exists():
+                    usage["bytes"] -= entry.size
+                    usage["entries"] -= 1
+            logger.info(f"存储清理完成: 回收 {evicted} 个条目, 释放 {freed / 1024 / 1024:.2f} MB")
+
+        self._evicted_entries += evicted
+        self._evicted_bytes += freed
+        self._last_sweep = started
+        self._last_sweep_duration = time.time() - started
+        return {"evicted_entries": evicted, "freed_bytes": freed}
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"存储清理出错: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """在当前事件循环中启动后台巡检"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"存储清理器已启动，配额 {self.quota_bytes / 1024 / 1024:.0f} MB，间隔 {self.interval} 秒")
+
+    async def stop(self):
+        """停止后台巡检"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        """
+        获取存储占用统计（用于 /health）
+
+        Returns:
+            各目录占用、配额和累计回收情况
+        """
+        used = sum(u["bytes"] for u in self._usage.values())
+        return {
+            "quota_bytes": self.quota_bytes,
+            "used_bytes": used,
+            "usage_ratio": round(used / self.quota_bytes, 4) if self.quota_bytes else None,
+            "roots": {name: dict(usage) for name, usage in self._usage.items()},
+            "evicted_entries": self._evicted_entries,
+            "evicted_bytes": self._evicted_bytes,
+            "last_sweep": datetime.fromtimestamp(self._last_sweep).isoformat() if self._last_sweep else None,
+            "last_sweep_seconds": round(self._last_sweep_duration, 3),
+            "running": self._task is not None and not self._task.done(),
+        }
+
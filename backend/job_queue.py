@@ -0,0 +1,389 @@
+"""
+分布式审计任务队列
+API 进程把审计任务（以单个文件为单位）投递到队列，其他节点上的无状态 Worker 拉取执行，
+审计结果通过结果流回传给 API 进程。
+
+投递语义为至少一次：
+- Worker 领取任务后获得租约（可见性超时），执行期间定期续租
+- Worker 崩溃或失联时租约过期，任务重新入队交给其他 Worker；超过最大投递次数后按失败回传
+- 每次领取的租约凭证不同，过期的旧租约无法确认或续租新一轮投递
+- 结果可能重复回传，消费方需要按任务状态幂等处理
+
+支持两种后端：
+- RedisBroker: Redis 协议（redis://、rediss://），跨机器部署
+- LocalBroker: 进程内实现（memory://），语义与 Redis 后端一致，用于单机开发和测试
+"""
+
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # 仅 Redis 后端需要
+    redis = None
+
+# 默认可见性超时（秒），Worker 每隔三分之一续租一次
+VISIBILITY_TIMEOUT = 120.0
+# 超过该投递次数仍未确认的任务按失败处理
+MAX_ATTEMPTS = 3
+DEAD_LETTER_ERROR = "任务已投递 {attempts} 次，Worker 均未在租约内完成"
+# 单次读取结果流的最大条数
+RESULT_BATCH = 100
+
+
+class Job:
+    """一次投递：任务 ID + 负载 + 第几次投递 + 本次租约凭证"""
+
+    __slots__ = ("job_id", "payload", "attempt", "receipt")
+
+    def __init__(self, job_id: str, payload: Dict, attempt: int, receipt: str):
+        self.job_id = job_id
+        self.payload = payload
+        self.attempt = attempt
+        self.receipt = receipt
+
+
+class LocalBroker:
+    """进程内的队列实现（线程安全），与 RedisBroker 接口和语义一致"""
+
+    def __init__(self, visibility_timeout: float = VISIBILITY_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Dict] = {}
+        self._queue: deque = deque()
+        self._inflight: Dict[str, float] = {}  # 任务 ID -> 租约到期时间
+        self._leases: Dict[str, str] = {}
+        self._attempts: Dict[str, int] = {}
+        self._cancelled: set = set()
+        self._results: deque = deque()
+
+    def enqueue(self, payload: Dict, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        with self._cond:
+            self._jobs[job_id] = payload
+            self._queue.append(job_id)
+            self._cond.notify_all()
+        return job_id
+
+    def _reclaim(self):
+        """租约过期的任务重新入队（需持有锁），超过最大投递次数的按失败回传"""
+        now = time.monotonic()
+        for job_id in [j for j, deadline in self._inflight.items() if deadline <= now]:
+            del self._inflight[job_id]
+            self._leases.pop(job_id, None)
+            attempts = self._attempts.get(job_id, 0)
+            if job_id in self._cancelled:
+                self._forget(job_id)
+            elif attempts >= self.max_attempts:
+                self._forget(job_id)
+                error = DEAD_LETTER_ERROR.format(attempts=attempts)
+                self._results.append({"job_id": job_id, "status": "failed", "error": error})
+            else:
+                logger.warning(f"任务 {job_id} 租约过期，重新入队（已投递 {attempts} 次）")
+                self._queue.appendleft(job_id)
+        if self._results or self._queue:
+            self._cond.notify_all()
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._attempts.pop(job_id, None)
+        self._cancelled.discard(job_id)
+
+    def reserve(self, timeout: float = 1.0, visibility_timeout: Optional[float] = None) -> Optional[Job]:
+        """领取一个任务并获得租约，timeout 秒内没有任务返回 None"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._reclaim()
+                while self._queue:
+                    job_id = self._queue.popleft()
+                    if job_id not in self._jobs:
+                        continue  # 排队期间已取消
+                    receipt = uuid.uuid4().hex
+                    self._inflight[job_id] = time.monotonic() + (visibility_timeout or self.visibility_timeout)
+                    self._leases[job_id] = receipt
+                    self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+                    return Job(job_id, self._jobs[job_id], self._attempts[job_id], receipt)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, 0.5))
+
+    def extend(self, job: Job, visibility_timeout: Optional[float] = None) -> bool:
+        """续租；租约已失效或任务已取消时返回 False，Worker 应停止执行"""
+        with self._cond:
+            if job.job_id in self._cancelled or self._leases.get(job.job_id) != job.receipt:
+                return False
+            self._inflight[job.job_id] = time.monotonic() + (visibility_timeout or self.visibility_timeout)
+            return True
+
+    def ack(self, job: Job) -> bool:
+        """确认完成并删除任务；租约已被重新投递时返回 False"""
+        with self._cond:
+            if self._leases.get(job.job_id) != job.receipt:
+                return False
+            del self._leases[job.job_id]
+            self._inflight.pop(job.job_id, None)
+            self._forget(job.job_id)
+            return True
+
+    def nack(self, job: Job) -> bool:
+        """放弃本次执行，任务立即重新入队"""
+        with self._cond:
+            if self._leases.get(job.job_id) != job.receipt:
+                return False
+            del self._leases[job.job_id]
+            self._inflight.pop(job.job_id, None)
+            self._queue.appendleft(job.job_id)
+            self._cond.notify_all()
+            return True
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务：排队中的直接移除，执行中的在下次续租时通知 Worker 停止"""
+        with self._cond:
+            if job_id not in self._jobs:
+                return False
+            if job_id in self._leases:
+                self._cancelled.add(job_id)
+            else:
+                self._forget(job_id)
+            return True
+
+    def publish(self, job_id: str, message: Dict):
+        """向结果流追加一条消息（状态变化或最终结果）"""
+        with self._cond:
+            self._results.append(dict(message, job_id=job_id))
+            self._cond.notify_all()
+
+    def read_results(self, timeout: float = 1.0, limit: int = RESULT_BATCH) -> List[Dict]:
+        """读取并移除结果流中的消息，timeout 秒内没有消息返回空列表"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._reclaim()
+                if self._results:
+                    return [self._results.popleft() for _ in range(min(limit, len(self._results)))]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(min(remaining, 0.5))
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "backend": "memory",
+                "queued": len(self._queue),
+                "inflight": len(self._inflight),
+                "results": len(self._results)
+            }
+
+    def close(self):
+        pass
+
+
+# Redis 后端的原子操作（时间统一取 Redis 服务器时间，避免各节点时钟偏差）
+_NOW = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+"""
+
+# KEYS: queue inflight leases attempts jobs  ARGV: visibility_timeout receipt
+_RESERVE = _NOW + """
+while true do
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then return false end
+    local payload = redis.call('HGET', KEYS[5], id)
+    if payload then
+        redis.call('ZADD', KEYS[2], now + tonumber(ARGV[1]), id)
+        redis.call('HSET', KEYS[3], id, ARGV[2])
+        local attempt = redis.call('HINCRBY', KEYS[4], id, 1)
+        return {id, payload, attempt}
+    end
+end
+"""
+
+# KEYS: inflight queue leases attempts jobs results cancelled  ARGV: max_attempts error_template
+_RECLAIM = _NOW + """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, 100)
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('HDEL', KEYS[3], id)
+    local attempts = tonumber(redis.call('HGET', KEYS[4], id) or '0')
+    local cancelled = redis.call('SREM', KEYS[7], id) == 1
+    if cancelled or attempts >= tonumber(ARGV[1]) then
+        -- 已取消或投递次数用尽的任务不再入队
+        redis.call('HDEL', KEYS[5], id)
+        redis.call('HDEL', KEYS[4], id)
+        if not cancelled then
+            local error = string.gsub(ARGV[2], '{attempts}', tostring(attempts))
+            redis.call('RPUSH', KEYS[6], cjson.encode({job_id = id, status = 'failed', error = error}))
+        end
+    else
+        redis.call('RPUSH', KEYS[2], id)
+    end
+end
+return #ids
+"""
+
+# KEYS: leases inflight cancelled  ARGV: id receipt visibility_timeout
+_EXTEND = _NOW + """
+if redis.call('SISMEMBER', KEYS[3], ARGV[1]) == 1 then return 0 end
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), ARGV[1])
+return 1
+"""
+
+# KEYS: leases inflight jobs attempts cancelled  ARGV: id receipt
+_ACK = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+redis.call('SREM', KEYS[5], ARGV[1])
+return 1
+"""
+
+# KEYS: leases inflight queue  ARGV: id receipt
+_NACK = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('RPUSH', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: jobs leases queue attempts cancelled  ARGV: id
+_CANCEL = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then return 0 end
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    redis.call('SADD', KEYS[5], ARGV[1])
+else
+    redis.call('LREM', KEYS[3], 0, ARGV[1])
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[4], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisBroker:
+    """
+    基于 Redis 的队列实现
+    - {prefix}:queue     待执行任务 ID（列表，LPUSH 入队 / RPOP 领取）
+    - {prefix}:jobs      任务负载（哈希）
+    - {prefix}:inflight  执行中任务的租约到期时间（有序集合）
+    - {prefix}:leases    当前租约凭证；{prefix}:attempts 投递次数；{prefix}:cancelled 待停止的任务
+    - {prefix}:results   结果流（列表）
+    """
+
+    def __init__(self, url: str, prefix: str = "audit", visibility_timeout: float = VISIBILITY_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS):
+        if redis is None:
+            raise RuntimeError("Redis 后端需要安装 redis 包: pip install redis")
+        self.client = redis.Redis.from_url(url)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.keys = {name: f"{prefix}:{name}"
+                     for name in ("queue", "jobs", "inflight", "leases", "attempts", "cancelled", "results")}
+        self._reserve = self.client.register_script(_RESERVE)
+        self._reclaim = self.client.register_script(_RECLAIM)
+        self._extend = self.client.register_script(_EXTEND)
+        self._ack = self.client.register_script(_ACK)
+        self._nack = self.client.register_script(_NACK)
+        self._cancel = self.client.register_script(_CANCEL)
+
+    def _k(self, *names: str) -> List[str]:
+        return [self.keys[name] for name in names]
+
+    def enqueue(self, payload: Dict, job_id: Optional[str] = None) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(self.keys["jobs"], job_id, json.dumps(payload, ensure_ascii=False))
+        pipe.lpush(self.keys["queue"], job_id)
+        pipe.execute()
+        return job_id
+
+    def reclaim(self) -> int:
+        """租约过期的任务重新入队，返回处理的任务数"""
+        return self._reclaim(
+            keys=self._k("inflight", "queue", "leases", "attempts", "jobs", "results", "cancelled"),
+            args=[self.max_attempts, DEAD_LETTER_ERROR]
+        )
+
+    def reserve(self, timeout: float = 1.0, visibility_timeout: Optional[float] = None) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            self.reclaim()
+            receipt = uuid.uuid4().hex
+            found = self._reserve(
+                keys=self._k("queue", "inflight", "leases", "attempts", "jobs"),
+                args=[visibility_timeout or self.visibility_timeout, receipt]
+            )
+            if found:
+                job_id, payload, attempt = found
+                return Job(job_id.decode(), json.loads(payload), int(attempt), receipt)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, 0.5))
+
+    def extend(self, job: Job, visibility_timeout: Optional[float] = None) -> bool:
+        return bool(self._extend(
+            keys=self._k("leases", "inflight", "cancelled"),
+            args=[job.job_id, job.receipt, visibility_timeout or self.visibility_timeout]
+        ))
+
+    def ack(self, job: Job) -> bool:
+        return bool(self._ack(keys=self._k("leases", "inflight", "jobs", "attempts", "cancelled"),
+                              args=[job.job_id, job.receipt]))
+
+    def nack(self, job: Job) -> bool:
+        return bool(self._nack(keys=self._k("leases", "inflight", "queue"), args=[job.job_id, job.receipt]))
+
+    def cancel(self, job_id: str) -> bool:
+        return bool(self._cancel(keys=self._k("jobs", "leases", "queue", "attempts", "cancelled"), args=[job_id]))
+
+    def publish(self, job_id: str, message: Dict):
+        self.client.rpush(self.keys["results"], json.dumps(dict(message, job_id=job_id), ensure_ascii=False))
+
+    def read_results(self, timeout: float = 1.0, limit: int = RESULT_BATCH) -> List[Dict]:
+        self.reclaim()
+        first = self.client.blpop([self.keys["results"]], timeout=max(1, int(timeout)))
+        if not first:
+            return []
+        raw = [first[1]]
+        while len(raw) < limit:
+            item = self.client.lpop(self.keys["results"])
+            if item is None:
+                break
+            raw.append(item)
+        return [json.loads(item) for item in raw]
+
+    def stats(self) -> Dict:
+        pipe = self.client.pipeline()
+        pipe.llen(self.keys["queue"])
+        pipe.zcard(self.keys["inflight"])
+        pipe.llen(self.keys["results"])
+        queued, inflight, results = pipe.execute()
+        return {"backend": "redis", "queued": queued, "inflight": inflight, "results": results}
+
+    def close(self):
+        self.client.close()
+
+
+def connect(url: str, visibility_timeout: float = VISIBILITY_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+    """按 URL 创建队列：memory:// 为进程内队列，redis:// / rediss:// 为 Redis"""
+    if url.startswith("memory://"):
+        return LocalBroker(visibility_timeout, max_attempts)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, visibility_timeout=visibility_timeout, max_attempts=max_attempts)
+    raise ValueError(f"不支持的队列地址: {url}")
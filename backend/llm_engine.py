@@ -6,21 +6,92 @@ LLM 审计引擎
 import os
 import json
 import logging
-from typing import Dict
+from typing import Dict, List, Tuple
 from openai import OpenAI
 
+from cancellation import CancelToken
+from prompt_budget import PromptBudget, get_counter
+from verdict_index import DedupPlan, VerdictIndex
+
 logger = logging.getLogger(__name__)
 
+# 固定不变的指令全部放在 System Prompt 中，作为可被服务端前缀缓存命中的稳定前缀；
+# 用户消息只包含本次任务的可变内容
+SYSTEM_PROMPT = """你是一个专业的代码安全审计专家。请分析代码中的安全漏洞，并以 JSON 格式返回结果。
+如果提供了静态分析工具的结果，请结合这些结果进行深度分析；代码过长时只会提供部分片段，省略处会标注行号。
+
+请以 JSON 格式返回结果，格式如下：
+{
+"issues": [
+{
+"severity": "high/medium/low",
+"category": "漏洞类型（如：SQL注入、XSS、命令注入等）",
+"line": 行号,
+"description": "问题描述",
+"suggestion": "修复建议"
+}
+],
+"summary": "整体安全评估摘要"
+}
+"""
+
+# 分层分析中小模型的初筛提示词，宁可误报也不要漏报高危问题
+TRIAGE_SYSTEM_PROMPT = """你是代码安全初筛助手。请快速判断代码片段是否可能存在安全漏洞，并以 JSON 格式返回结果。
+只要存在外部输入可能到达危险函数（SQL、命令执行、文件操作、反序列化、模板渲染等）的情况，risk 至少为 medium；
+确定没有安全问题时 risk 为 none。line 为片段内的行号（从 1 开始）。
+格式如下：
+{
+"risk": "high/medium/low/none",
+"reason": "一句话理由",
+"issues": [
+{
+"severity": "low",
+"category": "问题类型",
+"line": 行号,
+"description": "问题描述",
+"suggestion": "修复建议"
+}
+]
+}
+"""
+TRIAGE_MAX_TOKENS = 512
+# 单次模型请求超时（秒），受任务剩余时间预算约束
+LLM_REQUEST_TIMEOUT = 120.0
+
+STATIC_HEADER = """
+静态分析工具发现的问题（按严重性排序，共 {total} 个，列出 {included} 个）：
+{issues}
+"""
+
 
 class LLMAuditEngine:
-    """LLM 代码审计引擎"""
+    """
+    LLM 代码审计引擎
     
-    def __init__(self, api_key: str = None, model: str = "gpt-4"):
+    配置 triage_model 时启用分层分析：小模型逐块初筛，只有被标记为可疑、
+    或与 Bandit 结论不一致的代码块才升级到大模型深度分析
+    
+    配置 verdicts 时启用函数级结论复用：与已审计函数结构相同/相近的函数直接复用历史结论，
+    不再发送给 LLM
+    
+    配置 cancel_token 时，任务取消会关闭底层 HTTP 连接，中断进行中的请求
+    """
+    
+    def __init__(self, api_key: str = None, model: str = "gpt-4", triage_model: str = None,
+                 chunk_tokens: int = 1500, verdicts: VerdictIndex = None,
+                 cancel_token: CancelToken = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
+        self.triage_model = triage_model if triage_model and triage_model != model else None
+        self.chunk_tokens = chunk_tokens
         self.client = OpenAI(api_key=self.api_key) if self.api_key else None
+        self.budget = PromptBudget(get_counter(model))
+        self.verdicts = verdicts
+        self.cancel_token = cancel_token
+        if cancel_token is not None and self.client is not None:
+            cancel_token.on_cancel(self.client.close)
         
-    def analyze_code(self, code: str, language: str, static_results: dict = None) -> Dict:
+    def analyze_code(self, code: str, language: str, static_analysis_results: dict = None) -> Dict:
         """
         使用 LLM 分析代码安全问题
         """
@@ -32,58 +103,277 @@ class LLMAuditEngine:
                 "summary": "请在 .env 文件中配置 OPENAI_API_KEY"
             }
         
-        prompt = self._build_prompt(code, language, static_results)
+        plan = self.verdicts.prepare(code, language) if self.verdicts is not None else None
+        if plan is None or not plan.reused:
+            result = self._analyze(code, language, static_analysis_results)
+        elif plan.skip_llm:
+            result = {
+                "issues": [],
+                "summary": f"所有函数均与已审计函数结构相同，复用 {len(plan.reused)} 个函数的历史结论",
+                "usage": {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            }
+        else:
+            result = self._analyze(plan.code, language, self._without_reused(static_analysis_results, plan))
+        
+        if plan is not None:
+            # 分析不完整（调用失败或代码被预算截断）时不写入，避免把漏报固化为可复用的结论
+            if not plan.skip_llm and self._complete_coverage(result):
+                self.verdicts.record(plan, result.get("issues", []), language)
+            result["issues"] = result.get("issues", []) + plan.reused_issues
+            result["dedup"] = plan.stats()
+        return result
+    
+    def _analyze(self, code: str, language: str, static_analysis_results: dict = None) -> Dict:
+        """对代码做一次完整的 LLM 分析（单模型或分层）"""
+        if self.triage_model:
+            return self._analyze_tiered(code, language, static_analysis_results)
+        
+        prompt, budget_stats = self._build_prompt(code, language, static_analysis_results)
+        logger.info(f"提示词预算: {budget_stats}")
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的代码安全审计专家。请分析代码中的安全漏洞，并以 JSON 格式返回结果。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result, usage = self._complete(self.model, SYSTEM_PROMPT, prompt, self.budget.reserve_output)
+            result["prompt_budget"] = budget_stats
+            result["usage"] = usage
             logger.info(f"LLM 分析完成，发现 {len(result.get('issues', []))} 个问题")
-            return
-"""
-if static_results:
-prompt += f"""
-静态分析工具发现的问题：
-{json.dumps(static_results, indent=2, ensure_ascii=False)}
-请结合以上结果，进行深度分析。
-"""
-    prompt += """
-请以 JSON 格式返回结果，格式如下：
-{
-"issues": [
-{
-"severity": "high/medium/low",
-"category": "漏洞类型（如：SQL注入、XSS、命令注入等）",
-"line": 行号,
-"description": "问题描述",
-"suggestion": "修复建议"
-}
-],
-"summary": "整体安全评估摘要"
-}
-"""
-return prompt
-测试代码
-if name == "main":
-test_code = """
+            return result
+            
+        except Exception as e:
+            logger.error(f"LLM 分析失败: {e}")
+            return {
+                "error": str(e),
+                "issues": [],
+                "summary": f"LLM 分析失败: {e}",
+                "prompt_budget": budget_stats
+            }
+    
+    def _complete(self, model: str, system_prompt: str, prompt: str, max_tokens: int,
+                  temperature: float = 0.3) -> Tuple[Dict, Dict]:
+        """调用一次模型，返回 (解析后的 JSON, Token 用量)；任务已取消时抛出 TaskCancelled"""
+        token = self.cancel_token
+        if token is not None:
+            token.check()
+        try:
+            response = self._create(model, system_prompt, prompt, max_tokens, temperature)
+        except Exception:
+            # 取消时连接被关闭导致的异常，转换为 TaskCancelled
+            if token is not None:
+                token.check()
+            raise
+        return json.loads(response.choices[0].message.content), self._usage(getattr(response, "usage", None))
+    
+    def _create(self, model: str, system_prompt: str, prompt: str, max_tokens: int, temperature: float):
+        timeout = self.cancel_token.timeout(LLM_REQUEST_TIMEOUT) if self.cancel_token else LLM_REQUEST_TIMEOUT
+        return self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            timeout=timeout
+        )
+    
+    def _chunks(self, code: str) -> List[Tuple[int, int, str]]:
+        """按行切分代码块，每块不超过 chunk_tokens，返回 [(起始行, 结束行, 代码)]"""
+        counter = get_counter(self.triage_model)
+        chunks = []
+        lines = code.splitlines(keepends=True)
+        start, used, current = 1, 0, []
+        for number, line in enumerate(lines, 1):
+            cost = counter.count(line)
+            if current and used + cost > self.chunk_tokens:
+                chunks.append((start, number - 1, "".join(current)))
+                start, used, current = number, 0, []
+            current.append(line)
+            used += cost
+        if current:
+            chunks.append((start, len(lines), "".join(current)))
+        return chunks
+    
+    def _analyze_tiered(self, code: str, language: str, static_results: dict = None) -> Dict:
+        """
+        分层分析
+        
+        升级条件（任一满足）：
+        - 小模型判定风险为 high/medium
+        - Bandit 在该块报告了问题，而小模型认为无风险（两者不一致）
+        - 小模型调用或解析失败
+        其余块直接采用小模型给出的低危问题
+        """
+        static_issues = []
+        if static_results:
+            static_issues = static_results.get("issues") or static_results.get("issues_preview") or []
+        
+        tiers = {
+            "triage": {"model": self.triage_model, "calls": 0, "failed": 0, "chunks": 0,
+                       "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0},
+            "escalation": {"model": self.model, "calls": 0, "failed": 0, "chunks": 0,
+                           "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0},
+        }
+        issues = []
+        summaries = []
+        errors = []
+        truncated = []
+        
+        for start, end, chunk in self._chunks(code):
+            # 静态分析结果换算成块内行号
+            chunk_static = [
+                dict(issue, line=issue["line"] - start + 1)
+                for issue in static_issues
+                if isinstance(issue.get("line"), int) and start <= issue["line"] <= end
+            ]
+            
+            escalate = False
+            triage = tiers["triage"]
+            triage["chunks"] += 1
+            try:
+                data, usage = self._complete(
+                    self.triage_model, TRIAGE_SYSTEM_PROMPT,
+                    f"请初筛以下 {language} 代码片段：\n```{language}\n{chunk}\n```\n",
+                    TRIAGE_MAX_TOKENS, temperature=0
+                )
+                self._account(triage, usage)
+                risk = str(data.get("risk", "")).lower()
+                if risk in ("high", "medium"):
+                    escalate = True
+                elif chunk_static and risk in ("none", ""):
+                    escalate = True
+                    logger.info(f"第 {start}-{end} 行：Bandit 报告 {len(chunk_static)} 个问题而初筛认为无风险，升级分析")
+            except Exception as e:
+                triage["failed"] += 1
+                logger.warning(f"初筛失败，升级分析第 {start}-{end} 行: {e}")
+                escalate = True
+            
+            if not escalate:
+                for issue in data.get("issues", []):
+                    issues.append(self._offset(issue, start, "triage"))
+                continue
+            
+            escalation = tiers["escalation"]
+            escalation["chunks"] += 1
+            prompt, budget_stats = self._build_prompt(chunk, language, {"issues": chunk_static})
+            if budget_stats["code_truncated"]:
+                truncated.append([start, end])
+            try:
+                data, usage = self._complete(self.model, SYSTEM_PROMPT, prompt, self.budget.reserve_output)
+                self._account(escalation, usage)
+            except Exception as e:
+                escalation["failed"] += 1
+                errors.append(f"第 {start}-{end} 行: {e}")
+                logger.error(f"升级分析失败 (第 {start}-{end} 行): {e}")
+                continue
+            for issue in data.get("issues", []):
+                issues.append(self._offset(issue, start, "escalation"))
+            if data.get("summary"):
+                summaries.append(data["summary"])
+        
+        logger.info(f"分层分析完成: {tiers}")
+        summary = "；".join(summaries) or (
+            f"分层分析：{tiers['triage']['chunks']} 个代码块初筛，"
+            f"{tiers['escalation']['chunks']} 个升级到 {self.model}"
+        )
+        result = {"issues": issues, "summary": summary, "tiers": tiers}
+        # 至少有一次调用返回了用量时才给出合计，全部失败时用量未知
+        if tiers["triage"]["calls"] or tiers["escalation"]["calls"]:
+            result["usage"] = {
+                key: tiers["triage"][key] + tiers["escalation"][key]
+                for key in ("prompt_tokens", "cached_tokens", "completion_tokens")
+            }
+        if truncated:
+            result["prompt_budget"] = {"code_truncated": True, "truncated_chunks": truncated}
+        if errors:
+            result["error"] = "；".join(errors)
+        return result
+    
+    @staticmethod
+    def _complete_coverage(result: Dict) -> bool:
+        """LLM 是否成功分析了完整代码"""
+        return not result.get("error") and not (result.get("prompt_budget") or {}).get("code_truncated")
+    
+    @staticmethod
+    def _without_reused(static_results: dict, plan: DedupPlan) -> dict:
+        """去掉落在已复用函数内的静态分析问题，这些函数不会发送给 LLM"""
+        if not static_results:
+            return static_results
+        filtered = dict(static_results)
+        for key in ("issues", "issues_preview"):
+            if key in filtered:
+                filtered[key] = [issue for issue in filtered[key] or [] if not plan.covers(issue.get("line"))]
+        return filtered
+    
+    @staticmethod
+    def _offset(issue: Dict, start: int, tier: str) -> Dict:
+        """块内行号换算为文件行号，并标注来源层级"""
+        if isinstance(issue.get("line"), int):
+            issue["line"] += start - 1
+        issue["tier"] = tier
+        return issue
+    
+    @staticmethod
+    def _account(tier: Dict, usage: Dict):
+        tier["calls"] += 1
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+            tier[key] += usage.get(key, 0)
+    
+    @staticmethod
+    def _usage(usage) -> Dict:
+        """
+        提取 Token 用量，cached_tokens 为服务端前缀缓存命中的输入 Token
+        （OpenAI: prompt_tokens_details.cached_tokens，DeepSeek: prompt_cache_hit_tokens）
+        """
+        if usage is None:
+            return {}
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        if cached is None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = getattr(details, "cached_tokens", 0) if details is not None else 0
+        return {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "cached_tokens": cached or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0
+        }
+    
+    def _build_prompt(self, code: str, language: str, static_results: dict = None) -> Tuple[str, Dict]:
+        """
+        构建审计提示词，按 Token 预算分配代码和静态分析结果
+        
+        Returns:
+            (提示词, 预算统计)
+        """
+        static_issues = []
+        if static_results:
+            static_issues = static_results.get("issues") or static_results.get("issues_preview") or []
+        
+        header = f"请分析以下 {language} 代码的安全问题：\n"
+        fixed_text = SYSTEM_PROMPT + header + STATIC_HEADER
+        allocation = self.budget.allocate(fixed_text, code, static_issues)
+        
+        prompt = header + f"\n```{language}\n{allocation['code']}\n```\n"
+        if allocation["static_lines"]:
+            prompt += STATIC_HEADER.format(
+                included=len(allocation["static_lines"]),
+                total=len(static_issues),
+                issues="\n".join(allocation["static_lines"])
+            )
+        return prompt, allocation["stats"]
+
+
+# 测试代码
+if __name__ == "__main__":
+    test_code = """
 import os
 user_input = input("Enter command: ")
 os.system(user_input)
 """
-engine = LLMAuditEngine()
-result = engine.analyze_code(test_code, "python")
-print(json.dumps(result, indent=2, ensure_ascii=False))
\ No newline at end of file
+    engine = LLMAuditEngine()
+    result = engine.analyze_code(test_code, "python")
+    print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -4,21 +4,42 @@ FastAPI 后端服务
 """
 
 import os
-import json
 import uuid
 import logging
+import threading
 import subprocess
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # 导入自定义模块
+from config import Config
 from sandbox import SecureSandbox
-from llm_engine import LLMAuditEngine
+from janitor import StorageJanitor
+from task_index import TaskIndex
+from task_journal import TaskJournal
+from dashboard_stats import DashboardAggregates
+from finding_search import FindingSearchIndex
+from verdict_index import VerdictIndex
+from result_store import ColdStore
+from issue_model import Issue
+from fast_response import EncodedBody, ORJSONResponse
+from task_watch import TaskWatch
+from batch_upload import (
+    ALLOWED_EXTENSIONS, SUPPORTED_LANGUAGES, TERMINAL_STATUSES, BatchItem,
+    batch_counts, batch_key, check_item, parse_manifest, safe_name, stream_results
+)
+from cancellation import CancelToken, TaskCancelled
+from audit_runner import audit_file
+from worker import job_payload, start_workers
+from tenant_scheduler import (
+    DEFAULT_TENANT, FairScheduler, TenantPolicy, TenantRegistry, estimate_tokens, llm_tokens
+)
+import job_queue
 
 # 配置日志
 logging.basicConfig(
@@ -31,7 +52,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Cyber Audit API",
     description="自动化代码安全审计系统",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # 配置 CORS
@@ -49,6 +71,46 @@ sandbox = SecureSandbox()
 # 内存中存储任务状态（生产环境中应使用数据库）
 audit_tasks: Dict[str, Dict] = {}
 
+# 进行中任务的取消令牌（任务结束后移除）
+task_tokens: Dict[str, CancelToken] = {}
+
+# 任务列表索引（按上传时间有序 + 状态/语言/严重级别倒排）
+task_index = TaskIndex()
+
+# 仪表盘按天聚合统计
+dashboard_stats = DashboardAggregates()
+
+# 任务版本号（结果接口的 ETag / 长轮询）
+task_watch = TaskWatch()
+
+# 批量上传的批次：子任务本身是普通任务（带 batch_id），这里只记录批次包含哪些子任务
+audit_batches: Dict[str, Dict] = {}
+
+
+def task_started(task_id: str):
+    """任务开始执行后同步索引（按 status=running 查询）和版本号"""
+    task = audit_tasks.get(task_id)
+    if task:
+        task_watch.bump(task_id)
+        task_index.upsert(task)
+
+
+def task_finished(task_id: str):
+    """任务完成或失败后同步索引和仪表盘聚合（任务已被删除时忽略）"""
+    task = audit_tasks.get(task_id)
+    if task:
+        task_watch.bump(task_id)
+        if task.get("batch_id"):
+            task_watch.bump(batch_key(task["batch_id"]))
+        task_index.upsert(task)
+        task_journal.remove(task_id)
+        dashboard_stats.record_task(task)
+        if task.get("status") == "completed":
+            try:
+                finding_index.index_task(task)
+            except Exception as e:
+                logger.warning(f"索引任务 {task_id} 的问题失败: {e}")
+
 # 创建上传目录
 import os
 from pathlib import Path
@@ -58,11 +120,175 @@ BASE_DIR = Path(__file__).parent
 UPLOAD_DIR = BASE_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# 已完成任务的原始输出冷存储（内存中只保留压缩后的问题列表）
+cold_store = ColdStore(BASE_DIR / Config.COLD_STORAGE_DIR)
+
+# 历史漏洞全文索引（持久化，跨重启保留）
+finding_index = FindingSearchIndex(BASE_DIR / Config.FINDINGS_DB_PATH)
+
+# 已审计函数的近重复索引，跨任务/跨项目复用结构相同函数的结论
+verdict_index = VerdictIndex(BASE_DIR / Config.VERDICT_DB_PATH, threshold=Config.VERDICT_SIMILARITY)
+
+# 未结束（pending/running）任务的持久化日志，服务重启后重新排队
+task_journal = TaskJournal(BASE_DIR / Config.TASK_JOURNAL_PATH)
+
+# 分布式执行的任务队列（未配置时在 API 进程内直接审计）
+broker = job_queue.connect(
+    Config.AUDIT_BROKER_URL, Config.JOB_VISIBILITY_TIMEOUT, Config.JOB_MAX_ATTEMPTS
+) if Config.AUDIT_BROKER_URL else None
+# 后台线程（执行/投递/结果消费）的停止信号；memory:// 时在进程内启动的 Worker
+background_stop = threading.Event()
+local_workers = []
+
+# 多租户公平调度：上传的任务按租户排队，按权重和配额分配执行槽位
+tenant_registry = TenantRegistry(Config.AUDIT_TENANTS, TenantPolicy(
+    DEFAULT_TENANT,
+    max_concurrent=Config.TENANT_MAX_CONCURRENT,
+    tokens_per_minute=Config.TENANT_TOKENS_PER_MINUTE
+))
+scheduler = FairScheduler(Config.MAX_CONCURRENT_AUDITS)
+
+
+def get_active_task_ids() -> set:
+    """仍在处理中的任务，其上传文件和沙箱不能被回收"""
+    return {tid for tid, t in list(audit_tasks.items()) if t.get("status") in ("pending", "running")}
+
+
+# 后台存储清理器：按配额/过期时间回收上传文件，失败任务残留的沙箱按孤儿回收
+# （冷存储随任务删除，仍在列表中的已完成任务的原始输出不参与回收）
+janitor = StorageJanitor(
+    roots={"uploads": UPLOAD_DIR, "sandbox": sandbox.base_dir},
+    quota_bytes=Config.STORAGE_QUOTA_MB * 1024 * 1024,
+    max_age_seconds=Config.STORAGE_MAX_AGE_HOURS * 3600,
+    interval=Config.JANITOR_INTERVAL,
+    batch_size=Config.JANITOR_BATCH_SIZE,
+    orphan_roots=["sandbox"],
+    active_tasks=get_active_task_ids
+)
+
+def complete_task(task_id: str, result: Dict) -> bool:
+    """
+    写回审计结果；任务已删除或已结束（取消、重复回传）时忽略
+    """
+    task = audit_tasks.get(task_id)
+    if task is None or task.get("status") not in ("pending", "running"):
+        return False
+    task.update(result)
+    task["status"] = "completed"
+    task_finished(task_id)
+    archive_task(task)
+    return True
+
+
+# 移入冷存储、按需加载的原始输出字段
+RAW_RESULT_FIELDS = ("static_analysis_output", "llm_result")
+
+
+def archive_task(task: Dict):
+    """
+    压缩已完成任务的结果：原始输出移入冷存储，结果接口的响应体序列化并压缩一次，
+    之后只保留这一份（问题列表不再另存，索引和统计已在 task_finished 中更新）
+    """
+    raw = {field: task.pop(field) for field in RAW_RESULT_FIELDS if field in task}
+    if isinstance(raw.get("llm_result"), dict):
+        # LLM 给出的问题已合并进 task["issues"]，冷存储中不再重复保存
+        raw["llm_result"] = {k: v for k, v in raw["llm_result"].items() if k != "issues"}
+    if raw:
+        try:
+            cold_store.put(task["task_id"], raw)
+        except OSError as e:
+            logger.warning(f"写入任务 {task['task_id']} 的原始输出失败: {e}")
+    task["encoded_result"] = EncodedBody.of(task_result(task))
+    task["issue_count"] = len(task.pop("issues", None) or [])
+
+
+def apply_job_message(message: Dict):
+    """
+    处理 Worker 经结果流回传的消息（running / completed / failed）
+
+    投递语义为至少一次，同一任务可能收到重复消息，已结束的任务直接忽略
+    """
+    task_id = message.get("job_id")
+    status = message.get("status")
+    if status in ("completed", "failed"):
+        scheduler.release(task_id, llm_tokens(message.get("statistics")))
+    task = audit_tasks.get(task_id)
+    if task is None or task.get("status") not in ("pending", "running"):
+        return
+    if status == "running":
+        task["status"] = "running"
+        task["worker"] = message.get("worker")
+        task_started(task_id)
+    elif status == "completed":
+        result = {k: v for k, v in message.items() if k not in ("job_id", "status")}
+        result["issues"] = [Issue.from_dict(issue) for issue in result.get("issues") or []]
+        complete_task(task_id, result)
+    elif status == "failed":
+        task["status"] = "failed"
+        task["error"] = message.get("error", "未知错误")
+        task["completion_time"] = datetime.now().isoformat()
+        task_finished(task_id)
+
+
+def execute_audits(stop: threading.Event):
+    """进程内执行线程：按调度顺序领取任务并审计"""
+    while not stop.is_set():
+        item = scheduler.acquire(timeout=1.0)
+        if item is None:
+            continue
+        try:
+            run_audit(item.task_id, item.data["file_path"], item.data["language"])
+        finally:
+            task = audit_tasks.get(item.task_id)
+            scheduler.release(item.task_id, llm_tokens(task.get("statistics")) if task else None)
+
+
+def dispatch_to_broker(stop: threading.Event):
+    """分布式模式：按调度顺序把任务投递到队列，Worker 回传最终结果后归还槽位"""
+    while not stop.is_set():
+        item = scheduler.acquire(timeout=1.0)
+        if item is None:
+            continue
+        try:
+            content = Path(item.data["file_path"]).read_bytes()
+            broker.enqueue(job_payload(item.data["filename"], item.data["language"], content), job_id=item.task_id)
+        except Exception as e:
+            logger.error(f"投递任务 {item.task_id} 失败: {e}")
+            apply_job_message({"job_id": item.task_id, "status": "failed", "error": f"投递任务失败: {e}"})
+
+
+def collect_results(stop: threading.Event):
+    """结果流消费线程"""
+    while not stop.is_set():
+        try:
+            messages = broker.read_results(timeout=1.0)
+        except Exception as e:
+            logger.warning(f"读取任务结果失败: {e}")
+            stop.wait(1.0)
+            continue
+        for message in messages:
+            try:
+                apply_job_message(message)
+            except Exception as e:
+                logger.error(f"处理任务 {message.get('job_id')} 的结果失败: {e}", exc_info=True)
+
+
 def run_audit(task_id: str, file_path: str, language: str):
     """
-    运行完整的审计任务
+    在 API 进程内运行完整的审计任务（流程见 audit_runner.audit_file）
+    
+    各阶段之间检查取消令牌；取消或超过 Config.TASK_TIMEOUT 时终止进行中的子进程和 LLM 请求
     """
+    token = task_tokens.setdefault(task_id, CancelToken())
     try:
+        # 排队期间已被取消或删除
+        token.check()
+        task = audit_tasks.get(task_id)
+        if task is None:
+            return
+        task["status"] = "running"
+        task_started(task_id)
+        token.start_budget(Config.TASK_TIMEOUT)
         logger.info(f"开始审计任务 {task_id}，文件: {file_path}，语言: {language}")
         
         # 添加调试：检查文件是否存在
@@ -76,269 +302,31 @@ def run_audit(task_id: str, file_path: str, language: str):
             if task:
                 task["status"] = "failed"
                 task["error"] = f"文件不存在: {file_path}"
+                task_finished(task_id)
             return
         
-        # ... 其余代码保持不变 ...    """
-    运行完整的审计任务
-    1. 静态分析（Bandit/Semgrep）
-    2. LLM 深度分析
-    3. 合并结果
-    """
-    try:
-        logger.info(f"开始审计任务 {task_id}，文件: {file_path}，语言: {language}")
-        
-        # 1. 复制文件到沙箱
-        sandbox.copy_to_sandbox(task_id, file_path)
-        sandbox_path = sandbox.get_sandbox_path(task_id)
-        
-        # 2. 运行静态分析工具
-        static_output = ""
-        static_issues = []
-        
-        if language.lower() == "python":
-            # 运行 Bandit 进行 Python 代码分析
-            try:
-                logger.info(f"运行 Bandit 分析...")
-                
-                # 构建 bandit 命令
-                bandit_cmd = [
-                    "bandit",
-                    "-r", str(sandbox_path),
-                    "-f", "json",
-                    "-ll",  # 输出级别：低
-                    "-ii",  # 忽略 info 级别的问题
-                ]
-                
-                # 执行命令
-                bandit_result = subprocess.run(
-                    bandit_cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=120  # 2分钟超时
-                )
-                
-                logger.info(f"Bandit 返回码: {bandit_result.returncode}")
-                
-                # 处理结果
-                if bandit_result.returncode in [0, 1]:  # 0=成功，1=发现问题
-                    if bandit_result.stdout.strip():
-                        try:
-                            bandit_output = json.loads(bandit_result.stdout)
-                            static_output = json.dumps(bandit_output, ensure_ascii=False, indent=2)
-                            
-                            # 解析 Bandit 结果
-                            if "results" in bandit_output:
-                                for issue in bandit_output["results"]:
-                                    static_issues.append({
-                                        "tool": "bandit",
-                                        "severity": issue.get("issue_severity", "medium").lower(),
-                                        "confidence": issue.get("issue_confidence", "medium"),
-                                        "category": issue.get("test_name", "Unknown"),
-                                        "line": issue.get("line_number", 0),
-                                        "description": issue.get("issue_text", ""),
-                                        "suggestion": issue.get("more_info", ""),
-                                        "file": issue.get("filename", "").replace(str(sandbox_path), "").lstrip("/")
-                                    })
-                                logger.info(f"Bandit 发现 {len(static_issues)} 个问题")
-                            else:
-                                logger.info("Bandit 未发现安全问题")
-                                
-                        except json.JSONDecodeError as e:
-                            logger.error(f"解析 Bandit JSON 失败: {e}")
-                            static_output = f"解析 Bandit 输出失败: {e}\n原始输出:\n{bandit_result.stdout}"
-                    else:
-                        logger.warning("Bandit 无输出")
-                else:
-                    error_msg = f"Bandit 执行失败: {bandit_result.stderr}"
-                    logger.error(error_msg)
-                    static_output = error_msg
-                    
-            except subprocess.TimeoutExpired:
-                error_msg = "Bandit 分析超时（120秒）"
-                logger.error(error_msg)
-                static_output = error_msg
-            except Exception as e:
-                error_msg = f"Bandit 分析异常: {e}"
-                logger.error(error_msg)
-                static_output = error_msg
-        
-        # 3. 读取代码内容用于 LLM 分析
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                code_content = f.read()
-            logger.info(f"读取代码内容成功，长度: {len(code_content)} 字符")
-        except Exception as e:
-            logger.error(f"读取代码文件失败: {e}")
-            code_content = f"# 读取文件失败: {e}"
-        
-        # 4. LLM 深度分析
-        logger.info("开始 LLM 深度分析...")
-        
-        # 准备静态分析结果供 LLM 参考
-        static_results_summary = None
-        if static_issues:
-            static_results_summary = {
-                "tool": "bandit",
-                "issue_count": len(static_issues),
-                "issues_preview": static_issues[:3],  # 只传前3个问题供参考
-                "summary": f"静态分析发现 {len(static_issues)} 个问题"
-            }
-        
-        # 创建 LLM 引擎实例
-        llm_engine = LLMAuditEngine()
-        
-        # 运行 LLM 分析
-        llm_result = llm_engine.analyze_code(
-            code=code_content,
-            language=language,
-            static_analysis_results=static_results_summary
-        )
-        
-        # 5. 合并结果
-        all_issues = []
-        
-        # 添加静态分析问题
-        for issue in static_issues:
-            issue["source"] = "static_analysis"
-            issue["analysis_tool"] = "bandit"def run_audit(task_id: str, code_path: str, language: str):
-    """
-    执行审计任务（后台运行）
-    """
-    try:
-        task = audit_tasks[task_id]
-        
-        # 1. 读取代码内容
-        code_content = ""
-        for root, dirs, files in os.walk(code_path):
-            for file in files:
-                if file.endswith(('.py', '.java', '.php', '.js', '.ts')):
-                    try:
-                        with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
-                            code_content += f.read() + "\n"
-                    except:
-                        pass
+        result = audit_file(task_id, file_path, language, sandbox, token, verdict_index)
         
-        # 2. 使用沙箱运行静态分析工具
-        container = sandbox.create_sandbox(task_id, code_path)
-        
-        # 3. 静态分析
-        static_results = {}
-        
-        # 运行 Bandit（Python）
-        if language == "python" or language == "auto":
-            exit_code, output = sandbox.execute_command(
-                container, 
-                "bandit -r /sandbox/code -f json 2>/dev/null || echo '[]'"
-            )
-            try:
-                static_results["bandit"] = json.loads(output) if output.startswith('[') else []
-            except:
-                static_results["bandit"] = []
-        
-        # 运行 Semgrep
-        exit_code, output = sandbox.execute_command(
-            container,
-            "semgrep /sandbox/code --json 2>/dev/null || echo '{}'"
-        )
-        try:
-            static_results["semgrep"] = json.loads(output) if output.startswith('{') else {}
-        except:
-            static_results["semgrep"] = {}
-        
-        # 4. LLM 深度分析
-        from llm_engine import LLMAuditEngine
-        llm_engine = LLMAuditEngine()
-        
-        llm_result = llm_engine.analyze_code(
-            code=code_content,
-            language=language,
-            static_analysis_results=static_results
-        )
-        
-        # 5. 清理沙箱
-        sandbox.cleanup(task_id)
-        
-        # 6. 更新任务状态
-        task["status"] = "completed"
-        task["issues"] = llm_result.get("issues", [])
-        task["summary"] = llm_result.get("summary", "审计完成")
-        
-    except Exception as e:
-        audit_tasks[task_id]["status"] = "failed"
-        audit_tasks[task_id]["summary"] = str(e)
-        # 确保清理沙箱
-        try:
-            sandbox.cleanup(task_id)
-        except:
-            pass
-            all_issues.append(issue)
-        
-        # 添加 LLM 分析问题
-        llm_issues_count = 0
-        for issue in llm_result.get("issues", []):
-            # 避免重复问题（基于行号和描述）
-            is_duplicate = False
-            for existing_issue in all_issues:
-                if (existing_issue.get("line") == issue.get("line") and 
-                    existing_issue.get("description", "")[:50] == issue.get("description", "")[:50]):
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                issue["source"] = "llm_analysis"
-                issue["analysis_tool"] = "openai"
-                all_issues.append(issue)
-                llm_issues_count += 1
-        
-        # 6. 按严重性排序（high > medium > low）
-        severity_order = {"high": 0, "medium": 1, "low": 2}
-        all_issues.sort(key=lambda x: severity_order.get(x.get("severity", "low"), 3))
-        
-        # 7. 生成统计信息
-        severity_stats = {"high": 0, "medium": 0, "low": 0}
-        for issue in all_issues:
-            sev = issue.get("severity", "low").lower()
-            if sev in severity_stats:
-                severity_stats[sev] += 1
-        
-        total_issues = len(all_issues)
-        
-        # 8. 更新任务状态
-        task = audit_tasks[task_id]
-        task["status"] = "completed"
-        task["static_analysis_output"] = static_output
-        task["llm_result"] = llm_result
-        task["issues"] = all_issues
-        task["summary"] = llm_result.get("summary", f"审计完成，发现 {total_issues} 个安全问题")
-        
-        # 添加统计信息
-        task["statistics"] = {
-            "total_issues": total_issues,
-            "severity_distribution": severity_stats,
-            "static_issues": len(static_issues),
-            "llm_issues": llm_issues_count,
-            "unique_issues": total_issues  # 去重后的问题数
-        }
-        
-        task["completion_time"] = datetime.now().isoformat()
-        
-        logger.info(f"""
-        审计任务 {task_id} 完成!
-        总计发现 {total_issues} 个安全问题:
-          - 高危: {severity_stats['high']}
-          - 中危: {severity_stats['medium']}
-          - 低危: {severity_stats['low']}
-          - 静态分析: {len(static_issues)} 个
-          - LLM分析: {llm_issues_count} 个
-        """)
-        
-        # 9. 清理沙箱
-        try:
-            sandbox.cleanup(task_id)
-            logger.info(f"已清理沙箱 {task_id}")
-        except Exception as e:
-            logger.warning(f"清理沙箱时出错: {e}")
+        # 更新任务状态（分析期间任务可能已被删除）
+        token.check()
+        complete_task(task_id, result)
         
+    except TaskCancelled as e:
+        logger.warning(f"审计任务 {task_id} 已终止: {e.reason}")
+        task = audit_tasks.get(task_id)
+        # 用户取消时接口已更新状态，这里只处理超时和服务关闭
+        if task and task.get("status") == "running":
+            if e.reason == "shutdown":
+                # 任务保留在未结束任务日志中，重启后重新排队
+                return
+            if e.reason == "timeout":
+                task["status"] = "failed"
+                task["error"] = f"任务超过时间预算（{Config.TASK_TIMEOUT:g} 秒）"
+            else:
+                task["status"] = "cancelled"
+                task["error"] = f"任务已终止: {e.reason}"
+            task["completion_time"] = datetime.now().isoformat()
+            task_finished(task_id)
     except Exception as e:
         logger.error(f"审计任务 {task_id} 失败: {e}", exc_info=True)
         task = audit_tasks.get(task_id)
@@ -346,68 +334,138 @@ def run_audit(task_id: str, file_path: str, language: str):
             task["status"] = "failed"
             task["error"] = str(e)
             task["completion_time"] = datetime.now().isoformat()
+            task_finished(task_id)
+    finally:
+        task_tokens.pop(task_id, None)
+        token.close()
+
+
+def save_task(filename: str, language: str, content: bytes, tenant: TenantPolicy,
+              batch_id: Optional[str] = None) -> Dict:
+    """
+    保存上传的源码并登记为 pending 任务（入队由调用方完成）
+
+    Raises:
+        OSError: 文件保存失败
+    """
+    task_id = str(uuid.uuid4())[:8]
+    upload_path = UPLOAD_DIR / f"{task_id}_{safe_name(filename)}"
+    with open(upload_path, "wb") as f:
+        f.write(content)
+    
+    task = {
+        "task_id": task_id,
+        "filename": filename,
+        "language": language,
+        "status": "pending",
+        "upload_time": datetime.now().isoformat(),
+        "file_size": len(content),
+        "file_path": str(upload_path),
+        "tenant": tenant.name,
+        "issues": [],
+        "summary": "等待分析",
+        "error": None
+    }
+    if batch_id:
+        task["batch_id"] = batch_id
+    audit_tasks[task_id] = task
+    task_index.upsert(task)
+    task_journal.add(task)
+    if broker is None:
+        task_tokens[task_id] = CancelToken()
+    return task
+
+
+def schedule_item(task: Dict):
+    """任务的调度参数 (task_id, 预估 Token, 执行数据)"""
+    return task["task_id"], estimate_tokens(task["file_size"]), {
+        "file_path": task["file_path"],
+        "filename": task["filename"],
+        "language": task["language"]
+    }
+
+
+def restore_tasks() -> int:
+    """
+    重新登记并排队上次关闭时未结束的任务（按上传时间顺序），返回重新排队的任务数
+
+    上传文件已丢失的任务按失败处理；批次记录按恢复的子任务重建（重启前已结束的子任务不在其中）
+    """
+    restored = 0
+    for saved in task_journal.unfinished():
+        task_id = saved["task_id"]
+        if task_id in audit_tasks:
+            continue
+        task = dict(saved, status="pending", issues=[], summary="服务重启后重新排队", error=None)
+        audit_tasks[task_id] = task
+        if task.get("batch_id"):
+            audit_batches.setdefault(task["batch_id"], {
+                "batch_id": task["batch_id"],
+                "tenant": task.get("tenant"),
+                "upload_time": task.get("upload_time"),
+                "task_ids": [],
+                "skipped": []
+            })["task_ids"].append(task_id)
+        if not os.path.exists(task.get("file_path") or ""):
+            task["status"] = "failed"
+            task["error"] = "服务重启后上传文件已丢失，请重新上传"
+            task["completion_time"] = datetime.now().isoformat()
+            task_finished(task_id)
+            continue
+        task_index.upsert(task)
+        if broker is None:
+            task_tokens[task_id] = CancelToken()
+        task_id, cost, data = schedule_item(task)
+        scheduler.submit(task_id, tenant_registry.policy(task.get("tenant")), cost, data)
+        restored += 1
+    return restored
 
 
 @app.post("/api/audit/upload")
 async def upload_file(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    language: str = Form("python")
+    language: str = Form("python"),
+    x_api_key: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
 ):
     """
     上传代码文件进行安全审计
+    
+    任务按租户（X-API-Key 或 X-Tenant-ID）公平排队
     """
+    tenant = tenant_registry.resolve(x_api_key, x_tenant_id)
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="缺少或无效的 API Key（X-API-Key）")
+    
     # 验证文件类型
-    allowed_extensions = [".py", ".java", ".js", ".ts", ".c", ".cpp", ".go", ".php", ".rb", ".cs"]
     file_ext = Path(file.filename).suffix.lower()
     
-    if file_ext not in allowed_extensions:
+    if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"不支持的文件类型。支持的类型: {', '.join(allowed_extensions)}"
+            detail=f"不支持的文件类型。支持的类型: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
     # 验证语言参数
-    supported_languages = ["python", "java", "javascript", "typescript", "c", "cpp", "go", "php", "ruby", "csharp"]
-    if language.lower() not in supported_languages:
+    if language.lower() not in SUPPORTED_LANGUAGES:
         raise HTTPException(
             status_code=400,
-            detail=f"不支持的语言。支持的语言: {', '.join(supported_languages)}"
+            detail=f"不支持的语言。支持的语言: {', '.join(SUPPORTED_LANGUAGES)}"
         )
     
-    # 生成任务ID
-    task_id = str(uuid.uuid4())[:8]
-    
-    # 保存上传的文件
-    upload_path = UPLOAD_DIR / f"{task_id}_{file.filename}"
+    # 保存上传的文件并初始化任务状态
     try:
         content = await file.read()
-        with open(upload_path, "wb") as f:
-            f.write(content)
-        
-        file_size = len(content)
-        logger.info(f"文件上传成功: {file.filename} ({file_size} 字节), 任务ID: {task_id}")
+        task = save_task(file.filename, language, content, tenant)
+        logger.info(f"文件上传成功: {file.filename} ({len(content)} 字节), 任务ID: {task['task_id']}")
         
     except Exception as e:
         logger.error(f"保存文件失败: {e}")
         raise HTTPException(status_code=500, detail=f"文件保存失败: {e}")
     
-    # 初始化任务状态
-    audit_tasks[task_id] = {
-        "task_id": task_id,
-        "filename": file.filename,
-        "language": language,
-        "status": "pending",
-        "upload_time": datetime.now().isoformat(),
-        "file_size": file_size,
-        "file_path": str(upload_path),
-        "issues": [],
-        "summary": "等待分析",
-        "error": None
-    }
-    
-    # 在后台运行审计任务
-    background_tasks.add_task(run_audit, task_id, str(upload_path), language)
+    # 按租户排队，由执行线程（或分布式队列的 Worker）执行
+    task_id, cost, data = schedule_item(task)
+    scheduler.submit(task_id, tenant, cost, data)
     
     return {
         "task_id": task_id,
@@ -418,17 +476,170 @@ async def upload_file(
     }
 
 
-@app.get("/api/audit/result/{task_id}")
-async def get_audit_result(task_id: str):
+@app.post("/api/audit/batch")
+async def upload_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    manifest: Optional[str] = Form(None),
+    language: Optional[str] = Form(None),
+    x_api_key: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
     """
-    获取审计结果
+    批量上传（CI 集成）：一次提交多个文件，创建一个批次和每个文件的子任务
+    
+    - files: 多个文件字段；manifest: JSON 清单（[{"filename", "language", "content"}]），两者可同时提供
+    - language: 无法按扩展名推断语言时使用的默认语言
+    - 不支持的文件不会导致整个请求失败，在 skipped 中列出；子任务一次性进入同一租户的调度队列
+    - 结果通过 GET /api/audit/batch/{batch_id}/results 以 NDJSON 流式获取
     """
-    task = audit_tasks.get(task_id)
+    tenant = tenant_registry.resolve(x_api_key, x_tenant_id)
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="缺少或无效的 API Key（X-API-Key）")
     
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    # (文件, 尚未读取的上传文件)：清单中的内容已在请求体中，上传文件在校验通过后才读取
+    items: List[Tuple[BatchItem, Optional[UploadFile]]] = []
+    if manifest:
+        try:
+            items.extend((item, None) for item in parse_manifest(manifest))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    items.extend((BatchItem(file.filename, None, b""), file) for file in files or [])
+    
+    # 先按文件数拒绝，再读取任何文件内容
+    if not items:
+        raise HTTPException(status_code=400, detail="未提供文件（files 或 manifest）")
+    if len(items) > Config.MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单个批次最多 {Config.MAX_BATCH_FILES} 个文件，本次 {len(items)} 个"
+        )
     
-    # 格式化返回结果
+    default_language = language.lower() if language else None
+    accepted, skipped = [], []
+    for item, upload in items:
+        reason = check_item(item, default_language)
+        if reason is None and upload is not None:
+            # 最多读取 MAX_FILE_SIZE + 1 字节，足以判断是否超限，超限文件不会整个读入内存
+            item.content = await upload.read(Config.MAX_FILE_SIZE + 1)
+        if reason is None and len(item.content) > Config.MAX_FILE_SIZE:
+            reason = "文件超过大小限制"
+        if reason:
+            skipped.append({"filename": item.filename, "reason": reason})
+        else:
+            accepted.append(item)
+    if not accepted:
+        raise HTTPException(status_code=400, detail=f"没有可审计的文件（跳过 {len(skipped)} 个）")
+    
+    batch_id = str(uuid.uuid4())[:8]
+    tasks = []
+    try:
+        for item in accepted:
+            tasks.append(save_task(item.filename, item.language, item.content, tenant, batch_id))
+    except OSError as e:
+        logger.error(f"保存批次 {batch_id} 的文件失败: {e}")
+        for task in tasks:
+            remove_task(task["task_id"])
+        raise HTTPException(status_code=500, detail=f"文件保存失败: {e}")
+    
+    audit_batches[batch_id] = {
+        "batch_id": batch_id,
+        "tenant": tenant.name,
+        "upload_time": datetime.now().isoformat(),
+        "task_ids": [task["task_id"] for task in tasks],
+        "skipped": skipped
+    }
+    scheduler.submit_batch(tenant, [schedule_item(task) for task in tasks])
+    logger.info(f"批次 {batch_id} 上传成功: {len(tasks)} 个文件，跳过 {len(skipped)} 个")
+    
+    return {
+        "batch_id": batch_id,
+        "status": "pending",
+        "total": len(tasks),
+        "tasks": [
+            {"task_id": task["task_id"], "filename": task["filename"], "language": task["language"]}
+            for task in tasks
+        ],
+        "skipped": skipped,
+        "status_url": f"/api/audit/batch/{batch_id}",
+        "results_url": f"/api/audit/batch/{batch_id}/results"
+    }
+
+
+@app.get("/api/audit/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """
+    批次进度：按状态统计子任务，并列出各子任务的摘要
+    """
+    batch = audit_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="批次不存在或已删除")
+    
+    counts = batch_counts(batch["task_ids"], audit_tasks.get)
+    return {
+        "batch_id": batch_id,
+        "tenant": batch["tenant"],
+        "upload_time": batch["upload_time"],
+        "total": len(batch["task_ids"]),
+        "counts": counts,
+        "done": all(status in TERMINAL_STATUSES or status == "deleted" for status in counts),
+        "tasks": [summarize_task(audit_tasks[tid]) for tid in batch["task_ids"] if tid in audit_tasks],
+        "skipped": batch["skipped"]
+    }
+
+
+@app.get("/api/audit/batch/{batch_id}/results")
+async def stream_batch_results(batch_id: str):
+    """
+    批量结果（NDJSON）：子任务按结束先后各输出一行（内容与单任务结果接口一致），
+    全部结束后输出一行 {"type": "summary"}，随后关闭连接
+    """
+    batch = audit_batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="批次不存在或已删除")
+    
+    return StreamingResponse(
+        stream_results(batch_id, batch["task_ids"], audit_tasks.get, task_result, task_watch),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.delete("/api/audit/batch/{batch_id}")
+async def delete_batch(batch_id: str):
+    """
+    删除批次及其所有子任务（运行中的子任务会先被取消）
+    """
+    batch = audit_batches.pop(batch_id, None)
+    if not batch:
+        raise HTTPException(status_code=404, detail="批次不存在或已删除")
+    
+    deleted = 0
+    for task_id in batch["task_ids"]:
+        if task_id in audit_tasks:
+            remove_task(task_id)
+            deleted += 1
+    task_watch.forget(batch_key(batch_id))
+    
+    return {
+        "message": f"批次 {batch_id} 已删除",
+        "deleted": True,
+        "deleted_tasks": deleted
+    }
+
+
+# 结果缓存策略：进行中的任务每次都需要验证；已完成的任务不再变化，允许客户端短时间直接复用
+CACHE_CONTROL_ACTIVE = "no-cache"
+CACHE_CONTROL_COMPLETED = "private, max-age=60"
+
+
+def task_result(task: Dict) -> Dict:
+    """
+    结果接口返回的任务内容（单任务结果接口与批量结果流共用）；
+    已完成的任务在 archive_task 中编码后只保留 encoded_result，直接取其内容
+    """
+    encoded = task.get("encoded_result")
+    if encoded is not None:
+        return encoded.content()
     response = {
         "task_id": task["task_id"],
         "filename": task["filename"],
@@ -444,73 +655,318 @@ async def get_audit_result(task_id: str):
     
     # 如果任务失败，返回错误信息
     if task["status"] == "failed":
-        return JSONResponse(
-            status_code=500,
-            content={
-                **response,
-                "error": task.get("error", "未知错误")
-            }
-        )
-    
+        response["error"] = task.get("error") or "未知错误"
+    elif task["status"] == "cancelled":
+        response["message"] = "任务已取消"
     # 如果任务还在进行中
+    elif task["status"] != "completed":
+        response["message"] = "分析仍在进行中，请稍后刷新"
+        response["progress"] = "running"
+    return response
+
+
+@app.get("/api/audit/result/{task_id}")
+async def get_audit_result(
+    task_id: str,
+    wait: float = 0,
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    获取审计结果
+    
+    - ETag 为任务版本号，If-None-Match 与当前版本一致时返回 304
+    - wait=N 长轮询：任务进行中且相对客户端已有的版本（未带 If-None-Match 时为请求时的版本）没有变化时，
+      最多挂起 N 秒（不超过 Config.LONG_POLL_MAX），状态或结果变化后立即返回
+    - 已完成的任务结果不再变化，首次读取时序列化并缓存压缩后的字节，之后按 Accept-Encoding 直接返回
+    """
+    task = audit_tasks.get(task_id)
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    
+    # 先取版本再读内容：并发变化时只会把新内容标成旧版本（下次轮询多返回一次），不会把旧内容标成新版本
+    known = task_watch.known_version(task_id, if_none_match)
+    version = task_watch.version(task_id)
+    if wait > 0 and task["status"] in ("pending", "running") and known in (None, version):
+        version = await task_watch.wait(task_id, version, min(wait, Config.LONG_POLL_MAX))
+        task = audit_tasks.get(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    
+    headers = {
+        "ETag": task_watch.etag(task_id, version),
+        "Cache-Control": CACHE_CONTROL_COMPLETED if task["status"] == "completed" else CACHE_CONTROL_ACTIVE
+    }
+    if known == version:
+        return Response(status_code=304, headers=headers)
+    
+    encoded = task.get("encoded_result")
+    if encoded is not None:
+        response = encoded.response(accept_encoding)
+        response.headers.update(headers)
+        return response
+    
+    return ORJSONResponse(
+        status_code=500 if task["status"] == "failed" else 200, headers=headers, content=task_result(task)
+    )
+
+
+@app.get("/api/audit/result/{task_id}/raw")
+async def get_raw_output(task_id: str, accept_encoding: Optional[str] = Header(None)):
+    """
+    获取已完成任务的原始输出（Bandit JSON、LLM 原始结果），从冷存储按需加载
+    """
+    task = audit_tasks.get(task_id)
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    
     if task["status"] != "completed":
-        return {
-            **response,
-            "message": "分析仍在进行中，请稍后刷新",
-            "progress": "running"
-        }
+        raise HTTPException(status_code=409, detail=f"任务未完成（{task['status']}）")
     
-    return response
+    raw = cold_store.get(task_id)
+    if raw is None:
+        raise HTTPException(status_code=404, detail="原始输出不存在或已被存储清理回收")
+    
+    return EncodedBody.of({"task_id": task_id, **raw}).response(accept_encoding)
 
 
-@app.get("/api/audit/tasks")
-async def list_audit_tasks(limit: int = 10, status: Optional[str] = None):
+# 任务列表可返回的字段
+TASK_LIST_FIELDS = (
+    "task_id", "filename", "language", "status", "upload_time",
+    "completion_time", "issue_count", "summary"
+)
+
+
+def issue_count(task: Dict) -> int:
+    """问题数（已完成的任务只保留计数和编码后的结果）"""
+    if "issue_count" in task:
+        return task["issue_count"]
+    return len(task.get("issues") or [])
+
+
+def summarize_task(task: Dict, fields: Optional[List[str]] = None) -> Dict:
     """
-    列出所有审计任务
+    生成任务列表中的简化条目
+
+    Args:
+        task: 任务字典
+        fields: 需要返回的字段（字段投影），默认全部
     """
-    tasks = list(audit_tasks.values())
+    item = {
+        "task_id": task["task_id"],
+        "filename": task["filename"],
+        "language": task["language"],
+        "status": task["status"],
+        "upload_time": task["upload_time"],
+        "completion_time": task.get("completion_time"),
+        "issue_count": issue_count(task),
+        "summary": task.get("summary", "")[:100]  # 只取前100字符
+    }
+    if fields:
+        item = {field: item[field] for field in fields}
+    return item
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的字段投影参数"""
+    if not fields:
+        return None
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in TASK_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的字段: {', '.join(unknown)}。支持的字段: {', '.join(TASK_LIST_FIELDS)}"
+        )
+    return selected
+
+
+@app.get("/api/audit/tasks")
+async def list_audit_tasks(
+    limit: int = 10,
+    status: Optional[str] = None,
+    language: Optional[str] = None,
+    severity: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    列出审计任务（按上传时间倒序）
     
-    # 按上传时间排序（最新的在前）
-    tasks.sort(key=lambda x: x.get("upload_time", ""), reverse=True)
+    - 过滤：status / language / severity（包含该级别问题的任务）/ since~until（ISO 时间）
+    - 分页：使用上一页返回的 next_cursor 获取下一页
+    - 投影：fields=task_id,status,issue_count 只返回指定字段
+    """
+    limit = max(1, min(limit, 500))
+    selected = parse_fields(fields)
     
-    # 筛选状态
-    if status:
-        tasks = [t for t in tasks if t.get("status") == status]
+    try:
+        task_ids, next_cursor = task_index.query(
+            limit=limit,
+            cursor=cursor,
+            since=since,
+            until=until,
+            status=status,
+            language=language,
+            severity=severity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # 限制数量
-    tasks = tasks[:limit]
+    simplified_tasks = [
+        summarize_task(audit_tasks[tid], selected)
+        for tid in task_ids if tid in audit_tasks
+    ]
     
-    # 简化响应
-    simplified_tasks = []
-    for task in tasks:
-        simplified_tasks.append({
+    return {
+        "total_tasks": len(audit_tasks),
+        "returned_tasks": len(simplified_tasks),
+        "next_cursor": next_cursor,
+        "tasks": simplified_tasks
+    }
+
+
+@app.get("/api/tasks/recent")
+async def recent_tasks(limit: int = 10):
+    """
+    最近的审计任务（仪表盘使用）
+    """
+    task_ids, _ = task_index.query(limit=max(1, min(limit, 100)))
+    recent = []
+    for tid in task_ids:
+        task = audit_tasks.get(tid)
+        if not task:
+            continue
+        recent.append({
             "task_id": task["task_id"],
             "filename": task["filename"],
+            "project_name": task["filename"],
             "language": task["language"],
             "status": task["status"],
-            "upload_time": task["upload_time"],
-            "completion_time": task.get("completion_time"),
-            "issue_count": len(task.get("issues", [])),
-            "summary": task.get("summary", "")[:100]  # 只取前100字符
+            "vulnerabilities": issue_count(task),
+            "created_at": task["upload_time"]
         })
+    return recent
+
+
+@app.get("/api/dashboard/trend")
+async def dashboard_trend(days: int = 7):
+    """
+    近 N 天审计任务数与漏洞数趋势
+    """
+    return dashboard_stats.trend(days=max(1, min(days, 365)))
+
+
+@app.get("/api/dashboard/vulnerability-types")
+async def dashboard_vulnerability_types(days: int = 30, top: int = 10):
+    """
+    漏洞类型分布
+    """
+    return dashboard_stats.vulnerability_types(days=max(1, min(days, 365)), top=max(1, top))
+
+
+@app.get("/api/dashboard/distribution")
+async def dashboard_distribution(days: int = 30):
+    """
+    按严重级别、漏洞类型、语言、来源的合计
+    """
+    return dashboard_stats.distribution(days=max(1, min(days, 365)))
+
+
+@app.get("/api/findings/search")
+async def search_findings(
+    q: Optional[str] = None,
+    severity: Optional[str] = None,
+    language: Optional[str] = None,
+    task_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0
+):
+    """
+    检索历史审计发现的问题
     
+    - q: 检索词（类型/描述/文件/代码片段/修复建议），空格分隔的词需全部命中，按相关度排序
+    - severity / language / task_id: 结构化过滤
+    """
+    results = finding_index.search(
+        query=q,
+        severity=severity,
+        language=language,
+        task_id=task_id,
+        limit=max(1, min(limit, 200)),
+        offset=offset
+    )
     return {
-        "total_tasks": len(audit_tasks),
-        "returned_tasks": len(simplified_tasks),
-        "tasks": simplified_tasks
+        "query": q,
+        "returned": len(results),
+        "results": results
     }
 
 
-@app.delete("/api/audit/task/{task_id}")
-async def delete_audit_task(task_id: str):
+def release_task(task_id: str):
+    """取消或删除任务时移出调度队列；已投递给 Worker 的任务通知其停止并立即归还槽位"""
+    if scheduler.remove(task_id):
+        task_tokens.pop(task_id, None)
+        return
+    if broker is not None:
+        broker.cancel(task_id)
+        scheduler.release(task_id)
+
+
+@app.get("/api/scheduler/tenants")
+async def tenant_metrics():
     """
-    删除审计任务
+    按租户的调度统计：排队/执行/完成数、等待时间、Token 用量与剩余配额
+    """
+    return {
+        "scheduler": scheduler.stats(),
+        "tenants": scheduler.metrics()
+    }
+
+
+@app.post("/api/audit/task/{task_id}/cancel")
+async def cancel_audit_task(task_id: str):
+    """
+    取消排队中或运行中的审计任务，立即终止进行中的静态扫描和 LLM 请求
     """
     task = audit_tasks.get(task_id)
     
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
+    if task["status"] not in ("pending", "running"):
+        raise HTTPException(status_code=409, detail=f"任务已结束（{task['status']}），无法取消")
+    
+    task["status"] = "cancelled"
+    task["error"] = "任务已被用户取消"
+    task["completion_time"] = datetime.now().isoformat()
+    token = task_tokens.get(task_id)
+    if token:
+        token.cancel("cancelled")
+    release_task(task_id)
+    task_finished(task_id)
+    
+    return {
+        "task_id": task_id,
+        "status": "cancelled",
+        "message": f"任务 {task_id} 已取消"
+    }
+
+
+def remove_task(task_id: str):
+    """删除任务：取消执行、清理上传文件、索引和冷存储"""
+    task = audit_tasks.get(task_id)
+    if task is None:
+        return
+    token = task_tokens.get(task_id)
+    if token:
+        token.cancel("deleted")
+    release_task(task_id)
+    
     # 清理文件
     file_path = task.get("file_path")
     if file_path and os.path.exists(file_path):
@@ -522,6 +978,27 @@ async def delete_audit_task(task_id: str):
     
     # 从内存中移除
     del audit_tasks[task_id]
+    task_watch.forget(task_id)
+    task_index.remove(task_id)
+    task_journal.remove(task_id)
+    dashboard_stats.discard_task(task_id)
+    finding_index.remove_task(task_id)
+    cold_store.delete(task_id)
+    if task.get("batch_id"):
+        task_watch.bump(batch_key(task["batch_id"]))
+
+
+@app.delete("/api/audit/task/{task_id}")
+async def delete_audit_task(task_id: str):
+    """
+    删除审计任务（运行中的任务会先被取消）
+    """
+    task = audit_tasks.get(task_id)
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    remove_task(task_id)
     
     return {
         "message": f"任务 {task_id} 已删除",
@@ -540,7 +1017,12 @@ async def health_check():
         "service": "cyber-audit-api",
         "version": "1.0.0",
         "active_tasks": len([t for t in audit_tasks.values() if t.get("status") == "running"]),
-        "total_tasks": len(audit_tasks)
+        "total_tasks": len(audit_tasks),
+        "storage": janitor.stats(),
+        "verdict_reuse": verdict_index.stats(),
+        "queue": broker.stats() if broker is not None else None,
+        "scheduler": scheduler.stats(),
+        "result_polling": task_watch.stats()
     }
 
 
@@ -555,8 +1037,20 @@ async def root():
         "endpoints": {
             "上传文件": "POST /api/audit/upload",
             "获取结果": "GET /api/audit/result/{task_id}",
+            "原始输出": "GET /api/audit/result/{task_id}/raw",
             "列出任务": "GET /api/audit/tasks",
+            "最近任务": "GET /api/tasks/recent",
+            "趋势统计": "GET /api/dashboard/trend",
+            "漏洞类型分布": "GET /api/dashboard/vulnerability-types",
+            "分布统计": "GET /api/dashboard/distribution",
+            "检索历史问题": "GET /api/findings/search",
+            "租户调度统计": "GET /api/scheduler/tenants",
+            "取消任务": "POST /api/audit/task/{task_id}/cancel",
             "删除任务": "DELETE /api/audit/task/{task_id}",
+            "批量上传": "POST /api/audit/batch",
+            "批次进度": "GET /api/audit/batch/{batch_id}",
+            "批量结果（NDJSON）": "GET /api/audit/batch/{batch_id}/results",
+            "删除批次": "DELETE /api/audit/batch/{batch_id}",
             "健康检查": "GET /health"
         },
         "usage": "使用 curl 或 Postman 测试 API，或访问 /docs 查看交互式文档"
@@ -596,8 +1090,26 @@ async def startup_event():
         logger.warning("⚠ OpenAI API Key 未配置，LLM 分析将使用模拟数据")
         logger.info("  请在 .env 文件中配置 OPENAI_API_KEY")
     
-    # 清理旧的临时文件
-    cleanup_old_files()
+    # 上次关闭时未结束的任务重新排队（先于存储清理登记，其上传文件不会被回收）
+    restored = restore_tasks()
+    if restored:
+        logger.info(f"已恢复 {restored} 个未结束的任务")
+    
+    # 启动后台存储清理（首次巡检会回收过期的上传文件和残留沙箱）
+    janitor.start()
+    
+    # 按调度顺序执行任务；分布式模式下投递到队列并消费 Worker 回传的结果
+    if broker is None:
+        for i in range(scheduler.slots):
+            threading.Thread(target=execute_audits, args=(background_stop,), name=f"audit-executor-{i}", daemon=True).start()
+    else:
+        threading.Thread(target=dispatch_to_broker, args=(background_stop,), name="audit-dispatch", daemon=True).start()
+        threading.Thread(target=collect_results, args=(background_stop,), name="audit-results", daemon=True).start()
+        if isinstance(broker, job_queue.LocalBroker):
+            local_workers.extend(start_workers(
+                broker, max(1, Config.WORKER_CONCURRENCY), sandbox=sandbox, verdicts=verdict_index
+            ))
+        logger.info(f"任务队列: {Config.AUDIT_BROKER_URL}（进程内 Worker: {len(local_workers)}）")
     
     logger.info(f"上传目录: {UPLOAD_DIR.absolute()}")
     logger.info("服务已启动，等待请求...")
@@ -608,36 +1120,37 @@ async def shutdown_event():
     """应用关闭时执行"""
     logger.info("正在关闭 Cyber Audit API...")
     
+    # 终止仍在运行的任务
+    for token in list(task_tokens.values()):
+        token.cancel("shutdown")
+    
+    # 停止执行/投递/结果消费线程和进程内 Worker（进行中的任务交还队列）
+    background_stop.set()
+    scheduler.wake()
+    for worker in local_workers:
+        worker.stop()
+    
+    # 停止存储清理器
+    await janitor.stop()
+    
     # 清理所有沙箱
     sandbox.cleanup_all()
     
-    # 清理临时文件
-    cleanup_uploaded_files()
+    # 清理临时文件：未结束任务的上传文件保留，重启后重新排队；
+    # 已结束任务的状态只在内存中，冷存储随之失效
+    cleanup_uploaded_files(keep={Path(t["file_path"]).name for t in task_journal.unfinished() if t.get("file_path")})
+    cold_store.clear()
     
     logger.info("服务已关闭")
 
 
-def cleanup_old_files(max_age_hours: int = 24):
-    """清理旧的上传文件"""
+def cleanup_uploaded_files(keep: Optional[set] = None):
+    """清理上传的文件（keep 中的文件名保留）"""
+    keep = keep or set()
     try:
-        current_time = datetime.now().timestamp()
         for file_path in UPLOAD_DIR.glob("*"):
-            # 获取文件修改时间
-            mtime = file_path.stat().st_mtime
-            age_hours = (current_time - mtime) / 3600
-            
-            if age_hours > max_age_hours:
+            if file_path.name not in keep:
                 file_path.unlink()
-                logger.debug(f"已清理旧文件: {file_path.name}")
-    except Exception as e:
-        logger.warning(f"清理旧文件时出错: {e}")
-
-
-def cleanup_uploaded_files():
-    """清理所有上传的文件"""
-    try:
-        for file_path in UPLOAD_DIR.glob("*"):
-            file_path.unlink()
         logger.info(f"已清理上传目录: {UPLOAD_DIR}")
     except Exception as e:
         logger.warning(f"清理上传目录时出错: {e}")
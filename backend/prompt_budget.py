@@ -0,0 +1,265 @@
+"""
+提示词 Token 预算
+按模型分词器精确计数（未安装 tiktoken 时按字符估算），
+在指令、静态分析结果和代码之间分配上下文窗口
+"""
+
+import os
+import json
+import math
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 常见模型的上下文窗口表（按前缀匹配，长前缀优先），与 MultiAgentAudit 共用仓库根目录下的同一份数据文件
+MODEL_CONTEXT_FILE = Path(
+    os.getenv("MODEL_CONTEXT_FILE") or Path(__file__).resolve().parent.parent / "shared" / "model_context.json"
+)
+# 数据文件缺失时所有模型按该值计算（取常见模型中最小的窗口，宁小勿大）
+FALLBACK_CONTEXT_TOKENS = 8192
+
+
+def load_context_table(path: Path) -> Tuple[Dict[str, int], int]:
+    """读取模型上下文窗口表，返回 (前缀 -> 窗口大小, 默认窗口大小)"""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        models = {prefix.lower(): int(tokens) for prefix, tokens in data["models"].items()}
+        return models, int(data.get("default", FALLBACK_CONTEXT_TOKENS))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"读取模型上下文窗口表失败，统一按 {FALLBACK_CONTEXT_TOKENS} Token 计算: {e}")
+        return {}, FALLBACK_CONTEXT_TOKENS
+
+
+MODEL_CONTEXT_TOKENS, DEFAULT_CONTEXT_TOKENS = load_context_table(MODEL_CONTEXT_FILE)
+
+SEVERITY_WEIGHT = {"high": 3, "medium": 2, "low": 1}
+CONFIDENCE_WEIGHT = {"high": 3, "medium": 2, "low": 1}
+
+
+def context_window(model: str) -> int:
+    """模型上下文窗口大小"""
+    model = (model or "").lower()
+    for prefix in sorted(MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_CONTEXT_TOKENS[prefix]
+    return DEFAULT_CONTEXT_TOKENS
+
+
+class TokenCounter:
+    """
+    Token 计数器
+    - 优先使用 tiktoken 的模型分词器
+    - 否则按 ASCII 约 4 字符/Token、非 ASCII（中文等）1 字符/Token 估算，宁多勿少
+    - 按内容哈希缓存计数结果，未变化的内容不会重复分词
+    """
+
+    def __init__(self, model: str = "gpt-4", cache_size: int = 4096):
+        self.model = model
+        self.cache_size = cache_size
+        self._encoding = self._load_encoding(model)
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _load_encoding(model: str):
+        if tiktoken is None:
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # 分词表下载失败等
+            logger.warning(f"加载分词器失败，改用估算: {e}")
+            return None
+
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return (len(text) - ascii_chars) + math.ceil(ascii_chars / 4)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = self.estimate(text)
+
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+
+def rank_static_issues(issues: List[Dict]) -> List[Dict]:
+    """
+    按相关性排序静态分析问题：严重性 > 置信度 > 行号；
+    同一行同一规则只保留一条
+    """
+    seen = set()
+    unique = []
+    for issue in issues:
+        key = (issue.get("category"), issue.get("line"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(issue)
+
+    def score(issue):
+        severity = SEVERITY_WEIGHT.get(str(issue.get("severity", "")).lower(), 0)
+        confidence = CONFIDENCE_WEIGHT.get(str(issue.get("confidence", "")).lower(), 0)
+        return (-severity, -confidence, issue.get("line") or 0)
+
+    return sorted(unique, key=score)
+
+
+def _compact_issue(issue: Dict) -> str:
+    fields = {k: issue[k] for k in ("severity", "confidence", "category", "line", "description") if issue.get(k)}
+    return json.dumps(fields, ensure_ascii=False)
+
+
+class PromptBudget:
+    """
+    在上下文窗口内分配提示词预算
+
+    总预算 = 上下文窗口 - 预留输出 - 固定指令；
+    静态分析结果最多占 static_share，按相关性依次放入；
+    其余全部给代码，放不下时围绕高危问题所在行截取片段并标注行号
+    """
+
+    def __init__(self, counter: TokenCounter, context_tokens: Optional[int] = None,
+                 reserve_output: int = 2048, static_share: float = 0.2, window_lines: int = 15):
+        self.counter = counter
+        self.context_tokens = context_tokens or context_window(counter.model)
+        self.reserve_output = min(reserve_output, self.context_tokens // 4)
+        self.static_share = static_share
+        self.window_lines = window_lines
+
+    def available(self, fixed_text: str) -> int:
+        return max(0, self.context_tokens - self.reserve_output - self.counter.count(fixed_text))
+
+    def select_static(self, issues: List[Dict], budget: int) -> Tuple[List[str], int]:
+        """按相关性放入静态分析问题，返回 (每条问题的紧凑 JSON, 已用 Token)"""
+        lines, used = [], 0
+        for issue in rank_static_issues(issues):
+            line = _compact_issue(issue)
+            cost = self.counter.count(line) + 1
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+        return lines, used
+
+    def fit_code(self, code: str, budget: int, focus_lines: List[int]) -> Tuple[str, bool]:
+        """
+        代码超出预算时，按优先级（问题行 -> 文件开头）选取行窗口，
+        相邻窗口合并，省略部分用注释标注，返回 (代码, 是否截断)
+        """
+        if self.counter.count(code) <= budget:
+            return code, False
+
+        lines = code.splitlines()
+        total = len(lines)
+        anchors = [line for line in focus_lines if line and 1 <= line <= total] + [1]
+
+        chosen: List[Tuple[int, int]] = []
+        used = 0
+        for anchor in anchors:
+            start = max(1, anchor - self.window_lines)
+            end = min(total, anchor + self.window_lines)
+            if any(s <= anchor <= e for s, e in chosen):
+                continue
+            cost = self.counter.count("\n".join(lines[start - 1:end])) + 16
+            if used + cost > budget:
+                continue
+            chosen.append((start, end))
+            used += cost
+
+        if not chosen:
+            # 单个窗口都放不下时按行截取开头
+            kept = []
+            for line in lines:
+                cost = self.counter.count(line) + 1
+                if used + cost > budget:
+                    break
+                kept.append(line)
+                used += cost
+            return "\n".join(kept), True
+
+        merged: List[List[int]] = []
+        for start, end in sorted(chosen):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        parts = []
+        cursor = 1
+        for start, end in merged:
+            if start > cursor:
+                parts.append(f"# ... 省略第 {cursor}-{start - 1} 行 ...")
+            parts.extend(lines[start - 1:end])
+            cursor = end + 1
+        if cursor <= total:
+            parts.append(f"# ... 省略第 {cursor}-{total} 行 ...")
+        return "\n".join(parts), True
+
+    def allocate(self, fixed_text: str, code: str, static_issues: List[Dict]) -> Dict:
+        """
+        分配预算
+
+        Returns:
+            code: 放入提示词的代码
+            static_lines: 放入的静态分析问题（紧凑 JSON）
+            stats: 各部分 Token 使用情况
+        """
+        available = self.available(fixed_text)
+        static_lines, static_used = self.select_static(
+            static_issues or [], int(available * self.static_share))
+        focus = [issue.get("line") for issue in rank_static_issues(static_issues or [])]
+        fitted_code, truncated = self.fit_code(code, available - static_used, focus)
+
+        stats = {
+            "context_tokens": self.context_tokens,
+            "instruction_tokens": self.counter.count(fixed_text),
+            "static_tokens": static_used,
+            "code_tokens": self.counter.count(fitted_code),
+            "static_included": len(static_lines),
+            "static_total": len(static_issues or []),
+            "code_truncated": truncated,
+            "exact_count": self.counter.exact,
+        }
+        return {"code": fitted_code, "static_lines": static_lines, "stats": stats}
+
+
+_counters: Dict[str, TokenCounter] = {}
+
+
+def get_counter(model: str) -> TokenCounter:
+    """同一模型共享计数器（及其缓存）"""
+    counter = _counters.get(model)
+    if counter is None:
+        counter = _counters[model] = TokenCounter(model)
+    return counter
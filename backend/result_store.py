@@ -0,0 +1,119 @@
+"""
+原始工具输出的冷存储
+原始工具输出（Bandit JSON、LLM 原始结果）压缩后写入磁盘，按需加载，不常驻内存；
+已完成任务的结果本身由 fast_response.EncodedBody 以压缩后的响应体保存（见 main.archive_task）
+
+序列化优先使用 msgpack，压缩优先使用 zstd，未安装时回退到 JSON + zlib；
+数据首字节记录所用格式，两种环境写出的数据可以互相读取
+"""
+
+import os
+import json
+import zlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 首字节格式标记
+FLAG_MSGPACK = 0x01
+FLAG_ZSTD = 0x02
+COMPRESS_LEVEL = 6
+
+
+def encode(data) -> bytes:
+    """序列化并压缩"""
+    flags = 0
+    if msgpack is not None:
+        raw = msgpack.packb(data, use_bin_type=True)
+        flags |= FLAG_MSGPACK
+    else:
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if zstandard is not None:
+        body = zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compress(raw)
+        flags |= FLAG_ZSTD
+    else:
+        body = zlib.compress(raw, COMPRESS_LEVEL)
+    return bytes([flags]) + body
+
+
+def decode(blob: bytes):
+    """解压并反序列化 encode 的输出"""
+    flags, body = blob[0], blob[1:]
+    if flags & FLAG_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("数据使用 zstd 压缩，需要安装 zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(body)
+    else:
+        raw = zlib.decompress(body)
+    if flags & FLAG_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("数据使用 msgpack 序列化，需要安装 msgpack")
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw)
+
+
+class ColdStore:
+    """
+    原始输出的磁盘冷存储，每个任务一个文件：{task_id}_raw.bin
+
+    生命周期与任务一致（删除任务时删除），不交给存储清理器按配额和过期时间回收
+    """
+
+    SUFFIX = "_raw.bin"
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, task_id: str) -> Path:
+        return self.root / f"{task_id}{self.SUFFIX}"
+
+    def put(self, task_id: str, data: Dict) -> int:
+        """写入（原子替换），返回压缩后的字节数"""
+        blob = encode(data)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self.path(task_id))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return len(blob)
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """读取原始输出，不存在（未生成或已被回收）时返回 None"""
+        try:
+            blob = self.path(task_id).read_bytes()
+        except FileNotFoundError:
+            return None
+        return decode(blob)
+
+    def delete(self, task_id: str):
+        try:
+            self.path(task_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for path in self.root.glob(f"*{self.SUFFIX}"):
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f"删除冷存储文件失败 {path}: {e}")
@@ -0,0 +1,44 @@
+"""
+源码读取
+上传文件大小受 MAX_FILE_SIZE 限制，整个读入后按 BOM 和试解码识别编码：
+utf-8 -> gb18030（兼容 GBK）-> latin-1，解码失败的字节以替换字符表示，不会中断审计
+"""
+
+import codecs
+from typing import Tuple
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+FALLBACK_ENCODINGS = ("utf-8", "gb18030")
+
+
+def detect_encoding(data: bytes) -> str:
+    """根据 BOM 和试解码判断编码，都不匹配时返回 latin-1（任何字节序列都能解码）"""
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def read_source(path) -> Tuple[str, str]:
+    """
+    读取源码文件
+
+    Returns:
+        (文本, 编码)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    encoding = detect_encoding(data)
+    return data.decode(encoding, errors="replace"), encoding
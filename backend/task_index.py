@@ -0,0 +1,198 @@
+"""
+任务索引模块
+按上传时间维护有序索引，并为状态/语言/严重级别维护倒排列表，
+支持游标分页与组合过滤，列表查询不再需要全量排序
+"""
+
+import json
+import base64
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+# (upload_time, task_id)，按字典序即时间顺序
+IndexKey = Tuple[str, str]
+
+
+def encode_cursor(key: IndexKey) -> str:
+    """将索引键编码为不透明的游标字符串"""
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> IndexKey:
+    """
+    解析游标
+
+    Raises:
+        ValueError: 游标格式非法
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        upload_time, task_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(upload_time), str(task_id)
+    except Exception:
+        raise ValueError(f"无效的游标: {cursor}")
+
+
+class TaskIndex:
+    """审计任务索引（线程安全）"""
+
+    INDEXED_FIELDS = ("status", "language", "severity")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: Dict[str, IndexKey] = {}
+        self._attrs: Dict[str, Dict[str, FrozenSet[str]]] = {}
+        self._ordered: List[IndexKey] = []
+        self._postings: Dict[Tuple[str, str], List[IndexKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _extract(task: Dict) -> Dict[str, FrozenSet[str]]:
+        """提取任务的可索引字段"""
+        return {
+            "status": frozenset([str(task.get("status", "")).lower()]),
+            "language": frozenset([str(task.get("language", "")).lower()]),
+            "severity": frozenset(
+                str(issue.get("severity", "")).lower()
+                for issue in task.get("issues") or []
+                if issue.get("severity")
+            ),
+        }
+
+    @staticmethod
+    def _insert(lst: List[IndexKey], key: IndexKey):
+        # 新任务通常是最新的，直接追加即可
+        if not lst or lst[-1] < key:
+            lst.append(key)
+        else:
+            insort(lst, key)
+
+    @staticmethod
+    def _discard(lst: List[IndexKey], key: IndexKey):
+        i = bisect_left(lst, key)
+        if i < len(lst) and lst[i] == key:
+            del lst[i]
+
+    def upsert(self, task: Dict):
+        """
+        添加或更新任务索引（任务状态、语言或问题列表变化后调用）
+
+        Args:
+            task: 任务字典，需包含 task_id 和 upload_time
+        """
+        task_id = task["task_id"]
+        key = (task.get("upload_time", ""), task_id)
+        attrs = self._extract(task)
+
+        with self._lock:
+            old_key = self._keys.get(task_id)
+            old_attrs = self._attrs.get(task_id, {})
+            if old_key is not None and old_key != key:
+                self.remove(task_id)
+                old_key, old_attrs = None, {}
+
+            if old_key is None:
+                self._insert(self._ordered, key)
+                self._keys[task_id] = key
+
+            for field in self.INDEXED_FIELDS:
+                before = old_attrs.get(field, frozenset())
+                after = attrs[field]
+                for value in before - after:
+                    postings = self._postings.get((field, value))
+                    if postings is not None:
+                        self._discard(postings, key)
+                        if not postings:
+                            del self._postings[(field, value)]
+                for value in after - before:
+                    self._insert(self._postings.setdefault((field, value), []), key)
+
+            self._attrs[task_id] = attrs
+
+    def remove(self, task_id: str):
+        """从索引中移除任务"""
+        with self._lock:
+            key = self._keys.pop(task_id, None)
+            if key is None:
+                return
+            self._discard(self._ordered, key)
+            for field, values in self._attrs.pop(task_id, {}).items():
+                for value in values:
+                    postings = self._postings.get((field, value))
+                    if postings is not None:
+                        self._discard(postings, key)
+                        if not postings:
+                            del self._postings[(field, value)]
+
+    def query(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        **filters: Optional[str]
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        按上传时间倒序查询任务
+
+        从最小的倒排列表出发，二分定位游标和时间范围，
+        其余过滤条件逐条校验，复杂度与返回条数相关而与任务总数无关（过滤条件高度稀疏时除外）
+
+        Args:
+            limit: 返回数量
+            cursor: 上一页返回的 next_cursor
+            since: 起始时间（ISO 格式，包含）
+            until: 截止时间（ISO 格式，包含；只给日期时包含当天）
+            **filters: status / language / severity
+
+        Returns:
+            (任务ID列表, 下一页游标；没有更多时为 None)
+
+        Raises:
+            ValueError: 游标非法或过滤字段不支持
+        """
+        limit = max(1, limit)
+        active = {}
+        for field, value in filters.items():
+            if field not in self.INDEXED_FIELDS:
+                raise ValueError(f"不支持的过滤字段: {field}")
+            if value:
+                active[field] = value.lower()
+
+        if until and len(until) == 10:
+            until = until + "T23:59:59.999999"
+        after_key = decode_cursor(cursor) if cursor else None
+
+        with self._lock:
+            if active:
+                lists = [(f, self._postings.get((f, v), [])) for f, v in active.items()]
+                driver_field, source = min(lists, key=lambda item: len(item[1]))
+                checks = [(f, v) for f, v in active.items() if f != driver_field]
+            else:
+                source, checks = self._ordered, []
+
+            hi = len(source)
+            if until:
+                hi = bisect_right(source, (until, "\uffff"))
+            if after_key is not None:
+                hi = min(hi, bisect_left(source, after_key))
+            lo = bisect_left(source, (since, "")) if since else 0
+
+            result: List[str] = []
+            last_key = None
+            i = hi - 1
+            while i >= lo:
+                key = source[i]
+                attrs = self._attrs[key[1]]
+                if all(value in attrs[field] for field, value in checks):
+                    if len(result) == limit:
+                        return result, encode_cursor(last_key)
+                    result.append(key[1])
+                    last_key = key
+                i -= 1
+
+        return result, None
@@ -0,0 +1,78 @@
+"""
+未结束任务日志
+任务状态只保存在内存中；pending/running 任务另外写入 SQLite，任务结束或删除时移除。
+服务重启后按日志重新登记并排队这些任务（上传文件在关闭时保留），已结束的任务不恢复
+"""
+
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Union
+
+logger = logging.getLogger(__name__)
+
+# 恢复任务所需的字段（结果、问题列表等运行期字段不写入）
+JOURNAL_FIELDS = ("task_id", "filename", "language", "upload_time", "file_size", "file_path", "tenant", "batch_id")
+
+
+class TaskJournal:
+    """未结束任务的持久化日志（线程安全）"""
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:"):
+        """
+        初始化日志
+
+        Args:
+            db_path: SQLite 数据库路径，默认内存库
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        if self.db_path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS unfinished_tasks (
+                task_id TEXT PRIMARY KEY,
+                upload_time TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM unfinished_tasks").fetchone()[0]
+
+    def add(self, task: Dict):
+        """登记新任务（重复登记时覆盖）"""
+        data = {field: task[field] for field in JOURNAL_FIELDS if task.get(field) is not None}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO unfinished_tasks (task_id, upload_time, data) VALUES (?, ?, ?)",
+                (task["task_id"], task.get("upload_time", ""), json.dumps(data, ensure_ascii=False))
+            )
+
+    def remove(self, task_id: str):
+        """任务结束或删除后移除（不存在时忽略）"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM unfinished_tasks WHERE task_id = ?", (task_id,))
+
+    def unfinished(self) -> List[Dict]:
+        """按上传时间排序的未结束任务"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM unfinished_tasks ORDER BY upload_time, task_id"
+            ).fetchall()
+        tasks = []
+        for (data,) in rows:
+            try:
+                tasks.append(json.loads(data))
+            except ValueError as e:
+                logger.warning(f"跳过损坏的任务日志记录: {e}")
+        return tasks
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
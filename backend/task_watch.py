@@ -0,0 +1,109 @@
+"""
+任务版本与变更通知
+每个任务维护一个版本号，状态或结果变化时递增：
+- 结果接口据此生成 ETag，轮询时内容未变直接返回 304，不再重建和序列化结果
+- 长轮询请求（?wait=N）挂起等待版本变化，变更发生在后台线程中，通过 call_soon_threadsafe 唤醒事件循环
+"""
+
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class TaskWatch:
+    """任务版本计数器（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+
+    def version(self, task_id: str) -> int:
+        with self._lock:
+            return self._versions.get(task_id, 0)
+
+    def etag(self, task_id: str, version: Optional[int] = None) -> str:
+        """弱 ETag：同一版本的 gzip / br / 原文响应视为等价"""
+        if version is None:
+            version = self.version(task_id)
+        return f'W/"{task_id}-{version}"'
+
+    @staticmethod
+    def known_version(task_id: str, if_none_match: Optional[str]) -> Optional[int]:
+        """
+        从 If-None-Match 中解析客户端已有的版本（取其中属于该任务的最大版本），无法解析时返回 None
+        """
+        found = None
+        prefix = f"{task_id}-"
+        for tag in (if_none_match or "").split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            tag = tag.strip('"')
+            if tag.startswith(prefix) and tag[len(prefix):].isdigit():
+                version = int(tag[len(prefix):])
+                found = version if found is None else max(found, version)
+        return found
+
+    def bump(self, task_id: str) -> int:
+        """任务变化后递增版本并唤醒等待者，返回新版本"""
+        with self._lock:
+            version = self._versions.get(task_id, 0) + 1
+            self._versions[task_id] = version
+            waiters = self._waiters.pop(task_id, [])
+        self._wake(waiters)
+        return version
+
+    def forget(self, task_id: str):
+        """任务删除后移除版本并唤醒等待者"""
+        with self._lock:
+            self._versions.pop(task_id, None)
+            waiters = self._waiters.pop(task_id, [])
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters):
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+    async def wait(self, task_id: str, version: int, timeout: float) -> int:
+        """
+        等待任务版本不再等于 version，最多 timeout 秒
+
+        Returns:
+            返回时的版本
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._lock:
+            if self._versions.get(task_id, 0) != version:
+                return self._versions.get(task_id, 0)
+            self._waiters.setdefault(task_id, []).append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(task_id)
+                if waiters and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[task_id]
+        return self.version(task_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "tracked_tasks": len(self._versions),
+                "waiting_requests": sum(len(w) for w in self._waiters.values())
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
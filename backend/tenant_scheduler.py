@@ -0,0 +1,325 @@
+"""
+多租户公平调度
+每个租户（API Key / X-Tenant-ID）一个队列，按加权公平排队（WFQ）在租户之间分配执行槽位：
+- 任务开销按预估 Token 计，租户的虚拟完成时间 = 开始时间 + 开销 / 权重，每次调度虚拟完成时间最小的队首任务，
+  大批量上传的租户不会挤占其他租户的单文件检查
+- 每个租户可限制同时执行的任务数和每分钟 Token 数（令牌桶，任务开始时按预估扣减、结束后按实际用量校正）
+- 按租户统计排队/执行/完成数、等待时间和 Token 用量
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+# 单个任务的固定 Token 开销（系统提示词 + 输出），加上源码部分按 4 字节/Token 估算
+BASE_TASK_TOKENS = 1000
+# 等待时间分位数的统计窗口
+WAIT_WINDOW = 200
+
+
+def estimate_tokens(file_size: int) -> int:
+    """按文件大小预估单个审计任务消耗的 Token"""
+    return BASE_TASK_TOKENS + max(0, file_size) // 4
+
+
+def llm_tokens(statistics: Optional[Dict]) -> Optional[int]:
+    """
+    任务实际消耗的 Token（输入 + 输出），取自统计信息中的 llm_usage；
+    用量未知（任务失败、没有统计信息、接口未返回用量）时返回 None，调度器保留预估扣减
+    """
+    usage = (statistics or {}).get("llm_usage")
+    if not usage:
+        return None
+    return usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+
+
+class TenantPolicy:
+    """租户配额：权重、并发任务上限、每分钟 Token 上限（0 表示不限）"""
+
+    __slots__ = ("name", "weight", "max_concurrent", "tokens_per_minute")
+
+    def __init__(self, name: str, weight: float = 1.0, max_concurrent: int = 0, tokens_per_minute: int = 0):
+        if weight <= 0:
+            raise ValueError(f"租户 {name} 的权重必须大于 0")
+        self.name = name
+        self.weight = float(weight)
+        self.max_concurrent = int(max_concurrent)
+        self.tokens_per_minute = int(tokens_per_minute)
+
+
+class TenantRegistry:
+    """
+    租户身份解析
+
+    配置了 API Key 时只接受已登记的 Key；未配置时按 X-Tenant-ID 区分租户，全部使用默认配额
+    """
+
+    def __init__(self, tenants_json: str = "", default: Optional[TenantPolicy] = None):
+        """
+        Args:
+            tenants_json: {"API Key": {"tenant": "team-a", "weight": 2, "max_concurrent": 2, "tokens_per_minute": 200000}}
+            default: 未登记租户使用的配额
+        """
+        self.default = default or TenantPolicy(DEFAULT_TENANT)
+        self.keys: Dict[str, TenantPolicy] = {}
+        for api_key, spec in (json.loads(tenants_json) if tenants_json else {}).items():
+            self.keys[api_key] = TenantPolicy(
+                spec.get("tenant") or api_key[:8],
+                weight=spec.get("weight", self.default.weight),
+                max_concurrent=spec.get("max_concurrent", self.default.max_concurrent),
+                tokens_per_minute=spec.get("tokens_per_minute", self.default.tokens_per_minute)
+            )
+
+    @property
+    def requires_key(self) -> bool:
+        return bool(self.keys)
+
+    def policy(self, name: Optional[str]) -> TenantPolicy:
+        """按租户名取配额（恢复重启前登记的任务时使用），未登记的租户使用默认配额"""
+        for policy in self.keys.values():
+            if policy.name == name:
+                return policy
+        d = self.default
+        return TenantPolicy(name or DEFAULT_TENANT, d.weight, d.max_concurrent, d.tokens_per_minute)
+
+    def resolve(self, api_key: Optional[str] = None, tenant_id: Optional[str] = None) -> Optional[TenantPolicy]:
+        """返回请求对应的租户配额；需要 API Key 但未提供或无效时返回 None"""
+        if self.requires_key:
+            return self.keys.get(api_key or "")
+        name = (tenant_id or "").strip()[:64] or DEFAULT_TENANT
+        d = self.default
+        return TenantPolicy(name, d.weight, d.max_concurrent, d.tokens_per_minute)
+
+
+class TokenBucket:
+    """每分钟 Token 配额，允许透支（实际用量超过预估时），透支期间不再开始新任务"""
+
+    def __init__(self, tokens_per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: int) -> float:
+        """开始一个预估 tokens 的任务还需等待的秒数（超过桶容量的任务只需桶满）"""
+        self._refill()
+        need = min(float(tokens), self.capacity) - self.level
+        return max(0.0, need / self.rate) if need > 0 else 0.0
+
+    def consume(self, tokens: float):
+        self._refill()
+        self.level -= tokens
+
+    @property
+    def available(self) -> int:
+        self._refill()
+        return int(self.level)
+
+
+class ScheduledTask:
+    """排队中的任务：开销、虚拟开始/完成时间、调度时附带的数据"""
+
+    __slots__ = ("task_id", "tenant", "cost", "start_tag", "finish_tag", "data", "submitted", "started")
+
+    def __init__(self, task_id: str, tenant: str, cost: int, start_tag: float, finish_tag: float, data: Dict):
+        self.task_id = task_id
+        self.tenant = tenant
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.data = data
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+
+
+class _TenantState:
+    def __init__(self, policy: TenantPolicy, clock: Callable[[], float]):
+        self.policy = policy
+        self.queue: deque = deque()
+        self.running: Dict[str, ScheduledTask] = {}
+        self.last_finish = 0.0
+        self.bucket = TokenBucket(policy.tokens_per_minute, clock) if policy.tokens_per_minute > 0 else None
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.tokens_used = 0
+        self.waits: deque = deque(maxlen=WAIT_WINDOW)
+
+    def blocked_for(self, task: ScheduledTask) -> Optional[float]:
+        """队首任务还需等待的秒数；0 表示可以开始，None 表示受并发上限阻塞"""
+        limit = self.policy.max_concurrent
+        if limit and len(self.running) >= limit:
+            return None
+        return self.bucket.wait_time(task.cost) if self.bucket else 0.0
+
+
+class FairScheduler:
+    """
+    加权公平调度器（线程安全）
+
+    submit 入队，执行方（进程内执行线程或向分布式队列投递的线程）通过 acquire 阻塞领取下一个任务，
+    任务结束、取消或删除后调用 release 归还槽位
+    """
+
+    def __init__(self, slots: int, clock: Callable[[], float] = time.monotonic):
+        self.slots = max(1, slots)
+        self.clock = clock
+        self.vtime = 0.0
+        self._cond = threading.Condition()
+        self._tenants: Dict[str, _TenantState] = {}
+        self._index: Dict[str, ScheduledTask] = {}
+        self._running = 0
+
+    def submit(self, task_id: str, tenant: TenantPolicy, cost: int, data: Optional[Dict] = None) -> ScheduledTask:
+        with self._cond:
+            task = self._enqueue(task_id, tenant, cost, data)
+            self._cond.notify_all()
+            return task
+
+    def submit_batch(self, tenant: TenantPolicy, items: List[Tuple[str, int, Dict]]) -> List[ScheduledTask]:
+        """
+        批量入队 [(task_id, cost, data)]：一次加锁、一次唤醒，批次内任务在租户队列中连续排列，
+        与逐个 submit 的公平性相同（仍按开销累加虚拟完成时间）
+        """
+        with self._cond:
+            tasks = [self._enqueue(task_id, tenant, cost, data) for task_id, cost, data in items]
+            self._cond.notify_all()
+            return tasks
+
+    def _enqueue(self, task_id: str, tenant: TenantPolicy, cost: int, data: Optional[Dict]) -> ScheduledTask:
+        """加入租户队列（需持有锁）"""
+        state = self._tenants.get(tenant.name)
+        if state is None:
+            state = self._tenants[tenant.name] = _TenantState(tenant, self.clock)
+        start = max(self.vtime, state.last_finish)
+        task = ScheduledTask(task_id, tenant.name, cost, start, start + cost / state.policy.weight, data or {})
+        state.last_finish = task.finish_tag
+        state.queue.append(task)
+        state.submitted += 1
+        self._index[task_id] = task
+        return task
+
+    def _pick(self):
+        """选出可以开始的任务（需持有锁），返回 (任务, 最短需等待秒数)"""
+        best, wait = None, None
+        if self._running >= self.slots:
+            return None, None
+        for state in self._tenants.values():
+            if not state.queue:
+                continue
+            head = state.queue[0]
+            blocked = state.blocked_for(head)
+            if blocked is None:
+                continue
+            if blocked > 0:
+                wait = blocked if wait is None else min(wait, blocked)
+            elif best is None or head.finish_tag < best.finish_tag:
+                best = head
+        return best, wait
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[ScheduledTask]:
+        """阻塞领取下一个任务，timeout 秒内没有可执行的任务返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                task, wait = self._pick()
+                if task is not None:
+                    state = self._tenants[task.tenant]
+                    state.queue.popleft()
+                    state.running[task.task_id] = task
+                    if state.bucket:
+                        state.bucket.consume(task.cost)
+                    self.vtime = max(self.vtime, task.start_tag)
+                    self._running += 1
+                    task.started = time.monotonic()
+                    state.waits.append(task.started - task.submitted)
+                    return task
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                waits = [w for w in (wait, remaining) if w is not None]
+                self._cond.wait(min(waits) if waits else None)
+
+    def release(self, task_id: str, tokens_used: Optional[int] = None) -> bool:
+        """
+        任务结束后归还槽位，tokens_used 为实际消耗（用于校正令牌桶），None 表示未知、按预估计入；
+        重复调用无副作用
+        """
+        with self._cond:
+            task = self._index.get(task_id)
+            if task is None or task.started is None:
+                return False
+            del self._index[task_id]
+            state = self._tenants[task.tenant]
+            state.running.pop(task_id, None)
+            self._running -= 1
+            state.completed += 1
+            if tokens_used is None:
+                state.tokens_used += task.cost
+            else:
+                state.tokens_used += tokens_used
+                if state.bucket:
+                    state.bucket.consume(tokens_used - task.cost)
+            self._cond.notify_all()
+            return True
+
+    def remove(self, task_id: str) -> bool:
+        """取消排队中的任务"""
+        with self._cond:
+            task = self._index.get(task_id)
+            if task is None or task.started is not None:
+                return False
+            del self._index[task_id]
+            state = self._tenants[task.tenant]
+            state.queue.remove(task)
+            state.cancelled += 1
+            self._cond.notify_all()
+            return True
+
+    def wake(self):
+        """唤醒阻塞在 acquire 的线程（如服务关闭时）"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def metrics(self) -> Dict[str, Dict]:
+        """按租户的调度统计"""
+        with self._cond:
+            result = {}
+            for name, state in self._tenants.items():
+                waits = sorted(state.waits)
+                result[name] = {
+                    "weight": state.policy.weight,
+                    "max_concurrent": state.policy.max_concurrent,
+                    "tokens_per_minute": state.policy.tokens_per_minute,
+                    "queued": len(state.queue),
+                    "running": len(state.running),
+                    "submitted": state.submitted,
+                    "completed": state.completed,
+                    "cancelled": state.cancelled,
+                    "tokens_used": state.tokens_used,
+                    "tokens_available": state.bucket.available if state.bucket else None,
+                    "wait_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0
+                }
+            return result
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "queued": sum(len(s.queue) for s in self._tenants.values()),
+                "tenants": len(self._tenants)
+            }
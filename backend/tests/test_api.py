@@ -0,0 +1,250 @@
+"""
+API 接口测试
+
+审计流程（audit_file）替换为可控的假实现，执行线程与调度器、索引等状态每个测试独立创建
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from cancellation import CancelToken
+from dashboard_stats import DashboardAggregates
+from finding_search import FindingSearchIndex
+from result_store import ColdStore
+from task_index import TaskIndex
+from task_journal import TaskJournal
+from task_watch import TaskWatch
+from tenant_scheduler import FairScheduler
+
+# 足够长的摘要，使结果响应体超过压缩阈值
+SUMMARY = "审计完成，未发现安全问题。" * 40
+
+
+class FakeAudit:
+    """替代 audit_file：release 之前保持运行（期间响应取消），之后返回一个没有问题的结果"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+
+    def __call__(self, task_id, file_path, language, sandbox, token: CancelToken, verdicts=None):
+        self.started.append(task_id)
+        while not self.release.wait(0.01):
+            token.check()
+        return {
+            "llm_result": {"summary": SUMMARY},
+            "issues": [],
+            "summary": SUMMARY,
+            "statistics": {"total_issues": 0}
+        }
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def audit(tmp_path, monkeypatch):
+    """独立的服务状态 + 单个执行槽位的进程内执行线程"""
+    fake = FakeAudit()
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    monkeypatch.setattr(main, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(main, "audit_file", fake)
+    monkeypatch.setattr(main, "audit_tasks", {})
+    monkeypatch.setattr(main, "audit_batches", {})
+    monkeypatch.setattr(main, "task_tokens", {})
+    monkeypatch.setattr(main, "task_index", TaskIndex())
+    monkeypatch.setattr(main, "task_watch", TaskWatch())
+    monkeypatch.setattr(main, "dashboard_stats", DashboardAggregates())
+    monkeypatch.setattr(main, "finding_index", FindingSearchIndex(tmp_path / "findings.db"))
+    monkeypatch.setattr(main, "task_journal", TaskJournal(tmp_path / "tasks.db"))
+    monkeypatch.setattr(main, "cold_store", ColdStore(tmp_path / "cold"))
+    monkeypatch.setattr(main, "scheduler", FairScheduler(1))
+
+    stop = threading.Event()
+    executor = threading.Thread(target=main.execute_audits, args=(stop,), daemon=True)
+    executor.start()
+    yield fake
+    stop.set()
+    fake.release.set()
+    main.scheduler.wake()
+    executor.join(timeout=5)
+    main.task_journal.close()
+
+
+@pytest.fixture
+def client():
+    # 不进入 with：不触发启动/关闭事件（关闭时会清理上传目录和沙箱）
+    return TestClient(main.app)
+
+
+def upload(client, filename="app.py", content=b"print('hello')\n"):
+    response = client.post(
+        "/api/audit/upload",
+        files={"file": (filename, content)},
+        data={"language": "python"}
+    )
+    assert response.status_code == 200
+    return response.json()["task_id"]
+
+
+def status_of(task_id):
+    task = main.audit_tasks.get(task_id)
+    return task["status"] if task else None
+
+
+class TestCancel:
+    """取消运行中的任务"""
+
+    def test_cancel_running_task_releases_slot(self, audit, client):
+        first = upload(client)
+        second = upload(client, "other.py")
+        assert wait_until(lambda: status_of(first) == "running")
+        assert status_of(second) == "pending"
+
+        response = client.post(f"/api/audit/task/{first}/cancel")
+        assert response.status_code == 200
+        assert response.json()["status"] == "cancelled"
+
+        # 唯一的执行槽位归还后，排队的任务开始执行
+        assert wait_until(lambda: status_of(second) == "running")
+        assert audit.started == [first, second]
+        assert status_of(first) == "cancelled"
+
+        audit.release.set()
+        assert wait_until(lambda: status_of(second) == "completed")
+        assert wait_until(lambda: main.scheduler.stats()["running"] == 0)
+        assert len(main.task_journal) == 0
+
+    def test_cancel_finished_task_conflicts(self, audit, client):
+        audit.release.set()
+        task_id = upload(client)
+        assert wait_until(lambda: status_of(task_id) == "completed")
+
+        response = client.post(f"/api/audit/task/{task_id}/cancel")
+        assert response.status_code == 409
+        assert client.post("/api/audit/task/missing/cancel").status_code == 404
+
+
+class TestResultEncoding:
+    """已完成任务的结果按 Accept-Encoding 协商"""
+
+    def test_negotiated_body(self, audit, client):
+        audit.release.set()
+        task_id = upload(client)
+        assert wait_until(lambda: status_of(task_id) == "completed")
+
+        gzipped = client.get(f"/api/audit/result/{task_id}", headers={"Accept-Encoding": "gzip"})
+        plain = client.get(f"/api/audit/result/{task_id}", headers={"Accept-Encoding": "identity"})
+        assert gzipped.status_code == plain.status_code == 200
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert "content-encoding" not in plain.headers
+        assert "Accept-Encoding" in gzipped.headers["vary"]
+        assert gzipped.json() == plain.json()
+        assert plain.json()["status"] == "completed"
+        assert plain.json()["summary"] == SUMMARY
+
+
+class TestResultPolling:
+    """ETag / If-None-Match 与 ?wait= 长轮询"""
+
+    def test_etag_not_modified(self, audit, client):
+        audit.release.set()
+        task_id = upload(client)
+        assert wait_until(lambda: status_of(task_id) == "completed")
+
+        first = client.get(f"/api/audit/result/{task_id}")
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == main.CACHE_CONTROL_COMPLETED
+
+        cached = client.get(f"/api/audit/result/{task_id}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+
+    def test_long_poll_returns_on_change(self, audit, client):
+        task_id = upload(client)
+        assert wait_until(lambda: status_of(task_id) == "running")
+        etag = client.get(f"/api/audit/result/{task_id}").headers["etag"]
+
+        timer = threading.Timer(0.2, audit.release.set)
+        timer.start()
+        started = time.monotonic()
+        response = client.get(f"/api/audit/result/{task_id}?wait=10", headers={"If-None-Match": etag})
+        elapsed = time.monotonic() - started
+        timer.join()
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+        assert response.headers["etag"] != etag
+        assert elapsed < 5
+
+    def test_long_poll_times_out_unchanged(self, audit, client):
+        task_id = upload(client)
+        assert wait_until(lambda: status_of(task_id) == "running")
+        etag = client.get(f"/api/audit/result/{task_id}").headers["etag"]
+
+        started = time.monotonic()
+        response = client.get(f"/api/audit/result/{task_id}?wait=0.2", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["cache-control"] == main.CACHE_CONTROL_ACTIVE
+        assert time.monotonic() - started >= 0.2
+
+
+class TestBatch:
+    """批量上传与 NDJSON 结果流"""
+
+    def test_stream_results(self, audit, client):
+        response = client.post("/api/audit/batch", files=[
+            ("files", ("a.py", b"print('a')\n")),
+            ("files", ("b.py", b"print('b')\n")),
+            ("files", ("notes.txt", b"not code")),
+        ])
+        assert response.status_code == 200
+        batch = response.json()
+        assert batch["total"] == 2
+        assert batch["skipped"] == [{"filename": "notes.txt", "reason": "不支持的文件类型"}]
+
+        timer = threading.Timer(0.2, audit.release.set)
+        timer.start()
+        with client.stream("GET", batch["results_url"]) as stream:
+            assert stream.headers["content-type"].startswith("application/x-ndjson")
+            lines = [json.loads(line) for line in stream.iter_lines() if line]
+        timer.join()
+
+        results, summary = lines[:-1], lines[-1]
+        assert sorted(line["filename"] for line in results) == ["a.py", "b.py"]
+        assert all(line["type"] == "result" and line["status"] == "completed" for line in results)
+        assert summary == {"type": "summary", "batch_id": batch["batch_id"], "counts": {"completed": 2}}
+
+        progress = client.get(batch["status_url"]).json()
+        assert progress["done"] is True
+
+    def test_too_many_files_rejected_before_saving(self, audit, client, monkeypatch):
+        monkeypatch.setattr(main.Config, "MAX_BATCH_FILES", 1)
+        response = client.post("/api/audit/batch", files=[
+            ("files", ("a.py", b"print('a')\n")),
+            ("files", ("b.py", b"print('b')\n")),
+        ])
+        assert response.status_code == 400
+        assert main.audit_tasks == {}
+        assert list(main.UPLOAD_DIR.iterdir()) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,124 @@
+"""
+批量上传与 NDJSON 批量结果测试
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_upload import (
+    BatchItem, batch_counts, batch_key, check_item, infer_language, parse_manifest, safe_name, stream_results
+)
+from task_watch import TaskWatch
+
+
+def finish_later(tasks, watch, task_id, delay, status="completed"):
+    """模拟后台线程结束子任务（与 main.task_finished 一样递增批次版本）"""
+    def run():
+        time.sleep(delay)
+        if status == "deleted":
+            tasks.pop(task_id)
+        else:
+            tasks[task_id]["status"] = status
+        watch.bump(batch_key("b1"))
+    threading.Thread(target=run).start()
+
+
+def collect(tasks, watch, task_ids, **kwargs):
+    async def run():
+        return [json.loads(line) async for line in stream_results(
+            "b1", task_ids, tasks.get, lambda t: {"task_id": t["task_id"], "status": t["status"]}, watch, **kwargs
+        )]
+    return asyncio.run(run())
+
+
+class TestManifest:
+    """清单解析与文件校验"""
+
+    def test_parse_manifest(self):
+        items = parse_manifest(json.dumps({"files": [
+            {"path": "src/app.py", "content": "import os\n"},
+            {"filename": "web/index.ts", "language": "TypeScript", "content": ""},
+        ]}))
+        assert [(i.filename, i.language, i.content) for i in items] == [
+            ("src/app.py", None, b"import os\n"), ("web/index.ts", "typescript", b"")
+        ]
+        assert len(parse_manifest("[]")) == 0
+
+    @pytest.mark.parametrize("text", [
+        "not json", '{"files": 1}', '[1]', '[{"content": "x"}]', '[{"filename": "a.py"}]', '[{"filename": "/", "content": ""}]'
+    ])
+    def test_invalid_manifest(self, text):
+        with pytest.raises(ValueError):
+            parse_manifest(text)
+
+    def test_check_item(self):
+        item = BatchItem("src/app.rb", None, b"")
+        assert check_item(item) is None and item.language == "ruby"
+        assert check_item(BatchItem("README.md", None, b"")) == "不支持的文件类型"
+        assert check_item(BatchItem("a.py", "cobol", b"")).startswith("不支持的语言")
+        # 显式语言优先于扩展名推断
+        item = BatchItem("a.c", "cpp", b"")
+        assert check_item(item, "python") is None and item.language == "cpp"
+        assert infer_language("A.PY") == "python" and infer_language("Makefile") is None
+
+    def test_safe_name(self):
+        assert safe_name("src/app.py") == "app.py"
+        assert safe_name("..\\..\\etc\\x.py") == "x.py"
+        assert safe_name("../../x.py") == "x.py"
+
+
+class TestStreamResults:
+    """子任务结束时逐行输出"""
+
+    def test_streams_in_completion_order(self):
+        watch = TaskWatch()
+        tasks = {tid: {"task_id": tid, "status": "pending"} for tid in ("t1", "t2", "t3")}
+        tasks["t2"]["status"] = "failed"
+        finish_later(tasks, watch, "t3", 0.1)
+        finish_later(tasks, watch, "t1", 0.3, status="cancelled")
+
+        start = time.monotonic()
+        lines = collect(tasks, watch, ["t1", "t2", "t3"])
+        assert time.monotonic() - start < 2
+        assert [(l.get("task_id"), l.get("status")) for l in lines[:3]] == [
+            ("t2", "failed"), ("t3", "completed"), ("t1", "cancelled")
+        ]
+        assert all(l["type"] == "result" for l in lines[:3])
+        assert lines[3] == {"type": "summary", "batch_id": "b1", "counts": {"cancelled": 1, "failed": 1, "completed": 1}}
+
+    def test_deleted_children(self):
+        watch = TaskWatch()
+        tasks = {"t1": {"task_id": "t1", "status": "running"}}
+        finish_later(tasks, watch, "t1", 0.1, status="deleted")
+
+        lines = collect(tasks, watch, ["t1", "t0"])
+        assert lines[0] == {"type": "result", "task_id": "t0", "status": "deleted"}
+        assert lines[1] == {"type": "result", "task_id": "t1", "status": "deleted"}
+        assert lines[2]["counts"] == {"deleted": 2}
+        assert batch_counts(["t1"], tasks.get) == {"deleted": 1}
+
+    def test_rechecks_without_notification(self):
+        watch = TaskWatch()
+        tasks = {"t1": {"task_id": "t1", "status": "running"}}
+
+        def finish_silently():
+            time.sleep(0.1)
+            tasks["t1"]["status"] = "completed"
+        threading.Thread(target=finish_silently).start()
+
+        lines = collect(tasks, watch, ["t1"], poll_interval=0.2)
+        assert [l["type"] for l in lines] == ["result", "summary"]
+        assert watch.stats()["waiting_requests"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
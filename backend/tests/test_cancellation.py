@@ -0,0 +1,119 @@
+"""
+任务取消与超时测试
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cancellation import CancelToken, TaskCancelled
+from llm_engine import LLMAuditEngine
+
+SLEEP = [sys.executable, "-c", "import time; time.sleep(30)"]
+
+
+class BlockingCompletions:
+    """模拟进行中的请求：直到客户端被关闭才返回（连接断开异常）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.closed = threading.Event()
+        self.timeouts = []
+
+    def create(self, model, messages, timeout=None, **kwargs):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        if not self.closed.wait(10):
+            data = {"risk": "none", "issues": []}
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(data)))])
+        raise ConnectionError("connection closed")
+
+
+def _engine(token, completions, **kwargs):
+    engine = LLMAuditEngine(api_key=None, model="large", cancel_token=token, **kwargs)
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions), close=completions.closed.set)
+    # 构造时 client 为空，这里补注册关闭回调
+    token.on_cancel(engine.client.close)
+    return engine
+
+
+class TestCancelToken:
+    """取消令牌"""
+
+    def test_cancel_kills_subprocess(self):
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(TaskCancelled) as exc:
+            token.run(SLEEP, timeout=30)
+        assert exc.value.reason == "cancelled"
+        assert time.monotonic() - start < 5
+
+    def test_budget_times_out(self):
+        token = CancelToken()
+        token.start_budget(0.3)
+        assert 0 < token.timeout(120) <= 0.3
+        with pytest.raises(TaskCancelled) as exc:
+            token.run(SLEEP, timeout=30)
+        assert exc.value.reason == "timeout"
+        assert token.cancelled
+
+    def test_plain_timeout_and_success(self):
+        token = CancelToken()
+        with pytest.raises(Exception) as exc:
+            token.run(SLEEP, timeout=0.2)
+        assert type(exc.value).__name__ == "TimeoutExpired"
+        result = token.run([sys.executable, "-c", "print('ok')"], timeout=10)
+        assert (result.returncode, result.stdout.strip()) == (0, "ok")
+
+    def test_callbacks(self):
+        token = CancelToken()
+        fired = []
+        unregister = token.on_cancel(lambda: fired.append("a"))
+        token.on_cancel(lambda: fired.append("b"))
+        unregister()
+        assert token.cancel("deleted") is True
+        assert token.cancel() is False
+        token.on_cancel(lambda: fired.append("c"))
+        assert fired == ["b", "c"]
+        with pytest.raises(TaskCancelled):
+            token.check()
+
+
+class TestEngineCancellation:
+    """LLM 请求中断"""
+
+    def test_cancel_aborts_inflight_request(self):
+        token = CancelToken()
+        completions = BlockingCompletions()
+        engine = _engine(token, completions)
+        threading.Timer(0.2, token.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(TaskCancelled):
+            engine.analyze_code("import os\nos.system(cmd)\n", "python")
+        assert time.monotonic() - start < 5
+        assert completions.timeouts == [120.0]
+
+    def test_tiered_analysis_stops_after_cancel(self):
+        token = CancelToken()
+        completions = BlockingCompletions()
+        engine = _engine(token, completions, triage_model="small", chunk_tokens=5)
+        code = "".join(f"x{i} = {i}\n" for i in range(40))
+        threading.Timer(0.2, token.cancel).start()
+        with pytest.raises(TaskCancelled):
+            engine.analyze_code(code, "python")
+        # 取消后不再发起后续代码块的请求
+        assert completions.calls == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
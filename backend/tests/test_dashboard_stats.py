@@ -0,0 +1,84 @@
+"""
+仪表盘聚合测试
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard_stats import DashboardAggregates
+
+
+def _task(task_id, day, issues, status="completed", language="python"):
+    return {
+        "task_id": task_id,
+        "status": status,
+        "language": language,
+        "upload_time": f"2026-10-{day:02d}T08:00:00",
+        "completion_time": f"2026-10-{day:02d}T09:00:00",
+        "issues": issues,
+    }
+
+
+SQLI_HIGH = {"severity": "high", "category": "SQL注入", "source": "llm_analysis"}
+SQLI_MED = {"severity": "medium", "category": "SQL注入", "source": "static_analysis"}
+XSS_LOW = {"severity": "low", "category": "XSS", "source": "llm_analysis"}
+
+
+class TestDashboardAggregates:
+    """仪表盘聚合测试类"""
+
+    END = date(2026, 10, 19)
+
+    @pytest.fixture
+    def stats(self):
+        stats = DashboardAggregates()
+        stats.record_task(_task("a", 17, [SQLI_HIGH, SQLI_HIGH, XSS_LOW]))
+        stats.record_task(_task("b", 19, [SQLI_MED], language="php"))
+        stats.record_task(_task("c", 19, [], status="failed"))
+        return stats
+
+    def test_trend(self, stats):
+        """测试按天趋势"""
+        trend = stats.trend(days=3, end=self.END)
+        assert trend["dates"] == ["2026-10-17", "2026-10-18", "2026-10-19"]
+        assert trend["tasks"] == [1, 0, 2]
+        assert trend["vulns"] == [3, 0, 1]
+        assert trend["failed"] == [0, 0, 1]
+
+    def test_distribution(self, stats):
+        """测试维度合计"""
+        dist = stats.distribution(days=7, end=self.END)
+        assert dist["tasks"] == 3
+        assert dist["vulns"] == 4
+        assert dist["severity"] == {"high": 2, "medium": 1, "low": 1}
+        assert dist["language"] == {"python": 3, "php": 1}
+        assert dist["source"] == {"llm_analysis": 3, "static_analysis": 1}
+
+    def test_vulnerability_types(self, stats):
+        """测试漏洞类型分布及主严重级别"""
+        types = stats.vulnerability_types(days=7, end=self.END)
+        assert types == [
+            {"name": "SQL注入", "value": 3, "severity": "high"},
+            {"name": "XSS", "value": 1, "severity": "low"},
+        ]
+
+    def test_rerecord_and_discard(self, stats):
+        """测试重复记录不会重复计数，删除任务回退贡献"""
+        stats.record_task(_task("a", 17, [XSS_LOW]))
+        assert stats.trend(days=3, end=self.END)["vulns"] == [1, 0, 1]
+
+        stats.discard_task("a")
+        stats.discard_task("missing")
+        dist = stats.distribution(days=7, end=self.END)
+        assert dist["tasks"] == 2
+        assert dist["category"] == {"SQL注入": 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+"""
+快速 JSON 响应测试
+"""
+
+import os
+import sys
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_response
+from fast_response import EncodedBody, ORJSONResponse, choose_encoding, parse_accept_encoding
+from issue_model import Issue, Source
+
+LARGE = {"issues": [{"line": i, "description": "SQL 注入：用户输入直接拼接到查询语句"} for i in range(200)]}
+
+
+class TestNegotiation:
+    """Accept-Encoding 协商"""
+
+    def test_parse(self):
+        assert parse_accept_encoding("gzip, deflate;q=0.5, br;q=bad") == {"gzip": 1.0, "deflate": 0.5, "br": 0.0}
+        assert parse_accept_encoding(None) == {}
+
+    def test_choose(self):
+        both = ("br", "gzip")
+        assert choose_encoding("gzip, br", both) == "br"
+        assert choose_encoding("gzip, br;q=0.5", both) == "gzip"
+        assert choose_encoding("gzip", ("gzip",)) == "gzip"
+        assert choose_encoding("br", ("gzip",)) is None
+        assert choose_encoding("*", both) == "br"
+        assert choose_encoding("*, gzip;q=0", ("gzip",)) is None
+        assert choose_encoding("identity", both) is None
+        assert choose_encoding(None, both) is None
+
+
+class TestEncodedBody:
+    """预先序列化的响应体"""
+
+    def test_small_body_kept_plain(self):
+        encoded = EncodedBody.of({"ok": True})
+        assert encoded.encodings == ()
+        assert json.loads(encoded.body("gzip")) == {"ok": True}
+
+    def test_large_body_stored_compressed(self):
+        encoded = EncodedBody.of(LARGE)
+        assert encoded.encoding is not None and encoded.nbytes < encoded.size / 5
+        assert json.loads(gzip.decompress(encoded.body("gzip"))) == LARGE
+        assert json.loads(encoded.body(None)) == LARGE
+        assert encoded.content() == LARGE
+
+    def test_single_copy_with_brotli(self, monkeypatch):
+        # 用 zlib 模拟 brotli：只保存首选编码的一份数据，gzip 按需转换
+        fake = type("FakeBrotli", (), {
+            "compress": staticmethod(lambda data, quality=None: b"BR" + zlib.compress(data)),
+            "decompress": staticmethod(lambda data: zlib.decompress(data[2:])),
+        })
+        monkeypatch.setattr(fast_response, "brotli", fake)
+        encoded = EncodedBody.of(LARGE)
+        assert encoded.encoding == "br" and encoded.data.startswith(b"BR")
+        assert encoded.body("br") is encoded.data
+        assert json.loads(gzip.decompress(encoded.body("gzip"))) == LARGE
+        assert encoded.nbytes == len(encoded.data)
+        assert encoded.response("gzip, br").headers["content-encoding"] == "br"
+
+    def test_without_brotli(self, monkeypatch):
+        monkeypatch.setattr(fast_response, "brotli", None)
+        encoded = EncodedBody.of(LARGE)
+        response = encoded.response("br, gzip")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert "content-encoding" not in encoded.response("br").headers
+
+
+class TestResponses:
+    """与 FastAPI 集成"""
+
+    def test_endpoints(self):
+        app = FastAPI(default_response_class=ORJSONResponse)
+        issue = Issue.from_dict({"severity": "HIGH", "line": 3, "description": "命令注入"}, Source.STATIC)
+        cached = EncodedBody.of(LARGE)
+
+        @app.get("/issue")
+        async def get_issue():
+            return ORJSONResponse({"issues": [issue]})
+
+        @app.get("/large")
+        async def get_large(accept_encoding: str = Header(None)):
+            return cached.response(accept_encoding)
+
+        client = TestClient(app)
+        assert client.get("/issue").json() == {"issues": [issue.to_dict()]}
+        
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json() == LARGE
+        plain = client.get("/large", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        assert plain.json() == LARGE
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+"""
+历史漏洞检索测试
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finding_search import FindingSearchIndex
+
+
+def _task(task_id, language, issues, upload_time="2026-10-01T00:00:00"):
+    return {
+        "task_id": task_id,
+        "filename": f"{task_id}.py",
+        "language": language,
+        "upload_time": upload_time,
+        "issues": issues,
+    }
+
+
+FLASK_SQLI = {
+    "severity": "high",
+    "category": "SQL注入",
+    "line": 12,
+    "description": "Flask 视图中直接拼接 request.args 到 SQL 查询",
+    "code_snippet": "cursor.execute('SELECT * FROM users WHERE id=' + request.args['id'])",
+    "suggestion": "使用参数化查询",
+}
+PHP_XSS = {
+    "severity": "medium",
+    "category": "XSS",
+    "line": 3,
+    "description": "直接输出用户输入",
+    "code_snippet": "echo $_GET['name'];",
+    "suggestion": "使用 htmlspecialchars 转义输出",
+}
+
+
+class TestFindingSearchIndex:
+    """历史漏洞检索测试类"""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = FindingSearchIndex(tmp_path / "findings.db")
+        index.index_task(_task("t1", "python", [FLASK_SQLI], "2026-10-01T00:00:00"))
+        index.index_task(_task("t2", "php", [PHP_XSS], "2026-10-02T00:00:00"))
+        index.index_task(_task("t3", "python", [dict(FLASK_SQLI, severity="low")], "2026-10-03T00:00:00"))
+        yield index
+        index.close()
+
+    def test_text_search_with_filters(self, index):
+        """测试全文检索与结构化过滤组合"""
+        results = index.search("SQL注入 Flask")
+        assert {r["task_id"] for r in results} == {"t1", "t3"}
+        assert results[0]["score"] is not None
+
+        results = index.search("SQL注入 flask", severity="high", language="python")
+        assert [r["task_id"] for r in results] == ["t1"]
+        assert results[0]["line"] == 12
+
+    def test_search_code_snippet_and_short_terms(self, index):
+        """测试代码片段检索与短词兜底"""
+        assert [r["task_id"] for r in index.search("htmlspecialchars")] == ["t2"]
+        assert [r["task_id"] for r in index.search("$_GET")] == ["t2"]
+        assert [r["task_id"] for r in index.search("echo 转义")] == ["t2"]
+
+    def test_filter_only_orders_by_time(self, index):
+        """测试无检索词时按时间倒序"""
+        assert [r["task_id"] for r in index.search(language="python")] == ["t3", "t1"]
+
+    def test_reindex_and_remove(self, index):
+        """测试重建与删除任务"""
+        index.index_task(_task("t1", "python", [PHP_XSS]))
+        assert [r["task_id"] for r in index.search("SQL注入", severity="high")] == []
+        index.remove_task("t2")
+        assert [r["task_id"] for r in index.search("XSS")] == ["t1"]
+        assert index.count() == 2
+
+    def test_persistence(self, tmp_path):
+        """测试索引持久化"""
+        path = tmp_path / "persist.db"
+        first = FindingSearchIndex(path)
+        first.index_task(_task("t1", "python", [FLASK_SQLI]))
+        first.close()
+
+        second = FindingSearchIndex(path)
+        assert [r["task_id"] for r in second.search("参数化")] == ["t1"]
+        second.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,99 @@
+"""
+审计问题模型测试
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import issue_model
+from issue_model import Issue, Severity, Source, dumps, severity_counts, sort_issues
+from audit_runner import merge_issues
+
+BANDIT_ISSUE = {
+    "tool": "bandit",
+    "severity": "HIGH",
+    "confidence": "MEDIUM",
+    "category": "subprocess_popen_with_shell_equals_true",
+    "line": 12,
+    "description": "subprocess call with shell=True identified, security issue.",
+    "suggestion": "https://bandit.readthedocs.io/en/latest/plugins/b602.html",
+    "file": "app.py"
+}
+
+
+class TestIssue:
+    """字段转换与字典兼容接口"""
+
+    def test_from_dict_and_back(self):
+        issue = Issue.from_dict(BANDIT_ISSUE, Source.STATIC)
+        assert issue.severity is Severity.HIGH
+        assert issue.analysis_tool == "bandit"
+        assert issue.to_dict() == dict(BANDIT_ISSUE, severity="high", source="static_analysis", analysis_tool="bandit")
+        assert not hasattr(issue, "__dict__")
+        
+        llm = Issue.from_dict({"severity": "critical", "line": "7", "description": "SQL 注入", "tier": "escalation"},
+                              Source.LLM)
+        assert (llm.severity, llm.line, llm.category, llm.extra) == (Severity.HIGH, 7, "Unknown", {"tier": "escalation"})
+        assert Issue.from_dict(llm.to_dict()) == llm
+
+    def test_dict_compatible_reads(self):
+        issue = Issue.from_dict(dict(BANDIT_ISSUE, code_snippet="run(cmd, shell=True)"), Source.STATIC)
+        assert issue.get("severity") == "high" and issue["source"] == "static_analysis"
+        assert issue.get("code_snippet") == "run(cmd, shell=True)"
+        assert issue.get("missing", "x") == "x"
+        with pytest.raises(KeyError):
+            issue["missing"]
+
+    def test_severity_parse(self):
+        assert [Severity.parse(v) for v in ("Medium", "高危", None, "UNDEFINED")] == [
+            Severity.MEDIUM, Severity.HIGH, Severity.LOW, Severity.LOW]
+
+    def test_interned_strings(self):
+        a = Issue.from_dict(dict(BANDIT_ISSUE, category="".join(["hard", "coded"])), Source.STATIC)
+        b = Issue.from_dict(dict(BANDIT_ISSUE, category="".join(["hard", "coded"])), Source.STATIC)
+        assert a.category is b.category
+
+
+class TestMergeAndSerialize:
+    """合并去重、统计与序列化"""
+
+    def test_merge_dedup_sort_and_counts(self):
+        llm = [
+            {"severity": "low", "category": "信息泄露", "line": 3, "description": "调试信息"},
+            {"severity": "high", "category": "命令注入", "line": 12, "description": BANDIT_ISSUE["description"]},
+            {"severity": "medium", "category": "XSS", "line": 20, "description": "未转义输出"},
+            {"severity": "medium", "category": "XSS", "line": 20, "description": "未转义输出"},
+        ]
+        issues, llm_count = merge_issues([BANDIT_ISSUE], llm)
+        assert llm_count == 2
+        assert [(i.severity.value, i.source.value) for i in issues] == [
+            ("high", "static_analysis"), ("medium", "llm_analysis"), ("low", "llm_analysis")]
+        assert severity_counts(issues) == {"high": 1, "medium": 1, "low": 1}
+        # 合并不修改 LLM 原始结果
+        assert "source" not in llm[0]
+
+    def test_sort_is_stable(self):
+        issues = [Issue(Severity.LOW, Source.LLM, line=i) for i in range(3)] + [Issue(Severity.HIGH, Source.LLM, line=9)]
+        sort_issues(issues)
+        assert [i.line for i in issues] == [9, 0, 1, 2]
+
+    def test_dumps(self, monkeypatch):
+        issues = [Issue.from_dict(BANDIT_ISSUE, Source.STATIC)]
+        payload = {"task_id": "t1", "issues": issues, "summary": "中文"}
+        expected = {"task_id": "t1", "issues": [issues[0].to_dict()], "summary": "中文"}
+        assert json.loads(dumps(payload)) == expected
+        # 未安装 orjson 时结果一致
+        monkeypatch.setattr(issue_model, "orjson", None)
+        assert json.loads(dumps(payload)) == expected
+        with pytest.raises(TypeError):
+            dumps({"x": object()})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
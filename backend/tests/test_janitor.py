@@ -0,0 +1,116 @@
+"""
+存储清理测试
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from janitor import StorageJanitor
+
+
+def _make_file(path, size, age_seconds=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    ts = time.time() - age_seconds
+    os.utime(path, (ts, ts))
+    os.utime(path.parent, (ts, ts))
+    return path
+
+
+class TestStorageJanitor:
+    """存储清理测试类"""
+
+    @pytest.fixture
+    def dirs(self, tmp_path):
+        uploads = tmp_path / "uploads"
+        sandbox = tmp_path / "sandbox"
+        uploads.mkdir()
+        sandbox.mkdir()
+        return uploads, sandbox
+
+    def _janitor(self, dirs, active=None, **kwargs):
+        uploads, sandbox = dirs
+        params = dict(quota_bytes=10_000, max_age_seconds=3600, orphan_roots=["sandbox"])
+        params.update(kwargs)
+        return StorageJanitor(
+            roots={"uploads": uploads, "sandbox": sandbox},
+            active_tasks=lambda: set(active or ()),
+            **params
+        )
+
+    def test_scan_reports_usage(self, dirs):
+        """测试占用统计"""
+        uploads, sandbox = dirs
+        _make_file(uploads / "aaaa1111_a.py", 100)
+        _make_file(sandbox / "bbbb2222" / "b.py", 200)
+        _make_file(sandbox / "bbbb2222" / "sub" / "c.py", 300)
+
+        janitor = self._janitor(dirs)
+        entries = janitor.scan()
+
+        assert {e.task_id for e in entries} == {"aaaa1111", "bbbb2222"}
+        stats = janitor.stats()
+        assert stats["roots"]["uploads"] == {"bytes": 100, "entries": 1}
+        assert stats["roots"]["sandbox"] == {"bytes": 500, "entries": 1}
+        assert stats["used_bytes"] == 600
+
+    def test_expired_and_orphan_entries_evicted(self, dirs):
+        """测试过期文件和残留沙箱被回收，活动任务不受影响"""
+        uploads, sandbox = dirs
+        old = _make_file(uploads / "old00001_a.py", 10, age_seconds=7200)
+        fresh = _make_file(uploads / "new00001_b.py", 10)
+        orphan = _make_file(sandbox / "fail0001" / "c.py", 10, age_seconds=1200)
+        running = _make_file(sandbox / "run00001" / "d.py", 10, age_seconds=7200)
+
+        janitor = self._janitor(dirs, active={"run00001"})
+        result = asyncio.run(janitor.sweep())
+
+        assert result["evicted_entries"] == 2
+        assert not old.exists()
+        assert not orphan.parent.exists()
+        assert fresh.exists()
+        assert running.exists()
+
+    def test_quota_evicts_least_recently_used(self, dirs):
+        """测试超出配额时按 LRU 回收到低水位以下"""
+        uploads, _ = dirs
+        files = [
+            _make_file(uploads / f"task000{i}_f.py", 3000, age_seconds=100 * (5 - i))
+            for i in range(5)
+        ]
+
+        janitor = self._janitor(dirs, quota_bytes=10_000, batch_size=1)
+        asyncio.run(janitor.sweep())
+
+        # 15000 字节回收到低水位 9000，最旧的两个被删除
+        assert [f.exists() for f in files] == [False, False, True, True, True]
+        stats = janitor.stats()
+        assert stats["used_bytes"] == 9000
+        assert stats["evicted_entries"] == 2
+        assert stats["evicted_bytes"] == 6000
+
+    def test_start_and_stop(self, dirs):
+        """测试后台巡检的启动和停止"""
+        janitor = self._janitor(dirs, interval=0.01)
+
+        async def run():
+            janitor.start()
+            await asyncio.sleep(0.05)
+            assert janitor.stats()["running"]
+            await janitor.stop()
+
+        asyncio.run(run())
+        stats = janitor.stats()
+        assert not stats["running"]
+        assert stats["last_sweep"] is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,181 @@
+"""
+分布式任务队列与 Worker 测试
+"""
+
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import LocalBroker, connect
+from sandbox import SecureSandbox
+from worker import AuditWorker, job_payload
+
+
+def fake_audit(delay=0.0):
+    """代替 audit_file：读取下发的源码并返回行数，delay 期间响应取消"""
+    def audit(task_id, file_path, language, sandbox, token, verdicts):
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            token.check()
+            time.sleep(0.02)
+        with open(file_path, encoding="utf-8") as f:
+            lines = len(f.read().splitlines())
+        return {"issues": [], "summary": f"{language}:{lines}"}
+    return audit
+
+
+def drain(broker, until, timeout=5.0):
+    """读取结果流直到 until(messages) 成立"""
+    messages = []
+    deadline = time.monotonic() + timeout
+    while not until(messages) and time.monotonic() < deadline:
+        messages.extend(broker.read_results(timeout=0.2))
+    return messages
+
+
+def completed(messages):
+    return {m["job_id"]: m for m in messages if m["status"] == "completed"}
+
+
+class TestLocalBroker:
+    """进程内队列语义"""
+
+    def test_fifo_and_ack(self):
+        broker = LocalBroker()
+        ids = [broker.enqueue({"n": i}) for i in range(3)]
+        jobs = [broker.reserve(timeout=0) for _ in ids]
+        assert [j.job_id for j in jobs] == ids
+        assert broker.reserve(timeout=0) is None
+        assert all(broker.ack(j) for j in jobs)
+        assert broker.stats()["inflight"] == 0
+
+    def test_visibility_timeout_redelivers(self):
+        broker = LocalBroker(visibility_timeout=0.1)
+        broker.enqueue({"file": "a.py"}, job_id="t1")
+        first = broker.reserve(timeout=0)
+        assert broker.reserve(timeout=0) is None
+        
+        time.sleep(0.15)
+        second = broker.reserve(timeout=0)
+        assert second.job_id == "t1" and second.attempt == 2
+        # 过期租约不能再确认或续租
+        assert not broker.ack(first)
+        assert not broker.extend(first)
+        assert broker.ack(second)
+
+    def test_dead_letter_after_max_attempts(self):
+        broker = LocalBroker(visibility_timeout=0.05, max_attempts=2)
+        broker.enqueue({}, job_id="t1")
+        for _ in range(2):
+            assert broker.reserve(timeout=1).job_id == "t1"
+        message, = broker.read_results(timeout=1)
+        assert message["job_id"] == "t1" and message["status"] == "failed"
+        assert "2 次" in message["error"]
+        assert broker.reserve(timeout=0) is None
+
+    def test_cancel(self):
+        broker = LocalBroker()
+        broker.enqueue({}, job_id="queued")
+        broker.enqueue({}, job_id="running")
+        broker.cancel("queued")
+        job = broker.reserve(timeout=0)
+        assert job.job_id == "running"
+        assert broker.cancel("running")
+        assert not broker.extend(job)
+        assert broker.ack(job)
+        assert not broker.cancel("missing")
+
+    def test_connect(self):
+        assert isinstance(connect("memory://"), LocalBroker)
+        with pytest.raises(ValueError):
+            connect("amqp://localhost")
+
+
+class TestAuditWorker:
+    """Worker 执行、续租与故障转移"""
+
+    def make_worker(self, broker, tmp_path, name, audit):
+        return AuditWorker(broker, sandbox=SecureSandbox(str(tmp_path / "sandbox")), name=name,
+                           work_dir=str(tmp_path / name), audit=audit)
+
+    def test_workers_stream_results(self, tmp_path):
+        broker = LocalBroker()
+        for i in range(6):
+            broker.enqueue(job_payload(f"f{i}.py", "python", b"x = 1\n" * (i + 1)), job_id=f"t{i}")
+        workers = [self.make_worker(broker, tmp_path, f"w{i}", fake_audit(0.05)) for i in range(2)]
+        threads = [threading.Thread(target=w.run, kwargs={"poll_timeout": 0.1}) for w in workers]
+        for t in threads:
+            t.start()
+        
+        messages = drain(broker, lambda m: len(completed(m)) == 6)
+        for w in workers:
+            w.stop()
+        for t in threads:
+            t.join(5)
+        results = completed(messages)
+        assert {job_id: m["summary"] for job_id, m in results.items()} == {f"t{i}": f"python:{i + 1}" for i in range(6)}
+        assert {m["worker"] for m in results.values()} == {"w0", "w1"}
+        assert sum(1 for m in messages if m["status"] == "running") == 6
+        assert broker.stats() == {"backend": "memory", "queued": 0, "inflight": 0, "results": 0}
+        # 下发的源码执行后删除
+        assert not list((tmp_path / "w0").iterdir())
+
+    def test_heartbeat_keeps_long_job(self, tmp_path):
+        broker = LocalBroker(visibility_timeout=0.15)
+        broker.enqueue(job_payload("slow.py", "python", b"pass\n"), job_id="slow")
+        worker = self.make_worker(broker, tmp_path, "w", fake_audit(0.6))
+        worker.run(poll_timeout=0.1, max_jobs=1)
+        
+        messages = drain(broker, completed)
+        assert [m["attempt"] for m in messages if m["status"] == "running"] == [1]
+        assert "slow" in completed(messages)
+
+    def test_crashed_worker_job_is_redelivered(self, tmp_path):
+        broker = LocalBroker(visibility_timeout=0.1)
+        broker.enqueue(job_payload("a.py", "python", b"pass\n"), job_id="t1")
+        # 领取后失联（不续租、不确认）
+        lost = broker.reserve(timeout=0)
+        
+        worker = self.make_worker(broker, tmp_path, "w", fake_audit())
+        worker.run(poll_timeout=0.5, max_jobs=1)
+        messages = drain(broker, completed)
+        assert completed(messages)["t1"]["worker"] == "w"
+        assert not broker.ack(lost)
+
+    def test_cancel_stops_running_job(self, tmp_path):
+        broker = LocalBroker(visibility_timeout=0.1)
+        broker.enqueue(job_payload("a.py", "python", b"pass\n"), job_id="t1")
+        worker = self.make_worker(broker, tmp_path, "w", fake_audit(30))
+        thread = threading.Thread(target=worker.run, kwargs={"poll_timeout": 0.1, "max_jobs": 1})
+        thread.start()
+        
+        drain(broker, lambda m: any(x["status"] == "running" for x in m))
+        start = time.monotonic()
+        broker.cancel("t1")
+        thread.join(5)
+        assert time.monotonic() - start < 2
+        assert broker.read_results(timeout=0.2) == []
+        assert broker.stats()["inflight"] == 0
+
+    def test_shutdown_returns_job_to_queue(self, tmp_path):
+        broker = LocalBroker()
+        broker.enqueue(job_payload("a.py", "python", b"pass\n"), job_id="t1")
+        worker = self.make_worker(broker, tmp_path, "w", fake_audit(30))
+        thread = threading.Thread(target=worker.run, kwargs={"poll_timeout": 0.1})
+        thread.start()
+        
+        drain(broker, lambda m: any(x["status"] == "running" for x in m))
+        worker.stop()
+        thread.join(5)
+        job = broker.reserve(timeout=0)
+        assert job.job_id == "t1" and job.attempt == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
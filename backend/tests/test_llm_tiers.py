@@ -0,0 +1,115 @@
+"""
+分层分析（小模型初筛 + 大模型升级）测试
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_engine import LLMAuditEngine
+
+
+class FakeCompletions:
+    """按模型和代码内容返回预设结果的假 OpenAI 客户端"""
+
+    def __init__(self, fail_triage=False):
+        self.calls = []
+        self.fail_triage = fail_triage
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[1]["content"]
+        self.calls.append((model, prompt))
+        if model == "small":
+            if self.fail_triage:
+                raise RuntimeError("timeout")
+            if "os.system" in prompt:
+                data = {"risk": "high", "issues": []}
+            elif "yaml.load" in prompt:
+                data = {"risk": "none", "issues": []}
+            else:
+                data = {"risk": "low", "issues": [
+                    {"severity": "low", "category": "调试信息", "line": 1, "description": "print"}
+                ]}
+        else:
+            data = {"issues": [
+                {"severity": "high", "category": "命令注入", "line": 2, "description": "os.system"}
+            ], "summary": "发现命令注入"}
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10, prompt_cache_hit_tokens=0)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(data)))],
+            usage=usage,
+        )
+
+
+def _engine(completions, chunk_tokens=20):
+    engine = LLMAuditEngine(api_key=None, model="large", triage_model="small", chunk_tokens=chunk_tokens)
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return engine
+
+
+def _code():
+    safe = "".join(f"print('line {i}')\n" for i in range(8))
+    risky = "import os\nos.system(cmd)\n" + "".join(f"x{i} = {i}\n" for i in range(6))
+    return safe + risky
+
+
+class TestTieredAnalysis:
+    """分层分析"""
+
+    def test_only_flagged_chunks_escalate(self):
+        completions = FakeCompletions()
+        engine = _engine(completions)
+        result = engine.analyze_code(_code(), "python")
+
+        tiers = result["tiers"]
+        assert tiers["triage"]["chunks"] >= 2
+        assert tiers["escalation"]["chunks"] == 1
+        assert tiers["escalation"]["prompt_tokens"] == 100
+
+        flagged_start = [start for start, _, chunk in engine._chunks(_code()) if "os.system" in chunk][0]
+        high = [i for i in result["issues"] if i["tier"] == "escalation"]
+        assert len(high) == 1
+        # 块内第 2 行换算为文件行号
+        assert high[0]["line"] == flagged_start + 1
+        assert any(i["tier"] == "triage" for i in result["issues"])
+        assert [model for model, _ in completions.calls].count("large") == 1
+        # 各层用量合计，供调度器校正租户的 Token 配额
+        assert result["usage"]["prompt_tokens"] == 100 * len(completions.calls)
+        assert result["usage"]["completion_tokens"] == 10 * len(completions.calls)
+
+    def test_disagreement_with_bandit_escalates(self):
+        completions = FakeCompletions()
+        engine = _engine(completions, chunk_tokens=1000)
+        code = "import yaml\ndata = yaml.load(body)\n"
+        result = engine.analyze_code(code, "python", {"issues": [
+            {"severity": "medium", "category": "B506", "line": 2, "description": "yaml.load"},
+        ]})
+        assert result["tiers"]["escalation"]["chunks"] == 1
+        escalated_prompt = [prompt for model, prompt in completions.calls if model == "large"][0]
+        assert "B506" in escalated_prompt
+
+    def test_triage_failure_escalates(self):
+        engine = _engine(FakeCompletions(fail_triage=True), chunk_tokens=1000)
+        result = engine.analyze_code("print(1)\n", "python")
+        assert result["tiers"]["triage"]["failed"] == 1
+        assert result["tiers"]["escalation"]["chunks"] == 1
+
+    def test_single_pass_when_triage_disabled(self):
+        engine = LLMAuditEngine(api_key=None, model="large", triage_model="large")
+        assert engine.triage_model is None
+
+    def test_single_pass_reports_usage(self):
+        engine = LLMAuditEngine(api_key=None, model="large", triage_model=None)
+        engine.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+        result = engine.analyze_code("print(1)\n", "python")
+        assert result["usage"] == {"prompt_tokens": 100, "cached_tokens": 0, "completion_tokens": 10}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
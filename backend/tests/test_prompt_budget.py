@@ -0,0 +1,121 @@
+"""
+提示词 Token 预算测试
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+from prompt_budget import PromptBudget, TokenCounter, context_window, load_context_table, rank_static_issues
+from llm_engine import LLMAuditEngine, SYSTEM_PROMPT
+
+
+class TestTokenCounter:
+    """Token 计数"""
+
+    def test_estimate_and_cache(self):
+        counter = TokenCounter("unknown-model")
+        if counter.exact:
+            pytest.skip("已安装 tiktoken，估算逻辑不适用")
+        assert counter.count("abcdefgh") == 2
+        assert counter.count("中文") == 2
+        assert counter.count("") == 0
+        counter.count("abcdefgh")
+        assert counter.hits == 1 and counter.misses == 2
+
+    def test_context_window(self):
+        assert context_window("gpt-4") == 8192
+        assert context_window("gpt-4o-mini") == 128000
+        assert context_window("deepseek-chat") == 65536
+        assert context_window("other") == 8192
+
+    def test_context_table_file(self, tmp_path):
+        path = tmp_path / "model_context.json"
+        path.write_text('{"default": 4096, "models": {"My-Model": 32000}}', encoding="utf-8")
+        assert load_context_table(path) == ({"my-model": 32000}, 4096)
+        # 数据文件缺失或格式错误时按最小窗口计算
+        assert load_context_table(tmp_path / "missing.json") == ({}, 8192)
+        path.write_text('{"models": []}', encoding="utf-8")
+        assert load_context_table(path) == ({}, 8192)
+
+
+class TestPromptBudget:
+    """预算分配"""
+
+    def test_rank_static_issues(self):
+        issues = [
+            {"severity": "low", "confidence": "HIGH", "category": "B101", "line": 1},
+            {"severity": "high", "confidence": "LOW", "category": "B602", "line": 30},
+            {"severity": "high", "confidence": "HIGH", "category": "B608", "line": 50},
+            {"severity": "high", "confidence": "HIGH", "category": "B608", "line": 50},
+        ]
+        ranked = rank_static_issues(issues)
+        assert [issue["line"] for issue in ranked] == [50, 30, 1]
+
+    def test_small_code_kept_whole(self):
+        budget = PromptBudget(TokenCounter("gpt-4"))
+        result = budget.allocate("指令", "import os\nos.system(cmd)\n", [
+            {"severity": "high", "category": "B605", "line": 2, "description": "shell"},
+        ])
+        assert result["code"] == "import os\nos.system(cmd)\n"
+        assert len(result["static_lines"]) == 1
+        assert result["stats"]["code_truncated"] is False
+
+    def test_large_code_keeps_windows_around_findings(self):
+        code = "\n".join(f"value_{i} = compute_something({i})" for i in range(1, 2001))
+        budget = PromptBudget(TokenCounter("gpt-4"), context_tokens=3000, reserve_output=500, window_lines=5)
+        result = budget.allocate("指令", code, [
+            {"severity": "high", "category": "B608", "line": 1500, "description": "sql"},
+            {"severity": "low", "category": "B101", "line": 800, "description": "assert"},
+        ])
+        fitted = result["code"]
+        assert result["stats"]["code_truncated"] is True
+        assert "value_1500 = compute_something(1500)" in fitted
+        assert "value_800 = compute_something(800)" in fitted
+        assert "value_1 = compute_something(1)" in fitted
+        assert "# ... 省略第 1495-1999 行 ..." not in fitted
+        assert "# ... 省略第 1506-2000 行 ..." in fitted
+        assert budget.counter.count(fitted) <= 3000 - 500
+
+    def test_static_findings_limited_by_share(self):
+        issues = [
+            {"severity": "medium", "category": f"B{i}", "line": i, "description": "x" * 200}
+            for i in range(100)
+        ]
+        budget = PromptBudget(TokenCounter("gpt-4"), context_tokens=4000, reserve_output=1000, static_share=0.1)
+        result = budget.allocate("", "print(1)\n", issues)
+        assert 0 < result["stats"]["static_included"] < 100
+        assert result["stats"]["static_tokens"] <= 300
+
+
+class TestPromptLayout:
+    """前缀缓存布局"""
+
+    def test_user_prompt_contains_only_variable_content(self):
+        engine = LLMAuditEngine(api_key=None)
+        prompt, _ = engine._build_prompt("print(1)\n", "python", {"issues": [
+            {"severity": "low", "category": "B101", "line": 1, "description": "assert"},
+        ]})
+        assert "JSON" not in prompt
+        assert "print(1)" in prompt and "B101" in prompt
+        assert "\"issues\"" in SYSTEM_PROMPT
+
+    def test_usage_reports_cached_tokens(self):
+        deepseek = SimpleNamespace(prompt_tokens=1200, prompt_cache_hit_tokens=1024, completion_tokens=80)
+        openai = SimpleNamespace(prompt_tokens=2000, completion_tokens=10,
+                                 prompt_tokens_details=SimpleNamespace(cached_tokens=1536))
+        assert LLMAuditEngine._usage(deepseek)["cached_tokens"] == 1024
+        assert LLMAuditEngine._usage(openai) == {
+            "prompt_tokens": 2000, "cached_tokens": 1536, "completion_tokens": 10
+        }
+        assert LLMAuditEngine._usage(None) == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
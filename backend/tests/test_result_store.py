@@ -0,0 +1,78 @@
+"""
+原始输出冷存储测试
+"""
+
+import os
+import sys
+import json
+import zlib
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ColdStore, decode, encode
+
+
+def sample_issues(n=60):
+    issues = []
+    for i in range(n):
+        issue = {
+            "tool": "bandit" if i % 2 else "openai",
+            "severity": ("high", "medium", "low")[i % 3],
+            "confidence": "HIGH",
+            "category": "hardcoded_sql_expressions",
+            "line": i * 7,
+            "description": "Possible SQL injection vector through string-based query construction.",
+            "suggestion": "https://bandit.readthedocs.io/en/latest/plugins/b608_hardcoded_sql_expressions.html",
+            "file": "app/views.py",
+            "source": "static_analysis" if i % 2 else "llm_analysis",
+        }
+        if i % 5 == 0:
+            issue["code_snippet"] = f"cursor.execute('SELECT * FROM t WHERE id = %s' % uid_{i})"
+        issues.append(issue)
+    return issues
+
+
+class TestEncoding:
+    """序列化与压缩"""
+
+    def test_roundtrip(self):
+        data = {"text": "中文 + unicode ✓", "nested": [1, 2.5, None, True, {"k": "v"}]}
+        assert decode(encode(data)) == data
+
+    def test_reads_fallback_format(self):
+        # 未安装 msgpack/zstd 时写出的数据（JSON + zlib）在任何环境都能读取
+        blob = bytes([0]) + zlib.compress(json.dumps({"a": 1}).encode("utf-8"))
+        assert decode(blob) == {"a": 1}
+
+
+class TestColdStore:
+    """原始输出冷存储"""
+
+    def test_put_get_delete(self, tmp_path):
+        store = ColdStore(tmp_path / "cold")
+        raw = {"static_analysis_output": {"results": sample_issues(5)}, "llm_result": {"summary": "ok"}}
+        size = store.put("t1", raw)
+        assert store.path("t1").stat().st_size == size
+        assert store.get("t1") == raw
+        assert store.get("missing") is None
+        # 文件名以任务 ID 开头
+        assert store.path("t1").name.split("_", 1)[0] == "t1"
+        
+        store.delete("t1")
+        store.delete("t1")
+        assert store.get("t1") is None
+
+    def test_clear(self, tmp_path):
+        store = ColdStore(tmp_path)
+        for task_id in ("a", "b"):
+            store.put(task_id, {"x": task_id})
+        (tmp_path / "keep.txt").write_text("other")
+        store.clear()
+        assert [p.name for p in tmp_path.iterdir()] == ["keep.txt"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,47 @@
+"""
+源码读取与编码识别测试
+"""
+
+import os
+import sys
+import codecs
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from source_loader import detect_encoding, read_source
+
+CODE = "# 查询用户\nquery = \"SELECT * FROM users WHERE id = \" + uid\n"
+
+
+class TestReadSource:
+    """按编码解码上传的源码"""
+
+    @pytest.mark.parametrize("data, encoding", [
+        (CODE.encode("utf-8"), "utf-8"),
+        (codecs.BOM_UTF8 + CODE.encode("utf-8"), "utf-8-sig"),
+        (CODE.encode("gbk"), "gb18030"),
+        (CODE.encode("utf-16"), "utf-16"),
+    ])
+    def test_detects_encoding(self, tmp_path, data, encoding):
+        path = tmp_path / "app.py"
+        path.write_bytes(data)
+        assert read_source(path) == (CODE, encoding)
+
+    def test_undecodable_bytes_do_not_fail(self, tmp_path):
+        path = tmp_path / "bin.py"
+        path.write_bytes(b"x = '\x81\xff\xfe'\n")
+        text, encoding = read_source(path)
+        assert encoding == "latin-1" and text.startswith("x = '")
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "empty.py"
+        path.write_bytes(b"")
+        assert read_source(path) == ("", "utf-8")
+        assert detect_encoding(b"\xef\xbb\xbf") == "utf-8-sig"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
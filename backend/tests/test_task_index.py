@@ -0,0 +1,91 @@
+"""
+任务索引测试
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_index import TaskIndex, encode_cursor, decode_cursor
+
+
+def _task(task_id, day, status="completed", language="python", severities=()):
+    return {
+        "task_id": task_id,
+        "upload_time": f"2026-10-{day:02d}T12:00:00",
+        "status": status,
+        "language": language,
+        "issues": [{"severity": s} for s in severities],
+    }
+
+
+class TestTaskIndex:
+    """任务索引测试类"""
+
+    @pytest.fixture
+    def index(self):
+        index = TaskIndex()
+        index.upsert(_task("t1", 1, language="python", severities=["high"]))
+        index.upsert(_task("t2", 2, language="php", severities=["low"]))
+        index.upsert(_task("t3", 3, status="failed", language="python"))
+        index.upsert(_task("t4", 4, language="python", severities=["medium", "high"]))
+        index.upsert(_task("t5", 5, status="pending", language="java"))
+        return index
+
+    def test_latest_first(self, index):
+        """测试默认按上传时间倒序"""
+        ids, cursor = index.query(limit=10)
+        assert ids == ["t5", "t4", "t3", "t2", "t1"]
+        assert cursor is None
+
+    def test_cursor_pagination(self, index):
+        """测试游标分页覆盖全部任务且不重复"""
+        seen = []
+        cursor = None
+        while True:
+            ids, cursor = index.query(limit=2, cursor=cursor)
+            seen.extend(ids)
+            if cursor is None:
+                break
+        assert seen == ["t5", "t4", "t3", "t2", "t1"]
+
+    def test_combined_filters(self, index):
+        """测试状态/语言/严重级别组合过滤"""
+        assert index.query(language="python", severity="high")[0] == ["t4", "t1"]
+        assert index.query(status="completed", language="PYTHON")[0] == ["t4", "t1"]
+        assert index.query(status="failed")[0] == ["t3"]
+        assert index.query(severity="critical")[0] == []
+
+    def test_date_range(self, index):
+        """测试时间范围过滤（只给日期时包含当天）"""
+        assert index.query(since="2026-10-02", until="2026-10-04")[0] == ["t4", "t3", "t2"]
+
+    def test_update_and_remove(self, index):
+        """测试状态变化和删除后索引同步"""
+        index.upsert(_task("t5", 5, status="completed", language="java", severities=["high"]))
+        assert index.query(status="pending")[0] == []
+        assert index.query(severity="high")[0] == ["t5", "t4", "t1"]
+
+        index.remove("t4")
+        assert index.query(severity="high")[0] == ["t5", "t1"]
+        assert len(index) == 4
+
+    def test_invalid_cursor_and_field(self, index):
+        """测试非法游标和过滤字段"""
+        with pytest.raises(ValueError):
+            index.query(cursor="not-a-cursor")
+        with pytest.raises(ValueError):
+            index.query(filename="a.py")
+
+    def test_cursor_roundtrip(self):
+        """测试游标编解码"""
+        key = ("2026-10-01T12:00:00", "abcd1234")
+        assert decode_cursor(encode_cursor(key)) == key
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,65 @@
+"""
+未结束任务日志测试
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_journal import TaskJournal
+
+
+def make_task(task_id, upload_time, **extra):
+    task = {
+        "task_id": task_id,
+        "filename": f"{task_id}.py",
+        "language": "python",
+        "status": "pending",
+        "upload_time": upload_time,
+        "file_size": 12,
+        "file_path": f"/uploads/{task_id}_app.py",
+        "tenant": "team-a",
+        "issues": [],
+        "summary": "等待分析",
+        "error": None,
+    }
+    task.update(extra)
+    return task
+
+
+class TestTaskJournal:
+    """登记、移除与重启后读取"""
+
+    def test_persisted_across_reopen(self, tmp_path):
+        journal = TaskJournal(tmp_path / "tasks.db")
+        journal.add(make_task("t2", "2024-01-02T00:00:00"))
+        journal.add(make_task("t1", "2024-01-01T00:00:00", batch_id="b1"))
+        journal.add(make_task("t3", "2024-01-03T00:00:00"))
+        journal.remove("t3")
+        journal.remove("missing")
+        journal.close()
+
+        reopened = TaskJournal(tmp_path / "tasks.db")
+        assert len(reopened) == 2
+        first, second = reopened.unfinished()
+        # 按上传时间排序，只保存恢复所需的字段
+        assert first == {
+            "task_id": "t1", "filename": "t1.py", "language": "python", "upload_time": "2024-01-01T00:00:00",
+            "file_size": 12, "file_path": "/uploads/t1_app.py", "tenant": "team-a", "batch_id": "b1"
+        }
+        assert second["task_id"] == "t2" and "batch_id" not in second and "status" not in second
+
+    def test_add_is_idempotent(self):
+        journal = TaskJournal()
+        task = make_task("t1", "2024-01-01T00:00:00")
+        journal.add(task)
+        journal.add(dict(task, language="java"))
+        assert [t["language"] for t in journal.unfinished()] == ["java"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
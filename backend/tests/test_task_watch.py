@@ -0,0 +1,91 @@
+"""
+任务版本与长轮询测试
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_watch import TaskWatch
+
+
+def bump_later(watch, task_id, delay, forget=False):
+    def run():
+        time.sleep(delay)
+        watch.forget(task_id) if forget else watch.bump(task_id)
+    threading.Thread(target=run).start()
+
+
+class TestTaskWatch:
+    """版本号与 ETag"""
+
+    def test_versions_and_etag(self):
+        watch = TaskWatch()
+        assert watch.version("t1") == 0
+        assert watch.bump("t1") == 1 and watch.bump("t1") == 2
+        assert watch.etag("t1") == 'W/"t1-2"'
+        watch.forget("t1")
+        assert watch.version("t1") == 0
+
+    def test_known_version(self):
+        assert TaskWatch.known_version("t1", 'W/"t1-3"') == 3
+        assert TaskWatch.known_version("t1", '"t1-3", W/"t1-5", W/"t2-9"') == 5
+        assert TaskWatch.known_version("t1", '"t10-3"') is None
+        assert TaskWatch.known_version("t1", "*") is None
+        assert TaskWatch.known_version("t1", None) is None
+
+
+class TestLongPoll:
+    """跨线程唤醒等待中的请求"""
+
+    def test_wakes_on_change_from_thread(self):
+        watch = TaskWatch()
+        watch.bump("t1")
+
+        async def poll():
+            bump_later(watch, "t1", 0.1)
+            start = time.monotonic()
+            version = await watch.wait("t1", 1, timeout=5)
+            return version, time.monotonic() - start
+
+        version, elapsed = asyncio.run(poll())
+        assert version == 2 and elapsed < 2
+        assert watch.stats() == {"tracked_tasks": 1, "waiting_requests": 0}
+
+    def test_timeout_and_stale_version(self):
+        watch = TaskWatch()
+
+        async def poll():
+            unchanged = await watch.wait("t1", 0, timeout=0.1)
+            watch.bump("t1")
+            # 客户端版本已过期时立即返回
+            start = time.monotonic()
+            current = await watch.wait("t1", 0, timeout=5)
+            return unchanged, current, time.monotonic() - start
+
+        unchanged, current, elapsed = asyncio.run(poll())
+        assert (unchanged, current) == (0, 1) and elapsed < 0.5
+        assert watch.stats()["waiting_requests"] == 0
+
+    def test_forget_wakes_waiters(self):
+        watch = TaskWatch()
+        watch.bump("t1")
+
+        async def poll():
+            bump_later(watch, "t1", 0.1, forget=True)
+            return await asyncio.gather(*(watch.wait("t1", 1, timeout=5) for _ in range(3)))
+
+        start = time.monotonic()
+        assert asyncio.run(poll()) == [0, 0, 0]
+        assert time.monotonic() - start < 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,190 @@
+"""
+多租户公平调度测试
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tenant_scheduler import (
+    FairScheduler, TenantPolicy, TenantRegistry, TokenBucket, estimate_tokens, llm_tokens
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(scheduler, release=True):
+    """依次领取所有可执行任务，返回 [(租户, 任务ID)]"""
+    order = []
+    while True:
+        task = scheduler.acquire(timeout=0)
+        if task is None:
+            return order
+        order.append((task.tenant, task.task_id))
+        if release:
+            scheduler.release(task.task_id)
+
+
+class TestFairScheduler:
+    """加权公平排队与配额"""
+
+    def test_small_tenant_not_starved_by_bulk_upload(self):
+        scheduler = FairScheduler(slots=1)
+        bulk, interactive = TenantPolicy("bulk"), TenantPolicy("interactive")
+        for i in range(50):
+            scheduler.submit(f"b{i}", bulk, cost=1000)
+        scheduler.submit("i0", interactive, cost=1000)
+        
+        order = [task_id for _, task_id in drain(scheduler)]
+        assert order.index("i0") <= 1
+        assert len(order) == 51
+
+    def test_batch_submit_is_fair(self):
+        scheduler = FairScheduler(slots=1)
+        ci, interactive = TenantPolicy("ci"), TenantPolicy("interactive")
+        tasks = scheduler.submit_batch(ci, [(f"c{i}", 1000, {"n": i}) for i in range(20)])
+        assert [t.data["n"] for t in tasks] == list(range(20))
+        scheduler.submit("i0", interactive, cost=1000)
+        
+        order = [task_id for _, task_id in drain(scheduler)]
+        assert order.index("i0") <= 1
+        assert [t for t in order if t != "i0"] == [f"c{i}" for i in range(20)]
+        assert scheduler.metrics()["ci"]["submitted"] == 20
+
+    def test_weights_split_throughput(self):
+        scheduler = FairScheduler(slots=1)
+        a, b = TenantPolicy("a", weight=2), TenantPolicy("b", weight=1)
+        for i in range(30):
+            scheduler.submit(f"a{i}", a, cost=100)
+            scheduler.submit(f"b{i}", b, cost=100)
+        
+        first = [tenant for tenant, _ in drain(scheduler)][:30]
+        assert first.count("a") == 20 and first.count("b") == 10
+
+    def test_cost_weighted_by_tokens(self):
+        scheduler = FairScheduler(slots=1)
+        big, small = TenantPolicy("big"), TenantPolicy("small")
+        scheduler.submit("big", big, cost=10000)
+        for i in range(5):
+            scheduler.submit(f"s{i}", small, cost=1000)
+        # 大任务的虚拟完成时间靠后，五个小任务先执行
+        assert [task_id for _, task_id in drain(scheduler)][-1] == "big"
+
+    def test_concurrency_limits(self):
+        scheduler = FairScheduler(slots=3)
+        capped, other = TenantPolicy("capped", max_concurrent=1), TenantPolicy("other")
+        for i in range(3):
+            scheduler.submit(f"c{i}", capped, cost=1)
+        scheduler.submit("o0", other, cost=1)
+        
+        # 还有空闲槽位，但 capped 已达并发上限
+        running = drain(scheduler, release=False)
+        assert sorted(tenant for tenant, _ in running) == ["capped", "other"]
+        scheduler.release("c0")
+        assert scheduler.acquire(timeout=0).task_id == "c1"
+        
+        scheduler.submit("o1", other, cost=1)
+        scheduler.submit("o2", other, cost=1)
+        assert scheduler.acquire(timeout=0).task_id == "o1"
+        # 总槽位已满
+        assert scheduler.acquire(timeout=0) is None
+        assert scheduler.stats() == {"slots": 3, "running": 3, "queued": 2, "tenants": 2}
+
+    def test_tokens_per_minute(self):
+        clock = FakeClock()
+        scheduler = FairScheduler(slots=4, clock=clock)
+        tenant = TenantPolicy("t", tokens_per_minute=6000)
+        for i in range(3):
+            scheduler.submit(f"t{i}", tenant, cost=3000)
+        
+        assert [task_id for _, task_id in drain(scheduler, release=False)] == ["t0", "t1"]
+        # 实际用量超出预估：透支部分需要先恢复
+        scheduler.release("t0", tokens_used=4500)
+        clock.now = 30
+        assert scheduler.acquire(timeout=0) is None
+        clock.now = 75
+        assert scheduler.acquire(timeout=0).task_id == "t2"
+        
+        metrics = scheduler.metrics()["t"]
+        assert metrics["tokens_used"] == 4500
+        assert metrics["running"] == 2 and metrics["completed"] == 1
+
+    def test_unknown_usage_keeps_estimate(self):
+        clock = FakeClock()
+        scheduler = FairScheduler(slots=1, clock=clock)
+        tenant = TenantPolicy("t", tokens_per_minute=10000)
+        scheduler.submit("t0", tenant, cost=9000)
+        scheduler.submit("t1", tenant, cost=9000)
+        scheduler.acquire(timeout=0)
+        # 用量未知（失败、非分层分析没有统计）时不退还预估
+        scheduler.release("t0", tokens_used=None)
+        assert scheduler.acquire(timeout=0) is None
+        metrics = scheduler.metrics()["t"]
+        assert metrics["tokens_available"] == 1000 and metrics["tokens_used"] == 9000
+
+    def test_remove_and_release_idempotent(self):
+        scheduler = FairScheduler(slots=1)
+        tenant = TenantPolicy("t")
+        scheduler.submit("a", tenant, cost=1)
+        scheduler.submit("b", tenant, cost=1)
+        assert scheduler.remove("b")
+        assert not scheduler.release("b")
+        
+        task = scheduler.acquire(timeout=0)
+        assert not scheduler.remove("a")
+        assert scheduler.release("a") and not scheduler.release("a")
+        assert scheduler.acquire(timeout=0) is None
+        assert scheduler.metrics()["t"]["cancelled"] == 1
+
+
+class TestTenants:
+    """租户身份与辅助函数"""
+
+    def test_registry_with_api_keys(self):
+        registry = TenantRegistry(json.dumps({"k1": {"tenant": "team-a", "weight": 3, "max_concurrent": 2}}))
+        tenant = registry.resolve("k1", "ignored")
+        assert (tenant.name, tenant.weight, tenant.max_concurrent) == ("team-a", 3.0, 2)
+        assert registry.resolve("bad") is None
+        assert registry.resolve(None) is None
+        # 按名称取配额（恢复重启前的任务）
+        assert registry.policy("team-a").weight == 3.0
+        assert (registry.policy("gone").name, registry.policy("gone").weight) == ("gone", 1.0)
+        assert registry.policy(None).name == "default"
+
+    def test_registry_by_header(self):
+        registry = TenantRegistry(default=TenantPolicy("default", tokens_per_minute=100))
+        assert registry.resolve(None, "team-b").name == "team-b"
+        assert registry.resolve(None, None).name == "default"
+        assert registry.resolve(None, "x").tokens_per_minute == 100
+        with pytest.raises(ValueError):
+            TenantPolicy("bad", weight=0)
+
+    def test_token_bucket_large_task(self):
+        clock = FakeClock()
+        bucket = TokenBucket(600, clock)
+        # 超过桶容量的任务在桶满时即可开始
+        assert bucket.wait_time(5000) == 0
+        bucket.consume(900)
+        assert bucket.wait_time(600) == pytest.approx(90)
+
+    def test_token_helpers(self):
+        assert estimate_tokens(4000) == 2000
+        assert llm_tokens({"llm_usage": {"prompt_tokens": 10, "cached_tokens": 4, "completion_tokens": 5}}) == 15
+        assert llm_tokens({"llm_usage": {"prompt_tokens": 0, "completion_tokens": 0}}) == 0
+        assert llm_tokens({"llm_usage": None}) is None
+        assert llm_tokens({}) is None and llm_tokens(None) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,205 @@
+"""
+函数级近重复检测与结论复用测试
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_engine import LLMAuditEngine
+from prompt_budget import PromptBudget, get_counter
+from verdict_index import VerdictIndex, extract_functions, similarity
+
+HELPER = '''import sqlite3
+
+
+def get_user(db_path, user_id):
+    """按 ID 查询用户"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    query = "SELECT * FROM users WHERE id = " + str(user_id)
+    cursor.execute(query)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+'''
+
+# 同一个 helper 复制到另一个服务，只改了函数名和变量名
+RENAMED = '''import sqlite3
+
+
+def load_account(path, account_id):
+    connection = sqlite3.connect(path)
+    cur = connection.cursor()
+    sql = "SELECT * FROM accounts WHERE id = " + str(account_id)
+    cur.execute(sql)
+    result = cur.fetchall()
+    connection.close()
+    return result
+'''
+
+# 结构相近：多了一行日志
+NEAR = RENAMED.replace("    result = cur.fetchall()\n", "    result = cur.fetchall()\n    print(len(result))\n")
+
+# 只有一个常量不同的安全/危险版本
+SAFE_RUN = '''import subprocess
+
+
+def run_tool(cmd, cwd, env):
+    """运行外部工具"""
+    args = [cmd, "--quiet"]
+    completed = subprocess.run(args, cwd=cwd, env=env, shell=False, capture_output=True, check=False)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode("utf-8", "replace"))
+    output = completed.stdout.decode("utf-8", "replace")
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    return lines
+'''
+UNSAFE_RUN = SAFE_RUN.replace("shell=False", "shell=True")
+
+
+class FakeCompletions:
+    """在 cursor.execute 所在行报告 SQL 注入"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def create(self, model, messages, **kwargs):
+        prompt = messages[1]["content"]
+        self.prompts.append(prompt)
+        code = prompt.split("```")[1]
+        issues = [
+            {"severity": "high", "category": "SQL注入", "line": number, "description": "拼接 SQL"}
+            for number, line in enumerate(code.splitlines()[1:], 1) if ".execute(" in line
+        ]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"issues": issues, "summary": "ok"})))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=10, prompt_cache_hit_tokens=0),
+        )
+
+
+def _engine(verdicts, completions):
+    engine = LLMAuditEngine(api_key=None, model="large", verdicts=verdicts)
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return engine
+
+
+class TestNormalization:
+    """AST 归一化与 MinHash"""
+
+    def test_renamed_copy_has_same_fingerprint(self):
+        original, = extract_functions(HELPER, "python")
+        renamed, = extract_functions(RENAMED, "python")
+        assert (original.start, original.end) == (4, 12)
+        assert original.fingerprint == renamed.fingerprint
+
+    def test_near_copy_is_similar_but_different_code_is_not(self):
+        original, = extract_functions(HELPER, "python")
+        near, = extract_functions(NEAR, "python")
+        other, = extract_functions("def f(a):\n    for x in a:\n        yield x * 2\n", "python")
+        assert original.fingerprint != near.fingerprint
+        assert similarity(original.signature, near.signature) >= 0.7
+        assert similarity(original.signature, other.signature) < 0.3
+
+    def test_literal_flags_change_fingerprint(self):
+        safe, = extract_functions(SAFE_RUN, "python")
+        unsafe, = extract_functions(UNSAFE_RUN, "python")
+        assert safe.fingerprint != unsafe.fingerprint
+        assert safe.literal_key != unsafe.literal_key
+        # 短字符串保留原值，长字符串（如 SQL）仍只保留类型
+        helper, = extract_functions(HELPER, "python")
+        assert "'--quiet'" in safe.tokens and "str" in helper.tokens
+
+    def test_unsupported_input(self):
+        assert extract_functions("function f() {}", "javascript") == []
+        assert extract_functions("def broken(:\n", "python") == []
+
+
+class TestVerdictReuse:
+    """跨任务复用结论"""
+
+    def test_exact_reuse_skips_llm(self, tmp_path):
+        verdicts = VerdictIndex(tmp_path / "verdicts.db")
+        completions = FakeCompletions()
+        first = _engine(verdicts, completions).analyze_code(HELPER, "python")
+        assert [i["line"] for i in first["issues"]] == [9]
+        assert first["dedup"] == {"functions": 1, "reused": 0, "reused_issues": 0, "llm_skipped": False}
+
+        # 重新打开持久化索引，改名后的副本直接复用结论
+        verdicts = VerdictIndex(tmp_path / "verdicts.db")
+        second = _engine(verdicts, completions).analyze_code(RENAMED, "python")
+        assert len(completions.prompts) == 1
+        assert second["dedup"]["llm_skipped"] is True
+        issue, = second["issues"]
+        assert (issue["line"], issue["category"], issue["reused_similarity"]) == (8, "SQL注入", 1.0)
+        assert verdicts.stats()["exact_hits"] == 1
+
+    def test_near_duplicate_reuse_with_threshold(self):
+        completions = FakeCompletions()
+        _engine(VerdictIndex(threshold=0.7), completions).analyze_code(HELPER, "python")
+
+        strict = VerdictIndex(threshold=1.0)
+        _engine(strict, completions).analyze_code(HELPER, "python")
+        _engine(strict, completions).analyze_code(NEAR, "python")
+        assert strict.stats()["misses"] == 2
+
+        loose = VerdictIndex(threshold=0.7)
+        _engine(loose, completions).analyze_code(HELPER, "python")
+        result = _engine(loose, completions).analyze_code(NEAR, "python")
+        assert result["dedup"]["reused"] == 1
+        assert loose.stats()["near_hits"] == 1
+
+    def test_safe_twin_not_reused_for_unsafe_function(self):
+        # 即使阈值很低，常量原值不同的函数也不是近似匹配候选
+        verdicts = VerdictIndex(threshold=0.5)
+        completions = FakeCompletions()
+        assert _engine(verdicts, completions).analyze_code(SAFE_RUN, "python")["issues"] == []
+        assert len(verdicts) == 1
+
+        result = _engine(verdicts, completions).analyze_code(UNSAFE_RUN, "python")
+        assert len(completions.prompts) == 2
+        assert result["dedup"]["reused"] == 0 and result["dedup"]["llm_skipped"] is False
+        assert verdicts.stats()["misses"] == 2
+
+    def test_truncated_code_not_recorded(self):
+        verdicts = VerdictIndex()
+        completions = FakeCompletions()
+        code = HELPER + "".join(
+            f"\n\ndef handler_{i}(request, db):\n    value = request.args.get('q{i}')\n"
+            f"    rows = db.query(value, limit={i})\n    return [row.name for row in rows if row.active]\n"
+            for i in range(120)
+        )
+        engine = _engine(verdicts, completions)
+        engine.budget = PromptBudget(get_counter("large"), context_tokens=1200)
+        result = engine.analyze_code(code, "python")
+        assert result["prompt_budget"]["code_truncated"] is True
+        assert "handler_119" not in completions.prompts[-1]
+        # 没有发送给 LLM 的函数不能作为无问题的结论写入
+        assert len(verdicts) == 0
+
+        engine.analyze_code(code, "python")
+        assert len(completions.prompts) == 2
+
+    def test_only_new_functions_sent_to_llm(self):
+        verdicts = VerdictIndex()
+        completions = FakeCompletions()
+        _engine(verdicts, completions).analyze_code(HELPER, "python")
+
+        extra = "\n\ndef run(cmd):\n    import os\n    return os.system(cmd)\n"
+        result = _engine(verdicts, completions).analyze_code(RENAMED + extra, "python")
+        prompt = completions.prompts[-1]
+        assert "[已复用历史结论] load_account: 第 4-11 行" in prompt
+        assert "cur.execute(sql)" not in prompt
+        assert "os.system(cmd)" in prompt
+        assert result["dedup"] == {"functions": 2, "reused": 1, "reused_issues": 1, "llm_skipped": False}
+        assert [i["line"] for i in result["issues"]] == [8]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1 @@
+x=1
@@ -0,0 +1,445 @@
+"""
+函数级近重复检测与结论复用
+对函数 AST 做标识符归一化后计算 MinHash 签名，用 LSH 分桶在 SQLite 中检索结构相同/相近的已审计函数，
+命中时直接复用其审计结论，只把未命中的函数交给 LLM
+"""
+
+import ast
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# MinHash 参数：64 个哈希函数，16 个 band x 4 行（Jaccard 0.9 时几乎必然成为候选）
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+# 归一化 token 过少的函数（getter、空实现等）彼此天然相似，不参与复用
+MIN_TOKENS = 40
+# 不超过该长度的字符串常量保留原值（"w"、"GET"、"sha1" 等会改变调用语义），更长的替换为类型标记
+SHORT_LITERAL = 16
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(num_perm: int) -> List[Tuple[int, int]]:
+    """固定种子派生的 (a, b) 系数，保证不同进程生成的签名可比较"""
+    params = []
+    for i in range(num_perm):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little") % _PRIME or 1
+        b = int.from_bytes(digest[8:], "little") % _PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMUTATIONS = _permutations(NUM_PERM)
+
+
+class _Normalizer:
+    """
+    把函数 AST 序列化为 token 序列：
+    - 函数内绑定的名字（参数、局部变量、循环变量等）按出现顺序替换为 V0, V1, ...
+    - 函数名替换为 FUNC，数字常量和较长的字符串常量替换为类型标记；
+      True/False/None 和短字符串保留原值，shell=True 与 shell=False 不能视为同一函数；
+      这些原值另外记入 literals，近似匹配也要求两者一致
+    - 属性名、全局名（os、request、db 等）保留，它们决定了数据流向的 sink
+    """
+
+    def __init__(self, func: ast.AST):
+        self.bound = {arg.arg for arg in ast.walk(func.args) if isinstance(arg, ast.arg)}
+        for node in ast.walk(func):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                self.bound.add(node.id)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node is not func:
+                self.bound.add(node.name)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                self.bound.add(node.name)
+        self.aliases: Dict[str, str] = {}
+        self.tokens: List[str] = []
+        self.literals: List[str] = []
+        self.stmt_lines: List[int] = []
+        self.func = func
+
+    def _alias(self, name: str) -> str:
+        if name not in self.bound:
+            return name
+        if name not in self.aliases:
+            self.aliases[name] = f"V{len(self.aliases)}"
+        return self.aliases[name]
+
+    def _constant(self, value) -> str:
+        # bool 是 int 的子类，必须先于数字判断
+        if isinstance(value, (str, bytes, int, float, complex)) and not isinstance(value, bool):
+            if not isinstance(value, (str, bytes)) or len(value) > SHORT_LITERAL:
+                return type(value).__name__
+        token = repr(value)
+        self.literals.append(token)
+        return token
+
+    def visit(self, node: ast.AST):
+        tokens = self.tokens
+        tokens.append(type(node).__name__)
+        if isinstance(node, ast.stmt) and node is not self.func:
+            self.stmt_lines.append(node.lineno)
+        if isinstance(node, ast.Name):
+            tokens.append(self._alias(node.id))
+            return
+        if isinstance(node, ast.arg):
+            tokens.append(self._alias(node.arg))
+        elif isinstance(node, ast.Attribute):
+            tokens.append(node.attr)
+        elif isinstance(node, ast.keyword):
+            tokens.append(node.arg or "**")
+        elif isinstance(node, ast.alias):
+            tokens.append(node.name)
+        elif isinstance(node, ast.Constant):
+            tokens.append(self._constant(node.value))
+            return
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            tokens.append("FUNC" if node is self.func else self._alias(node.name))
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            tokens.append(self._alias(node.name))
+
+        body = getattr(node, "body", None)
+        skip_docstring = (
+            isinstance(body, list) and body and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str)
+        )
+        for field, value in ast.iter_fields(node):
+            if field in ("ctx", "type_comment"):
+                continue
+            if isinstance(value, list):
+                for item in value[1:] if (field == "body" and skip_docstring) else value:
+                    if isinstance(item, ast.AST):
+                        self.visit(item)
+            elif isinstance(value, ast.AST):
+                self.visit(value)
+
+
+class FunctionUnit:
+    """
+    源码中的一个函数（含装饰器），行号为文件行号
+    stmt_lines 为函数内各语句（不含文档字符串）按遍历顺序的起始行，
+    结论中的问题按语句序号保存，复用到结构相同的函数时再换算回行号
+    literal_key 为保留原值的常量序列的摘要，只有该摘要相同的函数才互为近似匹配候选
+    """
+    __slots__ = ("name", "start", "end", "tokens", "stmt_lines", "fingerprint", "literal_key", "_signature")
+
+    def __init__(self, name: str, start: int, end: int, tokens: List[str], stmt_lines: List[int],
+                 literals: List[str] = ()):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.tokens = tokens
+        self.stmt_lines = stmt_lines
+        self.fingerprint = hashlib.sha1(" ".join(tokens).encode("utf-8")).hexdigest()
+        self.literal_key = hashlib.sha1("\0".join(literals).encode("utf-8")).hexdigest()[:16]
+        self._signature = None
+
+    @property
+    def signature(self) -> List[int]:
+        if self._signature is None:
+            self._signature = minhash(self.tokens)
+        return self._signature
+
+    def statement_at(self, line: int) -> int:
+        """行号 -> 所在语句序号（-1 表示函数定义行）"""
+        index = -1
+        for i, stmt_line in enumerate(self.stmt_lines):
+            if stmt_line > line:
+                break
+            index = i
+        return index
+
+    def line_of(self, statement: int) -> int:
+        """语句序号 -> 行号；近似重复时序号可能越界，取最后一条语句"""
+        if statement < 0 or not self.stmt_lines:
+            return self.start
+        return self.stmt_lines[min(statement, len(self.stmt_lines) - 1)]
+
+
+def minhash(tokens: List[str], size: int = SHINGLE_SIZE) -> List[int]:
+    """token 序列的 k-shingle 集合 -> MinHash 签名"""
+    shingles = {" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+              for s in shingles]
+    return [min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """签名相同位置的比例，即 Jaccard 相似度的估计"""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def _band_keys(signature: List[int], literal_key: str) -> List[str]:
+    """LSH 分桶键；带上 literal_key，常量原值不同的函数不会落入同一个桶"""
+    rows = len(signature) // BANDS
+    return [
+        hashlib.sha1(f"{literal_key}:{','.join(map(str, signature[i * rows:(i + 1) * rows]))}".encode()).hexdigest()[:16]
+        for i in range(BANDS)
+    ]
+
+
+def extract_functions(code: str, language: str) -> List[FunctionUnit]:
+    """
+    提取模块级函数和类方法（嵌套函数归属外层函数）；目前只支持 Python，
+    其他语言或语法错误时返回空列表
+    """
+    if language.lower() != "python":
+        return []
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+
+    units = []
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop(0)
+        if isinstance(node, ast.ClassDef):
+            pending.extend(node.body)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            normalizer = _Normalizer(node)
+            normalizer.visit(node)
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            units.append(FunctionUnit(node.name, start, node.end_lineno, normalizer.tokens, normalizer.stmt_lines,
+                                      normalizer.literals))
+    return units
+
+
+class DedupPlan:
+    """
+    一次分析的复用计划
+
+    - code: 复用函数的行已清空（保留行号）的代码，交给 LLM
+    - reused_issues: 复用的历史结论（已换算为本文件行号）
+    - pending: 需要 LLM 分析、分析后写入索引的函数
+    - skip_llm: 所有函数都已复用且模块级只有导入语句
+    """
+
+    def __init__(self, code: str, functions: List[FunctionUnit]):
+        self.code = code
+        self.functions = functions
+        self.reused: List[Tuple[FunctionUnit, float]] = []
+        self.reused_issues: List[Dict] = []
+        self.pending: List[FunctionUnit] = []
+        self.skip_llm = False
+
+    def covers(self, line) -> bool:
+        """行号是否落在已复用的函数内"""
+        return isinstance(line, int) and any(u.start <= line <= u.end for u, _ in self.reused)
+
+    def stats(self) -> Dict:
+        return {
+            "functions": len(self.functions),
+            "reused": len(self.reused),
+            "reused_issues": len(self.reused_issues),
+            "llm_skipped": self.skip_llm
+        }
+
+
+class VerdictIndex:
+    """已审计函数的近重复索引（线程安全，SQLite 持久化）"""
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:", threshold: float = 0.9,
+                 min_tokens: int = MIN_TOKENS):
+        """
+        初始化索引
+
+        Args:
+            db_path: SQLite 数据库路径，默认内存库
+            threshold: 复用结论所需的最低 MinHash 相似度（1.0 表示只复用归一化后完全相同的函数）
+            min_tokens: 参与复用的函数最少归一化 token 数
+        """
+        self.db_path = str(db_path)
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_schema()
+        self.metrics = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0,
+                        "reused_issues": 0, "llm_skipped": 0, "recorded": 0}
+
+    def _create_schema(self):
+        conn = self._conn
+        if self.db_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL UNIQUE,
+                language TEXT,
+                name TEXT,
+                signature TEXT NOT NULL,
+                issues TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS verdict_bands (
+                band_key TEXT NOT NULL,
+                verdict_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_verdict_bands ON verdict_bands(band_key);
+        """)
+        conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def lookup(self, unit: FunctionUnit, language: str) -> Optional[Tuple[float, List[Dict]]]:
+        """
+        查找结构相同或相近的已审计函数
+
+        Returns:
+            (相似度, 问题列表（stmt 为语句序号）)，未命中返回 None
+        """
+        if len(unit.tokens) < self.min_tokens:
+            return None
+        with self._lock:
+            self.metrics["lookups"] += 1
+            conn = self._conn
+            row = conn.execute(
+                "SELECT issues FROM verdicts WHERE fingerprint = ? AND language = ?",
+                (unit.fingerprint, language)
+            ).fetchone()
+            if row:
+                self.metrics["exact_hits"] += 1
+                return 1.0, json.loads(row[0])
+
+            best = None
+            if self.threshold < 1.0:
+                keys = _band_keys(unit.signature, unit.literal_key)
+                candidates = conn.execute(
+                    f"SELECT DISTINCT v.signature, v.issues FROM verdict_bands b "
+                    f"JOIN verdicts v ON v.id = b.verdict_id "
+                    f"WHERE b.band_key IN ({', '.join('?' for _ in keys)}) AND v.language = ?",
+                    keys + [language]
+                ).fetchall()
+                for signature, issues in candidates:
+                    score = similarity(unit.signature, json.loads(signature))
+                    if score >= self.threshold and (best is None or score > best[0]):
+                        best = (score, issues)
+            if best is None:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["near_hits"] += 1
+            return best[0], json.loads(best[1])
+
+    def add(self, unit: FunctionUnit, language: str, issues: List[Dict]) -> bool:
+        """
+        记录函数的审计结论（问题以 stmt 语句序号代替行号，无问题也记录）
+
+        Returns:
+            是否新增（归一化后完全相同的函数只保留第一条）
+        """
+        if len(unit.tokens) < self.min_tokens:
+            return False
+        signature = unit.signature
+        with self._lock:
+            conn = self._conn
+            with conn:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO verdicts (fingerprint, language, name, signature, issues) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (unit.fingerprint, language, unit.name, json.dumps(signature),
+                     json.dumps(issues, ensure_ascii=False))
+                )
+                if not cur.rowcount:
+                    return False
+                conn.executemany(
+                    "INSERT INTO verdict_bands (band_key, verdict_id) VALUES (?, ?)",
+                    [(key, cur.lastrowid) for key in _band_keys(signature, unit.literal_key)]
+                )
+            self.metrics["recorded"] += 1
+        return True
+
+    def prepare(self, code: str, language: str) -> DedupPlan:
+        """
+        提取函数并逐个查找历史结论，生成复用计划
+        """
+        language = language.lower()
+        functions = extract_functions(code, language)
+        plan = DedupPlan(code, functions)
+        if not functions:
+            return plan
+
+        lines = code.splitlines(keepends=True)
+        for unit in functions:
+            hit = self.lookup(unit, language)
+            if hit is None:
+                plan.pending.append(unit)
+                continue
+            score, issues = hit
+            plan.reused.append((unit, score))
+            for issue in issues:
+                issue = dict(issue, reused_similarity=round(score, 3))
+                statement = issue.pop("stmt", None)
+                if statement is not None:
+                    issue["line"] = unit.line_of(statement)
+                plan.reused_issues.append(issue)
+            # 清空函数体但保留行号，LLM 返回的行号仍对应原文件；pass 保证类体仍然合法
+            first = lines[unit.start - 1]
+            indent = first[:len(first) - len(first.lstrip())]
+            lines[unit.start - 1] = f"{indent}pass  # [已复用历史结论] {unit.name}: 第 {unit.start}-{unit.end} 行\n"
+            for number in range(unit.start, min(unit.end, len(lines))):
+                lines[number] = "\n"
+
+        if plan.reused:
+            plan.code = "".join(lines)
+            plan.skip_llm = not plan.pending and self._only_imports(plan.code)
+            with self._lock:
+                self.metrics["reused_issues"] += len(plan.reused_issues)
+                self.metrics["llm_skipped"] += int(plan.skip_llm)
+            logger.info(f"函数级结论复用: {plan.stats()}")
+        return plan
+
+    @staticmethod
+    def _only_imports(code: str) -> bool:
+        """清空复用函数后，模块级是否只剩导入、文档字符串和空的类定义"""
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return False
+
+        def trivial(node):
+            if isinstance(node, (ast.Import, ast.ImportFrom, ast.Pass)):
+                return True
+            if isinstance(node, ast.Expr):
+                return isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+            return isinstance(node, ast.ClassDef) and all(trivial(n) for n in node.body)
+
+        return all(trivial(node) for node in tree.body)
+
+    def record(self, plan: DedupPlan, issues: List[Dict], language: str) -> int:
+        """
+        把 LLM 对未命中函数的分析结论写入索引
+
+        Returns:
+            新增的函数数
+        """
+        added = 0
+        for unit in plan.pending:
+            own = []
+            for issue in issues:
+                line = issue.get("line")
+                if isinstance(line, int) and unit.start <= line <= unit.end:
+                    stored = {k: v for k, v in issue.items() if k not in ("line", "tier")}
+                    stored["stmt"] = unit.statement_at(line)
+                    own.append(stored)
+            added += self.add(unit, language.lower(), own)
+        return added
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.metrics)
+        hits = stats["exact_hits"] + stats["near_hits"]
+        stats["hit_rate"] = round(hits / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
@@ -0,0 +1,200 @@
+"""
+分布式审计 Worker
+从任务队列领取单文件审计任务，在本机沙箱中执行，并把状态和结果写回结果流。
+Worker 不保存任务状态（源码随任务下发），可以在任意节点按需启动多个实例：
+
+    python worker.py --broker redis://queue-host:6379/0 --concurrency 4
+"""
+
+import os
+import base64
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from sandbox import SecureSandbox
+from verdict_index import VerdictIndex
+from cancellation import CancelToken, TaskCancelled
+from audit_runner import audit_file
+import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def job_payload(filename: str, language: str, content: bytes) -> Dict:
+    """构造任务负载：源码随任务下发，Worker 无需访问 API 节点的上传目录"""
+    return {
+        "filename": filename,
+        "language": language,
+        "content": base64.b64encode(content).decode("ascii")
+    }
+
+
+class AuditWorker:
+    """
+    单个 Worker：循环领取任务并执行
+
+    执行期间每隔可见性超时的三分之一续租一次；续租失败（任务被取消或租约已被重新投递）时
+    通过取消令牌立即终止静态扫描和 LLM 请求
+    """
+
+    def __init__(
+        self,
+        broker,
+        sandbox: Optional[SecureSandbox] = None,
+        verdicts: Optional[VerdictIndex] = None,
+        name: Optional[str] = None,
+        work_dir: Optional[str] = None,
+        task_timeout: float = Config.TASK_TIMEOUT,
+        audit: Callable[..., Dict] = audit_file
+    ):
+        """
+        Args:
+            broker: job_queue.LocalBroker / RedisBroker
+            sandbox: 执行审计的沙箱
+            verdicts: 函数级结论复用索引（本机缓存，可选）
+            name: Worker 名称，随状态消息回传
+            work_dir: 下发源码的临时落盘目录
+            task_timeout: 单个任务的时间预算（秒）
+            audit: 审计函数，签名同 audit_runner.audit_file
+        """
+        self.broker = broker
+        self.sandbox = sandbox or SecureSandbox()
+        self.verdicts = verdicts
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="audit_worker_"))
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.task_timeout = task_timeout
+        self.audit = audit
+        self.processed = 0
+        self.thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._current: Optional[CancelToken] = None
+
+    def _heartbeat(self, job: job_queue.Job, token: CancelToken, done: threading.Event):
+        interval = max(0.05, self.broker.visibility_timeout / 3)
+        while not done.wait(interval):
+            try:
+                alive = self.broker.extend(job)
+            except Exception as e:
+                # 队列暂时不可用：继续执行，租约过期后由其他 Worker 接手
+                logger.warning(f"任务 {job.job_id} 续租失败: {e}")
+                continue
+            if not alive:
+                token.cancel("revoked")
+                return
+
+    def process(self, job: job_queue.Job):
+        """执行一次投递：成功或失败都回传结果并确认；被撤销或 Worker 退出时不确认"""
+        payload = job.payload
+        filename = os.path.basename(payload.get("filename") or "source")
+        file_path = self.work_dir / f"{job.job_id}_{filename}"
+        token = CancelToken()
+        done = threading.Event()
+        self._current = token
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, token, done), daemon=True)
+        try:
+            token.start_budget(self.task_timeout)
+            heartbeat.start()
+            self.broker.publish(job.job_id, {"status": "running", "worker": self.name, "attempt": job.attempt})
+            logger.info(f"[{self.name}] 开始审计任务 {job.job_id}（第 {job.attempt} 次投递）")
+            file_path.write_bytes(base64.b64decode(payload.get("content", "")))
+            result = self.audit(job.job_id, str(file_path), payload.get("language", "python"),
+                                self.sandbox, token, self.verdicts)
+            issues = [issue.to_dict() for issue in result.get("issues", [])]
+            self.broker.publish(job.job_id, dict(result, issues=issues, status="completed", worker=self.name))
+            self.broker.ack(job)
+        except TaskCancelled as e:
+            if e.reason == "timeout":
+                error = f"任务超过时间预算（{self.task_timeout:g} 秒）"
+                self.broker.publish(job.job_id, {"status": "failed", "error": error, "worker": self.name})
+                self.broker.ack(job)
+            elif e.reason == "shutdown":
+                # Worker 退出，立即交还给其他 Worker
+                self.broker.nack(job)
+            else:
+                # 已被用户取消或租约已转交：确认只对仍持有的租约生效
+                self.broker.ack(job)
+            logger.warning(f"[{self.name}] 任务 {job.job_id} 已终止: {e.reason}")
+        except Exception as e:
+            logger.error(f"[{self.name}] 任务 {job.job_id} 失败: {e}", exc_info=True)
+            self.broker.publish(job.job_id, {"status": "failed", "error": str(e), "worker": self.name})
+            self.broker.ack(job)
+        finally:
+            done.set()
+            token.close()
+            self._current = None
+            self.processed += 1
+            try:
+                file_path.unlink()
+            except OSError:
+                pass
+
+    def run(self, poll_timeout: float = 1.0, max_jobs: Optional[int] = None):
+        """循环领取任务直到 stop()；max_jobs 用于测试和一次性批处理"""
+        logger.info(f"Worker {self.name} 已启动")
+        while not self._stop.is_set() and (max_jobs is None or self.processed < max_jobs):
+            try:
+                job = self.broker.reserve(timeout=poll_timeout)
+            except Exception as e:
+                logger.warning(f"[{self.name}] 领取任务失败: {e}")
+                self._stop.wait(poll_timeout)
+                continue
+            if job is not None:
+                self.process(job)
+        logger.info(f"Worker {self.name} 已退出")
+
+    def stop(self, wait: float = 0):
+        """停止领取新任务，并终止进行中的任务（交还队列）；wait > 0 时等待线程退出"""
+        self._stop.set()
+        token = self._current
+        if token is not None:
+            token.cancel("shutdown")
+        if wait and self.thread is not None:
+            self.thread.join(wait)
+
+
+def start_workers(broker, count: int, **kwargs) -> List[AuditWorker]:
+    """在后台线程中启动 count 个 Worker"""
+    workers = []
+    for i in range(count):
+        worker = AuditWorker(broker, **kwargs)
+        worker.name = f"{worker.name}-{i}"
+        worker.thread = threading.Thread(target=worker.run, name=f"audit-worker-{i}", daemon=True)
+        worker.thread.start()
+        workers.append(worker)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cyber Audit 分布式 Worker")
+    parser.add_argument("--broker", default=Config.AUDIT_BROKER_URL, help="任务队列地址，如 redis://host:6379/0")
+    parser.add_argument("--concurrency", type=int, default=Config.WORKER_CONCURRENCY, help="本机并发执行的任务数")
+    args = parser.parse_args()
+    if not args.broker:
+        parser.error("需要通过 --broker 或 AUDIT_BROKER_URL 指定任务队列地址")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    broker = job_queue.connect(args.broker, Config.JOB_VISIBILITY_TIMEOUT, Config.JOB_MAX_ATTEMPTS)
+    verdicts = VerdictIndex(Path(__file__).parent / Config.VERDICT_DB_PATH, threshold=Config.VERDICT_SIMILARITY)
+    sandbox = SecureSandbox()
+    workers = start_workers(broker, max(1, args.concurrency), sandbox=sandbox, verdicts=verdicts)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logger.info("正在停止 Worker...")
+    finally:
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.stop(wait=10)
+        broker.close()
+
+
+if __name__ == "__main__":
+    main()